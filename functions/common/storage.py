@@ -0,0 +1,24 @@
+import os
+import stat
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.abspath(os.path.join(CURRENT_DIR, "..", ".."))
+STORAGE_DIR = os.path.join(BASE_DIR, "storage")
+
+
+def private_directory(path: str) -> str:
+    """
+    Create ``path`` as a directory only this user can use, and refuse an
+    existing one that another user owns or could write into.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.name == "nt":  # POSIX ownership and mode bits do not apply
+        return path
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Refusing to use {path}: not a plain directory")
+    if info.st_uid != os.geteuid():
+        raise PermissionError(f"Refusing to use {path}: owned by uid {info.st_uid}")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"Refusing to use {path}: writable by group or others")
+    return path
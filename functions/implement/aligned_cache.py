@@ -0,0 +1,291 @@
+"""Disk-backed cache of rasters already warped onto a reference grid.
+
+The raster calculator, change detection and time-series analysis all warp
+secondary inputs onto a reference grid. Users iterating on an expression or
+a date range warp the same inputs onto the same grid again and again, so
+``open_aligned`` keeps the warped result as a float32 GeoTIFF (NaN marks
+pixels that are invalid or outside the source coverage) keyed by
+
+* the source path and its ``raster_validity_signature`` (mtime/size of the
+  raster and its GDAL validity sidecars, so edits invalidate the entry);
+* the target grid (CRS, transform, width, height);
+* the resampling method;
+* the source bands the caller reads, so only those are warped.
+
+Each entry is built once: concurrent callers (threads, or other processes
+through a lock file) wait for the first builder and then share the result.
+The directory is bounded by ``RS_ALIGNED_CACHE_MAX_BYTES`` with
+least-recently-used eviction (a hit refreshes the file's mtime).
+``RS_ALIGNED_CACHE=0`` falls back to an in-memory ``WarpedVRT`` per call.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from collections.abc import Iterable
+from contextlib import contextmanager
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from functions.common.storage import STORAGE_DIR, private_directory
+from functions.implement.block_processing import iter_halo_windows
+from functions.implement.raster_validity import (
+    aligned_vrt,
+    dataset_has_explicit_mask,
+    grids_match,
+    raster_validity_signature,
+    read_masked_data,
+    read_masked_from_vrt,
+)
+
+logger = logging.getLogger("functions.aligned_cache")
+
+ALIGNED_CACHE_ENABLED = os.getenv("RS_ALIGNED_CACHE", "1").strip().lower() not in {"0", "false", "no", "off"}
+ALIGNED_CACHE_DIR = os.getenv("RS_ALIGNED_CACHE_DIR", os.path.join(STORAGE_DIR, "aligned_cache"))
+ALIGNED_CACHE_MAX_BYTES = int(os.getenv("RS_ALIGNED_CACHE_MAX_BYTES", str(4 * 1024 ** 3)))
+
+_BUILD_BLOCK_SIZE = 1024
+_SOURCE_BANDS_TAG = "RS_SOURCE_BANDS"
+_evict_lock = threading.Lock()
+_build_guard = threading.Lock()
+_build_locks: dict[str, list] = {}  # entry path -> [lock, holders]
+
+
+def _entry_bands(source, band_indexes: int | Iterable[int] | None) -> tuple[int, ...]:
+    if band_indexes is None:
+        return tuple(range(1, int(source.count) + 1))
+    if isinstance(band_indexes, int):
+        return (int(band_indexes),)
+    return tuple(sorted({int(index) for index in band_indexes}))
+
+
+@contextmanager
+def _building(path: str):
+    """Serialize builders of one entry: a keyed lock in-process, ``flock`` across processes."""
+    with _build_guard:
+        entry = _build_locks.setdefault(path, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0], open(f"{os.path.splitext(path)[0]}.lock", "a+b") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        with _build_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _build_locks.pop(path, None)
+
+
+def aligned_cache_key(
+    source,
+    reference,
+    resampling: Resampling,
+    band_indexes: int | Iterable[int] | None = None,
+) -> str:
+    grid = (
+        reference.crs.to_wkt() if reference.crs else "",
+        tuple(reference.transform)[:6],
+        int(reference.width),
+        int(reference.height),
+    )
+    material = "|".join((
+        os.path.abspath(source.name),
+        raster_validity_signature(source.name),
+        repr(grid),
+        resampling.name,
+        ",".join(str(index) for index in _entry_bands(source, band_indexes)),
+    ))
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+def aligned_raster_path(
+    source,
+    reference,
+    *,
+    resampling: Resampling = Resampling.nearest,
+    band_indexes: int | Iterable[int] | None = None,
+    cache_dir: str | None = None,
+    max_bytes: int | None = None,
+) -> str:
+    """
+    Path of the cached ``band_indexes`` of ``source`` (default: every band)
+    warped onto ``reference``'s grid, building it on a miss.
+    """
+    directory = private_directory(cache_dir or ALIGNED_CACHE_DIR)
+    bands = _entry_bands(source, band_indexes)
+    path = os.path.join(directory, f"{aligned_cache_key(source, reference, resampling, bands)}.tif")
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    with _building(path):
+        try:
+            # Built by another thread or process while we waited.
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            _write_aligned(source, reference, resampling, temporary, bands)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    logger.info("Cached %s aligned to %sx%s grid at %s", source.name, reference.width, reference.height, path)
+    evict_aligned_cache(directory, ALIGNED_CACHE_MAX_BYTES if max_bytes is None else max_bytes, keep=path)
+    return path
+
+
+def _write_aligned(
+    source,
+    reference,
+    resampling: Resampling,
+    output_path: str,
+    band_indexes: tuple[int, ...],
+) -> None:
+    profile = {
+        "driver": "GTiff",
+        "width": reference.width,
+        "height": reference.height,
+        "count": len(band_indexes),
+        "dtype": "float32",
+        "nodata": float("nan"),
+        "crs": reference.crs,
+        "transform": reference.transform,
+        "tiled": True,
+        "blockxsize": 512,
+        "blockysize": 512,
+        "compress": "lzw",
+    }
+    with aligned_vrt(source, reference, resampling=resampling) as vrt, rasterio.open(output_path, "w", **profile) as dst:
+        dst.update_tags(**{_SOURCE_BANDS_TAG: ",".join(str(index) for index in band_indexes)})
+        for halo_window in iter_halo_windows(reference.width, reference.height, _BUILD_BLOCK_SIZE):
+            window = halo_window.window
+            data = read_masked_from_vrt(source, vrt, list(band_indexes), zero_is_invalid=False, window=window)
+            dst.write(data.astype("float32").filled(np.nan), window=window)
+
+
+def evict_aligned_cache(directory: str, max_bytes: int, *, keep: str | None = None) -> int:
+    """Delete least-recently-used entries until the directory fits ``max_bytes``; returns files removed."""
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(directory):
+            if not name.endswith(".tif"):
+                continue
+            entry = os.path.join(directory, name)
+            try:
+                stat = os.stat(entry)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries):
+            if total <= max_bytes:
+                break
+            if entry == keep:
+                continue
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                # Windows refuses to delete an entry another request still has open.
+                logger.warning("Keeping aligned cache entry %s: %s", entry, exc)
+                continue
+            try:
+                os.remove(f"{os.path.splitext(entry)[0]}.lock")
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def open_aligned(
+    source,
+    reference,
+    *,
+    resampling: Resampling = Resampling.nearest,
+    band_indexes: int | Iterable[int] | None = None,
+):
+    """
+    Open ``source`` on ``reference``'s grid: the cached GeoTIFF of
+    ``band_indexes`` (default: every band), or a ``WarpedVRT`` when the cache
+    is disabled. Read it with ``read_masked_aligned`` (source band numbers)
+    and close it when done.
+    """
+    if not ALIGNED_CACHE_ENABLED:
+        return aligned_vrt(source, reference, resampling=resampling)
+    return rasterio.open(
+        aligned_raster_path(source, reference, resampling=resampling, band_indexes=band_indexes)
+    )
+
+
+def read_masked_aligned(
+    source,
+    aligned,
+    band_indexes: int | Iterable[int] | None = None,
+    *,
+    zero_is_invalid: bool | None = False,
+    window=None,
+) -> np.ma.MaskedArray:
+    """``read_masked_from_vrt`` for anything returned by ``open_aligned``."""
+    if isinstance(aligned, WarpedVRT):
+        return read_masked_from_vrt(source, aligned, band_indexes, zero_is_invalid=zero_is_invalid, window=window)
+
+    if isinstance(band_indexes, int):
+        indexes = [band_indexes]
+    else:
+        indexes = list(band_indexes or range(1, int(source.count) + 1))
+    entry_bands = [int(index) for index in aligned.tags().get(_SOURCE_BANDS_TAG, "").split(",") if index]
+    positions = {band: position for position, band in enumerate(entry_bands or range(1, aligned.count + 1), 1)}
+    missing = [index for index in indexes if index not in positions]
+    if missing:
+        raise ValueError(f"Aligned cache entry {aligned.name} does not hold source band(s) {missing}")
+    entry_indexes = positions[band_indexes] if isinstance(band_indexes, int) else [positions[i] for i in indexes]
+
+    read_kwargs = {} if window is None else {"window": window}
+    data = read_masked_data(aligned, entry_indexes, zero_is_invalid=False, **read_kwargs)
+    # Zero inference follows the source's metadata, not the cache file's NaN nodata.
+    if zero_is_invalid is True or (zero_is_invalid is None and not dataset_has_explicit_mask(source, indexes)):
+        data = np.ma.masked_where(np.ma.getdata(data) == 0, data, copy=False)
+    return data
+
+
+def read_masked_on_grid_cached(
+    source,
+    reference,
+    band_indexes: int | Iterable[int] | None = None,
+    *,
+    resampling: Resampling = Resampling.nearest,
+    zero_is_invalid: bool | None = False,
+    window=None,
+) -> np.ma.MaskedArray:
+    """``read_masked_on_grid`` that reuses the aligned-input cache off-grid."""
+    if grids_match(source, reference):
+        read_kwargs = {} if window is None else {"window": window}
+        return read_masked_data(source, band_indexes, zero_is_invalid=zero_is_invalid, **read_kwargs)
+    with open_aligned(source, reference, resampling=resampling, band_indexes=band_indexes) as aligned:
+        return read_masked_aligned(source, aligned, band_indexes, zero_is_invalid=zero_is_invalid, window=window)
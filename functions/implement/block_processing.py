@@ -0,0 +1,317 @@
+"""Halo-aware block processing for neighborhood raster operations.
+
+Texture, DEM and transform products used to read a whole band and run their
+kernels on the full array. Here the output grid is split into square blocks
+instead; each block reads its window grown by a ``halo`` (clipped to the
+raster), runs the unchanged kernel on that padded array and writes back only
+the block's own pixels to a tiled GeoTIFF.
+
+A kernel whose footprint fits inside the halo therefore sees exactly the
+neighbours it would have seen on the full array, and at the raster edges the
+padded window stops at the edge just like the full array does, so ``edge`` /
+``nearest`` / ``constant`` padding inside the kernel behaves identically.
+Kernels that also depend on scene-wide scalars (quantization range, fill
+value) get them from a streaming ``band_statistics`` pass.
+
+Blocks run on a thread pool by default (``RS_BLOCK_WORKERS``,
+``RS_BLOCK_EXECUTOR=process`` for a process pool) with a bounded number in
+flight, so peak memory is proportional to
+``(block_size + 2 * halo) ** 2 * workers`` instead of the scene size.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+logger = logging.getLogger("functions.block_processing")
+
+DEFAULT_BLOCK_SIZE = 512
+BLOCK_EXECUTORS = {"thread", "process"}
+
+# kernel(data, valid_mask) -> array, or (array, metadata);
+# kernel(data, valid_mask, halo_window) with ``pass_window=True``
+BlockKernel = Callable[[np.ndarray, np.ndarray], Any]
+# reader(src, indexes, window) -> (data, valid_mask)
+BlockReader = Callable[[rasterio.DatasetReader, Any, Window], tuple[np.ndarray, np.ndarray]]
+
+
+def default_block_workers() -> int:
+    configured = os.getenv("RS_BLOCK_WORKERS", "").strip()
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def default_block_size() -> int:
+    configured = os.getenv("RS_BLOCK_SIZE", "").strip()
+    return int(configured) if configured else DEFAULT_BLOCK_SIZE
+
+
+def default_block_executor() -> str:
+    value = os.getenv("RS_BLOCK_EXECUTOR", "thread").strip().lower()
+    return value if value in BLOCK_EXECUTORS else "thread"
+
+
+@dataclass(frozen=True)
+class HaloWindow:
+    """An output block and the halo-padded window read to compute it."""
+
+    window: Window
+    read_window: Window
+
+    @property
+    def crop(self) -> tuple[slice, slice]:
+        """Slices selecting ``window`` inside an array read from ``read_window``."""
+        row = int(self.window.row_off - self.read_window.row_off)
+        col = int(self.window.col_off - self.read_window.col_off)
+        return (
+            slice(row, row + int(self.window.height)),
+            slice(col, col + int(self.window.width)),
+        )
+
+
+def iter_halo_windows(width: int, height: int, block_size: int, halo: int = 0) -> Iterator[HaloWindow]:
+    halo = max(0, int(halo))
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            block_height = min(block_size, height - row)
+            block_width = min(block_size, width - col)
+            row_start = max(0, row - halo)
+            col_start = max(0, col - halo)
+            row_stop = min(height, row + block_height + halo)
+            col_stop = min(width, col + block_width + halo)
+            yield HaloWindow(
+                window=Window(col, row, block_width, block_height),
+                read_window=Window(col_start, row_start, col_stop - col_start, row_stop - row_start),
+            )
+
+
+def read_masked_window(
+    src: rasterio.DatasetReader,
+    indexes: int | Sequence[int],
+    window: Window | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Read ``indexes`` as float32 with invalid pixels set to NaN.
+
+    A single band index gives a 2-D array; a sequence gives a 3-D stack whose
+    mask is valid only where every band is valid and finite.
+    """
+    data = src.read(indexes, window=window, masked=True).astype("float32")
+    values = np.asarray(data.filled(np.nan), dtype="float32")
+    mask = np.ma.getmaskarray(data)
+    if values.ndim == 3:
+        return values, ~np.any(mask, axis=0) & np.all(np.isfinite(values), axis=0)
+    return values, ~mask & np.isfinite(values)
+
+
+@dataclass(frozen=True)
+class BlockOutput:
+    """An additional GeoTIFF written from the same blocks by ``run_halo_blocks``."""
+
+    path: str
+    count: int = 1
+    dtype: str = "float32"
+    nodata: int | float | None = None
+    descriptions: Sequence[str] | None = None
+    tags: dict[str, str] | None = None
+
+
+@dataclass(frozen=True)
+class BandStatistics:
+    count: int
+    minimum: float
+    maximum: float
+    mean: float
+
+
+def band_statistics(
+    input_path: str,
+    band_index: int,
+    *,
+    block_size: int | None = None,
+) -> BandStatistics:
+    """Count, min, max and mean of the valid pixels of one band, read block by block."""
+    size = _normalize_block_size(block_size)
+    count = 0
+    total = 0.0
+    minimum = math.inf
+    maximum = -math.inf
+    with rasterio.open(input_path) as src:
+        for halo_window in iter_halo_windows(src.width, src.height, size):
+            data, valid_mask = read_masked_window(src, band_index, halo_window.window)
+            values = data[valid_mask]
+            if values.size == 0:
+                continue
+            count += int(values.size)
+            total += float(values.sum(dtype="float64"))
+            minimum = min(minimum, float(values.min()))
+            maximum = max(maximum, float(values.max()))
+    mean = total / count if count else math.nan
+    return BandStatistics(count=count, minimum=minimum, maximum=maximum, mean=mean)
+
+
+def _normalize_block_size(block_size: int | None) -> int:
+    size = int(block_size or default_block_size())
+    return max(16, size - size % 16)
+
+
+def _run_block(
+    input_path: str,
+    indexes: int | Sequence[int],
+    halo_window: HaloWindow,
+    kernel: BlockKernel,
+    reader: BlockReader = read_masked_window,
+    pass_window: bool = False,
+) -> tuple[Window, list[np.ndarray], Any]:
+    # Each block opens its own handle: rasterio datasets are neither
+    # thread-safe nor picklable for the process pool.
+    with rasterio.open(input_path) as src:
+        data, valid_mask = reader(src, indexes, halo_window.read_window)
+    output = kernel(data, valid_mask, halo_window) if pass_window else kernel(data, valid_mask)
+    metadata = None
+    if isinstance(output, tuple):
+        output, metadata = output
+    arrays = output if isinstance(output, list) else [output]
+    rows, cols = halo_window.crop
+    return halo_window.window, [np.asarray(array)[..., rows, cols] for array in arrays], metadata
+
+
+def run_halo_blocks(
+    input_path: str,
+    output_path: str,
+    kernel: BlockKernel,
+    *,
+    indexes: int | Sequence[int] = 1,
+    halo: int = 0,
+    count: int = 1,
+    dtype: str = "float32",
+    nodata: int | float | None = None,
+    descriptions: Sequence[str] | None = None,
+    tags: dict[str, str] | None = None,
+    block_size: int | None = None,
+    max_workers: int | None = None,
+    executor: str | None = None,
+    reader: BlockReader = read_masked_window,
+    extra_outputs: Sequence[BlockOutput] = (),
+    pass_window: bool = False,
+) -> dict[str, Any]:
+    """
+    Apply ``kernel`` block by block and write a tiled, LZW-compressed GeoTIFF.
+
+    ``kernel(data, valid_mask)`` receives the halo-padded block as read by
+    ``reader`` (``read_masked_window`` by default) and returns an array of
+    the same height/width (``count`` bands first when ``count > 1``) already
+    in ``dtype`` with ``nodata`` applied, optionally paired with a metadata
+    dict. Kernels and readers must be picklable (module-level functions or
+    ``functools.partial``) for the process executor.
+
+    With ``extra_outputs`` the kernel returns a list of arrays instead, the
+    primary output first, and every output is written from the same pass.
+    ``pass_window=True`` also hands the kernel its ``HaloWindow``, for
+    kernels that depend on where the block sits in the raster.
+
+    Returns the block layout and the metadata of the first block. The output
+    files are removed if any block fails.
+    """
+    size = _normalize_block_size(block_size)
+    workers = max(1, int(max_workers or default_block_workers()))
+    executor_kind = (executor or default_block_executor()).strip().lower()
+    if executor_kind not in BLOCK_EXECUTORS:
+        raise ValueError(f"executor must be one of: {', '.join(sorted(BLOCK_EXECUTORS))}")
+
+    with rasterio.open(input_path) as src:
+        base_profile = src.profile.copy()
+        width, height = src.width, src.height
+    outputs = [
+        BlockOutput(output_path, int(count), dtype, nodata, descriptions, tags),
+        *extra_outputs,
+    ]
+
+    pool_class = ProcessPoolExecutor if executor_kind == "process" else ThreadPoolExecutor
+    pool_options = {} if executor_kind == "process" else {"thread_name_prefix": "raster-block"}
+    max_in_flight = workers * 2
+    metadata = None
+    blocks = 0
+    try:
+        with ExitStack() as stack:
+            datasets = []
+            for output in outputs:
+                os.makedirs(os.path.dirname(os.path.abspath(output.path)), exist_ok=True)
+                profile = {
+                    **base_profile,
+                    "driver": "GTiff",
+                    "count": int(output.count),
+                    "dtype": output.dtype,
+                    "nodata": output.nodata,
+                    "compress": "lzw",
+                    "tiled": True,
+                    "blockxsize": size,
+                    "blockysize": size,
+                }
+                datasets.append(stack.enter_context(rasterio.open(output.path, "w", **profile)))
+            pool = stack.enter_context(pool_class(max_workers=workers, **pool_options))
+            pending = set()
+
+            def drain():
+                nonlocal pending, metadata, blocks
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window, arrays, block_metadata = future.result()
+                    for output, dst, block in zip(outputs, datasets, arrays):
+                        if block.ndim == 2:
+                            dst.write(block.astype(output.dtype, copy=False), 1, window=window)
+                        else:
+                            dst.write(block.astype(output.dtype, copy=False), window=window)
+                    if metadata is None:
+                        metadata = block_metadata
+                    blocks += 1
+
+            for halo_window in iter_halo_windows(width, height, size, halo):
+                pending.add(pool.submit(
+                    _run_block, input_path, indexes, halo_window, kernel, reader, pass_window
+                ))
+                if len(pending) >= max_in_flight:
+                    drain()
+            while pending:
+                drain()
+
+            for output, dst in zip(outputs, datasets):
+                for band, description in enumerate(output.descriptions or [], start=1):
+                    dst.set_band_description(band, description)
+                if output.tags:
+                    dst.update_tags(**output.tags)
+    except BaseException:
+        for output in outputs:
+            if os.path.exists(output.path):
+                os.remove(output.path)
+        raise
+
+    logger.info(
+        "Block processing wrote %sx%s in %spx blocks (halo %s) with %s %s worker(s)",
+        width,
+        height,
+        size,
+        halo,
+        workers,
+        executor_kind,
+    )
+    return {
+        "block_size": int(size),
+        "halo": int(halo),
+        "blocks": int(blocks),
+        "workers": int(workers),
+        "executor": executor_kind,
+        "metadata": metadata or {},
+    }
@@ -5,11 +5,8 @@ import numpy as np
 import rasterio
 from rasterio.enums import Resampling
 
-from functions.implement.raster_validity import (
-    read_masked_data,
-    read_masked_on_grid,
-    write_dataset_mask,
-)
+from functions.implement.aligned_cache import read_masked_on_grid_cached
+from functions.implement.raster_validity import read_masked_data, write_dataset_mask
 
 logger = logging.getLogger("functions.change_ops")
 
@@ -42,7 +39,7 @@ def _align_to_reference(
                 f"file has {src.count} band(s)"
             )
 
-        aligned = read_masked_on_grid(
+        aligned = read_masked_on_grid_cached(
             src,
             ref,
             band_indexes,
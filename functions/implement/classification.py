@@ -1,13 +1,31 @@
 from __future__ import annotations
 
 import os
+import tempfile
 from collections import Counter
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from functools import partial
 from typing import Any, Literal
 
 import numpy as np
 import rasterio
 from rasterio.warp import transform as transform_coords
-
+from rasterio.windows import Window
+
+from functions.implement.block_processing import (
+    BlockOutput,
+    default_block_size,
+    default_block_workers,
+    iter_halo_windows,
+    run_halo_blocks,
+)
+from functions.implement.classifier_store import (
+    StoredClassifier,
+    classifier_model_id,
+    load_classifier,
+    save_classifier,
+)
 from functions.implement.raster_validity import (
     dataset_has_explicit_mask,
     read_masked_data,
@@ -16,6 +34,12 @@ from functions.implement.raster_validity import (
 
 ClassifierName = Literal["nearest_centroid", "random_forest", "svm"]
 
+# Rows per GEMM when assigning features to their nearest center.
+ASSIGN_CHUNK_ROWS = 65536
+MINI_BATCH_SIZE = 4096
+MINI_BATCH_STEPS = 100
+PROBABILITY_NODATA = -9999.0
+
 
 def unsupervised_classification(
     input_path: str,
@@ -27,101 +51,237 @@ def unsupervised_classification(
     random_seed: int = 13,
     smoothing: int = 0,
 ) -> dict[str, Any]:
-    """Classify a raster into spectral clusters without training labels."""
+    """Classify a raster into spectral clusters without training labels.
+
+    Band statistics and the fitting sample come from one streaming pass over
+    the raster; ``mini_batch_kmeans`` then fits on batches drawn from sampled
+    blocks, and labels are assigned block by block in parallel.
+    """
 
     if n_classes < 2:
         raise ValueError("n_classes must be at least 2")
     if method not in {"kmeans", "mini_batch_kmeans"}:
         raise ValueError("method must be 'kmeans' or 'mini_batch_kmeans'")
 
+    rng = np.random.default_rng(random_seed)
     with rasterio.open(input_path) as src:
-        stack, valid_mask, profile = _read_stack(src, band_indices)
-        features = _valid_features(stack, valid_mask)
-        labels = _cluster_features(
-            features,
-            n_classes=n_classes,
-            max_samples=max_samples,
-            random_seed=random_seed,
-            prefer_minibatch=method == "mini_batch_kmeans",
-        )
-        output = _labels_to_raster(labels, valid_mask, src.height, src.width)
-        output = _smooth_labels(output, smoothing, valid_mask)
-        _write_label_raster(output_path, output, profile, tags={
+        indexes = _normalize_band_indices(src.count, band_indices)
+        scan = _scan_features(src, indexes, max_samples, rng)
+        fit_features = (scan.sample - scan.mean) / scan.scale
+        if method == "mini_batch_kmeans":
+            centers = _mini_batch_kmeans(
+                _initial_centers(fit_features, n_classes, rng),
+                _window_batches(src, indexes, scan, rng),
+            )
+        else:
+            centers = _numpy_kmeans(fit_features, n_classes, rng)
+
+    layout = _write_label_blocks(
+        input_path,
+        output_path,
+        partial(_predict_nearest_center, mean=scan.mean, scale=scan.scale, centers=centers),
+        indexes,
+        smoothing,
+        tags={
             "CLASSIFICATION_TYPE": "unsupervised",
             "CLASSIFICATION_METHOD": method,
             "CLASS_COUNT": str(n_classes),
-        })
+        },
+    )
 
-    return _classification_summary(output, "unsupervised", method, n_classes)
+    return {
+        **_summary_from_histogram(_raster_label_histogram(output_path), "unsupervised", method, n_classes),
+        "fit_sample_count": int(scan.sample.shape[0]),
+        "block_processing": layout,
+    }
 
 
 def supervised_classification(
     input_path: str,
     output_path: str,
-    samples: list[dict[str, Any]],
+    samples: list[dict[str, Any]] | None = None,
     classifier: ClassifierName = "nearest_centroid",
     band_indices: list[int] | None = None,
     n_estimators: int = 100,
     random_seed: int = 13,
     smoothing: int = 0,
+    probability_output_path: str | None = None,
+    model_id: str | None = None,
 ) -> dict[str, Any]:
-    """Classify a raster from labeled samples.
+    """Classify a raster from labeled samples or a stored classifier.
 
     Samples may provide either spectral values (`features` or `values`) or a
     pixel/location (`row`+`col`, `x`+`y`, or `lng`+`lat`) plus a class value.
+    Fitted classifiers are kept in the classifier store; the result's
+    `model_id` applies one to other rasters without samples, and training
+    identical samples again reuses the stored fit.
+
+    The scaler and model are fitted once and shared by the block workers
+    (``RS_BLOCK_WORKERS``) that predict the raster window by window. With
+    ``probability_output_path`` a float32 raster holding one probability band
+    per class (ascending class value) is written from the same pass.
     """
 
-    if not samples:
-        raise ValueError("At least one labeled sample is required")
+    if not samples and not model_id:
+        raise ValueError("At least one labeled sample or a model_id is required")
     if classifier not in {"nearest_centroid", "random_forest", "svm"}:
         raise ValueError("classifier must be nearest_centroid, random_forest, or svm")
 
-    label_lookup: dict[Any, int] = {}
-    label_names: dict[int, str] = {}
-
     with rasterio.open(input_path) as src:
-        stack, valid_mask, profile = _read_stack(src, band_indices)
-        train_x, train_y = _extract_training_samples(
-            src,
-            stack,
-            valid_mask,
-            samples,
-            label_lookup,
-            label_names,
+        if model_id:
+            stored = _stored_classifier(model_id, src, band_indices)
+            reused = True
+        else:
+            stored, reused = _train_classifier(
+                src,
+                _normalize_band_indices(src.count, band_indices),
+                samples,
+                classifier=classifier,
+                n_estimators=n_estimators,
+                random_seed=random_seed,
+                probabilities=probability_output_path is not None,
+            )
+    model, label_names, indexes = stored.model, stored.label_names, list(stored.band_indexes)
+    if probability_output_path and not model.supports_probabilities:
+        raise ValueError(
+            f"Stored classifier {stored.model_id} was trained without probability support; "
+            "retrain it with probability output enabled"
         )
-        if len(np.unique(train_y)) < 2:
-            raise ValueError("Supervised classification requires at least two classes")
 
-        features = _valid_features(stack, valid_mask)
-        labels = _classify_features(
-            features,
+    class_labels = ",".join(f"{value}:{name}" for value, name in sorted(label_names.items()))
+    extra_outputs = []
+    if probability_output_path:
+        extra_outputs.append(BlockOutput(
+            probability_output_path,
+            count=int(model.classes.size),
+            dtype="float32",
+            nodata=PROBABILITY_NODATA,
+            descriptions=[f"probability_{label_names.get(int(value), value)}" for value in model.classes],
+            tags={"CLASSIFICATION_TYPE": "supervised_probability", "CLASS_LABELS": class_labels},
+        ))
+
+    method = stored.parameters.get("classifier", classifier)
+    layout = _write_label_blocks(
+        input_path,
+        output_path,
+        model.predict,
+        indexes,
+        smoothing,
+        tags={
+            "CLASSIFICATION_TYPE": "supervised",
+            "CLASSIFICATION_METHOD": method,
+            "CLASS_LABELS": class_labels,
+            "MODEL_ID": stored.model_id,
+        },
+        predict_proba=model.predict_proba if probability_output_path else None,
+        extra_outputs=extra_outputs,
+    )
+
+    result = {
+        **_summary_from_histogram(
+            _raster_label_histogram(output_path), "supervised", method, int(len(label_names))
+        ),
+        "training_sample_count": stored.training_sample_count,
+        "class_labels": label_names,
+        "fitted_classifier": model.name,
+        "model_id": stored.model_id,
+        "model_reused": reused,
+        "block_processing": layout,
+    }
+    if probability_output_path:
+        result["probability_classes"] = [int(value) for value in model.classes]
+    return result
+
+
+def _train_classifier(
+    src: rasterio.DatasetReader,
+    indexes: list[int],
+    samples: list[dict[str, Any]],
+    *,
+    classifier: str,
+    n_estimators: int,
+    random_seed: int,
+    probabilities: bool,
+) -> tuple[StoredClassifier, bool]:
+    """Fit a classifier on ``samples``, or reuse the stored fit of identical training data."""
+    label_lookup: dict[Any, int] = {}
+    label_names: dict[int, str] = {}
+    train_x, train_y = _extract_training_samples(src, indexes, samples, label_lookup, label_names)
+    if len(np.unique(train_y)) < 2:
+        raise ValueError("Supervised classification requires at least two classes")
+
+    parameters = {
+        "classifier": classifier,
+        "n_estimators": int(n_estimators),
+        "random_seed": int(random_seed),
+        # Only SVC probabilities change the fit.
+        "probabilities": bool(probabilities and classifier == "svm"),
+    }
+    model_id = classifier_model_id(train_x, train_y, label_names, indexes, parameters)
+    stored = load_classifier(model_id)
+    if stored is not None:
+        return stored, True
+
+    stored = StoredClassifier(
+        model_id=model_id,
+        model=_fit_classifier(
             train_x,
             train_y,
             classifier=classifier,
             n_estimators=n_estimators,
             random_seed=random_seed,
-        )
-        output = _labels_to_raster(labels, valid_mask, src.height, src.width)
-        output = _smooth_labels(output, smoothing, valid_mask)
-        _write_label_raster(output_path, output, profile, tags={
-            "CLASSIFICATION_TYPE": "supervised",
-            "CLASSIFICATION_METHOD": classifier,
-            "CLASS_LABELS": ",".join(f"{value}:{name}" for value, name in sorted(label_names.items())),
-        })
+            probabilities=probabilities,
+        ),
+        label_names=label_names,
+        band_indexes=tuple(indexes),
+        source_band_count=int(src.count),
+        training_sample_count=int(train_y.size),
+        parameters=parameters,
+    )
+    save_classifier(stored)
+    return stored, False
 
-    return {
-        **_classification_summary(output, "supervised", classifier, int(len(label_names))),
-        "training_sample_count": int(train_y.size),
-        "class_labels": label_names,
-    }
+
+def _stored_classifier(
+    model_id: str,
+    src: rasterio.DatasetReader,
+    band_indices: list[int] | None,
+) -> StoredClassifier:
+    stored = load_classifier(model_id)
+    if stored is None:
+        raise ValueError(f"Classifier model_id was not found: {model_id}")
+    if band_indices and [int(index) for index in band_indices] != list(stored.band_indexes):
+        raise ValueError(
+            f"band_indices {band_indices} do not match the bands the classifier was trained on "
+            f"({list(stored.band_indexes)})"
+        )
+    if src.count != stored.source_band_count:
+        raise ValueError(
+            f"Classifier {model_id} was trained on a {stored.source_band_count}-band raster; "
+            f"this raster has {src.count} bands"
+        )
+    return stored
 
 
 def _read_stack(src: rasterio.DatasetReader, band_indices: list[int] | None) -> tuple[np.ndarray, np.ndarray, dict[str, Any]]:
     indexes = _normalize_band_indices(src.count, band_indices)
+    stack, valid_mask = _read_feature_window(src, indexes)
+    profile = src.profile.copy()
+    return stack, valid_mask, profile
+
+
+def _read_feature_window(
+    src: rasterio.DatasetReader,
+    indexes: list[int],
+    window: Window | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Band stack (invalid pixels zero-filled) and the all-bands-valid mask."""
+    read_kwargs = {} if window is None else {"window": window}
     masked_stack = read_masked_data(
         src,
         indexes,
         zero_is_invalid=False,
+        **read_kwargs,
     ).astype("float32")
     stack = np.asarray(masked_stack.filled(0), dtype="float32")
     valid_mask = (
@@ -130,8 +290,109 @@ def _read_stack(src: rasterio.DatasetReader, band_indices: list[int] | None) ->
     )
     if not dataset_has_explicit_mask(src, indexes):
         valid_mask &= np.any(stack != 0, axis=0)
-    profile = src.profile.copy()
-    return stack, valid_mask, profile
+    return stack, valid_mask
+
+
+@dataclass(frozen=True)
+class _FeatureScan:
+    """Streaming statistics of the valid feature vectors of a raster."""
+
+    count: int
+    mean: np.ndarray        # (1, bands)
+    scale: np.ndarray       # (1, bands), population std with zeros replaced by 1
+    sample: np.ndarray      # (<= max_samples, bands), uniform over valid pixels
+    windows: list[tuple[Window, int]]  # blocks holding valid pixels, with their counts
+
+
+def _scan_features(
+    src: rasterio.DatasetReader,
+    indexes: list[int],
+    max_samples: int,
+    rng: np.random.Generator,
+    block_size: int | None = None,
+) -> _FeatureScan:
+    """
+    One pass over the raster in blocks: per-band mean/std (merged per block
+    with Chan's formula) and a uniform sample of valid pixels, kept as the
+    ``max_samples`` smallest of one random key per pixel.
+    """
+    band_count = len(indexes)
+    count = 0
+    mean = np.zeros(band_count, dtype="float64")
+    m2 = np.zeros(band_count, dtype="float64")
+    sample = np.empty((0, band_count), dtype="float32")
+    sample_keys = np.empty(0, dtype="float64")
+    windows = []
+
+    size = int(block_size or default_block_size())
+    for halo_window in iter_halo_windows(src.width, src.height, size):
+        stack, valid_mask = _read_feature_window(src, indexes, halo_window.window)
+        features = stack[:, valid_mask].T
+        block_count = features.shape[0]
+        if block_count == 0:
+            continue
+        windows.append((halo_window.window, block_count))
+
+        block_mean = features.mean(axis=0, dtype="float64")
+        block_m2 = np.square(features - block_mean.astype("float32"), dtype="float64").sum(axis=0)
+        total = count + block_count
+        delta = block_mean - mean
+        mean += delta * block_count / total
+        m2 += block_m2 + delta * delta * count * block_count / total
+        count = total
+
+        keys = rng.random(block_count)
+        if max_samples > 0 and block_count > max_samples:
+            keep = np.argpartition(keys, max_samples - 1)[:max_samples]
+            features, keys = features[keep], keys[keep]
+        sample = np.concatenate([sample, features])
+        sample_keys = np.concatenate([sample_keys, keys])
+        if max_samples > 0 and sample.shape[0] > max_samples:
+            keep = np.argpartition(sample_keys, max_samples - 1)[:max_samples]
+            sample, sample_keys = sample[keep], sample_keys[keep]
+
+    if count == 0:
+        raise ValueError("Raster has no valid pixels to classify")
+    scale = np.sqrt(m2 / count)
+    scale[scale == 0] = 1.0
+    return _FeatureScan(
+        count=count,
+        mean=mean.astype("float32")[np.newaxis, :],
+        scale=scale.astype("float32")[np.newaxis, :],
+        sample=sample,
+        windows=windows,
+    )
+
+
+def _window_batches(
+    src: rasterio.DatasetReader,
+    indexes: list[int],
+    scan: _FeatureScan,
+    rng: np.random.Generator,
+    batch_size: int = MINI_BATCH_SIZE,
+) -> Iterator[np.ndarray]:
+    """Standardized mini-batches drawn from blocks picked in proportion to their valid pixels."""
+    counts = np.asarray([block_count for _, block_count in scan.windows], dtype="float64")
+    probabilities = counts / counts.sum()
+    while True:
+        window, _ = scan.windows[int(rng.choice(len(scan.windows), p=probabilities))]
+        stack, valid_mask = _read_feature_window(src, indexes, window)
+        features = stack[:, valid_mask].T
+        if features.shape[0] > batch_size:
+            features = features[rng.choice(features.shape[0], size=batch_size, replace=False)]
+        yield (features - scan.mean) / scan.scale
+
+
+def _array_batches(
+    features: np.ndarray,
+    rng: np.random.Generator,
+    batch_size: int = MINI_BATCH_SIZE,
+) -> Iterator[np.ndarray]:
+    while True:
+        if features.shape[0] <= batch_size:
+            yield features
+        else:
+            yield features[rng.choice(features.shape[0], size=batch_size, replace=False)]
 
 
 def _normalize_band_indices(total_bands: int, band_indices: list[int] | None) -> list[int]:
@@ -158,25 +419,62 @@ def _cluster_features(
     random_seed: int,
     prefer_minibatch: bool = True,
 ) -> np.ndarray:
-    scaled, mean, scale = _standardize(features)
+    scaled, _, _ = _standardize(features)
     rng = np.random.default_rng(random_seed)
     fit_features = _sample_rows(scaled, max_samples, rng)
-    del mean, scale, prefer_minibatch
-    centers = _numpy_kmeans(fit_features, n_classes, rng)
+    if prefer_minibatch:
+        centers = _mini_batch_kmeans(
+            _initial_centers(fit_features, n_classes, rng),
+            _array_batches(scaled, rng),
+        )
+    else:
+        centers = _numpy_kmeans(fit_features, n_classes, rng)
     return _assign_nearest(scaled, centers).astype("uint16") + 1
 
 
-def _classify_features(
-    features: np.ndarray,
+@dataclass(frozen=True)
+class _FittedClassifier:
+    """Scaler plus fitted model; picklable, so process-pool workers can share it."""
+
+    name: str
+    mean: np.ndarray
+    scale: np.ndarray
+    classes: np.ndarray                 # uint16 class values, probability band order
+    model: Any = None                   # scikit-learn estimator, or None for nearest centroid
+    centers: np.ndarray | None = None   # standardized class centroids
+
+    @property
+    def supports_probabilities(self) -> bool:
+        return self.model is None or bool(getattr(self.model, "probability", True))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        scaled = (features - self.mean) / self.scale
+        if self.model is not None:
+            return np.asarray(self.model.predict(scaled), dtype="uint16")
+        return self.classes[_assign_nearest(scaled, self.centers)]
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        scaled = (features - self.mean) / self.scale
+        if self.model is not None:
+            return np.asarray(self.model.predict_proba(scaled), dtype="float32")
+        # Nearest centroid: softmax over -d^2 / 2 in the standardized space.
+        logits = scaled @ self.centers.T - 0.5 * np.einsum("ij,ij->i", self.centers, self.centers)
+        logits -= logits.max(axis=1, keepdims=True)
+        weights = np.exp(logits)
+        return (weights / weights.sum(axis=1, keepdims=True)).astype("float32")
+
+
+def _fit_classifier(
     train_x: np.ndarray,
     train_y: np.ndarray,
     classifier: str,
     n_estimators: int,
     random_seed: int,
-) -> np.ndarray:
+    probabilities: bool = False,
+) -> _FittedClassifier:
     _, mean, scale = _standardize(train_x)
     train_scaled = (train_x - mean) / scale
-    features_scaled = (features - mean) / scale
+    classes = np.unique(train_y).astype("uint16")
 
     try:
         if classifier == "random_forest":
@@ -186,26 +484,33 @@ def _classify_features(
                 n_estimators=n_estimators,
                 random_state=random_seed,
                 class_weight="balanced",
-                n_jobs=1,
+                n_jobs=default_block_workers(),
             )
         elif classifier == "svm":
             from sklearn.svm import SVC
 
-            model = SVC(kernel="rbf", gamma="scale", class_weight="balanced")
+            model = SVC(
+                kernel="rbf",
+                gamma="scale",
+                class_weight="balanced",
+                probability=probabilities,
+                random_state=random_seed,
+            )
         else:
             raise ImportError("Use numpy nearest-centroid classifier")
         model.fit(train_scaled, train_y)
-        return model.predict(features_scaled).astype("uint16")
+        if classifier == "random_forest":
+            # Blocks are already predicted in parallel.
+            model.set_params(n_jobs=1)
+        return _FittedClassifier(classifier, mean, scale, classes, model=model)
     except Exception:
         centers, center_labels = _fit_centroids(train_scaled, train_y)
-        nearest = _assign_nearest(features_scaled, centers)
-        return center_labels[nearest].astype("uint16")
+        return _FittedClassifier("nearest_centroid", mean, scale, center_labels, centers=centers)
 
 
 def _extract_training_samples(
     src: rasterio.DatasetReader,
-    stack: np.ndarray,
-    valid_mask: np.ndarray,
+    indexes: list[int],
     samples: list[dict[str, Any]],
     label_lookup: dict[Any, int],
     label_names: dict[int, str],
@@ -227,13 +532,14 @@ def _extract_training_samples(
             vector = np.asarray(values, dtype="float32")
         else:
             row, col = _sample_row_col(src, sample)
-            if not valid_mask[row, col]:
+            pixel, pixel_valid = _read_feature_window(src, indexes, Window(col, row, 1, 1))
+            if not pixel_valid[0, 0]:
                 continue
-            vector = stack[:, row, col].astype("float32")
+            vector = pixel[:, 0, 0]
 
-        if vector.ndim != 1 or vector.size != stack.shape[0]:
+        if vector.ndim != 1 or vector.size != len(indexes):
             raise ValueError(
-                f"Training sample feature length must match selected band count ({stack.shape[0]})"
+                f"Training sample feature length must match selected band count ({len(indexes)})"
             )
         if not np.all(np.isfinite(vector)):
             continue
@@ -294,7 +600,7 @@ def _sample_rows(features: np.ndarray, max_samples: int, rng: np.random.Generato
     return features[indexes]
 
 
-def _numpy_kmeans(features: np.ndarray, n_classes: int, rng: np.random.Generator, iterations: int = 50) -> np.ndarray:
+def _initial_centers(features: np.ndarray, n_classes: int, rng: np.random.Generator) -> np.ndarray:
     unique_features = np.unique(features, axis=0)
     if unique_features.shape[0] < n_classes:
         raise ValueError(
@@ -302,23 +608,87 @@ def _numpy_kmeans(features: np.ndarray, n_classes: int, rng: np.random.Generator
             f"cannot create {n_classes} classes"
         )
     initial = rng.choice(unique_features.shape[0], size=n_classes, replace=False)
-    centers = unique_features[initial].astype("float32")
+    return unique_features[initial].astype("float32")
+
+
+def _numpy_kmeans(features: np.ndarray, n_classes: int, rng: np.random.Generator, iterations: int = 50) -> np.ndarray:
+    centers = _initial_centers(features, n_classes, rng)
     for _ in range(iterations):
         labels = _assign_nearest(features, centers)
+        counts = np.bincount(labels, minlength=n_classes)
+        members = counts > 0
         updated = centers.copy()
-        for class_index in range(n_classes):
-            members = features[labels == class_index]
-            if members.size:
-                updated[class_index] = members.mean(axis=0)
+        updated[members] = _cluster_sums(features, labels, n_classes)[members] / counts[members, np.newaxis]
         if np.allclose(updated, centers):
             break
         centers = updated
     return centers
 
 
+def _mini_batch_kmeans(
+    centers: np.ndarray,
+    batches: Iterator[np.ndarray],
+    steps: int = MINI_BATCH_STEPS,
+    tolerance: float = 1e-4,
+) -> np.ndarray:
+    """
+    Mini-batch k-means (Sculley, 2010): each center moves to the running mean
+    of every batch point ever assigned to it, so its learning rate decays as
+    ``1 / count``.
+    """
+    n_classes = centers.shape[0]
+    centers = centers.astype("float32")
+    counts = np.zeros(n_classes, dtype="float64")
+    for _, batch in zip(range(steps), batches):
+        labels = _assign_nearest(batch, centers)
+        batch_counts = np.bincount(labels, minlength=n_classes)
+        seen = batch_counts > 0
+        updated_counts = counts + batch_counts
+        updated = centers.copy()
+        updated[seen] = (
+            (centers[seen] * counts[seen, np.newaxis] + _cluster_sums(batch, labels, n_classes)[seen])
+            / updated_counts[seen, np.newaxis]
+        )
+        shift = float(np.max(np.abs(updated - centers)))
+        centers, counts = updated, updated_counts
+        if shift < tolerance:
+            break
+    return centers
+
+
+def _cluster_sums(features: np.ndarray, labels: np.ndarray, n_classes: int) -> np.ndarray:
+    return np.stack(
+        [np.bincount(labels, weights=features[:, band], minlength=n_classes) for band in range(features.shape[1])],
+        axis=1,
+    )
+
+
 def _assign_nearest(features: np.ndarray, centers: np.ndarray) -> np.ndarray:
-    distances = np.sum((features[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2, axis=2)
-    return np.argmin(distances, axis=1)
+    """
+    Index of the nearest center per row, from ``||x||^2 - 2 x.c + ||c||^2``
+    as one GEMM per chunk of rows (``||x||^2`` is constant per row and
+    dropped), so memory stays at ``ASSIGN_CHUNK_ROWS x centers``.
+    """
+    centers = np.asarray(centers, dtype=features.dtype)
+    center_norms = np.einsum("ij,ij->i", centers, centers)
+    projection = -2.0 * centers.T
+    nearest = np.empty(features.shape[0], dtype=np.intp)
+    for start in range(0, features.shape[0], ASSIGN_CHUNK_ROWS):
+        stop = start + ASSIGN_CHUNK_ROWS
+        distances = features[start:stop] @ projection
+        distances += center_norms
+        nearest[start:stop] = np.argmin(distances, axis=1)
+    return nearest
+
+
+def _predict_nearest_center(
+    features: np.ndarray,
+    *,
+    mean: np.ndarray,
+    scale: np.ndarray,
+    centers: np.ndarray,
+) -> np.ndarray:
+    return _assign_nearest((features - mean) / scale, centers).astype("uint16") + 1
 
 
 def _fit_centroids(train_x: np.ndarray, train_y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
@@ -327,6 +697,98 @@ def _fit_centroids(train_x: np.ndarray, train_y: np.ndarray) -> tuple[np.ndarray
     return centers.astype("float32"), labels.astype("uint16")
 
 
+def _label_block(
+    stack: np.ndarray,
+    valid_mask: np.ndarray,
+    *,
+    predict: Callable[[np.ndarray], np.ndarray],
+    predict_proba: Callable[[np.ndarray], np.ndarray] | None = None,
+    class_count: int = 0,
+) -> np.ndarray | list[np.ndarray]:
+    labels = np.zeros(valid_mask.shape, dtype="uint16")
+    features = stack[:, valid_mask].T if np.any(valid_mask) else None
+    if features is not None:
+        labels[valid_mask] = predict(features)
+    if predict_proba is None:
+        return labels
+
+    probabilities = np.full((class_count, *valid_mask.shape), PROBABILITY_NODATA, dtype="float32")
+    if features is not None:
+        probabilities[:, valid_mask] = predict_proba(features).T
+    return [labels, probabilities]
+
+
+def _smooth_label_block(labels: np.ndarray, valid_mask: np.ndarray, *, smoothing: int) -> np.ndarray:
+    from scipy import ndimage
+
+    values = np.where(valid_mask, labels, 0).astype("uint16")
+    smoothed = ndimage.median_filter(values, size=max(1, int(smoothing) * 2 + 1))
+    return np.where(valid_mask, smoothed, 0).astype("uint16")
+
+
+def _write_label_blocks(
+    input_path: str,
+    output_path: str,
+    predict: Callable[[np.ndarray], np.ndarray],
+    indexes: list[int],
+    smoothing: int,
+    tags: dict[str, str],
+    predict_proba: Callable[[np.ndarray], np.ndarray] | None = None,
+    extra_outputs: list[BlockOutput] | None = None,
+) -> dict[str, Any]:
+    """
+    Label the raster block by block with ``predict(features) -> uint16``,
+    then median-smooth the labels in a second halo pass when requested.
+    ``predict_proba`` fills the first of ``extra_outputs`` during the
+    labeling pass. Returns the block layout of the final pass.
+    """
+    label_kernel = partial(
+        _label_block,
+        predict=predict,
+        predict_proba=predict_proba,
+        class_count=extra_outputs[0].count if predict_proba is not None else 0,
+    )
+    label_options = {
+        "indexes": indexes,
+        "dtype": "uint16",
+        "nodata": 0,
+        "reader": _read_feature_window,
+        "extra_outputs": extra_outputs or (),
+    }
+    if smoothing <= 0:
+        layout = run_halo_blocks(input_path, output_path, label_kernel, tags=tags, **label_options)
+    else:
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(output_dir, exist_ok=True)
+        handle, raw_path = tempfile.mkstemp(suffix=".tif", prefix="labels_", dir=output_dir)
+        os.close(handle)
+        try:
+            run_halo_blocks(input_path, raw_path, label_kernel, **label_options)
+            layout = run_halo_blocks(
+                raw_path,
+                output_path,
+                partial(_smooth_label_block, smoothing=smoothing),
+                halo=int(smoothing),
+                dtype="uint16",
+                nodata=0,
+                tags=tags,
+            )
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+    return {key: value for key, value in layout.items() if key != "metadata"}
+
+
+def _raster_label_histogram(path: str) -> Counter:
+    counts: Counter = Counter()
+    with rasterio.open(path) as src:
+        for halo_window in iter_halo_windows(src.width, src.height, default_block_size()):
+            labels = src.read(1, window=halo_window.window)
+            values, value_counts = np.unique(labels[labels > 0], return_counts=True)
+            counts.update(dict(zip(values.tolist(), value_counts.tolist())))
+    return counts
+
+
 def _labels_to_raster(labels: np.ndarray, valid_mask: np.ndarray, height: int, width: int) -> np.ndarray:
     output = np.zeros((height, width), dtype="uint16")
     output[valid_mask] = labels.astype("uint16")
@@ -363,12 +825,21 @@ def _classification_summary(
 ) -> dict[str, Any]:
     nonzero = labels[labels > 0]
     counts = Counter(int(value) for value in nonzero.ravel())
+    return _summary_from_histogram(counts, operation, method, n_classes)
+
+
+def _summary_from_histogram(
+    counts: Counter,
+    operation: str,
+    method: str,
+    n_classes: int,
+) -> dict[str, Any]:
     return {
         "operation": operation,
         "method": method,
         "class_count": int(n_classes),
-        "valid_pixel_count": int(nonzero.size),
-        "class_histogram": dict(sorted(counts.items())),
+        "valid_pixel_count": int(sum(counts.values())),
+        "class_histogram": {int(value): int(count) for value, count in sorted(counts.items())},
         "output_dtype": "uint16",
         "nodata": 0,
     }
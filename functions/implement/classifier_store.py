@@ -0,0 +1,229 @@
+"""On-disk store of trained supervised classifiers.
+
+``supervised_classification`` saves every classifier it fits (scaler and
+model, class names, selected bands) under a model id derived from the
+training features, labels, class names, bands and fit parameters. Training
+the same samples again therefore reuses the stored model, and callers can
+apply a model to other rasters by id without any samples at all.
+
+Entries are pickles in ``RS_CLASSIFIER_STORE_DIR``, each with a small JSON
+summary alongside for listing; ids are validated as hex digests before they
+are turned into paths. The directory must be private to this user, and every
+pickle carries an HMAC under the store key (``RS_CLASSIFIER_STORE_KEY``, or a
+key file generated in the directory), so nothing this service did not write
+is ever unpickled. The directory is bounded by
+``RS_CLASSIFIER_STORE_MAX_BYTES`` with least-recently-used eviction (loading
+a model refreshes its mtime).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import pickle
+import re
+import secrets
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from functions.common.storage import STORAGE_DIR, private_directory
+
+logger = logging.getLogger("functions.classifier_store")
+
+CLASSIFIER_STORE_DIR = os.getenv("RS_CLASSIFIER_STORE_DIR", os.path.join(STORAGE_DIR, "classifiers"))
+CLASSIFIER_STORE_MAX_BYTES = int(os.getenv("RS_CLASSIFIER_STORE_MAX_BYTES", str(1024 ** 3)))
+CLASSIFIER_STORE_KEY = os.getenv("RS_CLASSIFIER_STORE_KEY", "")
+
+_MODEL_ID_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+_KEY_FILE = ".store_key"
+_SIGNATURE_BYTES = hashlib.sha256().digest_size
+_evict_lock = threading.Lock()
+_key_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class StoredClassifier:
+    model_id: str
+    model: Any                      # classification._FittedClassifier
+    label_names: dict[int, str]
+    band_indexes: tuple[int, ...]
+    source_band_count: int
+    training_sample_count: int
+    parameters: dict[str, Any] = field(default_factory=dict)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "classifier": self.model.name,
+            "class_labels": self.label_names,
+            "band_indexes": list(self.band_indexes),
+            "source_band_count": self.source_band_count,
+            "training_sample_count": self.training_sample_count,
+            "parameters": self.parameters,
+        }
+
+
+def classifier_model_id(
+    train_x: np.ndarray,
+    train_y: np.ndarray,
+    label_names: dict[int, str],
+    band_indexes: list[int],
+    parameters: dict[str, Any],
+) -> str:
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(train_x, dtype="float32").tobytes())
+    digest.update(np.ascontiguousarray(train_y, dtype="uint16").tobytes())
+    digest.update(json.dumps(
+        {
+            "labels": sorted((int(value), str(name)) for value, name in label_names.items()),
+            "bands": [int(index) for index in band_indexes],
+            "parameters": parameters,
+        },
+        sort_keys=True,
+        default=str,
+    ).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def classifier_path(model_id: str, store_dir: str | None = None) -> str:
+    if not _MODEL_ID_PATTERN.match(str(model_id)):
+        raise ValueError(f"Invalid classifier model_id: {model_id!r}")
+    return os.path.join(store_dir or CLASSIFIER_STORE_DIR, f"{model_id}.pkl")
+
+
+def save_classifier(
+    stored: StoredClassifier,
+    store_dir: str | None = None,
+    max_bytes: int | None = None,
+) -> str:
+    path = classifier_path(stored.model_id, store_dir)
+    directory = private_directory(os.path.dirname(path))
+    payload = pickle.dumps(stored, protocol=pickle.HIGHEST_PROTOCOL)
+    # Summary first: an entry is listed only once its pickle is in place.
+    _write_atomic(_summary_path(path), json.dumps(stored.summary(), default=str).encode("utf-8"))
+    _write_atomic(path, _sign(directory, payload) + payload)
+    logger.info("Stored %s classifier %s", stored.model.name, stored.model_id)
+    evict_classifier_store(directory, CLASSIFIER_STORE_MAX_BYTES if max_bytes is None else max_bytes, keep=path)
+    return path
+
+
+def load_classifier(model_id: str, store_dir: str | None = None) -> StoredClassifier | None:
+    """The stored classifier for ``model_id``, or None when it is not in the store."""
+    path = classifier_path(model_id, store_dir)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        return None
+    private_directory(directory)
+    try:
+        with open(path, "rb") as handle:
+            signature = handle.read(_SIGNATURE_BYTES)
+            payload = handle.read()
+    except FileNotFoundError:
+        return None
+    if not hmac.compare_digest(signature, _sign(directory, payload)):
+        logger.warning("Ignoring classifier %s: signature does not match the store key", model_id)
+        return None
+    os.utime(path)
+    return pickle.loads(payload)
+
+
+def list_classifiers(store_dir: str | None = None) -> list[dict[str, Any]]:
+    """Summaries of every stored classifier, most recently used first; reads no pickles."""
+    directory = store_dir or CLASSIFIER_STORE_DIR
+    if not os.path.isdir(directory):
+        return []
+    private_directory(directory)
+    entries = []
+    for name in os.listdir(directory):
+        model_id, extension = os.path.splitext(name)
+        if extension != ".pkl" or not _MODEL_ID_PATTERN.match(model_id):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            used_at = os.stat(path).st_mtime_ns
+            with open(_summary_path(path), "rb") as handle:
+                summary = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            continue
+        entries.append((used_at, summary))
+    return [summary for _, summary in sorted(entries, key=lambda entry: entry[0], reverse=True)]
+
+
+def evict_classifier_store(directory: str, max_bytes: int, *, keep: str | None = None) -> int:
+    """Delete least-recently-used models until the directory fits ``max_bytes``; returns models removed."""
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(directory):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            summary = _summary_path(path)
+            summary_size = os.path.getsize(summary) if os.path.exists(summary) else 0
+            entries.append((stat.st_mtime_ns, stat.st_size + summary_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if path == keep:
+                continue
+            for stale in (path, _summary_path(path)):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def _sign(directory: str, payload: bytes) -> bytes:
+    return hmac.new(_store_key(directory), payload, hashlib.sha256).digest()
+
+
+def _store_key(directory: str) -> bytes:
+    if CLASSIFIER_STORE_KEY:
+        return CLASSIFIER_STORE_KEY.encode("utf-8")
+    path = os.path.join(directory, _KEY_FILE)
+    with _key_lock:
+        if not os.path.exists(path):
+            # Link a fully written key into place so concurrent processes agree on one.
+            temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(descriptor, "wb") as handle:
+                    handle.write(secrets.token_bytes(32))
+                os.link(temporary, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temporary)
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def _summary_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.json"
+
+
+def _write_atomic(path: str, payload: bytes) -> None:
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary, "wb") as handle:
+            handle.write(payload)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import math
 import os
-from collections import deque
+from functools import partial
 from typing import Any, Literal
 
 import numpy as np
@@ -11,6 +11,15 @@ from affine import Affine
 from pyproj import CRS
 from scipy import ndimage
 
+from functions.implement.block_processing import band_statistics, run_halo_blocks
+from functions.implement.flow_routing import (
+    D8_OFFSETS,
+    basin_labels,
+    d8_flow,
+    filled_d8_flow,
+    flow_accumulation,
+)
+
 
 DEMOperation = Literal[
     "elevation",
@@ -39,18 +48,12 @@ DEM_OPERATIONS = {
     "watershed",
 }
 
-_FLOAT_NODATA = -9999.0
+# Operations computed from a fixed neighbourhood; these run block by block.
+LOCAL_DEM_OPERATIONS = {"elevation", "slope", "aspect", "hillshade", "curvature", "relief"}
+# Operations routed over the D8 flow network of the whole DEM.
+FLOW_DEM_OPERATIONS = {"twi", "flow_direction", "flow_accumulation", "watershed"}
 
-_D8_OFFSETS = (
-    (0, 1, 1, "east"),
-    (1, 1, 2, "southeast"),
-    (1, 0, 4, "south"),
-    (1, -1, 8, "southwest"),
-    (0, -1, 16, "west"),
-    (-1, -1, 32, "northwest"),
-    (-1, 0, 64, "north"),
-    (-1, 1, 128, "northeast"),
-)
+_FLOAT_NODATA = -9999.0
 
 
 def dem_analysis(
@@ -64,8 +67,15 @@ def dem_analysis(
     hillshade_altitude: float = 45.0,
     relief_window_size: int = 3,
     min_slope_degrees: float = 0.1,
+    fill_depressions: bool = True,
 ) -> dict[str, Any]:
-    """Create a DEM-derived raster product from a single elevation band."""
+    """
+    Create a DEM-derived raster product from a single elevation band.
+
+    Flow products (``twi``, ``flow_direction``, ``flow_accumulation``,
+    ``watershed``) are routed over a priority-flood filled DEM unless
+    ``fill_depressions`` is false, in which case interior pits stay outlets.
+    """
 
     operation_name = _normalize_operation(operation)
     if band_index < 1:
@@ -77,51 +87,54 @@ def dem_analysis(
         if band_index > src.count:
             raise ValueError(f"Raster has {src.count} bands; band_index {band_index} is out of range")
 
-        dem, valid_mask = _read_dem(src, band_index)
         x_size, y_size, mean_cell_size = _cell_sizes(src)
-        profile = src.profile.copy()
+        width, height = src.width, src.height
+        if operation_name not in LOCAL_DEM_OPERATIONS:
+            dem, valid_mask = _read_dem(src, band_index)
+            profile = src.profile.copy()
+
+    if operation_name in LOCAL_DEM_OPERATIONS:
+        description = _local_description(operation_name, slope_unit, relief_window_size)
+        if operation_name == "hillshade":
+            _validate_hillshade_altitude(hillshade_altitude)
+        if band_statistics(input_path, band_index).count == 0:
+            raise ValueError("Selected DEM band has no valid elevation pixels")
+
+        kernel = partial(
+            _local_dem_block,
+            operation=operation_name,
+            z_factor=float(z_factor),
+            x_size=x_size,
+            y_size=y_size,
+            slope_unit=slope_unit,
+            hillshade_azimuth=hillshade_azimuth,
+            hillshade_altitude=hillshade_altitude,
+            relief_window_size=relief_window_size,
+        )
+        layout = run_halo_blocks(
+            input_path,
+            output_path,
+            kernel,
+            indexes=band_index,
+            halo=_local_halo(operation_name, relief_window_size),
+            dtype="float32",
+            nodata=_FLOAT_NODATA,
+            descriptions=[description],
+            tags={"DEM_ANALYSIS": "true", "DEM_OPERATION": operation_name},
+        )
+        return _result_metadata(
+            operation_name, band_index, z_factor, width, height, "float32", _FLOAT_NODATA,
+            x_size, y_size, mean_cell_size,
+            block_processing={key: value for key, value in layout.items() if key != "metadata"},
+        )
 
+    if fill_depressions:
+        dem, direction, receiver = filled_d8_flow(dem, valid_mask, x_size, y_size, float(z_factor))
+    else:
+        direction, receiver = d8_flow(dem, valid_mask, x_size, y_size, float(z_factor))
     scaled_dem = dem * float(z_factor)
 
-    if operation_name == "elevation":
-        result = dem.astype("float32")
-        dtype = "float32"
-        nodata = _FLOAT_NODATA
-        description = "Elevation"
-    elif operation_name == "slope":
-        result = _slope(scaled_dem, valid_mask, x_size, y_size, slope_unit)
-        dtype = "float32"
-        nodata = _FLOAT_NODATA
-        description = f"Slope ({_normalize_slope_unit(slope_unit)})"
-    elif operation_name == "aspect":
-        result = _aspect(scaled_dem, valid_mask, x_size, y_size)
-        dtype = "float32"
-        nodata = _FLOAT_NODATA
-        description = "Aspect (degrees clockwise from north)"
-    elif operation_name == "hillshade":
-        result = _hillshade(
-            scaled_dem,
-            valid_mask,
-            x_size,
-            y_size,
-            hillshade_azimuth,
-            hillshade_altitude,
-        )
-        dtype = "float32"
-        nodata = _FLOAT_NODATA
-        description = "Hillshade"
-    elif operation_name == "curvature":
-        result = _curvature(scaled_dem, valid_mask, x_size, y_size)
-        dtype = "float32"
-        nodata = _FLOAT_NODATA
-        description = "Curvature"
-    elif operation_name == "relief":
-        result = _relief(dem, valid_mask, relief_window_size)
-        dtype = "float32"
-        nodata = _FLOAT_NODATA
-        description = f"Topographic relief ({_normalize_window_size(relief_window_size)} px window)"
-    elif operation_name == "twi":
-        _, receiver = _d8_flow(dem, valid_mask, x_size, y_size, float(z_factor))
+    if operation_name == "twi":
         result = _twi(
             scaled_dem,
             valid_mask,
@@ -135,20 +148,17 @@ def dem_analysis(
         nodata = _FLOAT_NODATA
         description = "Topographic humidity index"
     elif operation_name == "flow_direction":
-        direction, _ = _d8_flow(dem, valid_mask, x_size, y_size, float(z_factor))
         result = direction
         dtype = "uint8"
         nodata = 0
         description = "D8 flow direction"
     elif operation_name == "flow_accumulation":
-        _, receiver = _d8_flow(dem, valid_mask, x_size, y_size, float(z_factor))
-        result = _flow_accumulation(receiver, valid_mask).astype("float32")
+        result = flow_accumulation(receiver, valid_mask)
         dtype = "float32"
         nodata = _FLOAT_NODATA
         description = "D8 flow accumulation"
     elif operation_name == "watershed":
-        _, receiver = _d8_flow(dem, valid_mask, x_size, y_size, float(z_factor))
-        result = _watershed_labels(receiver, valid_mask)
+        result = basin_labels(receiver, valid_mask)
         dtype = "int32"
         nodata = 0
         description = "D8 watershed basin labels"
@@ -159,13 +169,33 @@ def dem_analysis(
     output_array = _prepare_output(result, valid_mask, dtype, nodata)
     _write_single_band(output_path, profile, output_array, dtype, nodata, description, operation_name)
 
+    return _result_metadata(
+        operation_name, band_index, z_factor, width, height, dtype, nodata,
+        x_size, y_size, mean_cell_size,
+        fill_depressions=bool(fill_depressions),
+    )
+
+
+def _result_metadata(
+    operation_name: str,
+    band_index: int,
+    z_factor: float,
+    width: int,
+    height: int,
+    dtype: str,
+    nodata: int | float,
+    x_size: float,
+    y_size: float,
+    mean_cell_size: float,
+    **extra: Any,
+) -> dict[str, Any]:
     return {
         "operation": "dem_analysis",
         "dem_operation": operation_name,
         "band_index": int(band_index),
         "z_factor": float(z_factor),
-        "width": int(output_array.shape[1]),
-        "height": int(output_array.shape[0]),
+        "width": int(width),
+        "height": int(height),
         "dtype": dtype,
         "nodata": nodata,
         "cell_size": {
@@ -173,10 +203,67 @@ def dem_analysis(
             "y": float(y_size),
             "mean": float(mean_cell_size),
         },
-        "flow_direction_encoding": _flow_direction_encoding() if operation_name in {"flow_direction", "flow_accumulation", "watershed", "twi"} else None,
+        "flow_direction_encoding": _flow_direction_encoding() if operation_name in FLOW_DEM_OPERATIONS else None,
+        **extra,
     }
 
 
+def _local_description(operation: str, slope_unit: str, relief_window_size: int) -> str:
+    if operation == "slope":
+        return f"Slope ({_normalize_slope_unit(slope_unit)})"
+    if operation == "relief":
+        return f"Topographic relief ({_normalize_window_size(relief_window_size)} px window)"
+    return {
+        "elevation": "Elevation",
+        "aspect": "Aspect (degrees clockwise from north)",
+        "hillshade": "Hillshade",
+        "curvature": "Curvature",
+    }[operation]
+
+
+def _local_halo(operation: str, relief_window_size: int) -> int:
+    """Rows/columns of context a local operation reads around each pixel."""
+    if operation == "elevation":
+        return 0
+    if operation == "curvature":
+        # gradient of the gradient
+        return 2
+    if operation == "relief":
+        return _normalize_window_size(relief_window_size) // 2
+    return 1
+
+
+def _local_dem_block(
+    dem: np.ndarray,
+    valid_mask: np.ndarray,
+    *,
+    operation: str,
+    z_factor: float,
+    x_size: float,
+    y_size: float,
+    slope_unit: str,
+    hillshade_azimuth: float,
+    hillshade_altitude: float,
+    relief_window_size: int,
+) -> np.ndarray:
+    scaled_dem = dem * z_factor
+    if operation == "elevation":
+        result = dem.astype("float32")
+    elif operation == "slope":
+        result = _slope(scaled_dem, valid_mask, x_size, y_size, slope_unit)
+    elif operation == "aspect":
+        result = _aspect(scaled_dem, valid_mask, x_size, y_size)
+    elif operation == "hillshade":
+        result = _hillshade(scaled_dem, valid_mask, x_size, y_size, hillshade_azimuth, hillshade_altitude)
+    elif operation == "curvature":
+        result = _curvature(scaled_dem, valid_mask, x_size, y_size)
+    elif operation == "relief":
+        result = _relief(dem, valid_mask, relief_window_size)
+    else:
+        raise ValueError(f"Unsupported local DEM operation: {operation}")
+    return _prepare_output(result, valid_mask, "float32", _FLOAT_NODATA)
+
+
 def _normalize_operation(operation: str) -> DEMOperation:
     value = str(operation or "").strip().lower().replace("-", "_")
     aliases = {
@@ -318,8 +405,7 @@ def _hillshade(
     azimuth: float,
     altitude: float,
 ) -> np.ndarray:
-    if altitude <= 0 or altitude > 90:
-        raise ValueError("hillshade_altitude must be in the range (0, 90]")
+    _validate_hillshade_altitude(altitude)
 
     dz_dx, dz_drow = _gradient(dem, x_size, y_size)
     dz_dnorth = -dz_drow
@@ -344,6 +430,11 @@ def _hillshade(
     return shade.astype("float32")
 
 
+def _validate_hillshade_altitude(altitude: float) -> None:
+    if altitude <= 0 or altitude > 90:
+        raise ValueError("hillshade_altitude must be in the range (0, 90]")
+
+
 def _curvature(dem: np.ndarray, valid_mask: np.ndarray, x_size: float, y_size: float) -> np.ndarray:
     dz_dx, dz_drow = _gradient(dem, x_size, y_size)
     _, d2z_dx2 = np.gradient(dz_dx, y_size, x_size, edge_order=1)
@@ -385,7 +476,7 @@ def _twi(
     mean_cell_size: float,
     min_slope_degrees: float,
 ) -> np.ndarray:
-    accumulation = _flow_accumulation(receiver, valid_mask).astype("float32")
+    accumulation = flow_accumulation(receiver, valid_mask)
     slope_rad = _slope_radians(dem, valid_mask, x_size, y_size)
     min_slope_rad = math.radians(max(float(min_slope_degrees), 1e-6))
     slope_rad = np.maximum(slope_rad, min_slope_rad)
@@ -396,132 +487,6 @@ def _twi(
     return twi.astype("float32")
 
 
-def _d8_flow(
-    dem: np.ndarray,
-    valid_mask: np.ndarray,
-    x_size: float,
-    y_size: float,
-    z_factor: float = 1.0,
-) -> tuple[np.ndarray, np.ndarray]:
-    rows, cols = dem.shape
-    scaled = dem * z_factor
-    best_drop = np.zeros((rows, cols), dtype="float32")
-    direction = np.zeros((rows, cols), dtype="uint8")
-    receiver = np.full((rows, cols), -1, dtype=np.int64)
-    linear = np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
-
-    for dr, dc, code, _ in _D8_OFFSETS:
-        src_slice, dst_slice = _neighbor_slices(dr, dc, rows, cols)
-        distance = _neighbor_distance(dr, dc, x_size, y_size)
-        src_values = scaled[src_slice]
-        dst_values = scaled[dst_slice]
-        drop = (src_values - dst_values) / distance
-        update = (
-            valid_mask[src_slice]
-            & valid_mask[dst_slice]
-            & np.isfinite(drop)
-            & (drop > 0)
-            & (drop > best_drop[src_slice])
-        )
-        if not np.any(update):
-            continue
-
-        best_view = best_drop[src_slice]
-        direction_view = direction[src_slice]
-        receiver_view = receiver[src_slice]
-        best_view[update] = drop[update]
-        direction_view[update] = code
-        receiver_view[update] = linear[dst_slice][update]
-
-    direction[~valid_mask] = 0
-    receiver[~valid_mask] = -1
-    return direction, receiver
-
-
-def _neighbor_slices(
-    dr: int,
-    dc: int,
-    rows: int,
-    cols: int,
-) -> tuple[tuple[slice, slice], tuple[slice, slice]]:
-    src_row_start = max(0, -dr)
-    src_row_stop = rows - max(0, dr)
-    src_col_start = max(0, -dc)
-    src_col_stop = cols - max(0, dc)
-    dst_row_start = src_row_start + dr
-    dst_row_stop = src_row_stop + dr
-    dst_col_start = src_col_start + dc
-    dst_col_stop = src_col_stop + dc
-    return (
-        (slice(src_row_start, src_row_stop), slice(src_col_start, src_col_stop)),
-        (slice(dst_row_start, dst_row_stop), slice(dst_col_start, dst_col_stop)),
-    )
-
-
-def _neighbor_distance(dr: int, dc: int, x_size: float, y_size: float) -> float:
-    if dr != 0 and dc != 0:
-        return math.hypot(x_size, y_size)
-    if dc != 0:
-        return x_size
-    return y_size
-
-
-def _flow_accumulation(receiver: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
-    flat_receiver = receiver.ravel()
-    valid_flat = valid_mask.ravel()
-    cell_count = flat_receiver.size
-    indegree = np.zeros(cell_count, dtype=np.int32)
-    receiver_mask = valid_flat & (flat_receiver >= 0)
-    np.add.at(indegree, flat_receiver[receiver_mask], 1)
-
-    accumulation = np.zeros(cell_count, dtype="float64")
-    accumulation[valid_flat] = 1.0
-    queue = deque(np.flatnonzero(valid_flat & (indegree == 0)).tolist())
-
-    while queue:
-        cell = queue.popleft()
-        target = flat_receiver[cell]
-        if target < 0:
-            continue
-        accumulation[target] += accumulation[cell]
-        indegree[target] -= 1
-        if indegree[target] == 0:
-            queue.append(int(target))
-
-    return accumulation.reshape(receiver.shape).astype("float32")
-
-
-def _watershed_labels(receiver: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
-    flat_receiver = receiver.ravel()
-    valid_flat = valid_mask.ravel()
-    labels = np.zeros(flat_receiver.size, dtype=np.int32)
-    next_label = 1
-
-    for start in np.flatnonzero(valid_flat):
-        if labels[start] > 0:
-            continue
-
-        path: list[int] = []
-        current = int(start)
-        while True:
-            if labels[current] > 0:
-                label = int(labels[current])
-                break
-
-            path.append(current)
-            target = int(flat_receiver[current])
-            if target < 0 or not valid_flat[target]:
-                label = next_label
-                next_label += 1
-                break
-            current = target
-
-        for cell in path:
-            labels[cell] = label
-
-    return labels.reshape(receiver.shape)
-
-
 def _prepare_output(
     result: np.ndarray,
     valid_mask: np.ndarray,
@@ -566,4 +531,4 @@ def _write_single_band(
 
 
 def _flow_direction_encoding() -> dict[str, int]:
-    return {name: code for _, _, code, name in _D8_OFFSETS}
+    return {name: code for _, _, code, name in D8_OFFSETS}
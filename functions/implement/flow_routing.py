@@ -0,0 +1,342 @@
+"""
+Vectorized D8 flow routing for an in-memory DEM.
+
+``d8_flow`` picks every cell's steepest strictly-downhill neighbour, so the
+receivers form a forest draining towards outlets. ``topological_levels``
+peels that forest from the ridges down in NumPy passes (level ``k`` holds
+the cells whose donors all sit in earlier levels); flow accumulation then
+sweeps the levels forward and basin labeling sweeps them backward. Both are
+linear in the number of cells with one Python iteration per level, i.e. per
+cell of the longest flow path, instead of one per cell.
+
+``filled_d8_flow`` adds priority-flood depression filling. Priority-flood is
+Prim's algorithm on the cell graph whose edge weights are the higher of the
+two elevations: a cell's filled elevation is the highest point on its tree
+path to the outside, and the cell it was flooded from is a valid drainage
+direction across the resulting flats. Only cells draining to an interior
+pit take part; their spanning tree is built with SciPy's compiled
+``minimum_spanning_tree`` and the path maxima come from pointer jumping.
+
+Receivers and counts use int32 while the raster has fewer than 2**31 cells.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import breadth_first_order, minimum_spanning_tree
+
+
+D8_OFFSETS = (
+    (0, 1, 1, "east"),
+    (1, 1, 2, "southeast"),
+    (1, 0, 4, "south"),
+    (1, -1, 8, "southwest"),
+    (0, -1, 16, "west"),
+    (-1, -1, 32, "northwest"),
+    (-1, 0, 64, "north"),
+    (-1, 1, 128, "northeast"),
+)
+
+# Offsets covering every unordered neighbour pair exactly once.
+_FORWARD_OFFSETS = ((0, 1), (1, 1), (1, 0), (1, -1))
+
+# D8 code for a (dr + 1) * 3 + (dc + 1) offset index.
+_CODE_BY_OFFSET = np.zeros(9, dtype=np.uint8)
+for _dr, _dc, _code, _ in D8_OFFSETS:
+    _CODE_BY_OFFSET[(_dr + 1) * 3 + (_dc + 1)] = _code
+
+
+def index_dtype(cell_count: int) -> np.dtype:
+    return np.dtype(np.int32 if cell_count < 2 ** 31 else np.int64)
+
+
+def neighbor_slices(
+    dr: int,
+    dc: int,
+    rows: int,
+    cols: int,
+) -> tuple[tuple[slice, slice], tuple[slice, slice]]:
+    src_row_start = max(0, -dr)
+    src_row_stop = rows - max(0, dr)
+    src_col_start = max(0, -dc)
+    src_col_stop = cols - max(0, dc)
+    dst_row_start = src_row_start + dr
+    dst_row_stop = src_row_stop + dr
+    dst_col_start = src_col_start + dc
+    dst_col_stop = src_col_stop + dc
+    return (
+        (slice(src_row_start, src_row_stop), slice(src_col_start, src_col_stop)),
+        (slice(dst_row_start, dst_row_stop), slice(dst_col_start, dst_col_stop)),
+    )
+
+
+def neighbor_distance(dr: int, dc: int, x_size: float, y_size: float) -> float:
+    if dr != 0 and dc != 0:
+        return math.hypot(x_size, y_size)
+    if dc != 0:
+        return x_size
+    return y_size
+
+
+def d8_flow(
+    dem: np.ndarray,
+    valid_mask: np.ndarray,
+    x_size: float,
+    y_size: float,
+    z_factor: float = 1.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """D8 direction codes (0 = no downhill neighbour) and flat receiver indexes (-1 = outlet)."""
+    rows, cols = dem.shape
+    scaled = dem * z_factor
+    best_drop = np.zeros((rows, cols), dtype="float32")
+    direction = np.zeros((rows, cols), dtype="uint8")
+
+    for dr, dc, code, _ in D8_OFFSETS:
+        src_slice, dst_slice = neighbor_slices(dr, dc, rows, cols)
+        distance = neighbor_distance(dr, dc, x_size, y_size)
+        drop = (scaled[src_slice] - scaled[dst_slice]) / distance
+        update = (
+            valid_mask[src_slice]
+            & valid_mask[dst_slice]
+            & np.isfinite(drop)
+            & (drop > 0)
+            & (drop > best_drop[src_slice])
+        )
+        if not np.any(update):
+            continue
+        best_drop[src_slice][update] = drop[update]
+        direction[src_slice][update] = code
+
+    direction[~valid_mask] = 0
+    return direction, receivers_from_direction(direction)
+
+
+def receivers_from_direction(direction: np.ndarray) -> np.ndarray:
+    rows, cols = direction.shape
+    dtype = index_dtype(direction.size)
+    step = np.zeros(256, dtype=dtype)
+    for dr, dc, code, _ in D8_OFFSETS:
+        step[code] = dr * cols + dc
+    receiver = np.arange(direction.size, dtype=dtype).reshape(rows, cols)
+    receiver += step[direction]
+    receiver[direction == 0] = -1
+    return receiver
+
+
+def topological_levels(receiver: np.ndarray, valid_mask: np.ndarray) -> list[np.ndarray]:
+    """Flat cell indexes grouped so every cell comes after all of its donors."""
+    flat_receiver = receiver.ravel()
+    indegree = np.bincount(flat_receiver[flat_receiver >= 0], minlength=flat_receiver.size).astype(np.int32)
+
+    levels = []
+    frontier = np.flatnonzero(valid_mask.ravel() & (indegree == 0)).astype(flat_receiver.dtype, copy=False)
+    while frontier.size:
+        levels.append(frontier)
+        targets = flat_receiver[frontier]
+        targets, donors = np.unique(targets[targets >= 0], return_counts=True)
+        indegree[targets] -= donors.astype(np.int32)
+        frontier = targets[indegree[targets] == 0]
+    return levels
+
+
+def flow_accumulation(
+    receiver: np.ndarray,
+    valid_mask: np.ndarray,
+    levels: list[np.ndarray] | None = None,
+) -> np.ndarray:
+    """Number of cells (including itself) draining through each cell, as float32."""
+    if levels is None:
+        levels = topological_levels(receiver, valid_mask)
+    flat_receiver = receiver.ravel()
+    accumulation = valid_mask.ravel().astype(index_dtype(flat_receiver.size))
+    for level in levels:
+        targets = flat_receiver[level]
+        draining = targets >= 0
+        targets, slot = np.unique(targets[draining], return_inverse=True)
+        inflow = np.bincount(slot, weights=accumulation[level[draining]], minlength=targets.size)
+        accumulation[targets] += inflow.astype(accumulation.dtype)
+    return accumulation.reshape(receiver.shape).astype("float32")
+
+
+def basin_labels(
+    receiver: np.ndarray,
+    valid_mask: np.ndarray,
+    levels: list[np.ndarray] | None = None,
+) -> np.ndarray:
+    """
+    int32 basin label per cell (0 = invalid), one per outlet, numbered in
+    raster order of each basin's first cell.
+    """
+    if levels is None:
+        levels = topological_levels(receiver, valid_mask)
+    outlet = _outlets(receiver.ravel(), levels)
+    cells = np.flatnonzero(valid_mask.ravel())
+    labels = np.zeros(receiver.size, dtype=np.int32)
+    if cells.size == 0:
+        return labels.reshape(receiver.shape)
+
+    roots, first, inverse = np.unique(outlet[cells], return_index=True, return_inverse=True)
+    rank = np.empty(roots.size, dtype=np.int32)
+    rank[np.argsort(first, kind="stable")] = np.arange(1, roots.size + 1, dtype=np.int32)
+    labels[cells] = rank[inverse]
+    return labels.reshape(receiver.shape)
+
+
+def _outlets(flat_receiver: np.ndarray, levels: list[np.ndarray]) -> np.ndarray:
+    """Flat index of the outlet each cell drains to (-1 for cells in no level)."""
+    outlet = np.full(flat_receiver.size, -1, dtype=flat_receiver.dtype)
+    for level in reversed(levels):
+        targets = flat_receiver[level]
+        outlet[level] = level
+        draining = targets >= 0
+        outlet[level[draining]] = outlet[targets[draining]]
+    return outlet
+
+
+def filled_d8_flow(
+    dem: np.ndarray,
+    valid_mask: np.ndarray,
+    x_size: float,
+    y_size: float,
+    z_factor: float = 1.0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Priority-flood fill ``dem`` and route D8 flow on the result.
+
+    Returns ``(filled, direction, receiver)``. Every valid cell drains to the
+    raster edge or to a cell next to nodata; cells on filled flats drain
+    along the flood tree towards the depression's spill point.
+    """
+    direction, receiver = d8_flow(dem, valid_mask, x_size, y_size, z_factor)
+    filled, spill = _priority_flood(dem, valid_mask, receiver)
+    if spill is None:
+        return dem, direction, receiver
+
+    direction, receiver = d8_flow(filled, valid_mask, x_size, y_size, z_factor)
+    flat_receiver = receiver.reshape(-1)
+    cols = dem.shape[1]
+    stuck = np.flatnonzero((flat_receiver < 0) & (spill >= 0))
+    targets = spill[stuck]
+    offset = (targets // cols - stuck // cols + 1) * 3 + (targets % cols - stuck % cols + 1)
+    flat_receiver[stuck] = targets
+    direction.reshape(-1)[stuck] = _CODE_BY_OFFSET[offset]
+    return filled, direction, receiver
+
+
+def _boundary_mask(valid_mask: np.ndarray) -> np.ndarray:
+    interior = ndimage.binary_erosion(valid_mask, structure=np.ones((3, 3), dtype=bool), border_value=0)
+    return valid_mask & ~interior
+
+
+def _priority_flood(
+    dem: np.ndarray,
+    valid_mask: np.ndarray,
+    receiver: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Filled DEM and, per flat cell index, the cell it was flooded from
+    (-1 where flooded from outside the raster or not flooded at all).
+    Returns ``(dem, None)`` when nothing drains to an interior pit.
+    """
+    rows, cols = dem.shape
+    flat_receiver = receiver.ravel()
+    valid_flat = valid_mask.ravel()
+    boundary = _boundary_mask(valid_mask).ravel()
+    pits = valid_flat & (flat_receiver < 0) & ~boundary
+    if not np.any(pits):
+        return dem, None
+
+    dtype = flat_receiver.dtype
+    outlet = _outlets(flat_receiver, topological_levels(receiver, valid_mask))
+    depressed = valid_flat & (outlet >= 0)
+    depressed[depressed] = pits[outlet[depressed]]
+    nodes = np.flatnonzero(depressed).astype(dtype, copy=False)
+    node_count = nodes.size
+    node_of = np.full(dem.size, -1, dtype=dtype)
+    node_of[nodes] = np.arange(node_count, dtype=dtype)
+    node_grid = node_of.reshape(rows, cols)
+    elevation = dem.reshape(-1)
+
+    # Edge to the virtual outside node: boundary cells spill off the raster at
+    # their own elevation, other cells over their lowest draining neighbour.
+    root_weight = np.full(node_count, np.inf, dtype="float64")
+    root_target = np.full(node_count, -1, dtype=dtype)
+    on_boundary = boundary[nodes]
+    root_weight[on_boundary] = elevation[nodes[on_boundary]]
+
+    sources, targets, weights = [], [], []
+    spill_nodes, spill_cells, spill_weights = [], [], []
+    for dr, dc in _FORWARD_OFFSETS:
+        a_slice, b_slice = neighbor_slices(dr, dc, rows, cols)
+        a_node, b_node = node_grid[a_slice], node_grid[b_slice]
+        both_valid = valid_mask[a_slice] & valid_mask[b_slice]
+        weight = np.maximum(dem[a_slice], dem[b_slice])
+
+        inner = both_valid & (a_node >= 0) & (b_node >= 0)
+        sources.append(a_node[inner])
+        targets.append(b_node[inner])
+        weights.append(weight[inner])
+
+        for node_side, cell_slice, spills in (
+            (a_node, b_slice, both_valid & (a_node >= 0) & (b_node < 0)),
+            (b_node, a_slice, both_valid & (b_node >= 0) & (a_node < 0)),
+        ):
+            local_rows, local_cols = np.nonzero(spills)
+            spill_nodes.append(node_side[spills])
+            spill_cells.append(
+                ((local_rows + cell_slice[0].start) * cols + local_cols + cell_slice[1].start).astype(dtype)
+            )
+            spill_weights.append(weight[spills])
+
+    spill_node = np.concatenate(spill_nodes)
+    if spill_node.size:
+        spill_cell = np.concatenate(spill_cells)
+        spill_weight = np.concatenate(spill_weights).astype("float64")
+        order = np.lexsort((spill_weight, spill_node))
+        first = np.unique(spill_node[order], return_index=True)[1]
+        lowest = order[first]
+        candidate = spill_node[lowest]
+        better = spill_weight[lowest] < root_weight[candidate]
+        root_weight[candidate[better]] = spill_weight[lowest][better]
+        root_target[candidate[better]] = spill_cell[lowest][better]
+
+    # Sparse graphs drop zero weights, so shift every weight to >= 1.
+    base = float(np.min(dem[valid_mask])) - 1.0
+    attached = np.flatnonzero(np.isfinite(root_weight))
+    graph = coo_matrix(
+        (
+            np.concatenate([np.concatenate(weights).astype("float64"), root_weight[attached]]) - base,
+            (
+                np.concatenate([np.concatenate(sources), attached]),
+                np.concatenate([np.concatenate(targets), np.full(attached.size, node_count, dtype=dtype)]),
+            ),
+        ),
+        shape=(node_count + 1, node_count + 1),
+    ).tocsr()
+    tree = minimum_spanning_tree(graph)
+    _, predecessor = breadth_first_order(tree, node_count, directed=False, return_predecessors=True)
+    predecessor = predecessor[:node_count]
+
+    # Highest point on each node's tree path to the outside, by pointer jumping.
+    from_outside = predecessor == node_count
+    reached = predecessor >= 0
+    value = elevation[nodes].astype("float64")
+    value[from_outside] = root_weight[from_outside]
+    value = np.append(value, -np.inf)
+    parent = np.append(np.where(reached, predecessor, node_count), node_count)
+    while np.any(parent != node_count):
+        np.maximum(value, value[parent], out=value)
+        parent = parent[parent]
+
+    filled = dem.copy()
+    filled.reshape(-1)[nodes] = value[:node_count].astype(dem.dtype)
+
+    spill = np.full(dem.size, -1, dtype=dtype)
+    inside = reached & ~from_outside
+    spill[nodes[inside]] = nodes[predecessor[inside]]
+    spill[nodes[from_outside]] = root_target[from_outside]
+    return filled, spill
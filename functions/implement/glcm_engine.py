@@ -0,0 +1,290 @@
+"""
+Strip-parallel GLCM texture engine.
+
+For one displacement ``(row_offset, col_offset)`` the co-occurrence pairs of
+an ``N x N`` window always start in the same ``hh x ww`` sub-rectangle of the
+window (``hh = N - |row_offset|``, ``ww = N - |col_offset|``). The engine
+therefore works on a "pair image" holding ``code = source * levels + target``
+and a pair-valid mask, where every pixel's GLCM is the histogram of one
+``hh x ww`` box:
+
+* contrast, dissimilarity, homogeneity and correlation only need box sums of
+  per-pair values, computed exactly with integral images;
+* asm, energy and entropy keep a running histogram per output column that is
+  updated as the box slides down a strip (one row of pairs in, one out), with
+  running sums of ``h**2`` and ``h * log(h)`` so no pixel ever rescans its
+  histogram.
+
+The raster is processed in row strips with an ``hh - 1`` row halo, on a thread
+pool (``RS_TEXTURE_WORKERS``); results match the per-window definition used by
+``texture_features`` exactly up to float rounding.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+
+DEFAULT_STRIP_ROWS = 256
+# Upper bound for one running-histogram block (columns x levels**2 counters).
+HISTOGRAM_BLOCK_BYTES = 32 * 1024 ** 2
+
+BOX_SUM_PROPERTIES = {"contrast", "dissimilarity", "homogeneity", "correlation"}
+HISTOGRAM_PROPERTIES = {"asm", "energy", "entropy"}
+
+
+def default_texture_workers() -> int:
+    configured = os.getenv("RS_TEXTURE_WORKERS", "").strip()
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+@dataclass(frozen=True)
+class _PairGeometry:
+    row_offset: int
+    col_offset: int
+    box_rows: int       # hh
+    box_cols: int       # ww
+    row_start: int      # first source row of a window, relative to its top
+    col_start: int      # first source column of a window, relative to its left
+
+
+def _pair_geometry(window_size: int, row_offset: int, col_offset: int) -> _PairGeometry:
+    if abs(row_offset) >= window_size or abs(col_offset) >= window_size:
+        raise ValueError("glcm_distance must be smaller than window_size")
+    return _PairGeometry(
+        row_offset=row_offset,
+        col_offset=col_offset,
+        box_rows=window_size - abs(row_offset),
+        box_cols=window_size - abs(col_offset),
+        row_start=max(0, -row_offset),
+        col_start=max(0, -col_offset),
+    )
+
+
+def glcm_property_image(
+    quantized: np.ndarray,
+    valid_mask: np.ndarray,
+    gray_levels: int,
+    window_size: int,
+    row_offset: int,
+    col_offset: int,
+    property_name: str,
+    *,
+    strip_rows: int = DEFAULT_STRIP_ROWS,
+    max_workers: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute one GLCM property for every pixel.
+
+    ``quantized`` holds gray levels in ``[0, gray_levels)``; windows are
+    ``window_size`` wide (odd), edge-padded for values and padded invalid.
+    Returns ``(result, pair_count)`` as float32/float64 arrays; ``result`` is
+    NaN where the window holds no valid pair.
+    """
+    if property_name not in BOX_SUM_PROPERTIES | HISTOGRAM_PROPERTIES:
+        raise ValueError(f"Unsupported GLCM property: {property_name}")
+    geometry = _pair_geometry(window_size, row_offset, col_offset)
+    pad = window_size // 2
+    padded_quantized = np.pad(quantized.astype(np.int32, copy=False), pad, mode="edge")
+    padded_valid = np.pad(valid_mask, pad, mode="constant", constant_values=False)
+
+    height, width = quantized.shape
+    result = np.full((height, width), np.nan, dtype="float32")
+    count = np.zeros((height, width), dtype="float64")
+    step = max(1, int(strip_rows))
+    strips = [(start, min(start + step, height)) for start in range(0, height, step)]
+
+    def run(strip):
+        start, stop = strip
+        values, counts = _glcm_strip(
+            padded_quantized, padded_valid, start, stop, width,
+            geometry, gray_levels, property_name,
+        )
+        result[start:stop] = values
+        count[start:stop] = counts
+
+    workers = max(1, min(max_workers or default_texture_workers(), len(strips)))
+    if workers == 1:
+        for strip in strips:
+            run(strip)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="glcm") as executor:
+            list(executor.map(run, strips))
+    return result, count
+
+
+def _strip_pairs(
+    padded_quantized: np.ndarray,
+    padded_valid: np.ndarray,
+    start: int,
+    stop: int,
+    width: int,
+    geometry: _PairGeometry,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Source/target levels and pair validity for output rows [start, stop) plus halo."""
+    rows = slice(geometry.row_start + start, geometry.row_start + stop + geometry.box_rows - 1)
+    cols = slice(geometry.col_start, geometry.col_start + width + geometry.box_cols - 1)
+    target_rows = slice(rows.start + geometry.row_offset, rows.stop + geometry.row_offset)
+    target_cols = slice(cols.start + geometry.col_offset, cols.stop + geometry.col_offset)
+    source = padded_quantized[rows, cols]
+    target = padded_quantized[target_rows, target_cols]
+    pair_valid = padded_valid[rows, cols] & padded_valid[target_rows, target_cols]
+    return source, target, pair_valid
+
+
+def _box_sum(values: np.ndarray, box_rows: int, box_cols: int) -> np.ndarray:
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=values.dtype)
+    np.cumsum(values, axis=0, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+    return (
+        integral[box_rows:, box_cols:]
+        - integral[:-box_rows, box_cols:]
+        - integral[box_rows:, :-box_cols]
+        + integral[:-box_rows, :-box_cols]
+    )
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros(numerator.shape, dtype="float64"),
+        where=denominator > 0,
+    )
+
+
+def _glcm_strip(
+    padded_quantized: np.ndarray,
+    padded_valid: np.ndarray,
+    start: int,
+    stop: int,
+    width: int,
+    geometry: _PairGeometry,
+    gray_levels: int,
+    property_name: str,
+) -> tuple[np.ndarray, np.ndarray]:
+    source, target, pair_valid = _strip_pairs(padded_quantized, padded_valid, start, stop, width, geometry)
+    hh, ww = geometry.box_rows, geometry.box_cols
+    valid_int = pair_valid.astype(np.int64)
+    count = _box_sum(valid_int, hh, ww).astype("float64")
+
+    if property_name in HISTOGRAM_PROPERTIES:
+        values = _running_histogram_property(
+            source * gray_levels + target, pair_valid, hh, ww, gray_levels, property_name
+        )
+    else:
+        source_i = source.astype(np.int64) * valid_int
+        target_i = target.astype(np.int64) * valid_int
+        diff = source_i - target_i
+        if property_name == "contrast":
+            values = _divide(_box_sum(diff * diff, hh, ww).astype("float64"), count)
+        elif property_name == "dissimilarity":
+            values = _divide(_box_sum(np.abs(diff), hh, ww).astype("float64"), count)
+        elif property_name == "homogeneity":
+            weights = np.where(pair_valid, 1.0 / (1.0 + (diff * diff).astype("float64")), 0.0)
+            values = _divide(_box_sum(weights, hh, ww), count)
+        else:
+            mean_source = _divide(_box_sum(source_i, hh, ww).astype("float64"), count)
+            mean_target = _divide(_box_sum(target_i, hh, ww).astype("float64"), count)
+            source_sq = _box_sum(source_i * source_i, hh, ww).astype("float64")
+            target_sq = _box_sum(target_i * target_i, hh, ww).astype("float64")
+            source_target = _box_sum(source_i * target_i, hh, ww).astype("float64")
+            var_source = np.maximum(_divide(source_sq, count) - mean_source * mean_source, 0.0)
+            var_target = np.maximum(_divide(target_sq, count) - mean_target * mean_target, 0.0)
+            covariance = _divide(source_target, count) - mean_source * mean_target
+            denominator = np.sqrt(var_source * var_target)
+            values = np.divide(
+                covariance,
+                denominator,
+                out=np.zeros_like(covariance, dtype="float64"),
+                where=denominator > 1e-12,
+            )
+
+    values = np.asarray(values, dtype="float32")
+    values[count <= 0] = np.nan
+    return values, count
+
+
+def _running_histogram_property(
+    codes: np.ndarray,
+    pair_valid: np.ndarray,
+    box_rows: int,
+    box_cols: int,
+    gray_levels: int,
+    property_name: str,
+) -> np.ndarray:
+    """
+    Slide an ``box_rows x box_cols`` box down the strip, one histogram per
+    output column (in column blocks that fit HISTOGRAM_BLOCK_BYTES).
+    """
+    out_rows = codes.shape[0] - box_rows + 1
+    out_cols = codes.shape[1] - box_cols + 1
+    bins = gray_levels * gray_levels
+    block_cols = max(1, min(out_cols, HISTOGRAM_BLOCK_BYTES // (bins * 4)))
+    # n * log(n) for every possible bin count, so entropy updates are lookups.
+    counts_range = np.arange(box_rows * box_cols + 1, dtype="float64")
+    n_log_n = counts_range * np.log(np.maximum(counts_range, 1.0))
+
+    output = np.empty((out_rows, out_cols), dtype="float64")
+    for col0 in range(0, out_cols, block_cols):
+        col1 = min(col0 + block_cols, out_cols)
+        output[:, col0:col1] = _running_histogram_block(
+            codes[:, col0:col1 + box_cols - 1],
+            pair_valid[:, col0:col1 + box_cols - 1].astype(np.int32),
+            box_rows, box_cols, bins, n_log_n, property_name,
+        )
+    return output
+
+
+def _running_histogram_block(
+    codes: np.ndarray,
+    weights: np.ndarray,
+    box_rows: int,
+    box_cols: int,
+    bins: int,
+    n_log_n: np.ndarray,
+    property_name: str,
+) -> np.ndarray:
+    out_rows = codes.shape[0] - box_rows + 1
+    out_cols = codes.shape[1] - box_cols + 1
+    histogram = np.zeros(out_cols * bins, dtype=np.int32)
+    base = np.arange(out_cols, dtype=np.int64) * bins
+    sum_squares = np.zeros(out_cols, dtype=np.int64)
+    sum_n_log_n = np.zeros(out_cols, dtype="float64")
+    pair_count = np.zeros(out_cols, dtype=np.int64)
+
+    def update(row: int, sign: int):
+        # Within one column offset every output column touches its own
+        # histogram, so the gather/scatter below never collides.
+        for k in range(box_cols):
+            index = base + codes[row, k:k + out_cols]
+            delta = weights[row, k:k + out_cols] * sign
+            before = histogram[index]
+            after = before + delta
+            histogram[index] = after
+            np.add(sum_squares, after.astype(np.int64) ** 2 - before.astype(np.int64) ** 2, out=sum_squares)
+            np.add(sum_n_log_n, n_log_n[after] - n_log_n[before], out=sum_n_log_n)
+            np.add(pair_count, delta, out=pair_count)
+
+    output = np.empty((out_rows, out_cols), dtype="float64")
+    for row in range(box_rows):
+        update(row, 1)
+    for row in range(out_rows):
+        if row:
+            update(row - 1, -1)
+            update(row + box_rows - 1, 1)
+        total = pair_count.astype("float64")
+        if property_name == "entropy":
+            values = np.maximum(np.log(np.maximum(total, 1.0)) - _divide(sum_n_log_n, total), 0.0)
+        else:
+            values = _divide(sum_squares.astype("float64"), total * total)
+            if property_name == "energy":
+                values = np.sqrt(values)
+        output[row] = values
+    return output
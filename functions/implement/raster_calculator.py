@@ -0,0 +1,379 @@
+"""Block-windowed raster calculator engine.
+
+The calculator evaluates a numexpr expression over tokens such as ``A``,
+``A_2`` or ``B_1_3`` (variable ``B``, bands 1 and 3). Instead of loading every
+input into memory, the output grid is split into square blocks; each block
+reads only the matching window of every input (warped onto the reference
+grid when needed), evaluates all output bands and is written immediately.
+Blocks run on a thread pool with a bounded number in flight, so peak memory
+is proportional to ``block_size ** 2 * workers`` rather than the scene size.
+
+Expressions are parsed, validated and compiled to a numexpr program once per
+expression text (see ``compile_expression``); the compiled program is reused
+for every band and block and across calls.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+import numexpr as ne
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+from functions.implement.aligned_cache import open_aligned, read_masked_aligned
+from functions.implement.raster_validity import grids_match, read_masked_data
+
+logger = logging.getLogger("functions.raster_calculator")
+
+NODATA = -9999.0
+DEFAULT_BLOCK_SIZE = 512
+
+RESERVED_NAMES = frozenset({
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2",
+    "sinh", "cosh", "tanh", "exp", "log", "log10", "sqrt", "abs",
+    "where", "pi", "e", "expm1", "log1p", "real", "imag", "conj",
+    "complex",
+})
+_TOKEN_PATTERN = re.compile(r"\b([A-Za-z][A-Za-z0-9]*(?:_\d+)*)\b")
+_FLOAT32 = ne.necompiler.getType(np.empty(0, dtype="float32"))
+
+# Older numexpr releases share interpreter state between compiled programs,
+# so calls are serialised here; each call is still multi-threaded internally.
+_EVALUATE_LOCK = threading.Lock()
+
+
+def default_calculator_workers() -> int:
+    configured = os.getenv("RS_CALCULATOR_WORKERS", "").strip()
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def resolve_output_band_count(band_counts: Iterable[int]) -> int:
+    """
+    Validate per-token band counts and return the output band count:
+    1. equal counts -> per band
+    2. a single non-singleton count -> broadcast the single-band tokens
+    3. several different multi-band counts -> error
+    """
+    unique = set(band_counts)
+    if len(unique) == 1:
+        return unique.pop()
+    non_one = [c for c in unique if c != 1]
+    if len(non_one) == 1:
+        return non_one[0]
+    raise ValueError(
+        f"Band dimensions are incompatible and cannot be broadcast:{sorted(unique)}."
+        f"Only all-equal band counts or one side with a single band are supported."
+    )
+
+
+def iter_block_windows(width: int, height: int, block_size: int) -> Iterator[Window]:
+    for row in range(0, height, block_size):
+        for col in range(0, width, block_size):
+            yield Window(
+                col,
+                row,
+                min(block_size, width - col),
+                min(block_size, height - row),
+            )
+
+
+def _token_bands(path: str, indices: list[int]) -> list[int]:
+    with rasterio.open(path) as src:
+        total = src.count
+    if not indices:
+        return list(range(1, total + 1))
+    for idx in indices:
+        if idx < 1 or idx > total:
+            raise ValueError(
+                f"File {path} has {total} bands; requested band index {idx} is out of range"
+            )
+    return list(indices)
+
+
+def parse_expression_tokens(expression: str) -> dict[str, tuple[str, list[int]]]:
+    """
+    Parse the variable tokens of an expression, e.g.
+    ``{"A_2_3": ("A", [2, 3]), "B": ("B", [])}`` (empty list = all bands).
+    numexpr function and constant names are skipped.
+    """
+    tokens = {}
+    for match in _TOKEN_PATTERN.finditer(expression):
+        token = match.group(1)
+        parts = token.split("_")
+        split_pos = len(parts)
+        for i, part in enumerate(parts):
+            if part.isdigit():
+                split_pos = i
+                break
+        var_name = "_".join(parts[:split_pos])
+        if not var_name or var_name.lower() in RESERVED_NAMES:
+            continue
+        tokens[token] = (var_name, [int(part) for part in parts[split_pos:]])
+    return tokens
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    """A parsed, validated and compiled calculator expression."""
+
+    text: str
+    tokens: dict[str, tuple[str, list[int]]]
+    safe_text: str
+    arguments: tuple[str, ...]
+    _program: Any = field(repr=False, compare=False)
+
+    @property
+    def variables(self) -> tuple[str, ...]:
+        """Base variable names in order of first reference."""
+        return tuple(dict.fromkeys(var_name for var_name, _ in self.tokens.values()))
+
+    def evaluate(self, operands: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Evaluate on same-shape float32 arrays keyed by token."""
+        args = [np.ascontiguousarray(operands[token], dtype="float32") for token in self.arguments]
+        with _EVALUATE_LOCK:
+            return self._program(*args)
+
+
+@lru_cache(maxsize=256)
+def compile_expression(expression: str) -> CompiledExpression:
+    """
+    Parse and compile ``expression`` once; results are cached by its text.
+
+    Raises ``ValueError`` for expressions without raster variables or that
+    numexpr rejects.
+    """
+    expression = expression.strip()
+    tokens = parse_expression_tokens(expression)
+    if not tokens:
+        raise ValueError("The expression does not reference any raster variables.")
+
+    # Rename tokens to numexpr-safe identifiers, longest first so that ``A``
+    # does not clobber ``A_2``.
+    safe_text = expression
+    safe_names = {}
+    for position, token in enumerate(sorted(tokens, key=len, reverse=True)):
+        safe_name = f"_v{position}"
+        safe_text = re.sub(rf"\b{re.escape(token)}\b", safe_name, safe_text)
+        safe_names[safe_name] = token
+
+    signature = [(safe_name, _FLOAT32) for safe_name in sorted(safe_names)]
+    try:
+        program = ne.NumExpr(safe_text, signature)
+    except (SyntaxError, TypeError, ValueError, KeyError, NotImplementedError) as exc:
+        raise ValueError(f"Invalid raster calculator expression '{expression}': {exc}") from exc
+
+    return CompiledExpression(
+        text=expression,
+        tokens=tokens,
+        safe_text=safe_text,
+        arguments=tuple(safe_names[name] for name in program.input_names),
+        _program=program,
+    )
+
+
+class _ThreadInputs:
+    """Per-thread dataset handles; rasterio datasets are not thread-safe."""
+
+    def __init__(
+        self,
+        paths: dict[str, str],
+        reference_path: str,
+        resampling: Resampling,
+        bands: dict[str, set[int]] | None = None,
+    ):
+        self._paths = paths
+        self._bands = bands or {}
+        self._reference_path = reference_path
+        self._resampling = resampling
+        self._local = threading.local()
+        self._opened = []
+        self._opened_lock = threading.Lock()
+
+    def _handles(self) -> dict:
+        handles = getattr(self._local, "handles", None)
+        if handles is not None:
+            return handles
+
+        handles = {}
+        opened = []
+        reference = rasterio.open(self._reference_path)
+        opened.append(reference)
+        for var_name, path in self._paths.items():
+            src = rasterio.open(path)
+            opened.append(src)
+            aligned = None
+            if not grids_match(src, reference):
+                aligned = open_aligned(
+                    src,
+                    reference,
+                    resampling=self._resampling,
+                    band_indexes=self._bands.get(var_name),
+                )
+                opened.append(aligned)
+            handles[var_name] = (src, aligned)
+        with self._opened_lock:
+            self._opened.extend(opened)
+        self._local.handles = handles
+        return handles
+
+    def read(self, var_name: str, bands: list[int], window: Window) -> np.ma.MaskedArray:
+        src, aligned = self._handles()[var_name]
+        if aligned is None:
+            data = read_masked_data(src, bands, zero_is_invalid=None, window=window)
+        else:
+            data = read_masked_aligned(src, aligned, bands, zero_is_invalid=None, window=window)
+        return data.astype("float32")
+
+    def close(self):
+        with self._opened_lock:
+            opened, self._opened = self._opened, []
+        for handle in reversed(opened):
+            try:
+                handle.close()
+            except Exception:
+                pass
+
+
+def _evaluate_block(
+    inputs: _ThreadInputs,
+    compiled: CompiledExpression,
+    token_plan: dict[str, tuple[str, list[int]]],
+    output_bands: int,
+    window: Window,
+) -> tuple[Window, np.ndarray, np.ndarray]:
+    token_blocks = {
+        token: inputs.read(var_name, bands, window)
+        for token, (var_name, bands) in token_plan.items()
+    }
+
+    result = np.empty((output_bands, int(window.height), int(window.width)), dtype="float32")
+    any_valid = np.zeros((int(window.height), int(window.width)), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for band_idx in range(output_bands):
+            operands = {}
+            band_valid = None
+            for token, block in token_blocks.items():
+                operand = block[0] if block.shape[0] == 1 else block[band_idx]
+                operand_valid = ~np.ma.getmaskarray(operand)
+                band_valid = (
+                    operand_valid.copy()
+                    if band_valid is None
+                    else band_valid & operand_valid
+                )
+                operands[token] = operand.filled(0)
+
+            band_result = np.asarray(compiled.evaluate(operands), dtype="float32")
+            band_result = np.broadcast_to(band_result, band_valid.shape)
+            band_valid &= np.isfinite(band_result)
+            result[band_idx] = np.where(band_valid, band_result, NODATA)
+            any_valid |= band_valid
+    return window, result, any_valid
+
+
+def run_block_calculator(
+    path_mapping: dict[str, str],
+    expression: str | CompiledExpression,
+    output_path: str,
+    *,
+    reference_path: str | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    max_workers: int | None = None,
+    resampling: Resampling = Resampling.bilinear,
+) -> int:
+    """
+    Evaluate ``expression`` block by block onto ``reference_path``'s grid.
+
+    ``reference_path`` defaults to the first referenced variable's file.
+    Returns the number of output bands written.
+    """
+    compiled = expression if isinstance(expression, CompiledExpression) else compile_expression(expression)
+    block_size = max(16, int(block_size) - int(block_size) % 16)
+    workers = max_workers or default_calculator_workers()
+
+    missing = [var_name for var_name in compiled.variables if var_name not in path_mapping]
+    if missing:
+        raise ValueError(
+            f"Variable in expression '{missing[0]}' does not have a matching file path in the mapping"
+        )
+    paths = {var_name: path_mapping[var_name] for var_name in compiled.variables}
+    reference_path = reference_path or paths[compiled.variables[0]]
+    token_plan = {
+        token: (var_name, _token_bands(paths[var_name], indices))
+        for token, (var_name, indices) in compiled.tokens.items()
+    }
+    output_bands = resolve_output_band_count(len(bands) for _, bands in token_plan.values())
+
+    with rasterio.open(reference_path) as reference:
+        meta = reference.meta.copy()
+    meta.update({
+        "dtype": "float32",
+        "count": output_bands,
+        "driver": "GTiff",
+        "nodata": NODATA,
+        "tiled": True,
+        "blockxsize": block_size,
+        "blockysize": block_size,
+    })
+
+    # Off-grid inputs are warped for the bands the expression reads only.
+    used_bands: dict[str, set[int]] = {}
+    for var_name, bands in token_plan.values():
+        used_bands.setdefault(var_name, set()).update(bands)
+    inputs = _ThreadInputs(paths, reference_path, resampling, used_bands)
+    max_in_flight = workers * 2
+    try:
+        with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True):
+            with rasterio.open(output_path, "w", **meta) as dest, ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="raster-calc",
+            ) as executor:
+                pending = set()
+
+                def drain(return_when):
+                    nonlocal pending
+                    done, pending = wait(pending, return_when=return_when)
+                    for future in done:
+                        window, block, valid = future.result()
+                        dest.write(block, window=window)
+                        dest.write_mask(valid.astype(np.uint8) * 255, window=window)
+
+                for window in iter_block_windows(meta["width"], meta["height"], block_size):
+                    pending.add(
+                        executor.submit(
+                            _evaluate_block,
+                            inputs,
+                            compiled,
+                            token_plan,
+                            output_bands,
+                            window,
+                        )
+                    )
+                    if len(pending) >= max_in_flight:
+                        drain(FIRST_COMPLETED)
+                while pending:
+                    drain(FIRST_COMPLETED)
+    finally:
+        inputs.close()
+
+    logger.info(
+        "Raster calculator wrote %s band(s) %sx%s in %spx blocks with %s worker(s)",
+        output_bands,
+        meta["width"],
+        meta["height"],
+        block_size,
+        workers,
+    )
+    return output_bands
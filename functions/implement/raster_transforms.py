@@ -2,11 +2,19 @@ from __future__ import annotations
 
 import math
 import os
+from functools import partial
 from typing import Any, Literal
 
 import numpy as np
 import rasterio
 
+from functions.implement.block_processing import (
+    default_block_size,
+    iter_halo_windows,
+    read_masked_window,
+    run_halo_blocks,
+)
+
 
 TransformType = Literal["fourier", "wavelet", "pca"]
 FourierOutput = Literal["magnitude", "power", "phase"]
@@ -29,22 +37,10 @@ def raster_transform_analysis(
     """Create Fourier, Haar wavelet, or PCA raster analysis products."""
 
     analysis_type = _normalize_transform_type(transform_type)
-    with rasterio.open(input_path) as src:
-        if analysis_type == "pca":
-            data, valid_mask = _read_stack(src)
-            result, descriptions, meta = _pca(data, valid_mask, pca_components, pca_standardize)
-            profile = src.profile.copy()
-            output = _prepare_float_output(result, valid_mask)
-            _write_stack(output_path, profile, output, descriptions)
-            return {
-                "operation": "raster_transform_analysis",
-                "transform_type": analysis_type,
-                **meta,
-                "width": int(output.shape[2]),
-                "height": int(output.shape[1]),
-                "bands": int(output.shape[0]),
-            }
+    if analysis_type == "pca":
+        return _pca_analysis(input_path, output_path, pca_components, pca_standardize)
 
+    with rasterio.open(input_path) as src:
         if band_index < 1 or band_index > src.count:
             raise ValueError(f"Raster has {src.count} bands; band_index {band_index} is out of range")
         band, valid_mask = _read_band(src, band_index)
@@ -118,17 +114,6 @@ def _read_band(src: rasterio.DatasetReader, band_index: int) -> tuple[np.ndarray
     return band, valid_mask
 
 
-def _read_stack(src: rasterio.DatasetReader) -> tuple[np.ndarray, np.ndarray]:
-    data = src.read(masked=True).astype("float32")
-    stack = np.asarray(data.filled(np.nan), dtype="float32")
-    valid_mask = ~np.any(np.ma.getmaskarray(data), axis=0) & np.all(np.isfinite(stack), axis=0)
-    if src.count < 2:
-        raise ValueError("PCA requires a raster with at least two bands")
-    if not np.any(valid_mask):
-        raise ValueError("Raster has no pixels valid across all bands")
-    return stack, valid_mask
-
-
 def _fill_invalid(data: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
     filled = np.asarray(data, dtype="float32").copy()
     mean_value = float(np.nanmean(filled[valid_mask]))
@@ -227,56 +212,121 @@ def _upsample_to_shape(data: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
     return upsampled[: shape[0], : shape[1]]
 
 
-def _pca(
-    stack: np.ndarray,
-    valid_mask: np.ndarray,
+def _pca_analysis(
+    input_path: str,
+    output_path: str,
     component_count: int,
     standardize: bool,
-) -> tuple[np.ndarray, list[str], dict[str, Any]]:
-    bands, height, width = stack.shape
+) -> dict[str, Any]:
+    """
+    PCA in two streaming passes: band statistics are accumulated block by
+    block, then every block is projected onto the leading eigenvectors.
+    """
     try:
         requested_components = int(component_count)
     except (TypeError, ValueError) as exc:
         raise ValueError("pca_components must be an integer") from exc
     if requested_components < 1:
         raise ValueError("pca_components must be at least 1")
-    components = min(requested_components, bands)
 
-    samples = stack[:, valid_mask].T.astype("float64")
-    if samples.shape[0] < 2:
+    with rasterio.open(input_path) as src:
+        bands, width, height = src.count, src.width, src.height
+    if bands < 2:
+        raise ValueError("PCA requires a raster with at least two bands")
+    indexes = list(range(1, bands + 1))
+    sample_count, means, covariance = _pca_statistics(input_path, indexes)
+    if sample_count == 0:
+        raise ValueError("Raster has no pixels valid across all bands")
+    if sample_count < 2:
         raise ValueError("PCA requires at least two valid pixels")
-    means = samples.mean(axis=0)
-    centered = samples - means
+
+    components = min(requested_components, bands)
     scales = np.ones(bands, dtype="float64")
     if standardize:
-        scales = samples.std(axis=0)
+        # population standard deviation, as numpy's ``std`` default
+        scales = np.sqrt(np.maximum(np.diag(covariance) * (sample_count - 1) / sample_count, 0.0))
         scales[scales <= 1e-12] = 1.0
-        centered = centered / scales
+        covariance = covariance / np.outer(scales, scales)
 
-    covariance = np.cov(centered, rowvar=False)
     eigenvalues, eigenvectors = np.linalg.eigh(covariance)
     order = np.argsort(eigenvalues)[::-1]
     eigenvalues = np.maximum(eigenvalues[order], 0.0)
-    eigenvectors = eigenvectors[:, order]
+    selected_vectors = eigenvectors[:, order][:, :components]
 
-    selected_vectors = eigenvectors[:, :components]
-    projected = centered @ selected_vectors
-    output = np.full((components, height, width), np.nan, dtype="float32")
-    for component_index in range(components):
-        output[component_index, valid_mask] = projected[:, component_index].astype("float32")
+    descriptions = [f"PCA component {index + 1}" for index in range(components)]
+    layout = run_halo_blocks(
+        input_path,
+        output_path,
+        partial(_pca_block, means=means, scales=scales, vectors=selected_vectors),
+        indexes=indexes,
+        count=components,
+        dtype="float32",
+        nodata=_FLOAT_NODATA,
+        descriptions=descriptions,
+        tags={"RASTER_TRANSFORM_ANALYSIS": "true"},
+    )
+    layout.pop("metadata")
 
     total_variance = float(eigenvalues.sum())
     explained = eigenvalues[:components] / total_variance if total_variance > 0 else np.zeros(components)
-    descriptions = [f"PCA component {index + 1}" for index in range(components)]
-    return output, descriptions, {
+    return {
+        "operation": "raster_transform_analysis",
+        "transform_type": "pca",
         "pca_components": int(components),
         "pca_standardize": bool(standardize),
         "explained_variance_ratio": [float(value) for value in explained],
         "band_means": [float(value) for value in means],
         "band_scales": [float(value) for value in scales],
+        "width": int(width),
+        "height": int(height),
+        "bands": int(components),
+        "block_processing": layout,
     }
 
 
+def _pca_statistics(input_path: str, indexes: list[int]) -> tuple[int, np.ndarray, np.ndarray]:
+    """Valid-pixel count, band means and covariance (ddof=1), read block by block."""
+    bands = len(indexes)
+    count = 0
+    shift = None
+    sums = np.zeros(bands, dtype="float64")
+    products = np.zeros((bands, bands), dtype="float64")
+    with rasterio.open(input_path) as src:
+        for halo_window in iter_halo_windows(src.width, src.height, default_block_size()):
+            stack, valid_mask = read_masked_window(src, indexes, halo_window.window)
+            samples = stack[:, valid_mask].T.astype("float64")
+            if samples.shape[0] == 0:
+                continue
+            if shift is None:
+                # Accumulating around a rough mean keeps the sums well conditioned.
+                shift = samples.mean(axis=0)
+            centered = samples - shift
+            count += samples.shape[0]
+            sums += centered.sum(axis=0)
+            products += centered.T @ centered
+
+    if count == 0:
+        return 0, np.zeros(bands), np.zeros((bands, bands))
+    offset = sums / count
+    covariance = (products - count * np.outer(offset, offset)) / max(count - 1, 1)
+    return count, shift + offset, covariance
+
+
+def _pca_block(
+    stack: np.ndarray,
+    valid_mask: np.ndarray,
+    *,
+    means: np.ndarray,
+    scales: np.ndarray,
+    vectors: np.ndarray,
+) -> np.ndarray:
+    samples = stack[:, valid_mask].T.astype("float64")
+    projected = ((samples - means) / scales) @ vectors
+    output = np.full((vectors.shape[1],) + valid_mask.shape, np.nan, dtype="float32")
+    output[:, valid_mask] = projected.T.astype("float32")
+    return _prepare_float_output(output, valid_mask)
+
+
 def _prepare_float_output(stack: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
     output = np.asarray(stack, dtype="float32").copy()
     output[:, ~valid_mask] = _FLOAT_NODATA
@@ -238,19 +238,61 @@ def read_masked_on_grid(
     *,
     resampling: Resampling = Resampling.nearest,
     zero_is_invalid: bool | None = False,
+    window=None,
 ) -> np.ma.MaskedArray:
-    """Read a dataset on a reference grid, reprojecting data and masks together."""
+    """Read a dataset on a reference grid, reprojecting data and masks together.
+
+    ``window`` is expressed on the reference grid.
+    """
     if grids_match(source, reference):
+        read_kwargs = {} if window is None else {"window": window}
         return read_masked_data(
             source,
             band_indexes,
             zero_is_invalid=zero_is_invalid,
+            **read_kwargs,
+        )
+
+    with aligned_vrt(source, reference, resampling=resampling) as vrt:
+        return read_masked_from_vrt(
+            source,
+            vrt,
+            band_indexes,
+            zero_is_invalid=zero_is_invalid,
+            window=window,
         )
+
+
+def aligned_vrt(source, reference, *, resampling: Resampling = Resampling.nearest) -> WarpedVRT:
+    """Open a WarpedVRT of ``source`` on ``reference``'s grid with a coverage alpha band."""
     if source.crs is None or reference.crs is None:
         raise ValueError(
             "Rasters on different grids require a CRS for mask-aware alignment."
         )
+    return WarpedVRT(
+        source,
+        crs=reference.crs,
+        transform=reference.transform,
+        width=reference.width,
+        height=reference.height,
+        resampling=resampling,
+        add_alpha=True,
+    )
+
 
+def read_masked_from_vrt(
+    source,
+    vrt,
+    band_indexes: int | Iterable[int] | None = None,
+    *,
+    zero_is_invalid: bool | None = False,
+    window=None,
+) -> np.ma.MaskedArray:
+    """Read an ``aligned_vrt`` (optionally one window) with source validity rules.
+
+    Keeping the VRT open lets block-wise callers warp many windows without
+    rebuilding it for each read.
+    """
     if band_indexes is None:
         indexes = list(range(1, int(source.count) + 1))
         scalar = False
@@ -261,21 +303,14 @@ def read_masked_on_grid(
         indexes = list(band_indexes)
         scalar = False
 
-    with WarpedVRT(
-        source,
-        crs=reference.crs,
-        transform=reference.transform,
-        width=reference.width,
-        height=reference.height,
-        resampling=resampling,
-        add_alpha=True,
-    ) as vrt:
-        aligned = read_masked_data(
-            vrt,
-            band_indexes,
-            zero_is_invalid=False,
-        ).copy()
-        coverage = vrt.read(vrt.count) > 0
+    read_kwargs = {} if window is None else {"window": window}
+    aligned = read_masked_data(
+        vrt,
+        band_indexes,
+        zero_is_invalid=False,
+        **read_kwargs,
+    ).copy()
+    coverage = vrt.read(vrt.count, **read_kwargs) > 0
 
     aligned_values = np.asarray(aligned.filled(0))
     valid = ~np.ma.getmaskarray(aligned)
@@ -1,17 +1,31 @@
 from __future__ import annotations
 
 import os
+import threading
+from collections import OrderedDict
+from functools import partial
 from typing import Any, Literal
 
 import numpy as np
 import rasterio
 
+from functions.implement.block_processing import (
+    HaloWindow,
+    default_block_size,
+    default_block_workers,
+    run_halo_blocks,
+)
 from functions.implement.classification import (
     _classification_summary,
     _cluster_features,
     _labels_to_raster,
+    _normalize_band_indices,
+    _raster_label_histogram,
+    _read_feature_window,
     _read_stack,
+    _scan_features,
     _smooth_labels,
+    _summary_from_histogram,
     _valid_features,
     _write_label_raster,
 )
@@ -19,6 +33,33 @@ from functions.implement.classification import (
 
 SegmentationBackend = Literal["auto", "onnx", "spectral_spatial", "slic", "watershed"]
 
+# Patch size for models with dynamic spatial input dimensions.
+DEFAULT_ONNX_PATCH_SIZE = 512
+DEFAULT_ONNX_PATCH_OVERLAP = 64
+# Block cores span this many patch strides: each block boundary re-runs one
+# row/column of patches, so wider blocks mean fewer repeated inferences.
+ONNX_BLOCK_PATCHES = int(os.getenv("RS_ONNX_BLOCK_PATCHES", "4"))
+ONNX_SESSION_CACHE_SIZE = int(os.getenv("RS_ONNX_SESSION_CACHE_SIZE", "4"))
+
+_onnx_sessions: OrderedDict[tuple[str, int, int], Any] = OrderedDict()
+_onnx_sessions_lock = threading.Lock()
+
+
+def default_onnx_batch_size() -> int:
+    configured = os.getenv("RS_ONNX_BATCH_SIZE", "").strip()
+    return max(1, int(configured)) if configured else 4
+
+
+def onnx_thread_counts() -> tuple[int, int]:
+    """``(intra_op, inter_op)`` threads; the default splits the CPUs across block workers."""
+    intra = os.getenv("RS_ONNX_INTRA_OP_THREADS", "").strip()
+    inter = os.getenv("RS_ONNX_INTER_OP_THREADS", "").strip()
+    default_intra = max(1, (os.cpu_count() or 1) // default_block_workers())
+    return (
+        max(1, int(intra)) if intra else default_intra,
+        max(1, int(inter)) if inter else 1,
+    )
+
 
 def deep_learning_segmentation(
     input_path: str,
@@ -39,6 +80,9 @@ def deep_learning_segmentation(
     an edge-aware segmentation using normalized spectral features and pixel
     coordinates. This keeps the module usable without downloading a model while
     preserving the same API for future trained model backends.
+
+    ONNX models run over overlapping patches (the model's static input size,
+    else 512 pixels) streamed block by block; sessions are cached per process.
     """
 
     if n_classes < 2:
@@ -46,37 +90,39 @@ def deep_learning_segmentation(
     if backend not in {"auto", "onnx", "spectral_spatial", "slic", "watershed"}:
         raise ValueError("backend must be auto, onnx, spectral_spatial, slic, or watershed")
 
+    chosen_backend = "onnx" if model_path and backend in {"auto", "onnx"} else backend
+    if chosen_backend == "auto":
+        chosen_backend = "spectral_spatial"
+    tags = {
+        "SEGMENTATION_TYPE": "deep_learning",
+        "SEGMENTATION_BACKEND": chosen_backend,
+        "MODEL_PATH": model_path or "",
+    }
+
+    if chosen_backend == "onnx":
+        return _run_onnx_segmentation(
+            input_path,
+            output_path,
+            model_path=model_path,
+            band_indices=band_indices,
+            threshold=threshold,
+            max_samples=max_samples,
+            random_seed=random_seed,
+            tags=tags,
+        )
+
     with rasterio.open(input_path) as src:
         stack, valid_mask, profile = _read_stack(src, band_indices)
-        chosen_backend = "onnx" if model_path and backend in {"auto", "onnx"} else backend
-        if chosen_backend == "auto":
-            chosen_backend = "spectral_spatial"
-
-        if chosen_backend == "onnx":
-            output = _run_onnx_segmentation(
-                stack,
-                valid_mask,
-                model_path=model_path,
-                threshold=threshold,
-                target_shape=(src.height, src.width),
-            )
-        else:
-            output = _spectral_spatial_segmentation(
-                stack,
-                valid_mask,
-                n_classes=n_classes,
-                max_samples=max_samples,
-                random_seed=random_seed,
-                compactness=compactness,
-                smoothing=smoothing,
-            )
-
-        _write_label_raster(output_path, output, profile, tags={
-            "SEGMENTATION_TYPE": "deep_learning",
-            "SEGMENTATION_BACKEND": chosen_backend,
-            "CLASS_COUNT": str(int(output.max())),
-            "MODEL_PATH": model_path or "",
-        })
+        output = _spectral_spatial_segmentation(
+            stack,
+            valid_mask,
+            n_classes=n_classes,
+            max_samples=max_samples,
+            random_seed=random_seed,
+            compactness=compactness,
+            smoothing=smoothing,
+        )
+        _write_label_raster(output_path, output, profile, tags={**tags, "CLASS_COUNT": str(int(output.max()))})
 
     return _classification_summary(output, "deep_learning_segmentation", chosen_backend, int(output.max()))
 
@@ -120,60 +166,272 @@ def _spectral_spatial_segmentation(
     return _smooth_labels(output, smoothing, valid_mask)
 
 
+def onnx_session(model_path: str):
+    """
+    Process-wide ``InferenceSession`` for ``model_path``, reused across calls
+    and reloaded when the file's mtime or size changes. Sessions are safe to
+    share between threads; the least recently used one is dropped beyond
+    ``RS_ONNX_SESSION_CACHE_SIZE``.
+    """
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+    with _onnx_sessions_lock:
+        session = _onnx_sessions.get(key)
+        if session is not None:
+            _onnx_sessions.move_to_end(key)
+            return session
+        for stale in [cached for cached in _onnx_sessions if cached[0] == key[0]]:
+            del _onnx_sessions[stale]
+        session = _create_onnx_session(key[0])
+        _onnx_sessions[key] = session
+        while len(_onnx_sessions) > max(1, ONNX_SESSION_CACHE_SIZE):
+            _onnx_sessions.popitem(last=False)
+        return session
+
+
+def _create_onnx_session(model_path: str):
+    try:
+        import onnxruntime as ort
+    except Exception as exc:
+        raise ValueError("onnxruntime is required for the onnx segmentation backend") from exc
+
+    intra_op, inter_op = onnx_thread_counts()
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op
+    options.inter_op_num_threads = inter_op
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
 def _run_onnx_segmentation(
-    stack: np.ndarray,
-    valid_mask: np.ndarray,
+    input_path: str,
+    output_path: str,
     model_path: str | None,
+    band_indices: list[int] | None,
     threshold: float,
-    target_shape: tuple[int, int],
-) -> np.ndarray:
+    max_samples: int,
+    random_seed: int,
+    tags: dict[str, str],
+) -> dict[str, Any]:
+    """
+    Sliding-window ONNX inference, streamed block by block. Patch origins
+    form one grid over the whole raster; each block runs, in batches, the
+    patches that touch its core and blends their outputs with weights that
+    taper towards the patch edges, so the result matches a single
+    whole-image sliding window. Blocks are a multiple of the patch stride
+    wide, and the halo covers every patch touching the core. Bands are
+    scaled by their 2nd/98th percentiles, estimated from a bounded sample of
+    valid pixels.
+    """
     if not model_path:
         raise ValueError("model_path is required for the onnx segmentation backend")
     if not os.path.exists(model_path):
         raise ValueError(f"ONNX model was not found: {model_path}")
 
-    try:
-        import onnxruntime as ort
-    except Exception as exc:
-        raise ValueError("onnxruntime is required for the onnx segmentation backend") from exc
+    session = onnx_session(model_path)
+    patch_shape, fixed_batch = _model_patch_layout(session)
+    overlap = min(DEFAULT_ONNX_PATCH_OVERLAP, min(patch_shape) // 4)
 
-    normalized = _normalize_stack(stack, valid_mask)
-    tensor = normalized[np.newaxis, ...].astype("float32")
-    session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
-    input_name = session.get_inputs()[0].name
-    output = session.run(None, {input_name: tensor})[0]
-    labels = _onnx_output_to_labels(output, threshold, target_shape)
-    labels[~valid_mask] = 0
-    return labels.astype("uint16")
-
-
-def _onnx_output_to_labels(output: np.ndarray, threshold: float, target_shape: tuple[int, int]) -> np.ndarray:
-    arr = np.asarray(output)
-    if arr.ndim == 4:
-        arr = arr[0]
-    if arr.ndim == 3:
-        if arr.shape[0] == 1:
-            arr = (arr[0] >= threshold).astype("uint16") + 1
-        else:
-            arr = np.argmax(arr, axis=0).astype("uint16") + 1
-    elif arr.ndim == 2:
-        arr = arr.astype("uint16")
-        if arr.max(initial=0) == 1:
-            arr = arr + 1
+    with rasterio.open(input_path) as src:
+        indexes = _normalize_band_indices(src.count, band_indices)
+        scan = _scan_features(src, indexes, max_samples, np.random.default_rng(random_seed))
+        row_starts = tuple(_patch_starts(src.height, patch_shape[0], overlap))
+        col_starts = tuple(_patch_starts(src.width, patch_shape[1], overlap))
+    if scan.sample.size:
+        low, high = np.percentile(scan.sample, [2, 98], axis=0).astype("float32")
+    else:
+        low, high = np.zeros(len(indexes), "float32"), np.ones(len(indexes), "float32")
+    high = np.where(high <= low, low + 1.0, high).astype("float32")
+
+    layout = run_halo_blocks(
+        input_path,
+        output_path,
+        partial(
+            _onnx_segment_block,
+            model_path=model_path,
+            low=low,
+            high=high,
+            threshold=threshold,
+            patch_shape=patch_shape,
+            overlap=overlap,
+            batch_size=fixed_batch or default_onnx_batch_size(),
+            row_starts=row_starts,
+            col_starts=col_starts,
+        ),
+        indexes=indexes,
+        halo=max(patch_shape),
+        dtype="uint16",
+        nodata=0,
+        tags=tags,
+        block_size=_onnx_block_size(patch_shape, overlap),
+        reader=_read_feature_window,
+        pass_window=True,
+    )
+    counts = _raster_label_histogram(output_path)
+    class_count = int(max(counts, default=0))
+    with rasterio.open(output_path, "r+") as dst:
+        dst.update_tags(CLASS_COUNT=str(class_count))
+
+    return {
+        **_summary_from_histogram(counts, "deep_learning_segmentation", "onnx", class_count),
+        "patch_size": list(patch_shape),
+        "patch_overlap": overlap,
+        "block_processing": {key: value for key, value in layout.items() if key != "metadata"},
+    }
+
+
+def _onnx_block_size(patch_shape: tuple[int, int], overlap: int) -> int:
+    stride = max(patch_shape) - overlap
+    size = max(default_block_size(), max(1, ONNX_BLOCK_PATCHES) * stride)
+    # Output tiles are multiples of 16 pixels.
+    return -(-size // 16) * 16
+
+
+def _model_patch_layout(session) -> tuple[tuple[int, int], int | None]:
+    """Patch ``(rows, cols)`` from a static NCHW input shape (else the default) and any fixed batch size."""
+    shape = list(session.get_inputs()[0].shape)
+    if len(shape) == 4 and all(isinstance(dim, int) and dim > 0 for dim in shape[2:]):
+        patch_shape = (int(shape[2]), int(shape[3]))
     else:
-        raise ValueError(f"Unsupported ONNX segmentation output shape: {arr.shape}")
-
-    if arr.shape != target_shape:
-        try:
-            from scipy import ndimage
-
-            factors = (target_shape[0] / arr.shape[0], target_shape[1] / arr.shape[1])
-            arr = ndimage.zoom(arr, factors, order=0)
-        except Exception as exc:
-            raise ValueError(
-                f"ONNX output shape {arr.shape} does not match raster shape {target_shape}"
-            ) from exc
-    return arr.astype("uint16")
+        patch_shape = (DEFAULT_ONNX_PATCH_SIZE, DEFAULT_ONNX_PATCH_SIZE)
+    fixed_batch = shape[0] if shape and isinstance(shape[0], int) and shape[0] > 0 else None
+    return patch_shape, fixed_batch
+
+
+def _onnx_segment_block(
+    stack: np.ndarray,
+    valid_mask: np.ndarray,
+    halo_window: HaloWindow,
+    *,
+    model_path: str,
+    low: np.ndarray,
+    high: np.ndarray,
+    threshold: float,
+    patch_shape: tuple[int, int],
+    overlap: int,
+    batch_size: int,
+    row_starts: tuple[int, ...],
+    col_starts: tuple[int, ...],
+) -> np.ndarray:
+    normalized = np.clip((stack - low[:, None, None]) / (high - low)[:, None, None], 0.0, 1.0)
+    normalized[:, ~valid_mask] = 0.0
+
+    core, read = halo_window.window, halo_window.read_window
+    rows = [
+        start - int(read.row_off)
+        for start in row_starts
+        if start < core.row_off + core.height and start + patch_shape[0] > core.row_off
+    ]
+    cols = [
+        start - int(read.col_off)
+        for start in col_starts
+        if start < core.col_off + core.width and start + patch_shape[1] > core.col_off
+    ]
+    labels = _sliding_window_labels(
+        onnx_session(model_path),
+        normalized.astype("float32"),
+        threshold,
+        patch_shape,
+        overlap,
+        batch_size,
+        origins=[(row, col) for row in rows for col in cols],
+    )
+    labels[~valid_mask] = 0
+    return labels
+
+
+def _sliding_window_labels(
+    session,
+    image: np.ndarray,
+    threshold: float,
+    patch_shape: tuple[int, int],
+    overlap: int,
+    batch_size: int,
+    origins: list[tuple[int, int]] | None = None,
+) -> np.ndarray:
+    """
+    Run ``session`` over overlapping patches of a ``(bands, rows, cols)``
+    image, at ``origins`` (default: a sliding window over the image). Score
+    outputs are blended with tapering weights and then thresholded (one
+    channel) or arg-maxed; label-map outputs keep, per pixel, the label of
+    the patch whose centre is nearest. Labels are class index + 1, so class
+    0 of any model never collides with nodata.
+    """
+    bands, height, width = image.shape
+    patch_rows, patch_cols = patch_shape
+    if origins is None:
+        origins = [
+            (row, col)
+            for row in _patch_starts(height, patch_rows, overlap)
+            for col in _patch_starts(width, patch_cols, overlap)
+        ]
+    weights = _patch_weights(patch_rows, patch_cols, overlap)
+    input_name = session.get_inputs()[0].name
+
+    score_sum = None
+    weight_sum = np.zeros((height, width), dtype="float32")
+    labels = np.zeros((height, width), dtype="uint16")
+    for start in range(0, len(origins), batch_size):
+        batch = origins[start:start + batch_size]
+        tensor = np.zeros((len(batch), bands, patch_rows, patch_cols), dtype="float32")
+        for item, (row, col) in enumerate(batch):
+            patch = image[:, row:row + patch_rows, col:col + patch_cols]
+            tensor[item, :, :patch.shape[1], :patch.shape[2]] = patch
+        output = np.asarray(session.run(None, {input_name: tensor})[0])
+
+        for item, (row, col) in enumerate(batch):
+            rows = slice(row, min(row + patch_rows, height))
+            cols = slice(col, min(col + patch_cols, width))
+            crop = (slice(0, rows.stop - rows.start), slice(0, cols.stop - cols.start))
+            patch_weight = weights[crop]
+            if output.ndim == 4 or (output.ndim == 3 and output.dtype.kind == "f"):
+                scores = output[item] if output.ndim == 4 else output[item][np.newaxis]
+                scores = _resize_patch_output(scores.astype("float32"), patch_shape, order=1)
+                if score_sum is None:
+                    score_sum = np.zeros((scores.shape[0], height, width), dtype="float32")
+                score_sum[:, rows, cols] += scores[(slice(None), *crop)] * patch_weight
+                weight_sum[rows, cols] += patch_weight
+            elif output.ndim in (2, 3):
+                patch_labels = output[item] if output.ndim == 3 else output
+                patch_labels = _resize_patch_output(patch_labels[np.newaxis], patch_shape, order=0)[0][crop]
+                nearer = patch_weight > weight_sum[rows, cols]
+                labels[rows, cols][nearer] = patch_labels[nearer].astype("uint16") + 1
+                weight_sum[rows, cols] = np.maximum(weight_sum[rows, cols], patch_weight)
+            else:
+                raise ValueError(f"Unsupported ONNX segmentation output shape: {output.shape}")
+
+    if score_sum is None:
+        # Label maps hold 0-based class ids, like the arg-max of scores.
+        return labels
+    scores = score_sum / np.maximum(weight_sum, 1e-12)
+    if scores.shape[0] == 1:
+        return (scores[0] >= threshold).astype("uint16") + 1
+    return np.argmax(scores, axis=0).astype("uint16") + 1
+
+
+def _patch_starts(size: int, patch: int, overlap: int) -> list[int]:
+    if size <= patch:
+        return [0]
+    stride = max(1, patch - overlap)
+    return [*range(0, size - patch, stride), size - patch]
+
+
+def _patch_weights(rows: int, cols: int, overlap: int) -> np.ndarray:
+    def ramp(length: int) -> np.ndarray:
+        steps = np.arange(length, dtype="float32")
+        distance = np.minimum(steps + 1, length - steps)
+        return np.clip(distance / float(overlap + 1), 1e-3, 1.0)
+
+    return np.outer(ramp(rows), ramp(cols)).astype("float32")
+
+
+def _resize_patch_output(output: np.ndarray, patch_shape: tuple[int, int], order: int) -> np.ndarray:
+    """Zoom a ``(channels, rows, cols)`` model output to the patch size when the model changes resolution."""
+    if output.shape[1:] == tuple(patch_shape):
+        return output
+    from scipy import ndimage
+
+    factors = (1.0, patch_shape[0] / output.shape[1], patch_shape[1] / output.shape[2])
+    return ndimage.zoom(output, factors, order=order)
 
 
 def _normalize_stack(stack: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
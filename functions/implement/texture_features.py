@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import math
-import os
+from functools import partial
 from typing import Any, Literal
 
 import numpy as np
@@ -9,6 +9,9 @@ import rasterio
 from numpy.lib.stride_tricks import sliding_window_view
 from scipy import ndimage
 
+from functions.implement.block_processing import band_statistics, run_halo_blocks
+from functions.implement.glcm_engine import glcm_property_image
+
 
 TextureType = Literal["glcm", "local_statistics", "gabor", "lbp"]
 GLCMProperty = Literal[
@@ -63,62 +66,126 @@ def texture_feature_analysis(
     with rasterio.open(input_path) as src:
         if band_index > src.count:
             raise ValueError(f"Raster has {src.count} bands; band_index {band_index} is out of range")
-        band, valid_mask = _read_band(src, band_index)
-        profile = src.profile.copy()
+        width, height = src.width, src.height
+
+    statistics = band_statistics(input_path, band_index)
+    if statistics.count == 0:
+        raise ValueError("Selected band has no valid pixels")
+
+    parameters = {
+        "gray_levels": gray_levels,
+        "window_size": window_size,
+        "glcm_distance": glcm_distance,
+        "glcm_angle": glcm_angle,
+        "glcm_property": glcm_property,
+        "local_stat": local_stat,
+        "gabor_frequency": gabor_frequency,
+        "gabor_theta": gabor_theta,
+        "gabor_sigma": gabor_sigma,
+        "lbp_radius": lbp_radius,
+        "lbp_points": lbp_points,
+    }
+    kernel = partial(
+        _texture_block,
+        feature_type=feature_type,
+        parameters=parameters,
+        value_range=(statistics.minimum, statistics.maximum),
+        fill_value=statistics.mean,
+    )
+    layout = run_halo_blocks(
+        input_path,
+        output_path,
+        kernel,
+        indexes=band_index,
+        halo=_texture_halo(feature_type, parameters),
+        dtype="float32",
+        nodata=_FLOAT_NODATA,
+        tags={"TEXTURE_FEATURE_ANALYSIS": "true", "TEXTURE_TYPE": feature_type},
+    )
+    meta = layout.pop("metadata")
+    description = meta.pop("description")
+    with rasterio.open(output_path, "r+") as dst:
+        dst.set_band_description(1, description)
+
+    return {
+        "operation": "texture_feature_analysis",
+        "texture_type": feature_type,
+        "band_index": int(band_index),
+        "width": int(width),
+        "height": int(height),
+        "dtype": "float32",
+        "nodata": _FLOAT_NODATA,
+        **meta,
+        "block_processing": layout,
+    }
 
+
+def _texture_block(
+    band: np.ndarray,
+    valid_mask: np.ndarray,
+    *,
+    feature_type: TextureType,
+    parameters: dict[str, Any],
+    value_range: tuple[float, float],
+    fill_value: float,
+) -> tuple[np.ndarray, dict[str, Any]]:
     if feature_type == "glcm":
         result, meta = _glcm_texture(
             band,
             valid_mask,
-            gray_levels=gray_levels,
-            window_size=window_size,
-            distance=glcm_distance,
-            angle=glcm_angle,
-            property_name=glcm_property,
+            gray_levels=parameters["gray_levels"],
+            window_size=parameters["window_size"],
+            distance=parameters["glcm_distance"],
+            angle=parameters["glcm_angle"],
+            property_name=parameters["glcm_property"],
+            value_range=value_range,
         )
         description = f"GLCM {meta['glcm_property']}"
     elif feature_type == "local_statistics":
         result, meta = _local_statistics(
             band,
             valid_mask,
-            gray_levels=gray_levels,
-            window_size=window_size,
-            statistic=local_stat,
+            gray_levels=parameters["gray_levels"],
+            window_size=parameters["window_size"],
+            statistic=parameters["local_stat"],
+            value_range=value_range,
         )
         description = f"Local {meta['local_stat']}"
     elif feature_type == "gabor":
         result, meta = _gabor_filter(
             band,
             valid_mask,
-            frequency=gabor_frequency,
-            theta=gabor_theta,
-            sigma=gabor_sigma,
+            frequency=parameters["gabor_frequency"],
+            theta=parameters["gabor_theta"],
+            sigma=parameters["gabor_sigma"],
+            fill_value=fill_value,
         )
         description = "Gabor magnitude response"
     elif feature_type == "lbp":
         result, meta = _lbp(
             band,
             valid_mask,
-            radius=lbp_radius,
-            points=lbp_points,
+            radius=parameters["lbp_radius"],
+            points=parameters["lbp_points"],
+            fill_value=fill_value,
         )
         description = "Local binary pattern code"
     else:
-        raise ValueError(f"Unsupported texture_type: {texture_type}")
+        raise ValueError(f"Unsupported texture_type: {feature_type}")
 
-    output = _prepare_float_output(result, valid_mask)
-    _write_single_band(output_path, profile, output, description, feature_type)
+    return _prepare_float_output(result, valid_mask), {**meta, "description": description}
 
-    return {
-        "operation": "texture_feature_analysis",
-        "texture_type": feature_type,
-        "band_index": int(band_index),
-        "width": int(output.shape[1]),
-        "height": int(output.shape[0]),
-        "dtype": "float32",
-        "nodata": _FLOAT_NODATA,
-        **meta,
-    }
+
+def _texture_halo(feature_type: TextureType, parameters: dict[str, Any]) -> int:
+    """Pixels of context each texture kernel reads around an output pixel."""
+    if feature_type in {"glcm", "local_statistics"}:
+        return _normalize_window_size(parameters["window_size"]) // 2
+    if feature_type == "gabor":
+        sigma = float(parameters["gabor_sigma"])
+        return _gabor_radius(sigma) if math.isfinite(sigma) and sigma > 0 else 0
+    radius = float(parameters["lbp_radius"])
+    # bilinear sampling at distance ``radius`` touches one more pixel
+    return int(math.ceil(radius)) + 1 if math.isfinite(radius) and radius > 0 else 0
 
 
 def _normalize_texture_type(texture_type: str) -> TextureType:
@@ -166,15 +233,6 @@ def _normalize_local_stat(statistic: str) -> LocalStatistic:
     return value  # type: ignore[return-value]
 
 
-def _read_band(src: rasterio.DatasetReader, band_index: int) -> tuple[np.ndarray, np.ndarray]:
-    data = src.read(band_index, masked=True).astype("float32")
-    band = np.asarray(data.filled(np.nan), dtype="float32")
-    valid_mask = ~np.ma.getmaskarray(data) & np.isfinite(band)
-    if not np.any(valid_mask):
-        raise ValueError("Selected band has no valid pixels")
-    return band, valid_mask
-
-
 def _normalize_gray_levels(gray_levels: int) -> int:
     try:
         levels = int(gray_levels)
@@ -197,11 +255,17 @@ def _normalize_window_size(window_size: int) -> int:
     return size
 
 
-def _quantize(data: np.ndarray, valid_mask: np.ndarray, gray_levels: int) -> np.ndarray:
+def _quantize(
+    data: np.ndarray,
+    valid_mask: np.ndarray,
+    gray_levels: int,
+    value_range: tuple[float, float] | None = None,
+) -> np.ndarray:
     levels = _normalize_gray_levels(gray_levels)
-    values = data[valid_mask]
-    value_min = float(np.nanmin(values))
-    value_max = float(np.nanmax(values))
+    if value_range is None:
+        values = data[valid_mask]
+        value_range = (float(np.nanmin(values)), float(np.nanmax(values)))
+    value_min, value_max = (float(value) for value in value_range)
     quantized = np.zeros(data.shape, dtype=np.uint16)
     if not math.isfinite(value_min) or not math.isfinite(value_max):
         raise ValueError("Selected band has no finite pixels")
@@ -230,33 +294,6 @@ def _offset_from_angle(distance: int, angle_degrees: float) -> tuple[int, int]:
     return row_offset, col_offset
 
 
-def _directional_pair_windows(
-    quantized: np.ndarray,
-    valid_mask: np.ndarray,
-    window_size: int,
-    row_offset: int,
-    col_offset: int,
-) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-    if abs(row_offset) >= window_size or abs(col_offset) >= window_size:
-        raise ValueError("glcm_distance must be smaller than window_size")
-
-    pad = window_size // 2
-    padded_quantized = np.pad(quantized, pad, mode="edge")
-    padded_valid = np.pad(valid_mask, pad, mode="constant", constant_values=False)
-    value_windows = sliding_window_view(padded_quantized, (window_size, window_size))
-    valid_windows = sliding_window_view(padded_valid, (window_size, window_size))
-
-    src_rows = slice(max(0, -row_offset), window_size - max(0, row_offset))
-    dst_rows = slice(max(0, row_offset), window_size - max(0, -row_offset))
-    src_cols = slice(max(0, -col_offset), window_size - max(0, col_offset))
-    dst_cols = slice(max(0, col_offset), window_size - max(0, -col_offset))
-
-    source = value_windows[..., src_rows, src_cols]
-    target = value_windows[..., dst_rows, dst_cols]
-    pair_mask = valid_windows[..., src_rows, src_cols] & valid_windows[..., dst_rows, dst_cols]
-    return source, target, pair_mask
-
-
 def _glcm_texture(
     data: np.ndarray,
     valid_mask: np.ndarray,
@@ -265,62 +302,24 @@ def _glcm_texture(
     distance: int,
     angle: float,
     property_name: str,
+    value_range: tuple[float, float] | None = None,
 ) -> tuple[np.ndarray, dict[str, Any]]:
     levels = _normalize_gray_levels(gray_levels)
     size = _normalize_window_size(window_size)
     selected_property = _normalize_glcm_property(property_name)
     row_offset, col_offset = _offset_from_angle(distance, angle)
-    quantized = _quantize(data, valid_mask, levels)
-    source, target, pair_mask = _directional_pair_windows(
+    quantized = _quantize(data, valid_mask, levels, value_range)
+    result, count = glcm_property_image(
         quantized,
         valid_mask,
+        levels,
         size,
         row_offset,
         col_offset,
+        selected_property,
     )
 
-    count = pair_mask.sum(axis=(-2, -1)).astype("float64")
-    result = np.full(data.shape, np.nan, dtype="float32")
-    output_mask = valid_mask & (count > 0)
-
-    if selected_property in {"asm", "energy", "entropy"}:
-        codes = (source.astype(np.int32) * levels + target.astype(np.int32)).reshape(data.size, -1)
-        masks = pair_mask.reshape(data.size, -1)
-        result = _histogram_glcm_property(codes, masks, count.ravel(), levels, selected_property).reshape(data.shape)
-    else:
-        source_float = source.astype("float64")
-        target_float = target.astype("float64")
-        diff = source_float - target_float
-        if selected_property == "contrast":
-            values = np.where(pair_mask, diff * diff, 0.0).sum(axis=(-2, -1))
-            result = _safe_divide(values, count)
-        elif selected_property == "dissimilarity":
-            values = np.where(pair_mask, np.abs(diff), 0.0).sum(axis=(-2, -1))
-            result = _safe_divide(values, count)
-        elif selected_property == "homogeneity":
-            values = np.where(pair_mask, 1.0 / (1.0 + diff * diff), 0.0).sum(axis=(-2, -1))
-            result = _safe_divide(values, count)
-        elif selected_property == "correlation":
-            masked_source = np.where(pair_mask, source_float, 0.0)
-            masked_target = np.where(pair_mask, target_float, 0.0)
-            mean_source = _safe_divide(masked_source.sum(axis=(-2, -1)), count)
-            mean_target = _safe_divide(masked_target.sum(axis=(-2, -1)), count)
-            source_sq = np.where(pair_mask, source_float * source_float, 0.0).sum(axis=(-2, -1))
-            target_sq = np.where(pair_mask, target_float * target_float, 0.0).sum(axis=(-2, -1))
-            source_target = np.where(pair_mask, source_float * target_float, 0.0).sum(axis=(-2, -1))
-            var_source = np.maximum(_safe_divide(source_sq, count) - mean_source * mean_source, 0.0)
-            var_target = np.maximum(_safe_divide(target_sq, count) - mean_target * mean_target, 0.0)
-            covariance = _safe_divide(source_target, count) - mean_source * mean_target
-            denominator = np.sqrt(var_source * var_target)
-            result = np.divide(
-                covariance,
-                denominator,
-                out=np.zeros_like(covariance, dtype="float64"),
-                where=denominator > 1e-12,
-            ).astype("float32")
-
-    result = np.asarray(result, dtype="float32")
-    result[~output_mask] = np.nan
+    result[~(valid_mask & (count > 0))] = np.nan
     return result, {
         "gray_levels": int(levels),
         "window_size": int(size),
@@ -331,40 +330,20 @@ def _glcm_texture(
     }
 
 
-def _histogram_glcm_property(
-    codes: np.ndarray,
-    masks: np.ndarray,
-    counts: np.ndarray,
-    gray_levels: int,
-    property_name: GLCMProperty,
-) -> np.ndarray:
-    output = np.full(counts.shape, np.nan, dtype="float32")
-    bins = gray_levels * gray_levels
-    for index in np.flatnonzero(counts > 0):
-        values = codes[index, masks[index]]
-        histogram = np.bincount(values, minlength=bins).astype("float64")
-        probabilities = histogram[histogram > 0] / counts[index]
-        if property_name == "entropy":
-            output[index] = float(-np.sum(probabilities * np.log(probabilities)))
-        else:
-            asm = float(np.sum(probabilities * probabilities))
-            output[index] = math.sqrt(asm) if property_name == "energy" else asm
-    return output
-
-
 def _local_statistics(
     data: np.ndarray,
     valid_mask: np.ndarray,
     gray_levels: int,
     window_size: int,
     statistic: str,
+    value_range: tuple[float, float] | None = None,
 ) -> tuple[np.ndarray, dict[str, Any]]:
     levels = _normalize_gray_levels(gray_levels)
     size = _normalize_window_size(window_size)
     selected_stat = _normalize_local_stat(statistic)
 
     if selected_stat == "entropy":
-        result = _local_entropy(data, valid_mask, levels, size)
+        result = _local_entropy(data, valid_mask, levels, size, value_range)
         return result, {"gray_levels": int(levels), "window_size": int(size), "local_stat": selected_stat}
 
     kernel = np.ones((size, size), dtype="float32")
@@ -399,8 +378,9 @@ def _local_entropy(
     valid_mask: np.ndarray,
     gray_levels: int,
     window_size: int,
+    value_range: tuple[float, float] | None = None,
 ) -> np.ndarray:
-    quantized = _quantize(data, valid_mask, gray_levels)
+    quantized = _quantize(data, valid_mask, gray_levels, value_range)
     pad = window_size // 2
     padded_quantized = np.pad(quantized, pad, mode="edge")
     padded_valid = np.pad(valid_mask, pad, mode="constant", constant_values=False)
@@ -423,6 +403,7 @@ def _gabor_filter(
     frequency: float,
     theta: float,
     sigma: float,
+    fill_value: float | None = None,
 ) -> tuple[np.ndarray, dict[str, Any]]:
     freq = float(frequency)
     angle = float(theta)
@@ -433,7 +414,7 @@ def _gabor_filter(
         raise ValueError("gabor_sigma must be greater than zero")
 
     real_kernel, imag_kernel = _gabor_kernels(freq, angle, sigma_value)
-    filled = _fill_invalid(data, valid_mask)
+    filled = _fill_invalid(data, valid_mask, fill_value)
     real_response = ndimage.convolve(filled, real_kernel, mode="nearest")
     imag_response = ndimage.convolve(filled, imag_kernel, mode="nearest")
     response = np.sqrt(real_response * real_response + imag_response * imag_response).astype("float32")
@@ -446,8 +427,12 @@ def _gabor_filter(
     }
 
 
+def _gabor_radius(sigma: float) -> int:
+    return max(1, int(math.ceil(sigma * 3.0)))
+
+
 def _gabor_kernels(frequency: float, theta_degrees: float, sigma: float) -> tuple[np.ndarray, np.ndarray]:
-    radius = max(1, int(math.ceil(sigma * 3.0)))
+    radius = _gabor_radius(sigma)
     coords = np.arange(-radius, radius + 1, dtype="float64")
     y, x = np.meshgrid(coords, coords, indexing="ij")
     theta = math.radians(theta_degrees)
@@ -472,6 +457,7 @@ def _lbp(
     valid_mask: np.ndarray,
     radius: float,
     points: int,
+    fill_value: float | None = None,
 ) -> tuple[np.ndarray, dict[str, Any]]:
     radius_value = float(radius)
     try:
@@ -484,7 +470,7 @@ def _lbp(
         raise ValueError("lbp_points must be in the range [1, 24]")
 
     rows, cols = np.indices(data.shape, dtype="float32")
-    filled = _fill_invalid(data, valid_mask)
+    filled = _fill_invalid(data, valid_mask, fill_value)
     valid_float = valid_mask.astype("float32")
     codes = np.zeros(data.shape, dtype="float64")
     output_mask = valid_mask.copy()
@@ -512,9 +498,18 @@ def _lbp(
     return codes.astype("float32"), {"lbp_radius": float(radius_value), "lbp_points": int(point_count)}
 
 
-def _fill_invalid(data: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
+def _fill_invalid(
+    data: np.ndarray,
+    valid_mask: np.ndarray,
+    fill_value: float | None = None,
+) -> np.ndarray:
     filled = np.asarray(data, dtype="float32").copy()
-    mean_value = float(np.nanmean(filled[valid_mask]))
+    if fill_value is not None:
+        mean_value = float(fill_value)
+    elif np.any(valid_mask):
+        mean_value = float(np.nanmean(filled[valid_mask]))
+    else:
+        mean_value = 0.0
     if not math.isfinite(mean_value):
         mean_value = 0.0
     filled[~valid_mask] = mean_value
@@ -535,23 +530,3 @@ def _prepare_float_output(result: np.ndarray, valid_mask: np.ndarray) -> np.ndar
     output[~valid_mask | ~np.isfinite(output)] = _FLOAT_NODATA
     return output
 
-
-def _write_single_band(
-    output_path: str,
-    profile: dict[str, Any],
-    data: np.ndarray,
-    description: str,
-    texture_type: str,
-) -> None:
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    profile.update(
-        driver="GTiff",
-        count=1,
-        dtype="float32",
-        nodata=_FLOAT_NODATA,
-        compress="lzw",
-    )
-    with rasterio.open(output_path, "w", **profile) as dst:
-        dst.write(data.astype("float32"), 1)
-        dst.set_band_description(1, description)
-        dst.update_tags(TEXTURE_FEATURE_ANALYSIS="true", TEXTURE_TYPE=texture_type)
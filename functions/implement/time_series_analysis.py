@@ -5,17 +5,15 @@ import os
 import re
 import warnings
 from datetime import date, datetime
+from collections.abc import Callable
 from typing import Any, Literal
 
 import numpy as np
 import rasterio
-from rasterio.enums import Resampling
 from scipy import signal
 
-from functions.implement.raster_validity import (
-    grids_match,
-    read_masked_on_grid,
-)
+from functions.implement.block_processing import default_block_size
+from functions.implement.time_stack import LazyTimeStack
 
 
 TimeSeriesOperation = Literal[
@@ -43,6 +41,8 @@ TIME_SERIES_OPERATIONS = {
 }
 
 _FLOAT_NODATA = -9999.0
+# Values per chunk when gap-filling a stack (time steps x pixels).
+INTERPOLATION_CHUNK_ELEMENTS = 256 * 1024
 
 
 def time_series_analysis(
@@ -64,13 +64,34 @@ def time_series_analysis(
     if band_index < 1:
         raise ValueError("band_index must be greater than zero")
 
-    stack, valid_mask, profile, aligned_input_count = _read_time_stack(
-        input_paths,
-        band_index,
-    )
-    parsed_dates = _parse_dates(dates, len(input_paths))
+    with LazyTimeStack.open(input_paths, band_index) as time_stack:
+        return _time_series_product(
+            time_stack,
+            output_path,
+            operation_name,
+            dates,
+            moving_window_size=moving_window_size,
+            savgol_window_length=savgol_window_length,
+            savgol_polyorder=savgol_polyorder,
+            phenology_threshold_ratio=phenology_threshold_ratio,
+        )
+
+
+def _time_series_product(
+    time_stack: LazyTimeStack,
+    output_path: str,
+    operation_name: TimeSeriesOperation,
+    dates: list[str | date | datetime | None] | str | None,
+    *,
+    moving_window_size: int,
+    savgol_window_length: int,
+    savgol_polyorder: int,
+    phenology_threshold_ratio: float,
+) -> dict[str, Any]:
+    aligned_input_count = time_stack.aligned_input_count
+    parsed_dates = _parse_dates(dates, time_stack.count)
     warnings_list: list[str] = []
-    original_input_count = int(stack.shape[0])
+    original_input_count = time_stack.count
 
     if parsed_dates is not None and any(item is not None for item in parsed_dates):
         order = sorted(
@@ -83,8 +104,7 @@ def time_series_analysis(
                 index,
             ),
         )
-        stack = stack[order]
-        valid_mask = valid_mask[order]
+        time_stack = time_stack.take(order)
         parsed_dates = [parsed_dates[index] for index in order]
 
     known_date_count = sum(
@@ -113,74 +133,47 @@ def time_series_analysis(
     ] or None
     used_input_count = original_input_count
     temporal_axis = "observation_index"
-
-    if operation_name == "monthly_composite":
-        stack, valid_mask, working_dates, excluded = _calendar_inputs(
-            stack,
-            valid_mask,
-            parsed_dates,
-            operation_name,
-        )
-        used_input_count = int(stack.shape[0])
-        temporal_axis = "calendar_month"
-        if excluded:
-            warnings_list.append(
-                f"{excluded} undated raster(s) were excluded from monthly "
-                "compositing."
-            )
-        output, descriptions, meta = _grouped_composite(
-            stack,
-            valid_mask,
-            _month_labels(working_dates),
-            statistic="mean",
-        )
-    elif operation_name == "annual_composite":
-        stack, valid_mask, working_dates, excluded = _calendar_inputs(
-            stack,
-            valid_mask,
-            parsed_dates,
-            operation_name,
-        )
-        used_input_count = int(stack.shape[0])
-        temporal_axis = "calendar_year"
+    time_count = time_stack.count
+
+    # Each kernel maps one spatial window of the stack to
+    # (output bands, band descriptions, metadata).
+    if operation_name in {"monthly_composite", "annual_composite"}:
+        indices, working_dates, excluded = _calendar_inputs(parsed_dates, operation_name)
+        time_stack = time_stack.take(indices)
+        used_input_count = time_stack.count
+        monthly = operation_name == "monthly_composite"
+        temporal_axis = "calendar_month" if monthly else "calendar_year"
         if excluded:
             warnings_list.append(
-                f"{excluded} undated raster(s) were excluded from annual "
-                "compositing."
+                f"{excluded} undated raster(s) were excluded from "
+                f"{'monthly' if monthly else 'annual'} compositing."
             )
-        output, descriptions, meta = _grouped_composite(
-            stack,
-            valid_mask,
-            _year_labels(working_dates),
-            statistic="mean",
-        )
-    elif operation_name == "maximum_composite":
-        output = _single_composite(stack, valid_mask, "max")
-        descriptions = ["Maximum value composite"]
-        meta = {"composite_statistic": "max"}
-        temporal_axis = "not_applicable"
-    elif operation_name == "median_composite":
-        output = _single_composite(stack, valid_mask, "median")
-        descriptions = ["Median composite"]
-        meta = {"composite_statistic": "median"}
+        labels = _month_labels(working_dates) if monthly else _year_labels(working_dates)
+
+        def kernel(stack, valid_mask):
+            return _grouped_composite(stack, valid_mask, labels, statistic="mean")
+    elif operation_name in {"maximum_composite", "median_composite"}:
+        statistic = "max" if operation_name == "maximum_composite" else "median"
+        description = "Maximum value composite" if statistic == "max" else "Median composite"
         temporal_axis = "not_applicable"
+
+        def kernel(stack, valid_mask):
+            output = _single_composite(stack, valid_mask, statistic)
+            return output, [description], {"composite_statistic": statistic}
     elif operation_name == "moving_window_smoothing":
-        output = _moving_window_smoothing(stack, valid_mask, moving_window_size)
-        descriptions = _time_descriptions(
-            "Moving window smooth",
-            output.shape[0],
-            parsed_dates,
-        )
+        descriptions = _time_descriptions("Moving window smooth", time_count, parsed_dates)
         meta = {"moving_window_size": _normalize_odd_window(moving_window_size, minimum=1)}
         _append_cadence_warning(warnings_list, complete_dates, operation_name)
+
+        def kernel(stack, valid_mask):
+            return _moving_window_smoothing(stack, valid_mask, moving_window_size), descriptions, meta
     elif operation_name == "savitzky_golay":
-        output, meta = _savitzky_golay(stack, valid_mask, savgol_window_length, savgol_polyorder)
-        descriptions = _time_descriptions(
-            "Savitzky-Golay smooth",
-            output.shape[0],
-            parsed_dates,
-        )
+        descriptions = _time_descriptions("Savitzky-Golay smooth", time_count, parsed_dates)
         _append_cadence_warning(warnings_list, complete_dates, operation_name)
+
+        def kernel(stack, valid_mask):
+            output, meta = _savitzky_golay(stack, valid_mask, savgol_window_length, savgol_polyorder)
+            return output, descriptions, meta
     elif operation_name == "trend":
         trend_dates = _dates_with_distinct_axis(complete_dates)
         if complete_dates and trend_dates is None:
@@ -193,47 +186,47 @@ def time_series_analysis(
                 "Trend was computed per observation step because a complete "
                 "acquisition-date axis is unavailable."
             )
-        output, meta = _trend(stack, valid_mask, trend_dates)
-        descriptions = ["Trend slope", "Trend intercept", "Trend R2"]
         temporal_axis = "days" if trend_dates else "observation_index"
+
+        def kernel(stack, valid_mask):
+            output, meta = _trend(stack, valid_mask, trend_dates)
+            return output, ["Trend slope", "Trend intercept", "Trend R2"], meta
     elif operation_name == "seasonality":
-        output, meta = _seasonality(stack, valid_mask, complete_dates)
-        descriptions = ["Seasonal mean", "Seasonal amplitude", "Peak timing", "Trough timing"]
         temporal_axis = "day_of_year" if complete_dates else "observation_index"
         if complete_dates is None:
             warnings_list.append(
                 "Seasonal peak and trough timing use observation positions "
                 "because a complete acquisition-date axis is unavailable."
             )
+
+        def kernel(stack, valid_mask):
+            output, meta = _seasonality(stack, valid_mask, complete_dates)
+            return output, ["Seasonal mean", "Seasonal amplitude", "Peak timing", "Trough timing"], meta
     elif operation_name == "phenology":
-        output, meta = _phenology(
-            stack,
-            valid_mask,
-            complete_dates,
-            phenology_threshold_ratio,
-        )
-        descriptions = [
-            "Start of season",
-            "End of season",
-            "Peak of season",
-            "Season length",
-            "Seasonal amplitude",
-        ]
         temporal_axis = "day_of_year" if complete_dates else "observation_index"
         if complete_dates is None:
             warnings_list.append(
                 "Phenology timing uses observation positions because a "
                 "complete acquisition-date axis is unavailable."
             )
+
+        def kernel(stack, valid_mask):
+            output, meta = _phenology(stack, valid_mask, complete_dates, phenology_threshold_ratio)
+            descriptions = [
+                "Start of season",
+                "End of season",
+                "Peak of season",
+                "Season length",
+                "Seasonal amplitude",
+            ]
+            return output, descriptions, meta
     else:
-        raise ValueError(f"Unsupported time-series operation: {operation}")
+        raise ValueError(f"Unsupported time-series operation: {operation_name}")
 
-    output = _prepare_float_stack(output)
-    _write_stack(
+    band_count, meta = _write_stack(
         output_path,
-        profile,
-        output,
-        descriptions,
+        time_stack,
+        kernel,
         operation_name,
         dates=working_dates,
         temporal_axis=temporal_axis,
@@ -242,12 +235,12 @@ def time_series_analysis(
     return {
         "operation": "time_series_analysis",
         "time_series_operation": operation_name,
-        "band_index": int(band_index),
+        "band_index": int(time_stack.band_index),
         "input_count": original_input_count,
         "used_input_count": used_input_count,
-        "width": int(output.shape[2]),
-        "height": int(output.shape[1]),
-        "bands": int(output.shape[0]),
+        "width": int(time_stack.width),
+        "height": int(time_stack.height),
+        "bands": int(band_count),
         "dates": [
             item.isoformat() if item is not None else None
             for item in parsed_dates
@@ -292,58 +285,6 @@ def _normalize_operation(operation: str) -> TimeSeriesOperation:
     return value  # type: ignore[return-value]
 
 
-def _read_time_stack(
-    input_paths: list[str],
-    band_index: int,
-) -> tuple[np.ndarray, np.ndarray, dict[str, Any], int]:
-    arrays: list[np.ndarray] = []
-    masks: list[np.ndarray] = []
-    profile: dict[str, Any] | None = None
-    aligned_input_count = 0
-
-    with rasterio.open(input_paths[0]) as reference:
-        if band_index > reference.count:
-            raise ValueError(
-                f"Raster {input_paths[0]} has {reference.count} bands; "
-                f"band_index {band_index} is out of range"
-            )
-        profile = reference.profile.copy()
-
-        for index, path in enumerate(input_paths):
-            with rasterio.open(path) as src:
-                if band_index > src.count:
-                    raise ValueError(
-                        f"Raster {path} has {src.count} bands; band_index "
-                        f"{band_index} is out of range"
-                    )
-
-                if index == 0 or grids_match(src, reference):
-                    data = src.read(
-                        band_index,
-                        masked=True,
-                    ).astype("float32")
-                else:
-                    data = read_masked_on_grid(
-                        src,
-                        reference,
-                        band_index,
-                        resampling=Resampling.bilinear,
-                        zero_is_invalid=False,
-                    ).astype("float32")
-                    aligned_input_count += 1
-
-                band = np.asarray(data.filled(np.nan), dtype="float32")
-                valid = ~np.ma.getmaskarray(data) & np.isfinite(band)
-                arrays.append(band)
-                masks.append(valid)
-
-    stack = np.stack(arrays, axis=0)
-    valid_mask = np.stack(masks, axis=0)
-    if not np.any(valid_mask):
-        raise ValueError("The selected time series has no valid pixels")
-    return stack, valid_mask, profile or {}, aligned_input_count
-
-
 def _parse_dates(
     values: list[str | date | datetime | None] | str | None,
     expected_count: int,
@@ -413,19 +354,13 @@ def _complete_dates_or_none(
 
 
 def _calendar_inputs(
-    stack: np.ndarray,
-    valid_mask: np.ndarray,
     dates: list[date | None] | None,
     operation: str,
-) -> tuple[np.ndarray, np.ndarray, list[date], int]:
-    if not dates:
-        raise ValueError(
-            f"{operation} requires at least one identifiable acquisition "
-            "date. Use maximum/median compositing when dates are unavailable."
-        )
+) -> tuple[list[int], list[date], int]:
+    """Indices and dates of the dated inputs, plus the number excluded."""
     indices = [
         index
-        for index, item in enumerate(dates)
+        for index, item in enumerate(dates or [])
         if item is not None
     ]
     if not indices:
@@ -435,8 +370,7 @@ def _calendar_inputs(
         )
     known_dates = [dates[index] for index in indices]
     return (
-        stack[indices],
-        valid_mask[indices],
+        indices,
         [item for item in known_dates if item is not None],
         len(dates) - len(indices),
     )
@@ -594,22 +528,62 @@ def _savitzky_golay(
     }
 
 
-def _interpolate_missing(stack: np.ndarray, valid_mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+def _interpolate_missing(
+    stack: np.ndarray,
+    valid_mask: np.ndarray,
+    chunk_elements: int = INTERPOLATION_CHUNK_ELEMENTS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Linearly fill invalid observations along the time axis for every pixel.
+
+    Equivalent to ``np.interp`` over the observation index per pixel (ends
+    are held at the nearest valid value), but vectorized: the previous and
+    next valid index of every observation are propagated with cumulative
+    max/min, and only the gaps are then filled with one weighted gather.
+    Pixels are processed in chunks of about ``chunk_elements`` values.
+    """
     time_count, height, width = stack.shape
     series = stack.reshape(time_count, -1)
     valid = valid_mask.reshape(time_count, -1)
-    filled = np.full_like(series, np.nan, dtype="float32")
-    x = np.arange(time_count, dtype="float64")
+    filled = np.empty(series.shape, dtype="float32")
     valid_any = valid.any(axis=0)
-
-    for pixel in np.flatnonzero(valid_any):
-        pixel_valid = valid[:, pixel]
-        values = series[pixel_valid, pixel]
-        if values.size == 1:
-            filled[:, pixel] = values[0]
-        else:
-            filled[:, pixel] = np.interp(x, x[pixel_valid], values).astype("float32")
-
+    steps = np.arange(time_count, dtype=np.int32)[:, np.newaxis]
+    last_step = time_count - 1
+    chunk = max(1, int(chunk_elements) // max(time_count, 1))
+
+    for start in range(0, series.shape[1], chunk):
+        stop = min(start + chunk, series.shape[1])
+        chunk_series = series[:, start:stop]
+        chunk_valid = valid[:, start:stop]
+        output = filled[:, start:stop]
+        output[...] = chunk_series
+
+        previous = np.where(chunk_valid, steps, -1)
+        np.maximum.accumulate(previous, axis=0, out=previous)
+        following = np.where(chunk_valid, steps, time_count)
+        reversed_following = following[::-1]
+        np.minimum.accumulate(reversed_following, axis=0, out=reversed_following)
+
+        gaps = np.flatnonzero(~chunk_valid)
+        if gaps.size == 0:
+            continue
+        gap_steps, gap_pixels = np.divmod(gaps, stop - start)
+        low_index = previous.ravel()[gaps]
+        high_index = following.ravel()[gaps]
+        # Before the first / after the last observation hold the end value;
+        # pixels without any observation are overwritten with NaN below.
+        low_index = np.where(low_index < 0, high_index, low_index)
+        high_index = np.where(high_index > last_step, low_index, high_index)
+        np.minimum(low_index, last_step, out=low_index)
+        np.minimum(high_index, last_step, out=high_index)
+
+        low = chunk_series[low_index, gap_pixels].astype("float64")
+        high = chunk_series[high_index, gap_pixels].astype("float64")
+        span = (high_index - low_index).astype("float64")
+        slope = np.divide(high - low, span, out=np.zeros_like(low), where=span > 0)
+        output[gap_steps, gap_pixels] = slope * (gap_steps - low_index) + low
+
+    filled[:, ~valid_any] = np.nan
     return filled.reshape(stack.shape), valid_any.reshape(height, width)
 
 
@@ -775,25 +749,57 @@ def _prepare_float_stack(stack: np.ndarray) -> np.ndarray:
 
 def _write_stack(
     output_path: str,
-    profile: dict[str, Any],
-    stack: np.ndarray,
-    descriptions: list[str],
+    time_stack: LazyTimeStack,
+    kernel: Callable[[np.ndarray, np.ndarray], tuple[np.ndarray, list[str], dict[str, Any]]],
     operation: str,
     *,
     dates: list[date] | None = None,
     temporal_axis: str = "observation_index",
     warnings_list: list[str] | None = None,
-) -> None:
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+) -> tuple[int, dict[str, Any]]:
+    """
+    Run ``kernel`` window by window and write each result as it completes.
+
+    The output is created on the first finished window, once the band count
+    is known. Returns the band count and the kernel metadata; the output is
+    removed again if a window fails or the series has no valid pixel.
+    """
+    block_size = default_block_size()
+    profile = time_stack.profile.copy()
     profile.update(
         driver="GTiff",
-        count=int(stack.shape[0]),
         dtype="float32",
         nodata=_FLOAT_NODATA,
         compress="lzw",
+        tiled=True,
+        blockxsize=block_size,
+        blockysize=block_size,
     )
-    with rasterio.open(output_path, "w", **profile) as dst:
-        dst.write(stack.astype("float32"))
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    def run(stack, valid_mask):
+        output, descriptions, meta = kernel(stack, valid_mask)
+        return _prepare_float_stack(output), descriptions, meta, bool(valid_mask.any())
+
+    dst = None
+    descriptions: list[str] = []
+    meta: dict[str, Any] = {}
+    any_valid = False
+    try:
+        for window, (output, block_descriptions, block_meta, block_valid) in time_stack.map_windows(
+            run,
+            block_size=block_size,
+        ):
+            if dst is None:
+                descriptions, meta = block_descriptions, block_meta
+                profile["count"] = int(output.shape[0])
+                dst = rasterio.open(output_path, "w", **profile)
+            dst.write(output, window=window)
+            any_valid = any_valid or block_valid
+
+        if not any_valid:
+            raise ValueError("The selected time series has no valid pixels")
+
         for band_index, description in enumerate(descriptions, start=1):
             dst.set_band_description(band_index, description)
         tags = {
@@ -807,3 +813,11 @@ def _write_stack(
         if warnings_list:
             tags["TIME_SERIES_WARNING_COUNT"] = str(len(warnings_list))
         dst.update_tags(**tags)
+        dst.close()
+    except BaseException:
+        if dst is not None:
+            dst.close()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return int(profile["count"]), meta
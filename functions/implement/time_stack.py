@@ -0,0 +1,217 @@
+"""Lazy, window-at-a-time access to a time series of single-band rasters.
+
+``LazyTimeStack`` validates the inputs up front but reads no pixels until a
+spatial window is requested; ``read(window)`` then returns that window for
+every date as a ``(dates, rows, cols)`` float32 array plus validity mask,
+with inputs on a different grid warped onto the first raster's grid (through
+the aligned-input cache). ``map_windows`` runs a per-pixel kernel over all
+windows on a bounded thread pool (``RS_TIME_SERIES_WORKERS``), so peak memory
+is proportional to ``dates * block_size ** 2 * workers`` rather than the
+whole series.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+from functions.implement.aligned_cache import open_aligned, read_masked_aligned
+from functions.implement.block_processing import default_block_size, iter_halo_windows
+from functions.implement.raster_validity import grids_match, read_masked_data
+
+
+def default_time_series_workers() -> int:
+    configured = os.getenv("RS_TIME_SERIES_WORKERS", "").strip()
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+@dataclass(frozen=True)
+class _StackInput:
+    path: str
+    aligned: bool  # warped onto the reference grid when read
+
+
+class _DatasetHandles:
+    """Per-thread dataset handles; rasterio datasets are not thread-safe."""
+
+    def __init__(self, reference_path: str, resampling: Resampling, band_index: int):
+        self._reference_path = reference_path
+        self._resampling = resampling
+        self._band_index = int(band_index)
+        self._local = threading.local()
+        self._opened = []
+        self._opened_lock = threading.Lock()
+
+    def get(self, stack_input: _StackInput):
+        handles = getattr(self._local, "handles", None)
+        if handles is None:
+            handles = self._local.handles = {}
+        if stack_input.path not in handles:
+            opened = [rasterio.open(stack_input.path)]
+            aligned = None
+            if stack_input.aligned:
+                with rasterio.open(self._reference_path) as reference:
+                    aligned = open_aligned(
+                        opened[0],
+                        reference,
+                        resampling=self._resampling,
+                        band_indexes=self._band_index,
+                    )
+                opened.append(aligned)
+            with self._opened_lock:
+                self._opened.extend(opened)
+            handles[stack_input.path] = (opened[0], aligned)
+        return handles[stack_input.path]
+
+    def close(self):
+        with self._opened_lock:
+            opened, self._opened = self._opened, []
+        for handle in reversed(opened):
+            try:
+                handle.close()
+            except Exception:
+                pass
+
+
+class LazyTimeStack:
+    """A ``(dates, rows, cols)`` stack over raster files, read window by window."""
+
+    def __init__(
+        self,
+        inputs: Sequence[_StackInput],
+        band_index: int,
+        profile: dict[str, Any],
+        handles: _DatasetHandles,
+    ):
+        self._inputs = tuple(inputs)
+        self.band_index = int(band_index)
+        self.profile = profile
+        self._handles = handles
+
+    @classmethod
+    def open(
+        cls,
+        input_paths: Sequence[str],
+        band_index: int,
+        *,
+        resampling: Resampling = Resampling.bilinear,
+    ) -> "LazyTimeStack":
+        """Validate band counts and grids; inputs off the first raster's grid are marked for alignment."""
+        inputs = []
+        with rasterio.open(input_paths[0]) as reference:
+            if band_index > reference.count:
+                raise ValueError(
+                    f"Raster {input_paths[0]} has {reference.count} bands; "
+                    f"band_index {band_index} is out of range"
+                )
+            profile = reference.profile.copy()
+            for index, path in enumerate(input_paths):
+                with rasterio.open(path) as src:
+                    if band_index > src.count:
+                        raise ValueError(
+                            f"Raster {path} has {src.count} bands; band_index "
+                            f"{band_index} is out of range"
+                        )
+                    aligned = index > 0 and not grids_match(src, reference)
+                    if aligned and (src.crs is None or reference.crs is None):
+                        raise ValueError(
+                            "Rasters on different grids require a CRS for mask-aware alignment."
+                        )
+                    inputs.append(_StackInput(path=str(path), aligned=aligned))
+        return cls(inputs, band_index, profile, _DatasetHandles(str(input_paths[0]), resampling, band_index))
+
+    @property
+    def count(self) -> int:
+        return len(self._inputs)
+
+    @property
+    def width(self) -> int:
+        return int(self.profile["width"])
+
+    @property
+    def height(self) -> int:
+        return int(self.profile["height"])
+
+    @property
+    def aligned_input_count(self) -> int:
+        return sum(stack_input.aligned for stack_input in self._inputs)
+
+    def take(self, indices: Sequence[int]) -> "LazyTimeStack":
+        """A view over the selected dates, in the given order, sharing open handles."""
+        return LazyTimeStack(
+            [self._inputs[index] for index in indices],
+            self.band_index,
+            self.profile,
+            self._handles,
+        )
+
+    def read(self, window: Window) -> tuple[np.ndarray, np.ndarray]:
+        """Every date's band over ``window`` (reference grid) as float32 plus validity."""
+        rows, cols = int(window.height), int(window.width)
+        stack = np.empty((self.count, rows, cols), dtype="float32")
+        valid_mask = np.empty((self.count, rows, cols), dtype=bool)
+        for index, stack_input in enumerate(self._inputs):
+            src, aligned = self._handles.get(stack_input)
+            if aligned is None:
+                data = read_masked_data(src, self.band_index, zero_is_invalid=False, window=window)
+            else:
+                data = read_masked_aligned(src, aligned, self.band_index, zero_is_invalid=False, window=window)
+            band = np.asarray(data.astype("float32").filled(np.nan), dtype="float32")
+            stack[index] = band
+            valid_mask[index] = ~np.ma.getmaskarray(data) & np.isfinite(band)
+        return stack, valid_mask
+
+    def iter_windows(self, block_size: int | None = None) -> Iterator[Window]:
+        size = int(block_size or default_block_size())
+        for halo_window in iter_halo_windows(self.width, self.height, size):
+            yield halo_window.window
+
+    def map_windows(
+        self,
+        func: Callable[[np.ndarray, np.ndarray], Any],
+        *,
+        block_size: int | None = None,
+        max_workers: int | None = None,
+    ) -> Iterator[tuple[Window, Any]]:
+        """
+        Yield ``(window, func(stack, valid_mask))`` for every window, in
+        completion order, keeping at most ``2 * workers`` windows in flight.
+        """
+        workers = max(1, int(max_workers or default_time_series_workers()))
+
+        def run(window: Window):
+            stack, valid_mask = self.read(window)
+            return window, func(stack, valid_mask)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="time-stack") as executor:
+            pending = set()
+            for window in self.iter_windows(block_size):
+                pending.add(executor.submit(run, window))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def close(self):
+        self._handles.close()
+
+    def __enter__(self) -> "LazyTimeStack":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,32 @@
+"""layer edit_version
+
+Revision ID: 9b3e5c1f7a20
+Revises: 273328c5f494
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e5c1f7a20'
+down_revision: Union[str, Sequence[str], None] = '273328c5f494'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('layers', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('edit_version', sa.BigInteger(), server_default=sa.text('0'), nullable=False)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('layers', schema=None) as batch_op:
+        batch_op.drop_column('edit_version')
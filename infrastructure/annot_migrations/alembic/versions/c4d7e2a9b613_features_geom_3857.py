@@ -0,0 +1,83 @@
+"""features geom_3857
+
+Revision ID: c4d7e2a9b613
+Revises: 9b3e5c1f7a20
+Create Date: 2026-10-17 12:00:00.000000
+
+Adds Web Mercator copies of ``features.geom`` for vtile_service:
+
+* ``geom_3857``         - ST_Transform(geom, 3857), GiST indexed;
+* ``geom_3857_lowres``  - geom_3857 simplified to one MVT pixel at zoom 10
+                          (40075016.69 / (2^10 * 4096) m), used for zoom <= 10.
+
+A BEFORE INSERT/UPDATE trigger keeps both in sync for every write path. Rows
+that existed before this revision stay NULL until the
+``worker_cluster.tasks.maintenance.backfill_geom_3857`` task has run; the
+vtile query falls back to transforming ``geom`` for them meanwhile.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d7e2a9b613'
+down_revision: Union[str, Sequence[str], None] = '9b3e5c1f7a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Must match LOWRES_MAX_ZOOM in services/vtile_service/main.py.
+LOWRES_TOLERANCE_METERS = 9.554628535647032
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('features', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'geom_3857',
+            geoalchemy2.types.Geometry(srid=3857, dimension=2, spatial_index=False, from_text='ST_GeomFromEWKT', name='geometry'),
+            nullable=True,
+        ))
+        batch_op.add_column(sa.Column(
+            'geom_3857_lowres',
+            geoalchemy2.types.Geometry(srid=3857, dimension=2, spatial_index=False, from_text='ST_GeomFromEWKT', name='geometry'),
+            nullable=True,
+        ))
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION features_sync_geom_3857() RETURNS trigger AS $$
+        BEGIN
+            NEW.geom_3857 := ST_Transform(NEW.geom, 3857);
+            NEW.geom_3857_lowres := ST_SimplifyPreserveTopology(NEW.geom_3857, {LOWRES_TOLERANCE_METERS});
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_features_sync_geom_3857
+        BEFORE INSERT OR UPDATE OF geom ON features
+        FOR EACH ROW EXECUTE FUNCTION features_sync_geom_3857();
+    """)
+
+    # Build the index without blocking feature writes on large tables.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_features_geom_3857 "
+            "ON features USING gist (geom_3857)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_features_geom_3857")
+
+    op.execute("DROP TRIGGER IF EXISTS trg_features_sync_geom_3857 ON features")
+    op.execute("DROP FUNCTION IF EXISTS features_sync_geom_3857()")
+
+    with op.batch_alter_table('features', schema=None) as batch_op:
+        batch_op.drop_column('geom_3857_lowres')
+        batch_op.drop_column('geom_3857')
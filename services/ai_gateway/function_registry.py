@@ -183,12 +183,20 @@ class GeometricCorrectionArgs(BaseModel):
 
 class SupervisedClassificationArgs(BaseModel):
     raster_id: int = Field(..., description="Source raster index_id to classify.")
-    samples: list[dict[str, Any]] = Field(
-        ...,
+    samples: list[dict[str, Any]] | None = Field(
+        default=None,
         min_length=2,
         description=(
             "Training samples. Each item needs class_id/class_value/label plus either row+col, "
-            "x+y, lng+lat, or spectral features/values matching selected bands."
+            "x+y, lng+lat, or spectral features/values matching selected bands. "
+            "Omit when model_id is given."
+        ),
+    )
+    model_id: str | None = Field(
+        default=None,
+        description=(
+            "Apply a previously trained classifier (the model_id returned by an earlier supervised_classification) "
+            "instead of training. Use to classify many rasters with the same model."
         ),
     )
     classifier: Literal["nearest_centroid", "random_forest", "svm"] = Field(
@@ -202,6 +210,10 @@ class SupervisedClassificationArgs(BaseModel):
     n_estimators: int = Field(default=100, ge=1, le=1000, description="Random forest tree count.")
     random_seed: int = Field(default=13, description="Deterministic random seed.")
     smoothing: int = Field(default=0, ge=0, le=5, description="Optional median-filter smoothing radius in pixels.")
+    probability_output: bool = Field(
+        default=False,
+        description="Also save a per-class probability raster (one band per class) alongside the labels.",
+    )
     new_name: str = Field(..., description="Name for the generated classification raster.")
 
 
@@ -270,6 +282,10 @@ class DEMAnalysisArgs(BaseModel):
     hillshade_altitude: float = Field(default=45.0, gt=0, le=90, description="Hillshade light altitude in degrees.")
     relief_window_size: int = Field(default=3, ge=3, description="Neighborhood size for topographic relief.")
     min_slope_degrees: float = Field(default=0.1, gt=0, description="Minimum slope used to stabilize TWI.")
+    fill_depressions: bool = Field(
+        default=True,
+        description="Fill depressions (priority-flood) before routing TWI and flow products.",
+    )
 
 
 class RasterTransformAnalysisArgs(BaseModel):
@@ -957,6 +973,12 @@ def _get_raster_processor():
     return RasterProcessor
 
 
+def _get_expression_compiler():
+    from functions.implement.raster_calculator import compile_expression
+
+    return compile_expression
+
+
 def _get_raster_crud_class():
     from services.data_service.crud.raster_crud import RasterCRUD
 
@@ -1086,10 +1108,16 @@ async def _run_raster_calculator(
     vector_db: AsyncSession,
 ) -> dict[str, Any]:
     del vector_db
+    # Compiled expressions are cached by text, so repeated tool calls with the
+    # same expression skip parsing; unused mappings are dropped before I/O.
+    compiled = _get_expression_compiler()(args.expression)
+    missing = [name for name in compiled.variables if name not in args.var_mapping]
+    if missing:
+        raise ValueError(f"Expression variables have no raster in var_mapping: {', '.join(missing)}")
     db_ops = _get_data_service_ops()
     return await db_ops.process_calculator_task(
         db,
-        args.var_mapping,
+        {name: args.var_mapping[name] for name in compiled.variables},
         args.expression,
         args.new_name,
         "calc",
@@ -1234,6 +1262,8 @@ async def _run_supervised_classification(
         n_estimators=args.n_estimators,
         random_seed=args.random_seed,
         smoothing=args.smoothing,
+        probability_output=args.probability_output,
+        model_id=args.model_id,
     )
 
 
@@ -1299,6 +1329,7 @@ async def _run_dem_analysis(
         hillshade_altitude=args.hillshade_altitude,
         relief_window_size=args.relief_window_size,
         min_slope_degrees=args.min_slope_degrees,
+        fill_depressions=args.fill_depressions,
     )
 
 
@@ -1917,8 +1948,11 @@ async def _export_vector_layer_features(
     vector_db: AsyncSession,
 ) -> dict[str, Any]:
     del db
-    features = await _get_feature_crud_class()(vector_db).export_by_layer(args.layer_id)
+    feature_crud = _get_feature_crud_class()(vector_db)
+    features = await feature_crud.export_by_layer(args.layer_id, limit=args.max_features)
     result = _feature_collection_result(features, args.max_features)
+    total = await feature_crud.count_by_layer(args.layer_id)
+    result.update({"feature_count": total, "truncated": total > result["returned"]})
     result.update({"status": "success", "layer_id": str(args.layer_id)})
     return result
 
@@ -2361,7 +2395,8 @@ REGISTERED_FUNCTIONS: dict[str, RegisteredFunction] = {
             name="supervised_classification",
             description=(
                 "Run supervised raster classification from labeled training samples and save a uint16 class raster. "
-                "Use when the user provides or selects representative class samples."
+                "Use when the user provides or selects representative class samples, or pass model_id to reuse "
+                "a trained classifier on another raster."
             ),
             category="classification",
             arguments_model=SupervisedClassificationArgs,
@@ -1,17 +1,23 @@
 import json
-import uuid
 from uuid import UUID
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, Iterable, List, Optional, Dict, Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, delete, func, update
 from geoalchemy2.functions import ST_AsGeoJSON, ST_MakeEnvelope
 from shapely.geometry import shape
 from shapely.wkt import dumps
 
-from ..models.feature import Feature
+from ..models.feature import Feature, Layer
 from ..schemas.geojson import FeatureCreate, FeatureUpdate
+from ..utils.feature_export import EXPORT_FEATURES_SQL, FeatureStreamEncoder
+from ..utils.feature_ingest import (
+    FEATURE_COPY_COLUMNS,
+    FeatureBatch,
+    IngestProgress,
+    batches_from_schemas,
+    iter_encoded_batches,
+)
 
 
 class FeatureCRUD:
@@ -23,6 +29,20 @@ class FeatureCRUD:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    async def _bump_layer_version(self, *layer_ids: UUID) -> None:
+        """
+        Advance the layer edit version in the same transaction as the write,
+        which invalidates vtile_service's cached tiles and ETags for the layer.
+        """
+        ids = set(layer_ids)
+        if not ids:
+            return
+        await self.db.execute(
+            update(Layer)
+            .where(Layer.id.in_(ids))
+            .values(edit_version=Layer.edit_version + 1)
+        )
+
     async def create(self, layer_id: UUID, schema: FeatureCreate) -> Feature:
         """
         Create a single feature with spatial validation and SRID handling.
@@ -44,6 +64,7 @@ class FeatureCRUD:
         )
 
         self.db.add(db_feature)
+        await self._bump_layer_version(layer_id)
         await self.db.commit()
         await self.db.refresh(db_feature)
         return db_feature
@@ -125,6 +146,7 @@ class FeatureCRUD:
         if schema.category:
             db_feature.category = schema.category
 
+        await self._bump_layer_version(db_feature.layer_id)
         await self.db.commit()
         await self.db.refresh(db_feature)
         return db_feature
@@ -133,35 +155,66 @@ class FeatureCRUD:
         """
         Delete a feature from the database.
         """
-        query = delete(Feature).where(Feature.id == feature_id)
+        query = delete(Feature).where(Feature.id == feature_id).returning(Feature.layer_id)
         result = await self.db.execute(query)
+        layer_ids = result.scalars().all()
+        await self._bump_layer_version(*layer_ids)
         await self.db.commit()
-        return result.rowcount > 0
+        return len(layer_ids) > 0
 
     async def bulk_create(self, layer_id: UUID, schemas: List[FeatureCreate]) -> int:
         if not schemas:
             return 0
+        return await self.ingest(layer_id, batches_from_schemas(schemas))
 
-        data_to_insert = []
-        for s in schemas:
-            geom_obj = shape(s.geometry.model_dump())
-            if not geom_obj.is_valid:
-                continue
-            data_to_insert.append({
-                "id": uuid.uuid4(),
-                "layer_id": layer_id,
-                "geom": f"SRID=4326;{dumps(geom_obj)}",
-                "category": s.category or s.properties.get("category"),
-                "properties": s.properties,
-                "meta": {"source_srid": s.srid},
-            })
+    async def ingest(
+        self,
+        layer_id: UUID,
+        batches: Iterable[FeatureBatch],
+        *,
+        transformer=None,
+        progress: Optional[IngestProgress] = None,
+    ) -> int:
+        """
+        Stream feature batches into PostGIS with a single binary COPY.
+        Invalid geometries are skipped; the whole ingest is one transaction.
+        """
+        imported = 0
 
-        if not data_to_insert:
-            return 0
+        async def records():
+            nonlocal imported
+            async for batch_records, processed in iter_encoded_batches(layer_id, batches, transformer):
+                imported += len(batch_records)
+                if progress is not None:
+                    progress.advance(processed, len(batch_records))
+                for record in batch_records:
+                    yield record
 
-        await self.db.execute(insert(Feature).values(data_to_insert))
+        await self._copy_features(records())
+        if imported:
+            await self._bump_layer_version(layer_id)
         await self.db.commit()
-        return len(data_to_insert)
+        return imported
+
+    async def _copy_features(self, records) -> None:
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver = raw_connection.driver_connection
+        # COPY ... (FORMAT binary) takes geometry as EWKB through geometry_recv.
+        # The connection goes back to the pool, so the codec is scoped to this COPY.
+        await driver.set_type_codec(
+            "geometry", schema="public", encoder=bytes, decoder=bytes, format="binary"
+        )
+        try:
+            await driver.copy_records_to_table(
+                Feature.__tablename__, records=records, columns=list(FEATURE_COPY_COLUMNS)
+            )
+        finally:
+            await driver.reset_type_codec("geometry", schema="public")
+
+    async def count_by_layer(self, layer_id: UUID) -> int:
+        query = select(func.count()).select_from(Feature).where(Feature.layer_id == layer_id)
+        return int((await self.db.execute(query)).scalar_one())
 
     async def export_by_layer(
         self,
@@ -195,3 +248,27 @@ class FeatureCRUD:
                 "properties": {**row.properties, "category": row.category}
             })
         return features
+
+    async def stream_export(
+        self,
+        layer_id: UUID,
+        fmt: str = "geojson",
+        chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a layer as GeoJSON or NDJSON text chunks from a server-side
+        cursor, with PostGIS geometry JSON passed through verbatim.
+        """
+        encoder = FeatureStreamEncoder(fmt)
+        parts = [encoder.start()]
+        size = len(parts[0])
+        result = await self.db.stream(EXPORT_FEATURES_SQL, {"layer_id": layer_id})
+        async for row in result:
+            part = encoder.feature(row)
+            parts.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield "".join(parts)
+                parts, size = [], 0
+        parts.append(encoder.end())
+        yield "".join(parts)
@@ -1,6 +1,6 @@
 import uuid
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import declarative_base, deferred, relationship
 from geoalchemy2 import Geometry
 from sqlalchemy import (
     Column, String, DateTime, ForeignKey, func,
@@ -31,6 +31,9 @@ class Layer(Base):
     # text ID,BigInteger text ID (text Snowflake)
     source_raster_index_id = Column(BigInteger, nullable=True, index=True)
 
+    # bumped on every feature write; vtile_service keys its MVT cache and ETags on it
+    edit_version = Column(BigInteger, nullable=False, server_default=text("0"))
+
     project = relationship("Project", back_populates="layers")
     features = relationship("Feature", back_populates="layer", cascade="all, delete-orphan")
 
@@ -69,6 +72,18 @@ class Feature(Base):
         nullable=False
     )
 
+    # Web Mercator copies for vtile_service, maintained by the features_sync_geom_3857
+    # trigger (see migration c4d7e2a9b613); *_lowres is pre-simplified for zoom <= 10.
+    # Deferred so ORM loads of Feature do not fetch them.
+    geom_3857 = deferred(Column(
+        Geometry(geometry_type='GEOMETRY', srid=3857, spatial_index=False),
+        nullable=True
+    ))
+    geom_3857_lowres = deferred(Column(
+        Geometry(geometry_type='GEOMETRY', srid=3857, spatial_index=False),
+        nullable=True
+    ))
+
     category = Column(String(100), index=True)
 
     # 2. JSONB performance optimization:text PostgreSQL text JSONB text Gin than regular JSON much faster
@@ -82,6 +97,7 @@ class Feature(Base):
     # 3. explicit index definition
     __table_args__ = (
         Index('idx_features_geom', 'geom', postgresql_using='gist'),
+        Index('idx_features_geom_3857', 'geom_3857', postgresql_using='gist'),
         Index('idx_features_properties_gin', 'properties', postgresql_using='gin'),
         Index('idx_layer_category', 'layer_id', 'category'),
     )
@@ -1,13 +1,29 @@
+import tempfile
+
+import fiona
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Literal
 from fastapi import UploadFile, File
+from fastapi.responses import StreamingResponse
 from services.annotation_service.database import get_db
 from services.annotation_service.crud.feature_crud import FeatureCRUD
 from services.annotation_service.crud.layer_crud import LayerCRUD
 from services.annotation_service.crud.layer_field_crud import LayerFieldCRUD
-from services.annotation_service.utils.shapefile_importer import parse_shapefile_bytes
+from services.annotation_service.utils.feature_export import EXPORT_FORMATS
+from services.annotation_service.utils.feature_ingest import (
+    get_ingest_progress,
+    make_transformer,
+    start_ingest_progress,
+)
+from services.annotation_service.utils.shapefile_importer import (
+    iter_shapefile_batches,
+    shapefile_crs,
+    shapefile_fields,
+    stage_shapefile_upload,
+)
 from services.annotation_service.schemas.geojson import (
     FeatureCreate,
     FeatureUpdate,
@@ -94,8 +110,8 @@ async def delete_feature(feature_id: UUID, db: AsyncSession = Depends(get_db)):
 async def bulk_create_features(layer_id: UUID, features_in: List[FeatureCreate], db: AsyncSession = Depends(get_db)):
     crud = FeatureCRUD(db)
     try:
-        await crud.bulk_create(layer_id, features_in)
-        return {"message": f"Successfully ingested {len(features_in)} features"}
+        imported = await crud.bulk_create(layer_id, features_in)
+        return {"message": f"Successfully ingested {imported} features", "imported": imported}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Bulk ingestion failed: {str(e)}")
 
@@ -187,54 +203,91 @@ async def import_shapefile(
     files: List[UploadFile] = File(..., description="Upload .shp/.shx/.dbf (required) plus .prj/.cpg (recommended)"),
     db: AsyncSession = Depends(get_db)
 ):
-    file_bytes: dict[str, bytes] = {}
-    for f in files:
-        content = await f.read()
-        file_bytes[f.filename] = content
-    try:
-        feature_list, field_defs = parse_shapefile_bytes(file_bytes)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    with tempfile.TemporaryDirectory(prefix="shp_import_") as tmpdir:
+        try:
+            shp_path = await run_in_threadpool(
+                stage_shapefile_upload, {f.filename: f.file for f in files}, tmpdir
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    if not feature_list:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No valid features were found in the Shapefile")
-    field_crud = LayerFieldCRUD(db)
-    existing_fields = await field_crud.get_by_layer(layer_id)
-    existing_names = {f.field_name for f in existing_fields}
-
-    for fd in field_defs:
-        if fd["field_name"] not in existing_names:
-            await field_crud.create(
-                layer_id,
-                LayerFieldCreate(
-                    field_name=fd["field_name"],
-                    field_alias=fd["field_alias"],
-                    field_type=fd["field_type"],
-                    is_system=False,
+        with fiona.open(shp_path, encoding="utf-8") as src:
+            total = len(src)
+            if not total:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No valid features were found in the Shapefile")
+            try:
+                transformer = make_transformer(shapefile_crs(src))
+            except Exception as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported CRS: {e}")
+
+            field_defs = shapefile_fields(src)
+            field_crud = LayerFieldCRUD(db)
+            existing_fields = await field_crud.get_by_layer(layer_id)
+            existing_names = {f.field_name for f in existing_fields}
+
+            for fd in field_defs:
+                if fd["field_name"] not in existing_names:
+                    await field_crud.create(
+                        layer_id,
+                        LayerFieldCreate(
+                            field_name=fd["field_name"],
+                            field_alias=fd["field_alias"],
+                            field_type=fd["field_type"],
+                            is_system=False,
+                        )
+                    )
+
+            # Records are streamed batch by batch into one COPY; poll
+            # GET /layers/{layer_id}/import/progress while this runs.
+            progress = start_ingest_progress(layer_id, total)
+            try:
+                imported_count = await FeatureCRUD(db).ingest(
+                    layer_id,
+                    iter_shapefile_batches(src),
+                    transformer=transformer,
+                    progress=progress,
                 )
-            )
-    feature_crud = FeatureCRUD(db)
-    imported_count = await feature_crud.bulk_create(layer_id, feature_list)
+            except Exception as e:
+                progress.finish(e)
+                raise
+            progress.finish()
+
+    if not imported_count:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No valid features were found in the Shapefile")
     return {
         "imported": imported_count,
+        "skipped": progress.skipped,
         "fields_registered": len(field_defs),
         "layer_id": str(layer_id),
     }
 
 
+@router.get(
+    "/layers/{layer_id}/import/progress",
+    tags=["Import"],
+    summary="Progress of the latest feature import into a layer"
+)
+async def import_progress(layer_id: UUID):
+    progress = get_ingest_progress(layer_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No import has run for this layer")
+    return progress.to_dict()
+
+
 @router.get(
     "/layers/{layer_id}/features/export",
-    response_model=FeatureCollectionResponse,
+    response_class=StreamingResponse,
     tags=["Export"],
     summary="Export complete layer data for analysis"
 )
 async def export_features(
     layer_id: UUID,
+    format: Literal["geojson", "ndjson"] = Query("geojson", description="FeatureCollection or one feature per line"),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Complete-data endpoint for internal services such as the calculation engine.
+    Streams from a server-side cursor, so memory stays flat for any layer size.
     """
     crud = FeatureCRUD(db)
-    features = await crud.export_by_layer(layer_id)
-    return {"type": "FeatureCollection", "features": features}
+    return StreamingResponse(crud.stream_export(layer_id, format), media_type=EXPORT_FORMATS[format])
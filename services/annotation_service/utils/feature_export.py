@@ -0,0 +1,80 @@
+"""
+Streaming layer export shared by the annotation_service export route and the
+worker_cluster GeoJSON export task.
+
+Rows come from a server-side cursor (``yield_per``), and PostGIS renders
+both the geometry and the merged properties as JSON text. Each feature is
+therefore assembled by string concatenation with no parse/dump round trip,
+and only one cursor batch is held in memory whatever the layer size.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+EXPORT_YIELD_PER = 2000
+
+# media type per export format
+EXPORT_FORMATS = {
+    "geojson": "application/geo+json",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_FEATURES_SQL = text("""
+    SELECT
+        f.id::text AS id,
+        f.layer_id::text AS layer_id,
+        ST_AsGeoJSON(f.geom) AS geometry,
+        (f.properties || jsonb_build_object('category', f.category))::text AS properties
+    FROM features f
+    WHERE f.layer_id = :layer_id
+""").execution_options(yield_per=EXPORT_YIELD_PER)
+
+
+def feature_json(row) -> str:
+    """One GeoJSON Feature from an EXPORT_FEATURES_SQL row, geometry passed through verbatim."""
+    return (
+        '{"type":"Feature","id":' + json.dumps(row.id)
+        + ',"layer_id":' + json.dumps(row.layer_id)
+        + ',"geometry":' + (row.geometry or "null")
+        + ',"properties":' + (row.properties or "{}")
+        + "}"
+    )
+
+
+class FeatureStreamEncoder:
+    """
+    Incremental writer for a FeatureCollection (``geojson``) or one feature
+    per line (``ndjson``). Call ``start()``, ``feature(row)`` per row, then
+    ``end()``; each returns the text to emit.
+    """
+
+    def __init__(self, fmt: str = "geojson", metadata: Optional[Dict[str, Any]] = None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.fmt = fmt
+        self.metadata = metadata
+        self.count = 0
+
+    @property
+    def media_type(self) -> str:
+        return EXPORT_FORMATS[self.fmt]
+
+    def start(self) -> str:
+        return '{"type":"FeatureCollection","features":[' if self.fmt == "geojson" else ""
+
+    def feature(self, row) -> str:
+        body = feature_json(row)
+        self.count += 1
+        if self.fmt == "ndjson":
+            return body + "\n"
+        return body if self.count == 1 else "," + body
+
+    def end(self, **extra_metadata) -> str:
+        if self.fmt == "ndjson":
+            return ""
+        if self.metadata is None and not extra_metadata:
+            return "]}"
+        metadata = {**(self.metadata or {}), **extra_metadata}
+        return '],"metadata":' + json.dumps(metadata, default=str) + "}"
@@ -0,0 +1,185 @@
+"""
+Streaming feature ingest for annotation_service.
+
+Shapefile imports and ``/layers/{layer_id}/bulk`` both go through here:
+features arrive in ``FeatureBatch`` chunks, are validated, reprojected and
+encoded to EWKB with shapely 2 array functions, and are handed to
+``FeatureCRUD.ingest`` as COPY records. Only one batch is materialized at a
+time, so memory stays flat regardless of layer size.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+import pyproj
+import shapely
+from shapely.geometry import shape
+
+DEFAULT_BATCH_SIZE = int(os.getenv("ANNOTATION_INGEST_BATCH_SIZE", "5000"))
+
+# Column order of the records produced by encode_feature_batch.
+FEATURE_COPY_COLUMNS = ("id", "layer_id", "geom", "category", "properties", "meta")
+
+
+@dataclass
+class FeatureBatch:
+    geometries: List[Any]            # shapely geometries (None = missing)
+    properties: List[Dict[str, Any]]
+    categories: List[Optional[str]]
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.geometries)
+
+
+@dataclass
+class IngestProgress:
+    layer_id: str
+    total: Optional[int] = None
+    processed: int = 0
+    imported: int = 0
+    skipped: int = 0
+    status: str = "running"          # running / completed / failed
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def advance(self, processed: int, imported: int):
+        self.processed += processed
+        self.imported += imported
+        self.skipped += processed - imported
+        self.updated_at = time.time()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.status = "failed" if error else "completed"
+        self.error = str(error) if error else None
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_progress: Dict[str, IngestProgress] = {}
+_progress_lock = threading.Lock()
+
+
+def start_ingest_progress(layer_id: UUID, total: Optional[int] = None) -> IngestProgress:
+    progress = IngestProgress(layer_id=str(layer_id), total=total)
+    with _progress_lock:
+        _progress[str(layer_id)] = progress
+    return progress
+
+
+def get_ingest_progress(layer_id: UUID) -> Optional[IngestProgress]:
+    with _progress_lock:
+        return _progress.get(str(layer_id))
+
+
+def make_transformer(src_crs: Any) -> Optional[pyproj.Transformer]:
+    """Transformer from ``src_crs`` to EPSG:4326, or None when no reprojection is needed."""
+    if not src_crs:
+        return None
+    src = pyproj.CRS(src_crs)
+    dst = pyproj.CRS("EPSG:4326")
+    if src == dst:
+        return None
+    return pyproj.Transformer.from_crs(src, dst, always_xy=True)
+
+
+def encode_feature_batch(
+    layer_id: UUID,
+    batch: FeatureBatch,
+    transformer: Optional[pyproj.Transformer] = None,
+) -> Tuple[List[tuple], int]:
+    """
+    Reproject, validate and EWKB-encode one batch.
+
+    Returns ``(records, skipped)``; records follow FEATURE_COPY_COLUMNS and
+    missing, empty or invalid geometries are skipped.
+    """
+    geometries = np.empty(len(batch.geometries), dtype=object)
+    geometries[:] = batch.geometries
+    keep = ~shapely.is_missing(geometries)
+    keep[keep] = ~shapely.is_empty(geometries[keep])
+
+    if transformer is not None and keep.any():
+        def project(coords):
+            x, y = transformer.transform(coords[:, 0], coords[:, 1])
+            return np.column_stack((x, y))
+
+        geometries[keep] = shapely.transform(geometries[keep], project)
+
+    keep[keep] = shapely.is_valid(geometries[keep])
+    indices = np.flatnonzero(keep)
+    wkbs = shapely.to_wkb(
+        shapely.set_srid(geometries[indices], 4326),
+        output_dimension=2,
+        include_srid=True,
+    )
+
+    meta = json.dumps(batch.meta)
+    records = [
+        (
+            uuid.uuid4(),
+            layer_id,
+            wkb,
+            batch.categories[index],
+            json.dumps(batch.properties[index], ensure_ascii=False, default=str),
+            meta,
+        )
+        for index, wkb in zip(indices.tolist(), wkbs)
+    ]
+    return records, len(batch) - len(records)
+
+
+def batches_from_schemas(schemas: Iterable[Any], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[FeatureBatch]:
+    """Chunk ``FeatureCreate`` schemas into batches for ``FeatureCRUD.ingest``."""
+    batch = None
+    for schema in schemas:
+        if batch is not None and batch.meta["source_srid"] != schema.srid:
+            yield batch
+            batch = None
+        if batch is None:
+            batch = FeatureBatch([], [], [], meta={"source_srid": schema.srid})
+        batch.geometries.append(shape(schema.geometry.model_dump()))
+        batch.properties.append(schema.properties or {})
+        batch.categories.append(schema.category or (schema.properties or {}).get("category"))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = None
+    if batch is not None:
+        yield batch
+
+
+async def iter_encoded_batches(
+    layer_id: UUID,
+    batches: Iterable[FeatureBatch],
+    transformer: Optional[pyproj.Transformer] = None,
+) -> AsyncIterator[Tuple[List[tuple], int]]:
+    """
+    Yield ``(records, processed)`` per batch. Batches are pulled and encoded
+    on a worker thread so reading (e.g. Fiona) and the shapely work never
+    block the event loop.
+    """
+    iterator = iter(batches)
+
+    def next_encoded():
+        batch = next(iterator, None)
+        if batch is None:
+            return None
+        records, _ = encode_feature_batch(layer_id, batch, transformer)
+        return records, len(batch)
+
+    while True:
+        item = await asyncio.to_thread(next_encoded)
+        if item is None:
+            return
+        yield item
@@ -2,7 +2,9 @@ import io
 import zipfile
 import tempfile
 import os
-from typing import List, Dict, Any, Tuple
+import shutil
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Dict, Any, Tuple
 
 import fiona
 import fiona.transform
@@ -12,9 +14,11 @@ from shapely.ops import transform
 import pyproj
 
 from ..schemas.geojson import FeatureCreate, GeometryModel
+from .feature_ingest import DEFAULT_BATCH_SIZE, FeatureBatch
 
 
 SUPPORTED_GEOM_TYPES = {"Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon"}
+SHAPEFILE_EXTENSIONS = {".shp", ".shx", ".dbf", ".prj", ".cpg"}
 
 FIONA_TYPE_MAP: Dict[str, str] = {
     "str" : "string",
@@ -50,6 +54,76 @@ def _infer_field_type(fiona_type: str) -> str:
     return FIONA_TYPE_MAP.get(fiona_type.lower(), "string")
 
 
+def _json_safe_properties(props) -> Dict[str, Any]:
+    # text date text JSON convert to string
+    return {k: str(v) if v is not None and not isinstance(v, (int, float, bool, str)) else v
+            for k, v in dict(props or {}).items()}
+
+
+def stage_shapefile_upload(uploads: Dict[str, BinaryIO], tmpdir: str) -> str:
+    """
+    Copy uploaded file objects into ``tmpdir`` under one stem, chunk by chunk,
+    and return the .shp path. Nothing is read fully into memory.
+
+    exception:
+        ValueError: Missing required files
+    """
+    exts = {os.path.splitext(name)[1].lower() for name in uploads}
+    missing = {".shp", ".shx", ".dbf"} - exts
+    if missing:
+        raise ValueError(f"Missing required files: {', '.join(sorted(missing))}")
+
+    stem = "upload"
+    for name, fileobj in uploads.items():
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in SHAPEFILE_EXTENSIONS:
+            continue
+        with open(os.path.join(tmpdir, stem + ext), "wb") as dest:
+            shutil.copyfileobj(fileobj, dest, length=1024 * 1024)
+    return os.path.join(tmpdir, stem + ".shp")
+
+
+def shapefile_fields(src) -> List[Dict[str, Any]]:
+    """Field definitions of an open fiona collection."""
+    raw_schema = src.schema.get("properties", {})
+    return [
+        {
+            "field_name": fname,
+            "field_type": _infer_field_type(ftype),
+            "field_alias": fname,
+        }
+        for fname, ftype in raw_schema.items()
+    ]
+
+
+def iter_shapefile_batches(src, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[FeatureBatch]:
+    """
+    Read an open fiona collection in batches of shapely geometries in the
+    source CRS; reprojection and validation happen per batch in
+    ``encode_feature_batch``. Unsupported geometry types come through as
+    missing geometries and are counted as skipped.
+    """
+    records = iter(src)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            return
+        batch = FeatureBatch([], [], [], meta={"source_srid": 4326})
+        for record in chunk:
+            geom = record.get("geometry")
+            supported = geom is not None and geom.get("type", "") in SUPPORTED_GEOM_TYPES
+            props = _json_safe_properties(record.get("properties"))
+            batch.geometries.append(shape(geom) if supported else None)
+            batch.properties.append(props)
+            batch.categories.append(props.get("category", "default"))
+        yield batch
+
+
+def shapefile_crs(src):
+    """Source CRS of an open fiona collection (None when there is no .prj)."""
+    return (src.crs_wkt or None) if src.crs else None
+
+
 def parse_shapefile_bytes(
     files: Dict[str, bytes]
 ) -> Tuple[List[FeatureCreate], List[Dict[str, Any]]]:
@@ -87,15 +161,7 @@ def parse_shapefile_bytes(
             src_crs = src.crs_wkt or src.crs.get("init") if src.crs else None
 
             # parsefield definitions
-            raw_schema = src.schema.get("properties", {})
-            fields = [
-                {
-                    "field_name": fname,
-                    "field_type": _infer_field_type(ftype),
-                    "field_alias": fname,
-                }
-                for fname, ftype in raw_schema.items()
-            ]
+            fields = shapefile_fields(src)
 
             # parsefeatures
             features: List[FeatureCreate] = []
@@ -111,10 +177,7 @@ def parse_shapefile_bytes(
                 # reproject to 4326
                 geom_4326 = _reproject_geometry(geom_dict, src_crs)
 
-                props = dict(record.get("properties") or {})
-                # text date text JSON convert to string
-                props = {k: str(v) if v is not None and not isinstance(v, (int, float, bool, str)) else v
-                         for k, v in props.items()}
+                props = _json_safe_properties(record.get("properties"))
 
                 fc = FeatureCreate(
                     geometry=GeometryModel(**geom_4326),
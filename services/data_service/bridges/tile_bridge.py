@@ -0,0 +1,46 @@
+"""Bridge from data_service to the tile service cache admin endpoint."""
+
+import logging
+import os
+from collections.abc import Iterable
+
+import httpx
+
+logger = logging.getLogger("data_service.tile_bridge")
+
+TILE_SERVICE_URL = os.getenv("TILE_SERVICE_URL", "http://localhost:8005").rstrip("/")
+TILE_INVALIDATE_TIMEOUT = float(os.getenv("RS_TILE_INVALIDATE_TIMEOUT", "5.0"))
+
+
+def raster_tile_keys(raster_id: int | None, index_id: int | None) -> list[str]:
+    """Tile URLs may address a raster by primary key or by index_id."""
+    keys = []
+    for value in (index_id, raster_id):
+        if value is not None and str(value) not in keys:
+            keys.append(str(value))
+    return keys
+
+
+async def invalidate_raster_tiles(
+    tile_keys: Iterable[str],
+    file_version: str | None = None,
+) -> int:
+    """
+    Ask the tile service to evict cached tiles for the given raster keys.
+
+    Best effort: a tile service that is down must not fail a delete or an
+    update, and stale tiles still age out through LRU eviction.
+    """
+    params = {"file_version": file_version} if file_version else None
+    removed = 0
+    async with httpx.AsyncClient(timeout=TILE_INVALIDATE_TIMEOUT) as client:
+        for key in tile_keys:
+            url = f"{TILE_SERVICE_URL}/tile/cache/{key}"
+            try:
+                response = await client.delete(url, params=params)
+                response.raise_for_status()
+                data = response.json()
+                removed += int(data.get("l1_removed", 0)) + int(data.get("l2_removed", 0))
+            except Exception as e:
+                logger.warning("Tile cache invalidation failed for %s: %s", key, e)
+    return removed
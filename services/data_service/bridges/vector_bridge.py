@@ -1,4 +1,5 @@
 import httpx
+import json
 import logging
 import os
 from typing import List, Dict, Any
@@ -84,29 +85,23 @@ async def internal_bulk_create_features(
 
 
 async def internal_fetch_features(layer_id: UUID) -> List[Dict[str, Any]]:
+    """
+    All features of a layer as a list, decoded from the NDJSON export one
+    line at a time rather than parsing the whole body as one JSON document.
+    """
     url = f"{ANNOTATION_SERVICE_URL}/layers/{layer_id}/features/export"
+    features: List[Dict[str, Any]] = []
     async with httpx.AsyncClient(timeout=120.0) as client:
         try:
-            response = await client.get(url)
-
-            if response.status_code == 404:
-                raise HTTPException(status_code=404, detail=f"Layer {layer_id} does not exist")
-
-            response.raise_for_status()
-            data = response.json()
-
-            # force normalized output:ensure it always returns List[Dict]
-            if isinstance(data, dict):
-                if data.get("type") == "FeatureCollection":
-                    return data.get("features", [])
-                # if the backend returned a single feature
-                if data.get("type") == "Feature":
-                    return [data]
+            async with client.stream("GET", url, params={"format": "ndjson"}) as response:
+                if response.status_code == 404:
+                    raise HTTPException(status_code=404, detail=f"Layer {layer_id} does not exist")
 
-            if isinstance(data, list):
-                return data
-
-            return []  # fallback to an empty list
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        features.append(json.loads(line))
+            return features
 
         except httpx.ReadTimeout:
             logger.error(f"Fetching vector data timed out: {url}")
@@ -16,6 +16,7 @@ UPLOAD_DIR = os.path.join(BASE_DIR, "storage", "raw")
 COG_DIR = os.path.join(BASE_DIR, "storage", "cog")
 
 RASTER_PRODUCT_TASK = "worker_cluster.tasks.algorithm.raster_product"
+SEED_TILES_TASK = "worker_cluster.tasks.preprocess.seed_tiles"
 WORKER_PING_TIMEOUT = float(os.getenv("RS_CLUSTER_PING_TIMEOUT", "1.0"))
 
 
@@ -33,6 +34,11 @@ def cluster_fallback_enabled() -> bool:
     return value not in {"0", "false", "no", "off"}
 
 
+def tile_seed_enabled() -> bool:
+    value = os.getenv("RS_TILE_SEED_ENABLED", "1").strip().lower()
+    return value not in {"0", "false", "no", "off"}
+
+
 def require_live_worker() -> bool:
     value = os.getenv("RS_CLUSTER_REQUIRE_WORKER", "1").strip().lower()
     return value not in {"0", "false", "no", "off"}
@@ -167,6 +173,53 @@ def submit_raster_product_job(
     }
 
 
+def submit_tile_seed_job(
+    *,
+    index_id: int | str,
+    cog_path: str,
+    bounds_wgs84: list[float] | None = None,
+    queue: str = "preprocess",
+) -> dict[str, Any]:
+    """Submit tile pre-seeding for a new COG to the compute cluster."""
+
+    try:
+        from worker_cluster.app import celery_app
+        from worker_cluster.producer import submit_task
+
+        if require_live_worker() and not _queue_has_live_worker(celery_app, queue, SEED_TILES_TASK):
+            raise ClusterDispatchError(
+                f"No ready Celery worker is consuming '{queue}' with task '{SEED_TILES_TASK}'."
+            )
+
+        submission = submit_task(
+            SEED_TILES_TASK,
+            task_type="seed_tiles",
+            kwargs={
+                "index_id": index_id,
+                "file_path": cog_path,
+                "bounds_wgs84": bounds_wgs84,
+            },
+            queue=queue,
+            raster_index_id=index_id,
+            create_job_record=True,
+        )
+    except ClusterDispatchError:
+        raise
+    except Exception as exc:
+        logger.warning("Cluster dispatch failed for tile seeding: %s", exc)
+        raise ClusterDispatchError(str(exc)) from exc
+
+    return {
+        "status": "accepted",
+        "execution": "cluster",
+        "operation": "seed_tiles",
+        "job_id": submission.get("job_id"),
+        "task_id": submission["task_id"],
+        "queue": submission.get("queue") or queue,
+        "status_url": f"/tasks/{submission['task_id']}/status",
+    }
+
+
 def get_cluster_task_status(task_id: str) -> dict[str, Any] | None:
     redis_status = None
     try:
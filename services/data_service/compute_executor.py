@@ -0,0 +1,282 @@
+"""
+Managed compute executor for CPU-heavy raster work in data_service.
+
+``process_*_task`` handlers run inside the FastAPI event loop. When the Celery
+cluster is disabled they used to call GDAL/numpy code directly, so one long
+NDVI or COG conversion blocked every other request on the worker. Jobs are now
+dispatched to a bounded process pool:
+
+* ``RS_COMPUTE_WORKERS`` sizes the pool (``0`` runs jobs on a thread pool
+  instead, still off the event loop);
+* every operation has its own concurrency limit (``RS_COMPUTE_OPERATION_LIMIT``
+  with per-operation overrides in ``RS_COMPUTE_OPERATION_LIMITS``, e.g.
+  ``calc=1,time_series=1``), so one heavy operation cannot take every slot;
+* queue depth, running jobs and outcomes are tracked per operation and
+  reported by ``metrics()``;
+* while a job waits or runs, the originating HTTP request is polled and the
+  job is cancelled if the client disconnects. Queued jobs never start; a job
+  already running in a worker process cannot be interrupted, so its result is
+  discarded and its output files are removed when it finishes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Callable
+
+from fastapi import Request
+
+
+logger = logging.getLogger("data_service.compute")
+
+current_request: ContextVar[Request | None] = ContextVar("compute_request", default=None)
+
+
+class ComputeCancelled(RuntimeError):
+    """Raised when a compute job is abandoned because its client disconnected."""
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r", name, value)
+        return default
+
+
+def default_compute_workers() -> int:
+    return max(0, _env_int("RS_COMPUTE_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def parse_operation_limits(value: str | None) -> dict[str, int]:
+    limits = {}
+    for item in (value or "").split(","):
+        name, sep, limit = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            limits[name.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning("Ignoring invalid compute operation limit %r", item)
+    return limits
+
+
+def _remove_paths(paths) -> None:
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError as exc:
+            logger.warning("Could not remove abandoned output %s: %s", path, exc)
+
+
+@dataclass
+class OperationStats:
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    busy_seconds: float = 0.0
+
+
+class ComputeExecutor:
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        *,
+        operation_limits: dict[str, int] | None = None,
+        default_operation_limit: int | None = None,
+        start_method: str | None = None,
+        disconnect_poll_seconds: float | None = None,
+    ):
+        self.max_workers = default_compute_workers() if max_workers is None else max(0, max_workers)
+        self.default_operation_limit = max(
+            1,
+            default_operation_limit
+            or _env_int("RS_COMPUTE_OPERATION_LIMIT", 0)
+            or self.max_workers
+            or 1,
+        )
+        self.operation_limits = (
+            parse_operation_limits(os.getenv("RS_COMPUTE_OPERATION_LIMITS"))
+            if operation_limits is None
+            else dict(operation_limits)
+        )
+        self.start_method = start_method or os.getenv("RS_COMPUTE_START_METHOD", "spawn")
+        self.disconnect_poll_seconds = max(
+            0.05,
+            disconnect_poll_seconds
+            if disconnect_poll_seconds is not None
+            else float(os.getenv("RS_COMPUTE_DISCONNECT_POLL_SECONDS", "0.5")),
+        )
+        self._pool: Executor | None = None
+        self._lock = threading.Lock()
+        self._stats: dict[str, OperationStats] = {}
+        # asyncio semaphores are bound to one event loop.
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def limit_for(self, operation: str) -> int:
+        return self.operation_limits.get(operation, self.default_operation_limit)
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.max_workers:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(thread_name_prefix="compute")
+            return self._pool
+
+    def _semaphore(self, operation: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        per_loop = self._semaphores.setdefault(loop, {})
+        if operation not in per_loop:
+            per_loop[operation] = asyncio.Semaphore(self.limit_for(operation))
+        return per_loop[operation]
+
+    def _record(self, operation: str, **deltas):
+        with self._lock:
+            stats = self._stats.setdefault(operation, OperationStats())
+            for name, delta in deltas.items():
+                setattr(stats, name, getattr(stats, name) + delta)
+
+    async def run(
+        self,
+        operation: str,
+        func: Callable[..., Any],
+        /,
+        *args: Any,
+        cleanup_paths: tuple[str, ...] = (),
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run ``func(*args, **kwargs)`` in the pool and return its result.
+
+        ``func`` and its arguments must be picklable. ``cleanup_paths`` are
+        deleted if the job is cancelled by a client disconnect.
+        """
+        request = current_request.get()
+        job = asyncio.ensure_future(self._execute(operation, partial(func, *args, **kwargs), cleanup_paths))
+        if request is None:
+            return await job
+
+        while True:
+            done, _ = await asyncio.wait({job}, timeout=self.disconnect_poll_seconds)
+            if done:
+                return job.result()
+            if await request.is_disconnected():
+                job.cancel()
+                try:
+                    await job
+                except asyncio.CancelledError:
+                    pass
+                logger.info("Cancelled %s job after client disconnect", operation)
+                raise ComputeCancelled(f"{operation} cancelled: client disconnected")
+
+    async def _execute(self, operation: str, call: Callable[[], Any], cleanup_paths) -> Any:
+        loop = asyncio.get_running_loop()
+        self._record(operation, queued=1)
+        try:
+            await self._semaphore(operation).acquire()
+        except asyncio.CancelledError:
+            self._record(operation, queued=-1, cancelled=1)
+            raise
+        self._record(operation, queued=-1, running=1)
+
+        semaphore = self._semaphore(operation)
+        started = time.perf_counter()
+
+        def finish(outcome: str):
+            self._record(operation, running=-1, busy_seconds=time.perf_counter() - started, **{outcome: 1})
+            semaphore.release()
+
+        try:
+            job = self._get_pool().submit(call)
+        except Exception:
+            finish("failed")
+            raise
+        try:
+            result = await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            if job.cancel():
+                finish("cancelled")
+            else:
+                # A job already running in a worker cannot be interrupted. It
+                # keeps its slot until it finishes and its outputs are dropped.
+                def abandoned(_):
+                    _remove_paths(cleanup_paths)
+                    try:
+                        loop.call_soon_threadsafe(finish, "cancelled")
+                    except RuntimeError:
+                        pass  # event loop already closed
+
+                job.add_done_callback(abandoned)
+            raise
+        except Exception:
+            finish("failed")
+            raise
+        finish("completed")
+        return result
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            operations = {
+                name: {**asdict(stats), "limit": self.limit_for(name)}
+                for name, stats in self._stats.items()
+            }
+        return {
+            "backend": "process" if self.max_workers else "thread",
+            "max_workers": self.max_workers,
+            "default_operation_limit": self.default_operation_limit,
+            "queued": sum(item["queued"] for item in operations.values()),
+            "running": sum(item["running"] for item in operations.values()),
+            "operations": operations,
+        }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor: ComputeExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_compute_executor() -> ComputeExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ComputeExecutor()
+        return _executor
+
+
+def shutdown_compute_executor(wait: bool = True):
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def bind_compute_request(request: Request):
+    """Router dependency that lets compute jobs watch for client disconnects."""
+    current_request.set(request)
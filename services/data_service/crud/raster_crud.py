@@ -4,10 +4,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
 from typing import List, Optional
+from services.data_service.bridges.tile_bridge import invalidate_raster_tiles, raster_tile_keys
 from services.data_service.models import RasterMetadata
 
 logger = logging.getLogger("data_service.crud")
 
+# Files written next to a raster by other services (tile stretch stats).
+_RASTER_SIDECAR_SUFFIXES = (".rsstats.json",)
+
 
 class RasterCRUD:
 
@@ -82,18 +86,27 @@ class RasterCRUD:
         raster = result.scalar_one_or_none()
         if not raster:
             return False
+        tile_keys = raster_tile_keys(raster.id, raster.index_id)
         RasterCRUD._delete_physical_files(raster)
         await db.delete(raster)
         await db.commit()
+        await invalidate_raster_tiles(tile_keys)
         return True
 
     @staticmethod
     async def clear_all_rasters(db: AsyncSession) -> bool:
         """clear the database and delete all files"""
-        stmt = select(RasterMetadata.file_path, RasterMetadata.cog_path)
+        stmt = select(
+            RasterMetadata.file_path,
+            RasterMetadata.cog_path,
+            RasterMetadata.id,
+            RasterMetadata.index_id,
+        )
         result = await db.execute(stmt)
         rows = result.all()
-        for file_path, cog_path in rows:
+        tile_keys = []
+        for file_path, cog_path, raster_id, index_id in rows:
+            tile_keys.extend(raster_tile_keys(raster_id, index_id))
             RasterCRUD._delete_file(file_path)
             if cog_path:
                 cog_filename = os.path.basename(cog_path)
@@ -102,6 +115,7 @@ class RasterCRUD:
                 RasterCRUD._delete_file(full_cog_path)
         await db.execute(delete(RasterMetadata))
         await db.commit()
+        await invalidate_raster_tiles(tile_keys)
         logger.info("Database and physical files cleared.")
         return True
 
@@ -117,6 +131,11 @@ class RasterCRUD:
             pass
         except Exception as e:
             logger.error(f"Failed to delete file {path}: {e}")
+        for suffix in _RASTER_SIDECAR_SUFFIXES:
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
 
     @staticmethod
     def _delete_physical_files(raster: RasterMetadata):
@@ -141,6 +160,12 @@ class RasterCRUD:
         if not raster:
             return None
 
+        replaces_file = any(
+            key in update_dict and update_dict[key] != getattr(raster, key)
+            for key in ("file_path", "cog_path")
+        )
+        tile_keys = raster_tile_keys(raster.id, raster.index_id)
+
         # only update update_dict fields present in,prevent accidentally clearing other fields
         for key, value in update_dict.items():
             if hasattr(raster, key):
@@ -148,4 +173,6 @@ class RasterCRUD:
 
         await db.commit()
         await db.refresh(raster)
+        if replaces_file:
+            await invalidate_raster_tiles(tile_keys)
         return raster
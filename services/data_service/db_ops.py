@@ -11,11 +11,13 @@ from sqlalchemy.future import select
 from rasterio.warp import transform_bounds
 from pyproj import CRS
 from functions.common.snowflake_utils import get_next_index_id
+from functions.implement.raster_calculator import compile_expression
 import services.data_service.models as models
 from services.data_service.processor import RasterProcessor
 from services.data_service.crud.raster_crud import RasterCRUD
 from services.data_service.crud.raster_field_crud import RasterFieldCRUD
 from services.data_service.bridges import worker_bridge
+from services.data_service.compute_executor import ComputeCancelled, get_compute_executor
 
 logger = logging.getLogger("data_service.db_ops")
 
@@ -74,11 +76,63 @@ async def _ensure_temporal_metadata(
         await db.flush()
 
 
-def run_conversion(input_path: str, output_path: str):
+def run_conversion(
+    input_path: str,
+    output_path: str,
+    index_id: int | None = None,
+    bounds_wgs84: list[float] | None = None,
+):
     try:
         RasterProcessor.convert_to_cog(input_path, output_path)
     except Exception as e:
         logger.error(f"COG conversion failed: {str(e)}")
+        return
+
+    if index_id is not None:
+        schedule_tile_seed(index_id, output_path, bounds_wgs84)
+
+
+def schedule_tile_seed(
+    index_id: int | str,
+    cog_path: str,
+    bounds_wgs84: list[float] | None = None,
+) -> dict | None:
+    """
+    Warm the tile-service cache for a freshly written COG.
+
+    Dispatches to the compute cluster when it is enabled and falls back to
+    seeding inline in the calling (background) thread. Seeding is best effort:
+    failures are logged and never surface to the request that wrote the COG.
+    """
+    if not worker_bridge.tile_seed_enabled():
+        return None
+
+    if worker_bridge.cluster_enabled():
+        try:
+            return worker_bridge.submit_tile_seed_job(
+                index_id=index_id,
+                cog_path=cog_path,
+                bounds_wgs84=bounds_wgs84,
+            )
+        except worker_bridge.ClusterDispatchError as exc:
+            if not worker_bridge.cluster_fallback_enabled():
+                logger.warning(f"Tile seeding skipped for {index_id}: {exc}")
+                return None
+            logger.warning(
+                "Falling back to inline tile seeding for %s after cluster dispatch failed: %s",
+                index_id,
+                exc,
+            )
+
+    try:
+        from services.tile_service.seeding import seed_raster_tiles
+
+        result = seed_raster_tiles(index_id, cog_path, bounds_wgs84)
+        result["execution"] = "inline"
+        return result
+    except Exception as e:
+        logger.error(f"Tile seeding failed for {index_id}: {str(e)}")
+        return None
 
 
 async def save_to_db(
@@ -147,7 +201,50 @@ async def save_to_db(
     new_record = await RasterCRUD.create_raster(db, db_data)
     await db.commit()
     await RasterFieldCRUD(db).ingest_from_metadata(new_record.index_id, db_data)
-    return {"status": "success", "id": new_record.id, "cog_url": db_data["cog_path"]}
+    return {
+        "status": "success",
+        "id": new_record.id,
+        "index_id": new_record.index_id,
+        "cog_url": db_data["cog_path"],
+    }
+
+
+def _produce_raster(func: Callable, args: tuple, kwargs: dict, tmp_path: str, cog_path: str):
+    """Compute-pool body of an inline product: run ``func``, write the COG, count bands."""
+    result = func(*args, **kwargs)
+    RasterProcessor.convert_to_cog(tmp_path, cog_path)
+    with rasterio.open(tmp_path) as src:
+        return result, src.count
+
+
+async def _run_raster_job(
+    operation: str,
+    func: Callable,
+    /,
+    *args,
+    tmp_path: str,
+    cog_path: str,
+    extra_cleanup_paths: tuple[str, ...] = (),
+    **kwargs,
+) -> tuple[Any, int]:
+    """
+    Produce ``tmp_path`` and its COG on the compute executor so the event loop
+    stays free. Returns ``(func result, band count)``. ``extra_cleanup_paths``
+    are side outputs of ``func`` removed along with the raster on cancellation.
+    """
+    try:
+        return await get_compute_executor().run(
+            operation,
+            _produce_raster,
+            func,
+            args,
+            kwargs,
+            tmp_path,
+            cog_path,
+            cleanup_paths=(tmp_path, cog_path, *extra_cleanup_paths),
+        )
+    except ComputeCancelled as exc:
+        raise HTTPException(status_code=499, detail=str(exc)) from exc
 
 
 async def _get_band_paths(db: AsyncSession, band_ids: List[int]) -> List[str]:
@@ -227,8 +324,9 @@ async def process_index_task(db: AsyncSession, band_ids: list, new_name: str, pr
         tmp_path = os.path.join(UPLOAD_DIR, f"{task_id}_{prefix}_raw.tif")
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
-        processor_func(*paths, tmp_path)
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
+        await _run_raster_job(
+            prefix, processor_func, *paths, tmp_path, tmp_path=tmp_path, cog_path=cog_path
+        )
         return await save_to_db(db, task_id, new_name, tmp_path, cog_filename, cog_path, prefix)
 
     except Exception as e:
@@ -263,8 +361,9 @@ async def process_extraction_task(db: AsyncSession, band_ids: List[int], new_nam
         tmp_path = os.path.join(UPLOAD_DIR, f"{task_id}_{prefix}_raw.tif")
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
-        processor_func(paths, tmp_path, **kwargs)
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
+        await _run_raster_job(
+            prefix, processor_func, paths, tmp_path, tmp_path=tmp_path, cog_path=cog_path, **kwargs
+        )
         return await save_to_db(db, task_id, new_name, tmp_path, cog_filename, cog_path, prefix)
 
     except Exception as e:
@@ -283,13 +382,23 @@ async def process_calculator_task(
     prefix: str
 ):
     try:
-        raster_ids = list(var_mapping.values())
+        # Parse (cached per expression) before touching the database so only
+        # the rasters the expression actually references are resolved.
+        try:
+            compiled = compile_expression(expression)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        missing = [name for name in compiled.variables if name not in var_mapping]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Variable in expression '{missing[0]}' does not have a matching raster",
+            )
+        used_mapping = {name: var_mapping[name] for name in compiled.variables}
+        raster_ids = list(used_mapping.values())
         paths = await _get_band_paths(db, raster_ids)
 
-        path_mapping = {
-            var_name: paths[index]
-            for index, (var_name, _) in enumerate(var_mapping.items())
-        }
+        path_mapping = dict(zip(used_mapping, paths))
 
         cluster_result = _submit_cluster_job_or_none(
             operation="calculator",
@@ -307,11 +416,15 @@ async def process_calculator_task(
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        RasterProcessor.run_raster_calculator(path_mapping, expression, tmp_path)
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
+        _, actual_bands = await _run_raster_job(
+            prefix,
+            RasterProcessor.run_raster_calculator,
+            path_mapping,
+            expression,
+            tmp_path,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
+        )
 
         return await save_to_db(
             db, task_id, new_name, tmp_path,
@@ -371,7 +484,11 @@ async def process_resampling_task(
         cog_filename = f"{task_id}_resampled.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        RasterProcessor.resample_raster(
+        _, actual_bands = await _run_raster_job(
+            "resample",
+            RasterProcessor.resample_raster,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             target_resolution_x=target_resolution_x,
@@ -379,10 +496,6 @@ async def process_resampling_task(
             resolution_unit=resolution_unit,
             resampling_method=resampling_method,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
 
         return await save_to_db(
             db,
@@ -456,7 +569,11 @@ async def process_atmospheric_correction_task(
         cog_filename = f"{task_id}_atmospheric.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        correction_meta = RasterProcessor.atmospheric_correction(
+        correction_meta, actual_bands = await _run_raster_job(
+            "atmospheric",
+            RasterProcessor.atmospheric_correction,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             method=method,
@@ -467,10 +584,6 @@ async def process_atmospheric_correction_task(
             bright_percentile=bright_percentile,
             clamp=clamp,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
 
         result = await save_to_db(
             db,
@@ -522,7 +635,11 @@ async def process_radiometric_calibration_task(
         cog_filename = f"{task_id}_radiometric.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        calibration_meta = RasterProcessor.radiometric_calibration(
+        calibration_meta, actual_bands = await _run_raster_job(
+            "radiometric",
+            RasterProcessor.radiometric_calibration,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             calibration_type=calibration_type,
@@ -538,10 +655,6 @@ async def process_radiometric_calibration_task(
             sun_elevation_correction=sun_elevation_correction,
             clamp=clamp,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
 
         result = await save_to_db(
             db,
@@ -590,7 +703,11 @@ async def process_geometric_correction_task(
         cog_filename = f"{task_id}_geometric.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        correction_meta = RasterProcessor.geometric_correction(
+        correction_meta, actual_bands = await _run_raster_job(
+            "geometric",
+            RasterProcessor.geometric_correction,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             dst_crs=dst_crs,
@@ -604,10 +721,6 @@ async def process_geometric_correction_task(
             rotation_degrees=rotation_degrees,
             gcps=gcps,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
 
         result = await save_to_db(
             db,
@@ -642,6 +755,7 @@ async def process_dem_analysis_task(
     hillshade_altitude: float = 45.0,
     relief_window_size: int = 3,
     min_slope_degrees: float = 0.1,
+    fill_depressions: bool = True,
 ):
     try:
         raster_record = await _get_raster_record_or_404(db, raster_id)
@@ -655,7 +769,11 @@ async def process_dem_analysis_task(
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        dem_meta = RasterProcessor.dem_analysis(
+        dem_meta, _ = await _run_raster_job(
+            "dem_analysis",
+            RasterProcessor.dem_analysis,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             operation=operation,
@@ -666,8 +784,8 @@ async def process_dem_analysis_task(
             hillshade_altitude=hillshade_altitude,
             relief_window_size=relief_window_size,
             min_slope_degrees=min_slope_degrees,
+            fill_depressions=fill_depressions,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
 
         result = await save_to_db(
             db,
@@ -714,7 +832,11 @@ async def process_raster_transform_task(
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        transform_meta = RasterProcessor.raster_transform_analysis(
+        transform_meta, actual_bands = await _run_raster_job(
+            "raster_transform",
+            RasterProcessor.raster_transform_analysis,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             transform_type=transform_type,
@@ -725,10 +847,6 @@ async def process_raster_transform_task(
             pca_components=pca_components,
             pca_standardize=pca_standardize,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
 
         result = await save_to_db(
             db,
@@ -781,7 +899,11 @@ async def process_texture_feature_task(
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        texture_meta = RasterProcessor.texture_feature_analysis(
+        texture_meta, _ = await _run_raster_job(
+            "texture_feature",
+            RasterProcessor.texture_feature_analysis,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             texture_type=texture_type,
@@ -798,7 +920,6 @@ async def process_texture_feature_task(
             lbp_radius=lbp_radius,
             lbp_points=lbp_points,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
 
         result = await save_to_db(
             db,
@@ -886,7 +1007,11 @@ async def process_time_series_task(
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        time_series_meta = RasterProcessor.time_series_analysis(
+        time_series_meta, actual_bands = await _run_raster_job(
+            "time_series",
+            RasterProcessor.time_series_analysis,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_paths=input_paths,
             output_path=tmp_path,
             operation=operation,
@@ -907,10 +1032,6 @@ async def process_time_series_task(
                 f"{low_confidence_count} raster date(s) came from "
                 "low-confidence automatic filename inference."
             )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
-
-        with rasterio.open(tmp_path) as src:
-            actual_bands = src.count
 
         result = await save_to_db(
             db,
@@ -940,13 +1061,15 @@ async def process_time_series_task(
 async def process_supervised_classification_task(
     db: AsyncSession,
     raster_id: int,
-    samples: list[dict[str, Any]],
+    samples: list[dict[str, Any]] | None,
     classifier: str,
     new_name: str,
     band_indices: list[int] | None = None,
     n_estimators: int = 100,
     random_seed: int = 13,
     smoothing: int = 0,
+    probability_output: bool = False,
+    model_id: str | None = None,
 ):
     try:
         raster_record = await _get_raster_record_or_404(db, raster_id)
@@ -958,8 +1081,16 @@ async def process_supervised_classification_task(
         tmp_path = os.path.join(UPLOAD_DIR, f"{task_id}_supervised_classification_raw.tif")
         cog_filename = f"{task_id}_supervised_classification.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
+        probability_tmp_path = None
+        if probability_output:
+            probability_tmp_path = os.path.join(UPLOAD_DIR, f"{task_id}_supervised_probability_raw.tif")
 
-        classification_meta = RasterProcessor.supervised_classification(
+        classification_meta, _ = await _run_raster_job(
+            "supervised_classification",
+            RasterProcessor.supervised_classification,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
+            extra_cleanup_paths=(probability_tmp_path,) if probability_tmp_path else (),
             input_path=input_path,
             output_path=tmp_path,
             samples=samples,
@@ -968,8 +1099,9 @@ async def process_supervised_classification_task(
             n_estimators=n_estimators,
             random_seed=random_seed,
             smoothing=smoothing,
+            probability_output_path=probability_tmp_path,
+            model_id=model_id,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
 
         result = await save_to_db(
             db,
@@ -983,6 +1115,31 @@ async def process_supervised_classification_task(
             metadata_source=tmp_path,
         )
         result["classification"] = classification_meta
+        if probability_tmp_path:
+            probability_filename = f"{task_id}_supervised_probability.tif"
+            probability_cog_path = os.path.join(COG_DIR, probability_filename)
+            try:
+                await get_compute_executor().run(
+                    "supervised_classification_probability",
+                    RasterProcessor.convert_to_cog,
+                    probability_tmp_path,
+                    probability_cog_path,
+                    cleanup_paths=(probability_tmp_path, probability_cog_path),
+                )
+            except ComputeCancelled as exc:
+                raise HTTPException(status_code=499, detail=str(exc)) from exc
+            result["probability"] = await save_to_db(
+                db,
+                task_id,
+                f"{new_name}_probability",
+                probability_tmp_path,
+                probability_filename,
+                probability_cog_path,
+                "supervised_classification",
+                bands_count=len(classification_meta.get("probability_classes", [])),
+                metadata_source=probability_tmp_path,
+                bundle_id=f"supervised_classification_{task_id[:8]}",
+            )
         return result
     except Exception as e:
         logger.error(f"supervised classification task failed: {str(e)}")
@@ -1014,7 +1171,11 @@ async def process_unsupervised_classification_task(
         cog_filename = f"{task_id}_unsupervised_classification.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        classification_meta = RasterProcessor.unsupervised_classification(
+        classification_meta, _ = await _run_raster_job(
+            "unsupervised_classification",
+            RasterProcessor.unsupervised_classification,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             n_classes=n_classes,
@@ -1024,7 +1185,6 @@ async def process_unsupervised_classification_task(
             random_seed=random_seed,
             smoothing=smoothing,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
 
         result = await save_to_db(
             db,
@@ -1072,7 +1232,11 @@ async def process_deep_learning_segmentation_task(
         cog_filename = f"{task_id}_deep_segmentation.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        segmentation_meta = RasterProcessor.deep_learning_segmentation(
+        segmentation_meta, _ = await _run_raster_job(
+            "deep_segmentation",
+            RasterProcessor.deep_learning_segmentation,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
             input_path=input_path,
             output_path=tmp_path,
             model_path=model_path,
@@ -1085,7 +1249,6 @@ async def process_deep_learning_segmentation_task(
             compactness=compactness,
             smoothing=smoothing,
         )
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
 
         result = await save_to_db(
             db,
@@ -1176,14 +1339,19 @@ async def process_raster_to_vector_task(
         if not raster_path:
             raise HTTPException(status_code=404, detail="Raster file not found")
 
-        features = RasterProcessor.run_vectorization(
-            raster_path=raster_path,
-            band_index=band_index,
-            skip_nodata=skip_nodata,
-            skip_zero=skip_zero,
-            max_features=max_features,
-            simplify_tolerance=simplify_tolerance,
-        )
+        try:
+            features = await get_compute_executor().run(
+                "vectorize",
+                RasterProcessor.run_vectorization,
+                raster_path=raster_path,
+                band_index=band_index,
+                skip_nodata=skip_nodata,
+                skip_zero=skip_zero,
+                max_features=max_features,
+                simplify_tolerance=simplify_tolerance,
+            )
+        except ComputeCancelled as exc:
+            raise HTTPException(status_code=499, detail=str(exc)) from exc
         if not features:
             raise HTTPException(
                 status_code=400,
@@ -1271,13 +1439,19 @@ async def process_rasterize_task(
         cog_filename = f"{task_id}_{prefix}.tif"
         cog_path = os.path.join(COG_DIR, cog_filename)
 
-        # 4. execute conversion (note:processor_func must handle coordinate alignment)
-        processor_func(features, ref_record.file_path, tmp_path)
-
-        # 5. convert to COG
-        RasterProcessor.convert_to_cog(tmp_path, cog_path)
+        # 4. execute conversion and COG translation on the compute executor
+        # (note:processor_func must handle coordinate alignment)
+        await _run_raster_job(
+            prefix,
+            processor_func,
+            features,
+            ref_record.file_path,
+            tmp_path,
+            tmp_path=tmp_path,
+            cog_path=cog_path,
+        )
 
-        # 6. write to database
+        # 5. write to database
         return await save_to_db(db, task_id, new_name, tmp_path, cog_filename, cog_path, prefix)
 
     except Exception as e:
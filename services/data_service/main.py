@@ -15,6 +15,7 @@ from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
 
+from services.data_service.compute_executor import shutdown_compute_executor
 from services.data_service.database import engine, Base
 from services.data_service.router import router as data_router
 
@@ -59,6 +60,7 @@ async def lifespan(app: FastAPI):
         logger.error(f"=== DATA SERVICE STARTUP FAILED: {str(e)} ===")
         raise e
     yield
+    shutdown_compute_executor(wait=False)
 
 app = FastAPI(
     title="Raster Processing Service",
@@ -1,8 +1,6 @@
 import os
 import logging
-import re
 import numpy as np
-import numexpr as ne
 import rasterio
 from rasterio.enums import Resampling
 from typing import TypedDict, TypeAlias, ParamSpec, List, Dict, Any
@@ -53,6 +51,13 @@ from functions.implement.extraction import (
     extract_cloud,
 )
 from functions.implement.rasterize_ops import raster_to_vector, vector_to_raster
+from functions.implement.raster_calculator import (
+    DEFAULT_BLOCK_SIZE,
+    compile_expression,
+    parse_expression_tokens,
+    resolve_output_band_count,
+    run_block_calculator,
+)
 from functions.implement.raster_validity import (
     band_validity_mask,
     read_masked_data,
@@ -271,6 +276,7 @@ class RasterProcessor:
         hillshade_altitude: float = 45.0,
         relief_window_size: int = 3,
         min_slope_degrees: float = 0.1,
+        fill_depressions: bool = True,
     ) -> dict[str, object]:
         result = dem_analysis(
             input_path=input_path,
@@ -283,6 +289,7 @@ class RasterProcessor:
             hillshade_altitude=hillshade_altitude,
             relief_window_size=relief_window_size,
             min_slope_degrees=min_slope_degrees,
+            fill_depressions=fill_depressions,
         )
         build_raster_overviews(output_path)
         return result
@@ -381,12 +388,14 @@ class RasterProcessor:
     def supervised_classification(
         input_path: str,
         output_path: str,
-        samples: list[dict[str, Any]],
+        samples: list[dict[str, Any]] | None = None,
         classifier: str = "nearest_centroid",
         band_indices: list[int] | None = None,
         n_estimators: int = 100,
         random_seed: int = 13,
         smoothing: int = 0,
+        probability_output_path: str | None = None,
+        model_id: str | None = None,
     ) -> dict[str, object]:
         result = supervised_classification(
             input_path=input_path,
@@ -397,8 +406,12 @@ class RasterProcessor:
             n_estimators=n_estimators,
             random_seed=random_seed,
             smoothing=smoothing,
+            probability_output_path=probability_output_path,
+            model_id=model_id,
         )
         build_raster_overviews(output_path)
+        if probability_output_path:
+            build_raster_overviews(probability_output_path)
         return result
 
     @staticmethod
@@ -513,68 +526,7 @@ class RasterProcessor:
         }
         exclude numexpr reserved keywords.
         """
-        RESERVED = {
-            'sin','cos','tan','arcsin','arccos','arctan','arctan2',
-            'sinh','cosh','tanh','exp','log','log10','sqrt','abs',
-            'where','pi','e','expm1','log1p','real','imag','conj',
-            'complex'
-        }
-        tokens = {}
-        for m in re.finditer(r'\b([A-Za-z][A-Za-z0-9]*(?:_\d+)*)\b', expression):
-            token = m.group(1)
-            parts = token.split('_')
-            split_pos = len(parts)
-            for i, p in enumerate(parts):
-                if p.isdigit():
-                    split_pos = i
-                    break
-            var_name = '_'.join(parts[:split_pos])
-            indices = [int(p) for p in parts[split_pos:]]
-            if var_name.lower() in RESERVED:
-                continue
-            if not var_name:
-                continue
-            tokens[token] = (var_name, indices)
-        return tokens
-
-    @staticmethod
-    def _load_bands(
-        path: str,
-        indices: list[int],
-        reference_path: str | None = None,
-    ) -> np.ma.MaskedArray:
-        """
-        load selected bands from a file,return shape=(n_bands, H, W) text float32 text.
-        indices load all bands when empty.
-        """
-        with rasterio.open(path) as src:
-            total = src.count
-            if not indices:
-                bands_to_read = list(range(1, total + 1))
-            else:
-                for idx in indices:
-                    if idx < 1 or idx > total:
-                        raise ValueError(
-                            f"File {path} has {total} bands; requested band index {idx} is out of range"
-                        )
-                bands_to_read = indices
-            if reference_path is None:
-                data = read_masked_data(
-                    src,
-                    bands_to_read,
-                    zero_is_invalid=None,
-                )
-            else:
-                with rasterio.open(reference_path) as reference:
-                    data = read_masked_on_grid(
-                        src,
-                        reference,
-                        bands_to_read,
-                        resampling=Resampling.bilinear,
-                        zero_is_invalid=None,
-                    )
-            data = data.astype("float32")
-        return data
+        return parse_expression_tokens(expression)
 
     @staticmethod
     def _resolve_output_bands(token_arrays: dict[str, np.ndarray]) -> int:
@@ -584,100 +536,37 @@ class RasterProcessor:
         2. single-dimension broadcast -> broadcast
         3. unequal multi-dimensional inputs -> raise an error
         """
-        band_counts = [arr.shape[0] for arr in token_arrays.values()]
-        unique = set(band_counts)
-        if len(unique) == 1:
-            return unique.pop()
-        non_one = [c for c in unique if c != 1]
-        if len(non_one) == 1:
-            return non_one[0]
-        raise ValueError(
-            f"Band dimensions are incompatible and cannot be broadcast:{sorted(unique)}."
-            f"Only all-equal band counts or one side with a single band are supported."
-        )
+        return resolve_output_band_count(arr.shape[0] for arr in token_arrays.values())
 
     @staticmethod
     def run_raster_calculator(
         path_mapping: dict[str, str],
         expression: str,
-        output_path: str
+        output_path: str,
+        *,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        max_workers: int | None = None,
     ) -> None:
         """
         execute multi-band raster algebra.
         path_mapping: base variable name -> file path,text {"A": "a.tif", "B": "b.tif"}
         expression:   supports A,A_2,A_2_3_4 text
         output_path:  result GeoTiff path
+
+        Inputs are aligned to the first referenced variable's grid and
+        evaluated block by block, so memory stays bounded by ``block_size``.
         """
         if not path_mapping:
             raise ValueError("No input variables were provided.")
-        token_map = RasterProcessor._parse_var_tokens(expression)
-        if not token_map:
-            raise ValueError("The expression does not reference any raster variables.")
-
-        # verify all base variable names are in path_mapping text
-        for token, (var_name, _) in token_map.items():
-            if var_name not in path_mapping:
-                raise ValueError(f"Variable in expression '{var_name}' does not have a matching file path in the mapping")
-        first_variable = next(iter(token_map.values()))[0]
-        first_path = path_mapping[first_variable]
-        with rasterio.open(first_path) as src:
-            meta = src.meta.copy()
-
-        token_arrays: dict[str, np.ma.MaskedArray] = {}
-        for token, (var_name, indices) in token_map.items():
-            token_arrays[token] = RasterProcessor._load_bands(
-                path_mapping[var_name],
-                indices,
-                reference_path=first_path,
-            )
-        output_bands = RasterProcessor._resolve_output_bands(token_arrays)
-        results = []
-        result_validity = []
-        with np.errstate(divide="ignore", invalid="ignore"):
-            for band_idx in range(output_bands):
-                local_dict = {}
-                band_valid = None
-                for token, arr in token_arrays.items():
-                    if arr.shape[0] == 1:
-                        operand = arr[0]
-                    else:
-                        operand = arr[band_idx]
-                    operand_valid = ~np.ma.getmaskarray(operand)
-                    band_valid = (
-                        operand_valid.copy()
-                        if band_valid is None
-                        else band_valid & operand_valid
-                    )
-                    local_dict[token] = operand.filled(0)
-
-                safe_expr = expression
-                safe_dict = {}
-                for token in local_dict:
-                    safe_name = f"_v{abs(hash(token)) % 100000}"
-                    safe_expr = re.sub(rf'\b{re.escape(token)}\b', safe_name, safe_expr)
-                    safe_dict[safe_name] = local_dict[token]
-
-                band_result = ne.evaluate(safe_expr, local_dict=safe_dict)
-                band_result = np.asarray(band_result, dtype="float32")
-                band_valid &= np.isfinite(band_result)
-                band_result[~band_valid] = -9999.0
-                results.append(band_result)
-                result_validity.append(band_valid)
-
-        output_array = np.stack(results, axis=0)
-        output_valid = np.any(np.stack(result_validity, axis=0), axis=0)
-
-        meta.update({
-            "dtype": "float32",
-            "count": output_bands,
-            "driver": "GTiff",
-            "nodata": -9999.0,
-        })
-        with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True):
-            with rasterio.open(output_path, "w", **meta) as dest:
-                dest.write(output_array)
-                write_dataset_mask(dest, output_valid)
+        compiled = compile_expression(expression)
 
+        run_block_calculator(
+            path_mapping,
+            compiled,
+            output_path,
+            block_size=block_size,
+            max_workers=max_workers,
+        )
         build_raster_overviews(output_path)
 
     @staticmethod
@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from services.data_service.compute_executor import bind_compute_request
 
 from services.data_service.routers.upload_router import router as upload_router
 from services.data_service.routers.indices_router import router as indices_router
@@ -20,7 +22,8 @@ from services.data_service.routers.transform_router import router as transform_r
 from services.data_service.routers.texture_router import router as texture_router
 from services.data_service.routers.time_series_router import router as time_series_router
 
-router = APIRouter()
+# Compute jobs started by any data_service route can watch for client disconnects.
+router = APIRouter(dependencies=[Depends(bind_compute_request)])
 
 router.include_router(task_router)
 router.include_router(atmospheric_router)
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, Form, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import services.data_service.db_ops as db_ops
+from functions.implement.classifier_store import list_classifiers
 from services.data_service.database import get_db
 
 
@@ -16,28 +17,40 @@ router = APIRouter()
 @router.post("/classify-supervised")
 async def classify_supervised(
     raster_id: int = Form(...),
-    samples: str = Form(...),
+    samples: str | None = Form(None),
     classifier: Literal["nearest_centroid", "random_forest", "svm"] = Form("nearest_centroid"),
     new_name: str = Form(...),
     band_indices: str | None = Form(None),
     n_estimators: int = Form(100),
     random_seed: int = Form(13),
     smoothing: int = Form(0),
+    probability_output: bool = Form(False),
+    model_id: str | None = Form(None),
     db: AsyncSession = Depends(get_db),
 ):
+    if not samples and not model_id:
+        raise HTTPException(status_code=400, detail="samples or model_id is required")
     return await db_ops.process_supervised_classification_task(
         db=db,
         raster_id=raster_id,
-        samples=_parse_json_list(samples, "samples"),
+        samples=_parse_json_list(samples, "samples") if samples else None,
         classifier=classifier,
         new_name=new_name,
         band_indices=_parse_int_list(band_indices),
         n_estimators=n_estimators,
         random_seed=random_seed,
         smoothing=smoothing,
+        probability_output=probability_output,
+        model_id=model_id,
     )
 
 
+@router.get("/classifiers")
+def list_stored_classifiers():
+    # Plain def: FastAPI runs the directory scan in its threadpool.
+    return {"classifiers": list_classifiers()}
+
+
 @router.post("/classify-unsupervised")
 async def classify_unsupervised(
     raster_id: int = Form(...),
@@ -38,6 +38,7 @@ async def dem_analysis(
     hillshade_altitude: float = Form(45.0),
     relief_window_size: int = Form(3),
     min_slope_degrees: float = Form(0.1),
+    fill_depressions: bool = Form(True),
     db: AsyncSession = Depends(get_db),
 ):
     return await db_ops.process_dem_analysis_task(
@@ -52,4 +53,5 @@ async def dem_analysis(
         hillshade_altitude=hillshade_altitude,
         relief_window_size=relief_window_size,
         min_slope_degrees=min_slope_degrees,
+        fill_depressions=fill_depressions,
     )
@@ -7,6 +7,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from services.data_service.bridges.worker_bridge import get_cluster_task_status
+from services.data_service.compute_executor import get_compute_executor
 from services.data_service.database import get_db
 
 
@@ -20,6 +21,12 @@ def _jsonable(value: Any) -> Any:
     return value
 
 
+@router.get("/compute/metrics")
+async def get_compute_metrics():
+    """Queue depth and outcomes of inline jobs on the data_service compute executor."""
+    return get_compute_executor().metrics()
+
+
 @router.get("/tasks/{task_id}/status")
 async def get_task_status(task_id: str):
     status = get_cluster_task_status(task_id)
@@ -50,7 +50,13 @@ async def save_and_process_file(
             metadata_source=raw_path
         )
 
-        background_tasks.add_task(db_ops.run_conversion, raw_path, cog_path)
+        background_tasks.add_task(
+            db_ops.run_conversion,
+            raw_path,
+            cog_path,
+            result.get("index_id"),
+            metadata.get("bounds_wgs84"),
+        )
         return {"id": result["id"], "status": "processing", "metadata": metadata}
 
     except Exception as e:
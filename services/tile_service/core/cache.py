@@ -2,13 +2,17 @@ import hashlib
 import json
 import logging
 import os
+import time
+import uuid
+from contextlib import contextmanager
 from threading import RLock
-from typing import Optional
+from typing import Iterator, Optional
 
 from cachetools import LRUCache
-from diskcache import Cache
+from diskcache import Cache, Index
 
 from .config import settings
+from .shared_l1 import HAS_SHARED_L1, SharedTileSlab, default_shared_l1_path
 
 logger = logging.getLogger("tile_service.cache")
 
@@ -19,22 +23,85 @@ class TileCache:
         l1_size: int = 1024,
         l2_dir: str = "cache_data",
         l2_limit: int = 10 * 1024 ** 3,
+        l1_bytes: Optional[int] = None,
+        shared_l1_path: Optional[str] = None,
     ):
-        self.l1_cache = LRUCache(maxsize=l1_size)
+        self.l1_cache = self._build_l1(l1_size, l1_bytes, shared_l1_path)
         self.l2_dir = l2_dir
         self.l2_limit = l2_limit
         self._l2_cache = None
+        self._raster_index = None
+        self._registered_versions = set()
         self._l1_lock = RLock()
         self._l2_init_lock = RLock()
         self._lock = self._l1_lock
 
+    @staticmethod
+    def _build_l1(l1_size: int, l1_bytes: Optional[int], shared_l1_path: Optional[str]):
+        """
+        Entry-count LRU by default; byte-bounded when ``l1_bytes`` is set, and
+        shared between worker processes when ``shared_l1_path`` is also set.
+        """
+        if shared_l1_path and l1_bytes:
+            if HAS_SHARED_L1:
+                return SharedTileSlab(shared_l1_path, l1_bytes)
+            logger.warning("Shared L1 tile cache needs fcntl; using a per-process L1")
+        if l1_bytes:
+            return LRUCache(maxsize=l1_bytes, getsizeof=len)
+        return LRUCache(maxsize=l1_size)
+
+    def _l1_store(self, key: str, data: bytes):
+        try:
+            with self._l1_lock:
+                self.l1_cache[key] = data
+        except ValueError:
+            # Larger than the whole L1 byte budget; the L2 still keeps it.
+            pass
+
     def _get_l2_cache(self):
         if self._l2_cache is None:
             with self._l2_init_lock:
                 if self._l2_cache is None:
-                    self._l2_cache = Cache(self.l2_dir, size_limit=self.l2_limit)
+                    self._l2_cache = Cache(
+                        self.l2_dir,
+                        size_limit=self.l2_limit,
+                        tag_index=True,
+                    )
         return self._l2_cache
 
+    def _get_raster_index(self) -> Index:
+        """
+        Side table of ``index_id -> file versions`` written to the L2.
+
+        It lives in an ``Index`` rather than the cache itself so size-based
+        culling can never drop the bookkeeping needed to find a raster's tiles.
+        """
+        if self._raster_index is None:
+            with self._l2_init_lock:
+                if self._raster_index is None:
+                    self._raster_index = Index(os.path.join(self.l2_dir, "raster_index"))
+        return self._raster_index
+
+    @staticmethod
+    def _raster_tag(index_id: str, file_version: Optional[int | str]) -> str:
+        version = "" if file_version is None else str(file_version)
+        return f"{index_id}/{version}"
+
+    def _register_version(self, index_id: str, file_version: Optional[int | str]):
+        version = "" if file_version is None else str(file_version)
+        marker = (str(index_id), version)
+        if marker in self._registered_versions:
+            return
+
+        raster_index = self._get_raster_index()
+        with raster_index.transact():
+            versions = raster_index.get(marker[0], ())
+            if version not in versions:
+                raster_index[marker[0]] = (*versions, version)
+        if len(self._registered_versions) >= 4096:
+            self._registered_versions.clear()
+        self._registered_versions.add(marker)
+
     def _make_key(
         self,
         index_id: str,
@@ -50,6 +117,7 @@ class TileCache:
         alpha_strategy: Optional[str] = None,
         style_hash: Optional[str] = None,
         render_options: Optional[dict] = None,
+        tile_format: Optional[str] = None,
     ) -> str:
         base = f"{index_id}/{z}/{x}/{y}/{bands}"
         parts = [base]
@@ -68,6 +136,8 @@ class TileCache:
             parts.append(f"style:{style_hash}")
         if render_options:
             parts.append(f"options:{self._hash_mapping(render_options)}")
+        if tile_format:
+            parts.append(f"format:{tile_format}")
 
         return "/".join(parts)
 
@@ -106,6 +176,7 @@ class TileCache:
         alpha_strategy: Optional[str] = None,
         style_hash: Optional[str] = None,
         render_options: Optional[dict] = None,
+        tile_format: Optional[str] = None,
     ) -> Optional[bytes]:
         key = self._make_key(
             index_id,
@@ -120,6 +191,7 @@ class TileCache:
             alpha_strategy=alpha_strategy,
             style_hash=style_hash,
             render_options=render_options,
+            tile_format=tile_format,
         )
 
         with self._l1_lock:
@@ -130,8 +202,7 @@ class TileCache:
 
         tile = self._get_l2_cache().get(key)
         if tile is not None:
-            with self._l1_lock:
-                self.l1_cache[key] = tile
+            self._l1_store(key, tile)
             self._log_profile_event("l2_hit", key, tile)
             return tile
 
@@ -154,6 +225,7 @@ class TileCache:
         alpha_strategy: Optional[str] = None,
         style_hash: Optional[str] = None,
         render_options: Optional[dict] = None,
+        tile_format: Optional[str] = None,
     ):
         if data is None:
             return
@@ -173,12 +245,119 @@ class TileCache:
             alpha_strategy=alpha_strategy,
             style_hash=style_hash,
             render_options=render_options,
+            tile_format=tile_format,
         )
-        with self._l1_lock:
-            self.l1_cache[key] = data
-        self._get_l2_cache().set(key, data)
+        self._l1_store(key, data)
+        self._register_version(index_id, file_version)
+        self._get_l2_cache().set(key, data, tag=self._raster_tag(index_id, file_version))
         self._log_profile_event("set", key, data)
 
+    def raster_versions(self, index_id: str) -> tuple[str, ...]:
+        return tuple(self._get_raster_index().get(str(index_id), ()))
+
+    def invalidate_raster(
+        self,
+        index_id: str,
+        file_version: Optional[int | str] = None,
+    ) -> dict:
+        """
+        Drop every cached tile of ``index_id``, or only those rendered from
+        ``file_version`` when it is given.
+
+        L2 entries are removed by tag in one bulk delete per file version;
+        L1 entries are matched on the key prefix. Tiles written before tags
+        were recorded are left to normal LRU eviction.
+        """
+        index_id = str(index_id)
+        if file_version is None:
+            versions = self.raster_versions(index_id)
+        else:
+            versions = (str(file_version),)
+
+        l2_removed = 0
+        l2_cache = self._get_l2_cache()
+        for version in versions:
+            l2_removed += l2_cache.evict(self._raster_tag(index_id, version))
+
+        raster_index = self._get_raster_index()
+        with raster_index.transact():
+            if file_version is None:
+                raster_index.pop(index_id, None)
+            else:
+                remaining = tuple(
+                    version
+                    for version in raster_index.get(index_id, ())
+                    if version not in versions
+                )
+                if remaining:
+                    raster_index[index_id] = remaining
+                else:
+                    raster_index.pop(index_id, None)
+        self._registered_versions.difference_update(
+            (index_id, version) for version in versions
+        )
+
+        file_part = None if file_version is None else f"file:{file_version}"
+        with self._l1_lock:
+            stale_keys = [
+                key
+                for key in self.l1_cache
+                if key.startswith(f"{index_id}/")
+                and (file_part is None or file_part in key.split("/"))
+            ]
+            for key in stale_keys:
+                self.l1_cache.pop(key, None)
+
+        logger.info(
+            "Invalidated tiles index=%s file_version=%s l1=%s l2=%s",
+            index_id,
+            file_version,
+            len(stale_keys),
+            l2_removed,
+        )
+        return {
+            "index_id": index_id,
+            "file_versions": list(versions),
+            "l1_removed": len(stale_keys),
+            "l2_removed": l2_removed,
+        }
+
+    @contextmanager
+    def render_lease(
+        self,
+        lock_key: str,
+        timeout: float = 10.0,
+        ttl: float = 30.0,
+    ) -> Iterator[bool]:
+        """
+        Cross-process single-flight lease stored in the shared L2.
+
+        Yields ``True`` once this process owns the lease, or ``False`` when
+        ``timeout`` elapses first so the caller can fall through and render.
+        The lease expires after ``ttl`` seconds so a crashed worker cannot
+        block a tile forever.
+        """
+        l2_cache = self._get_l2_cache()
+        lease_key = "lease:" + hashlib.sha1(lock_key.encode()).hexdigest()
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + max(0.0, timeout)
+        delay = 0.002
+        acquired = l2_cache.add(lease_key, token, expire=ttl)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.025)
+            acquired = l2_cache.add(lease_key, token, expire=ttl)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    with l2_cache.transact():
+                        if l2_cache.get(lease_key) == token:
+                            l2_cache.delete(lease_key)
+                except Exception:
+                    logger.exception("Failed to release tile render lease; it will expire")
+
     def clear_l1(self):
         with self._l1_lock:
             self.l1_cache.clear()
@@ -190,10 +369,21 @@ class TileCache:
             l2_cache = self._l2_cache
         if l2_cache is not None:
             l2_cache.clear()
+            self._get_raster_index().clear()
+        self._registered_versions.clear()
+
+
+def _shared_l1_path() -> Optional[str]:
+    if not bool(getattr(settings, "TILE_SHARED_L1_ENABLED", False)):
+        return None
+    path = str(getattr(settings, "TILE_SHARED_L1_PATH", "") or "").strip()
+    return path or default_shared_l1_path(settings.CACHE_L2_DIR)
 
 
 tile_cache = TileCache(
     l1_size=settings.CACHE_L1_SIZE,
     l2_dir=settings.CACHE_L2_DIR,
     l2_limit=settings.CACHE_L2_SIZE_LIMIT,
+    l1_bytes=max(0, int(getattr(settings, "CACHE_L1_BYTES", 0) or 0)) or None,
+    shared_l1_path=_shared_l1_path(),
 )
@@ -8,6 +8,9 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "RSMarking-TileService"
     STORAGE_RAW_DIR: str = os.getenv("STORAGE_RAW_DIR", "/app/storage/raw")
     CACHE_L1_SIZE: int = 1024
+    CACHE_L1_BYTES: int = 256 * 1024 * 1024
+    TILE_SHARED_L1_ENABLED: bool = False
+    TILE_SHARED_L1_PATH: str = ""
     CACHE_L2_DIR: str = os.path.join(os.path.dirname(__file__), "../../.tile_cache")
     CACHE_L2_SIZE_LIMIT: int = 5 * 1024 * 1024 * 1024
     DEFAULT_BANDS: str = "1,2,3"
@@ -21,6 +24,20 @@ class Settings(BaseSettings):
     TILE_RASTER_OPEN_MODE: str = "per_request"
     TILE_RESAMPLING_MODE: str = "quality"
     TILE_PNG_COMPRESS_LEVEL: int = 1
+    TILE_PALETTE_MAX_COLORS: int = 256
+    TILE_WEBP_ENABLED: bool = True
+    TILE_WEBP_LOSSLESS: bool = True
+    TILE_WEBP_QUALITY: int = 80
+    TILE_WEBP_METHOD: int = 2
+    TILE_RENDER_LEASE_ENABLED: bool = True
+    TILE_RENDER_LEASE_TIMEOUT_SECONDS: float = 10.0
+    TILE_RENDER_LEASE_TTL_SECONDS: float = 30.0
+    TILE_STATS_SIDECAR_ENABLED: bool = True
+    TILE_METATILE_SIZE: int = 1
+    TILE_METATILE_MIN_ZOOM: int = 8
+    TILE_SEED_MIN_ZOOM: int = 0
+    TILE_SEED_MAX_ZOOM: int = 12
+    TILE_SEED_MAX_TILES: int = 5000
     TILE_HTTP_CACHE_MAX_AGE_SECONDS: int = 60
     TILE_HTTP_CACHE_STALE_WHILE_REVALIDATE_SECONDS: int = 300
 
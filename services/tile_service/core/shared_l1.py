@@ -0,0 +1,321 @@
+"""
+Cross-process L1 tile cache backed by a memory-mapped file.
+
+Every uvicorn worker maps the same file (under ``/dev/shm`` by default), so a
+tile rendered by one worker is an L1 hit for all of them. The file holds:
+
+* a 64-byte header (geometry, log head and hit/miss counters);
+* a set-associative hash index of ``buckets x ways`` 32-byte entries, each a
+  128-bit key digest plus the record's absolute log offset;
+* a circular data log of ``[digest, key length, data length, key, data]``
+  records.
+
+Appends advance a monotonically increasing head, so a record is live while
+``offset >= head - capacity`` and overwritten records expire without any
+bookkeeping. Hits on records in the oldest quarter of the log are re-appended
+(CLOCK-style second chance), which keeps hot tiles resident under a strict
+byte budget. All access is serialised with ``flock`` plus a thread lock.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from threading import RLock
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger("tile_service.cache")
+
+HAS_SHARED_L1 = fcntl is not None
+
+_MAGIC = b"RSTL1v01"
+_HEADER = struct.Struct("<8sQIIQQQQ")
+_HEADER_SIZE = 64
+_ENTRY = struct.Struct("<16sQI4x")
+_RECORD = struct.Struct("<16sHHI")
+_WAYS = 8
+_AVG_RECORD_BYTES = 16 * 1024
+_ALIGN = 8
+
+
+def default_shared_l1_path(l2_dir: str) -> str:
+    digest = hashlib.md5(os.path.abspath(l2_dir).encode()).hexdigest()[:12]
+    if os.path.isdir("/dev/shm"):
+        return os.path.join("/dev/shm", f"rs_tile_l1_{digest}")
+    return os.path.join(l2_dir, "l1.slab")
+
+
+class SharedTileSlab:
+    """
+    Byte-bounded mapping of ``str -> bytes`` shared between processes.
+
+    It implements the subset of the ``MutableMapping`` API that ``TileCache``
+    uses for its L1, so it can stand in for ``cachetools.LRUCache``.
+    """
+
+    def __init__(self, path: str, capacity_bytes: int):
+        if not HAS_SHARED_L1:
+            raise RuntimeError("Shared L1 tile cache requires fcntl (POSIX)")
+        self.path = path
+        self.capacity = max(64 * 1024, int(capacity_bytes))
+        self.capacity -= self.capacity % _ALIGN
+        slots = max(_WAYS * 64, 2 * self.capacity // _AVG_RECORD_BYTES)
+        self.buckets = max(64, slots // _WAYS)
+        self.max_record = self.capacity // 4
+        self._index_offset = _HEADER_SIZE
+        self._data_offset = _HEADER_SIZE + self.buckets * _WAYS * _ENTRY.size
+        self._bucket = struct.Struct("<" + "16sQI4x" * _WAYS)
+        self._thread_lock = RLock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+
+    # ------------------------------------------------------------------
+    # Mapping and locking
+    # ------------------------------------------------------------------
+    @property
+    def total_size(self) -> int:
+        return self._data_offset + self.capacity
+
+    def _open(self):
+        pid = os.getpid()
+        if self._mm is not None and self._pid == pid:
+            return
+        # A forked child must not share the parent's open file description,
+        # otherwise flock would not exclude the two processes.
+        self._mm = None
+        self._fd = None
+
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != self.total_size:
+                    os.ftruncate(fd, self.total_size)
+                mm = mmap.mmap(fd, self.total_size)
+                if not self._header_matches(mm):
+                    self._initialise(mm)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._mm = mm
+        self._pid = pid
+
+    def _header_matches(self, mm) -> bool:
+        magic, capacity, buckets, ways, *_ = _HEADER.unpack_from(mm, 0)
+        return (
+            magic == _MAGIC
+            and capacity == self.capacity
+            and buckets == self.buckets
+            and ways == _WAYS
+        )
+
+    def _initialise(self, mm):
+        mm[: self._data_offset] = bytes(self._data_offset)
+        _HEADER.pack_into(mm, 0, _MAGIC, self.capacity, self.buckets, _WAYS, 0, 0, 0, 0)
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self._mm
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        with self._thread_lock:
+            if self._mm is not None and self._pid == os.getpid():
+                self._mm.close()
+                os.close(self._fd)
+            self._mm = None
+            self._fd = None
+            self._pid = None
+
+    # ------------------------------------------------------------------
+    # Record helpers (caller holds the lock)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+    def _bucket_offset(self, digest: bytes) -> int:
+        bucket = int.from_bytes(digest[:8], "little") % self.buckets
+        return self._index_offset + bucket * _WAYS * _ENTRY.size
+
+    @staticmethod
+    def _head(mm) -> int:
+        return struct.unpack_from("<Q", mm, 24)[0]
+
+    @staticmethod
+    def _bump(mm, offset: int):
+        struct.pack_into("<Q", mm, offset, struct.unpack_from("<Q", mm, offset)[0] + 1)
+
+    def _live(self, stored: int, head: int) -> bool:
+        return stored != 0 and stored - 1 >= head - self.capacity
+
+    def _find(self, mm, digest: bytes, head: int):
+        """Return ``(entry_offset, log_offset)`` for ``digest`` or ``(None, None)``."""
+        base = self._bucket_offset(digest)
+        fields = self._bucket.unpack_from(mm, base)
+        for way in range(_WAYS):
+            entry_digest, stored = fields[way * 3], fields[way * 3 + 1]
+            if entry_digest == digest and self._live(stored, head):
+                return base + way * _ENTRY.size, stored - 1
+        return None, None
+
+    def _read_record(self, mm, log_offset: int, digest: bytes | None = None):
+        pos = self._data_offset + log_offset % self.capacity
+        record_digest, key_len, _, data_len = _RECORD.unpack_from(mm, pos)
+        if digest is not None and record_digest != digest:
+            return None, None
+        key_start = pos + _RECORD.size
+        data_start = key_start + key_len
+        return (
+            bytes(mm[key_start:data_start]).decode(),
+            bytes(mm[data_start:data_start + data_len]),
+        )
+
+    def _append(self, mm, digest: bytes, key_bytes: bytes, data: bytes) -> int | None:
+        size = _RECORD.size + len(key_bytes) + len(data)
+        size += -size % _ALIGN
+        if size > self.max_record:
+            return None
+
+        head = self._head(mm)
+        pos = head % self.capacity
+        if pos + size > self.capacity:
+            head += self.capacity - pos
+            pos = 0
+        start = self._data_offset + pos
+        _RECORD.pack_into(mm, start, digest, len(key_bytes), 0, len(data))
+        key_start = start + _RECORD.size
+        mm[key_start:key_start + len(key_bytes)] = key_bytes
+        data_start = key_start + len(key_bytes)
+        mm[data_start:data_start + len(data)] = data
+        struct.pack_into("<Q", mm, 24, head + size)
+        return head
+
+    def _index(self, mm, digest: bytes, log_offset: int):
+        head = self._head(mm)
+        base = self._bucket_offset(digest)
+        fields = self._bucket.unpack_from(mm, base)
+        target = None
+        oldest = None
+        for way in range(_WAYS):
+            entry_digest, stored = fields[way * 3], fields[way * 3 + 1]
+            if entry_digest == digest:
+                target = way
+                break
+            if target is None and not self._live(stored, head):
+                target = way
+            if oldest is None or stored < fields[oldest * 3 + 1]:
+                oldest = way
+        if target is None:
+            target = oldest
+        _ENTRY.pack_into(mm, base + target * _ENTRY.size, digest, log_offset + 1, 0)
+
+    # ------------------------------------------------------------------
+    # Mapping API
+    # ------------------------------------------------------------------
+    def _lookup(self, key: str, count: bool):
+        digest = self._digest(key)
+        with self._locked() as mm:
+            head = self._head(mm)
+            entry_offset, log_offset = self._find(mm, digest, head)
+            data = None
+            if entry_offset is not None:
+                _, data = self._read_record(mm, log_offset, digest)
+            if data is None:
+                if count:
+                    self._bump(mm, 40)
+                return None
+
+            if count:
+                self._bump(mm, 32)
+                if log_offset < head - (self.capacity * 3) // 4:
+                    promoted = self._append(mm, digest, key.encode(), data)
+                    if promoted is not None:
+                        self._index(mm, digest, promoted)
+            return data
+
+    def get(self, key: str, default=None):
+        data = self._lookup(key, count=True)
+        return default if data is None else data
+
+    def __getitem__(self, key: str) -> bytes:
+        data = self._lookup(key, count=False)
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key, count=False) is not None
+
+    def __setitem__(self, key: str, data: bytes):
+        digest = self._digest(key)
+        with self._locked() as mm:
+            log_offset = self._append(mm, digest, key.encode(), bytes(data))
+            if log_offset is None:
+                raise ValueError("value too large")
+            self._index(mm, digest, log_offset)
+            self._bump(mm, 48)
+
+    def pop(self, key: str, default=None):
+        digest = self._digest(key)
+        with self._locked() as mm:
+            entry_offset, log_offset = self._find(mm, digest, self._head(mm))
+            if entry_offset is None:
+                return default
+            _, data = self._read_record(mm, log_offset, digest)
+            mm[entry_offset:entry_offset + _ENTRY.size] = bytes(_ENTRY.size)
+            return default if data is None else data
+
+    def _live_keys(self) -> list[str]:
+        keys = []
+        with self._locked() as mm:
+            head = self._head(mm)
+            for bucket in range(self.buckets):
+                base = self._index_offset + bucket * _WAYS * _ENTRY.size
+                fields = self._bucket.unpack_from(mm, base)
+                for way in range(_WAYS):
+                    entry_digest, stored = fields[way * 3], fields[way * 3 + 1]
+                    if self._live(stored, head):
+                        key, _ = self._read_record(mm, stored - 1, entry_digest)
+                        if key is not None:
+                            keys.append(key)
+        return keys
+
+    def __iter__(self):
+        return iter(self._live_keys())
+
+    def __len__(self) -> int:
+        return len(self._live_keys())
+
+    def clear(self):
+        with self._locked() as mm:
+            self._initialise(mm)
+
+    def stats(self) -> dict:
+        with self._locked() as mm:
+            _, _, _, _, head, hits, misses, sets = _HEADER.unpack_from(mm, 0)
+        return {
+            "capacity_bytes": self.capacity,
+            "used_bytes": min(head, self.capacity),
+            "hits": hits,
+            "misses": misses,
+            "sets": sets,
+        }
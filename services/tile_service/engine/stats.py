@@ -1,11 +1,16 @@
+import json
 import logging
 import math
+import os
+import uuid
 from threading import RLock
 
 import numpy as np
+import rasterio
 from rasterio.enums import Resampling
 
-from functions.implement.raster_validity import band_validity_mask
+from functions.implement.raster_validity import band_validity_mask, raster_validity_signature
+from services.tile_service.core.config import settings
 
 logger = logging.getLogger("tile_service.stats")
 
@@ -14,6 +19,104 @@ _GLOBAL_FILE_STATS: dict = {}
 _GLOBAL_FILE_STATS_LOCK = RLock()
 _GLOBAL_FILE_STATS_KEY_LOCKS: dict = {}
 
+# Persisted p2/p98 stretch saved next to the raster so restarts and other
+# workers skip the overview read. Stale when the validity signature changes.
+STATS_SIDECAR_SUFFIX = ".rsstats.json"
+_STATS_SIDECAR_VERSION = 1
+_FALLBACK_STATS = (0.0, 1.0)
+
+
+def _stats_sidecar_enabled() -> bool:
+    return bool(getattr(settings, "TILE_STATS_SIDECAR_ENABLED", True))
+
+
+def stats_sidecar_path(file_path: str) -> str:
+    return file_path + STATS_SIDECAR_SUFFIX
+
+
+def load_band_stats(file_path: str, signature: str | None = None) -> dict[int, tuple[float, float]]:
+    """Return persisted ``{band: (low, high)}``, or ``{}`` when missing or stale."""
+    try:
+        with open(stats_sidecar_path(file_path), encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if signature is None:
+        signature = raster_validity_signature(file_path)
+    if (
+        not isinstance(payload, dict)
+        or payload.get("version") != _STATS_SIDECAR_VERSION
+        or payload.get("signature") != signature
+    ):
+        return {}
+
+    band_stats = {}
+    for band, value in (payload.get("bands") or {}).items():
+        try:
+            low, high = float(value[0]), float(value[1])
+            band_stats[int(band)] = (low, high)
+        except (TypeError, ValueError, IndexError):
+            continue
+    return band_stats
+
+
+def save_band_stats(
+    file_path: str,
+    band_stats: dict[int, tuple[float, float]],
+    signature: str | None = None,
+) -> bool:
+    """Merge ``band_stats`` into the sidecar; failures are logged, not raised."""
+    if signature is None:
+        signature = raster_validity_signature(file_path)
+    merged = load_band_stats(file_path, signature)
+    merged.update({int(band): value for band, value in band_stats.items()})
+    payload = {
+        "version": _STATS_SIDECAR_VERSION,
+        "signature": signature,
+        "method": "p2-p98",
+        "bands": {str(band): [float(low), float(high)] for band, (low, high) in sorted(merged.items())},
+    }
+
+    sidecar = stats_sidecar_path(file_path)
+    tmp_path = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, sidecar)
+        return True
+    except OSError as e:
+        logger.warning("Could not persist band stats for %s: %s", file_path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def write_band_stats(file_path: str, bands=None) -> dict[int, tuple[float, float]]:
+    """
+    Compute and persist stretch stats for ``bands`` (default: all bands).
+
+    Bands already present in a current sidecar are not recomputed.
+    """
+    signature = raster_validity_signature(file_path)
+    band_stats = load_band_stats(file_path, signature)
+    manager = StatsManager()
+    computed = {}
+    with rasterio.open(file_path) as src:
+        for b_idx in bands or range(1, src.count + 1):
+            b_idx = int(b_idx)
+            if b_idx in band_stats or not 1 <= b_idx <= src.count:
+                continue
+            val = manager._compute_global_stats(src, b_idx)
+            if val != _FALLBACK_STATS:
+                computed[b_idx] = val
+    if computed:
+        save_band_stats(file_path, computed, signature)
+        band_stats.update(computed)
+    return band_stats
+
 
 class StatsManager:
     def __init__(self):
@@ -78,7 +181,10 @@ class StatsManager:
                 if cached is not None:
                     return cached
 
-            val = self._compute_global_stats(src, b_idx)
+            val = self._load_persisted_stats(global_key[0], b_idx)
+            if val is None:
+                val = self._compute_global_stats(src, b_idx)
+                self._persist_stats(global_key[0], b_idx, val)
 
             with _GLOBAL_FILE_STATS_LOCK:
                 cached = _GLOBAL_FILE_STATS.get(global_key)
@@ -87,6 +193,20 @@ class StatsManager:
                 _GLOBAL_FILE_STATS[global_key] = val
                 return val
 
+    @staticmethod
+    def _load_persisted_stats(file_path: str, b_idx: int):
+        if not _stats_sidecar_enabled() or not os.path.exists(file_path):
+            return None
+        return load_band_stats(file_path).get(b_idx)
+
+    @staticmethod
+    def _persist_stats(file_path: str, b_idx: int, val):
+        if val == _FALLBACK_STATS or not _stats_sidecar_enabled():
+            return
+        if not os.path.exists(file_path):
+            return
+        save_band_stats(file_path, {b_idx: val})
+
     def _get_stats_override(self, band_pos, b_idx, stats_override):
         if not stats_override:
             return None
@@ -148,7 +268,7 @@ class StatsManager:
                 b_idx,
                 e,
             )
-            return (0.0, 1.0)
+            return _FALLBACK_STATS
 
     def _compute_tile_stats(self, band, src=None, b_idx=None):
         if np.ma.isMaskedArray(band):
@@ -18,7 +18,7 @@ from functions.implement.raster_validity import (
 from services.tile_service.core.config import settings
 
 from .stats import StatsManager
-from .utils import get_tile_window
+from .utils import get_metatile_window, get_tile_window
 
 logger = logging.getLogger("tile_service.engine")
 
@@ -245,70 +245,30 @@ class TileEngine:
             window = get_tile_window(x, y, z, src, transformer)
             mark("window")
 
-            resampling = self._select_resampling(src, valid_bands[0], window)
-            raw_data = src.read(
+            data, read_valid_mask = self._read_block_data(
+                src,
                 valid_bands,
-                window=window,
-                out_shape=(len(valid_bands), settings.TILE_SIZE, settings.TILE_SIZE),
-                resampling=resampling,
-                boundless=True,
-                fill_value=self._read_fill_value(src, valid_bands),
-                out_dtype="float32",
-                masked=True,
+                window,
+                settings.TILE_SIZE,
             )
-
-            read_valid_mask = None
-            if np.ma.isMaskedArray(raw_data):
-                read_valid_mask = ~np.ma.getmaskarray(raw_data)
-                data = raw_data.filled(0.0)
-            else:
-                data = raw_data
-
-            if data.dtype != np.float32 or not data.flags.c_contiguous:
-                data = np.ascontiguousarray(data, dtype=np.float32)
             mark("read")
 
-            valid_mask = self._read_valid_data_mask(
+            data, alpha = self._block_alpha(
                 src,
                 valid_bands,
                 window,
                 data,
                 alpha_mode,
-                read_valid_mask=read_valid_mask,
+                read_valid_mask,
             )
-            data, alpha = self._sanitize_tile_data(data, valid_mask)
             mark("alpha")
             if not np.any(alpha):
                 return None
 
-            d_min = float(np.min(data))
-            d_max = float(np.max(data))
-
-            num_bands = len(valid_bands)
-            if d_min >= 0.0 and d_max <= 1.0 and self._is_binary_tile(data):
-                mins = np.zeros(num_bands, dtype=np.float32)
-                maxs = np.ones(num_bands, dtype=np.float32)
-            elif d_min >= -1.0001 and d_max <= 1.0001:
-                mins = np.full(num_bands, -1.0, dtype=np.float32)
-                maxs = np.full(num_bands, 1.0, dtype=np.float32)
-            else:
-                mins, maxs = self._stats_manager.get_stretch_params(
-                    data,
-                    valid_bands,
-                    src,
-                    stats,
-                )
+            mins, maxs = self._stretch_params(data, valid_bands, src, stats)
             mark("stats")
 
-            if HAS_FAST_TILER:
-                tile = render_tile(data, mins, maxs)
-            elif fast_stretch_and_stack:
-                tile = fast_stretch_and_stack(data, mins, maxs)
-            else:
-                tile = self._fallback_process(data, mins, maxs)
-
-            tile[:, :, 3] = alpha
-            tile_result = tile
+            tile_result = self._render_rgba(data, mins, maxs, alpha)
             mark("render")
             return tile_result
         except Exception:
@@ -346,11 +306,179 @@ class TileEngine:
                     tile_result is None,
                 )
 
+    def read_metatile(
+        self,
+        x: int,
+        y: int,
+        z: int,
+        span: int,
+        bands: list = None,
+        stats: dict = None,
+    ) -> dict:
+        """
+        Render a ``span`` x ``span`` block of XYZ tiles with one windowed read.
+
+        ``x``/``y`` is the top-left tile of the block. Reprojection, the masked
+        read and alpha derivation run once for the whole block; stretch and
+        RGBA rendering still run per sub-tile so every slice matches what
+        ``read_tile`` would decide for that tile on its own. Returns
+        ``{(x, y): rgba_or_None}`` for every tile in the block, or an empty
+        dict when the source cannot be read.
+        """
+        profile = _profile_enabled()
+        alpha_mode = _alpha_mode()
+        total_start = time.perf_counter()
+        tile_size = settings.TILE_SIZE
+        span = max(1, int(span))
+
+        if not os.path.exists(self.file_path):
+            self.close()
+            return {}
+
+        src = None
+        close_src = False
+        tiles = {}
+        try:
+            current_mtime_ns = _file_mtime_ns(self.file_path)
+            src, close_src = self._open_src(current_mtime_ns)
+
+            valid_bands = bands if bands else list(range(1, min(4, src.count) + 1))
+            valid_bands = [b for b in valid_bands if 1 <= b <= src.count] or [1]
+            transformer = self._get_transformer(src, current_mtime_ns)
+            window = get_metatile_window(x, y, z, span, src, transformer)
+
+            data, read_valid_mask = self._read_block_data(
+                src,
+                valid_bands,
+                window,
+                tile_size * span,
+            )
+            data, alpha = self._block_alpha(
+                src,
+                valid_bands,
+                window,
+                data,
+                alpha_mode,
+                read_valid_mask,
+            )
+
+            for row in range(span):
+                for col in range(span):
+                    rows = slice(row * tile_size, (row + 1) * tile_size)
+                    cols = slice(col * tile_size, (col + 1) * tile_size)
+                    sub_alpha = alpha[rows, cols]
+                    if not np.any(sub_alpha):
+                        tiles[(x + col, y + row)] = None
+                        continue
+
+                    sub_data = np.ascontiguousarray(data[:, rows, cols])
+                    mins, maxs = self._stretch_params(sub_data, valid_bands, src, stats)
+                    tiles[(x + col, y + row)] = self._render_rgba(
+                        sub_data,
+                        mins,
+                        maxs,
+                        np.ascontiguousarray(sub_alpha),
+                    )
+            return tiles
+        except Exception:
+            logger.exception(
+                "Metatile render failed file=%s z=%s x=%s y=%s span=%s bands=%s",
+                self.file_path,
+                z,
+                x,
+                y,
+                span,
+                bands,
+            )
+            return {}
+        finally:
+            if src is not None and close_src and not getattr(src, "closed", False):
+                src.close()
+            if profile:
+                logger.info(
+                    "tile_metatile_profile file=%s z=%s x=%s y=%s span=%s bands=%s "
+                    "total=%.2fms tiles=%s",
+                    self.file_path,
+                    z,
+                    x,
+                    y,
+                    span,
+                    bands,
+                    (time.perf_counter() - total_start) * 1000.0,
+                    len(tiles),
+                )
+
+    def _read_block_data(self, src, valid_bands, window, out_size):
+        resampling = self._select_resampling(src, valid_bands[0], window, out_size)
+        raw_data = src.read(
+            valid_bands,
+            window=window,
+            out_shape=(len(valid_bands), out_size, out_size),
+            resampling=resampling,
+            boundless=True,
+            fill_value=self._read_fill_value(src, valid_bands),
+            out_dtype="float32",
+            masked=True,
+        )
+
+        read_valid_mask = None
+        if np.ma.isMaskedArray(raw_data):
+            read_valid_mask = ~np.ma.getmaskarray(raw_data)
+            data = raw_data.filled(0.0)
+        else:
+            data = raw_data
+
+        if data.dtype != np.float32 or not data.flags.c_contiguous:
+            data = np.ascontiguousarray(data, dtype=np.float32)
+        return data, read_valid_mask
+
+    def _block_alpha(self, src, valid_bands, window, data, alpha_mode, read_valid_mask):
+        valid_mask = self._read_valid_data_mask(
+            src,
+            valid_bands,
+            window,
+            data,
+            alpha_mode,
+            read_valid_mask=read_valid_mask,
+        )
+        return self._sanitize_tile_data(data, valid_mask)
+
+    def _stretch_params(self, data, valid_bands, src, stats):
+        d_min = float(np.min(data))
+        d_max = float(np.max(data))
+
+        num_bands = len(valid_bands)
+        if d_min >= 0.0 and d_max <= 1.0 and self._is_binary_tile(data):
+            mins = np.zeros(num_bands, dtype=np.float32)
+            maxs = np.ones(num_bands, dtype=np.float32)
+        elif d_min >= -1.0001 and d_max <= 1.0001:
+            mins = np.full(num_bands, -1.0, dtype=np.float32)
+            maxs = np.full(num_bands, 1.0, dtype=np.float32)
+        else:
+            mins, maxs = self._stats_manager.get_stretch_params(
+                data,
+                valid_bands,
+                src,
+                stats,
+            )
+        return mins, maxs
+
+    def _render_rgba(self, data, mins, maxs, alpha):
+        if HAS_FAST_TILER:
+            tile = render_tile(data, mins, maxs)
+        elif fast_stretch_and_stack:
+            tile = fast_stretch_and_stack(data, mins, maxs)
+        else:
+            tile = self._fallback_process(data, mins, maxs)
+
+        tile[:, :, 3] = alpha
+        return tile
+
     @staticmethod
     def _is_binary_tile(data):
         return bool(np.count_nonzero((data != 0) & (data != 1)) == 0)
 
-    def _select_resampling(self, src, band, window):
+    def _select_resampling(self, src, band, window, out_size=None):
         mode = _resampling_mode()
         if mode == "nearest":
             return Resampling.nearest
@@ -360,8 +488,9 @@ class TileEngine:
         if window is None:
             return Resampling.bilinear
 
-        x_decimation = abs(window.width) / settings.TILE_SIZE
-        y_decimation = abs(window.height) / settings.TILE_SIZE
+        out_size = out_size or settings.TILE_SIZE
+        x_decimation = abs(window.width) / out_size
+        y_decimation = abs(window.height) / out_size
         decimation = max(x_decimation, y_decimation)
         if mode == "fast" and decimation >= 4.0:
             return Resampling.nearest
@@ -415,7 +544,7 @@ class TileEngine:
             masks = src.read_masks(
                 valid_bands,
                 window=window,
-                out_shape=(len(valid_bands), settings.TILE_SIZE, settings.TILE_SIZE),
+                out_shape=(len(valid_bands), height, width),
                 boundless=True,
                 resampling=Resampling.nearest,
             )
@@ -7,3 +7,18 @@ def get_tile_window(x, y, z, src, transformer):
     left, bottom = transformer.transform(tile_wgs84.west, tile_wgs84.south)
     right, top = transformer.transform(tile_wgs84.east, tile_wgs84.north)
     return from_bounds(left, bottom, right, top, transform=src.transform)
+
+
+def get_metatile_window(x, y, z, span, src, transformer):
+    """Source window covering tiles ``x..x+span-1`` by ``y..y+span-1`` at ``z``."""
+    top_left = mercantile.bounds(x, y, z)
+    bottom_right = mercantile.bounds(x + span - 1, y + span - 1, z)
+    left, bottom = transformer.transform(top_left.west, bottom_right.south)
+    right, top = transformer.transform(bottom_right.east, top_left.north)
+    return from_bounds(left, bottom, right, top, transform=src.transform)
+
+
+def metatile_origin(x, y, z, span):
+    """Top-left tile and clipped span of the metatile block containing x/y."""
+    span = max(1, min(int(span), 1 << z))
+    return (x // span) * span, (y // span) * span, span
@@ -125,6 +125,11 @@ def clear_raster_path_cache():
         _PATH_CACHE.clear()
 
 
+def forget_raster_path(index_id: str):
+    with _PATH_CACHE_LOCK:
+        _PATH_CACHE.pop(str(index_id), None)
+
+
 def process_tile_pixels_fallback(data: np.ndarray) -> np.ndarray:
     """Deprecated debug-only fallback renderer kept for /debug/render-first.png."""
     data = np.asarray(data, dtype=np.float32)
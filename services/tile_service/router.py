@@ -1,4 +1,4 @@
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
 from dataclasses import dataclass, field
 from functools import lru_cache
 import hashlib
@@ -9,6 +9,7 @@ from threading import Lock, RLock
 import time
 
 import mercantile
+import numpy as np
 import rasterio
 from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from PIL import Image
@@ -22,6 +23,7 @@ from services.data_service.database import get_db
 from services.tile_service.core.cache import tile_cache
 from services.tile_service.core.config import settings
 from services.tile_service.engine.tiler import get_tile_engine
+from services.tile_service.engine.utils import metatile_origin
 from functions.implement.raster_validity import raster_validity_signature
 
 import services.tile_service.logic as logic
@@ -65,6 +67,36 @@ class _KeyedRenderLocks:
                     self._entries.pop(key, None)
 
 
+def _render_lease_enabled() -> bool:
+    return bool(getattr(settings, "TILE_RENDER_LEASE_ENABLED", True))
+
+
+@contextmanager
+def _render_lease(lock_key: str):
+    """
+    Extend single-flight across worker processes through the L2 cache.
+
+    Waiters block until the owner has cached the tile; on timeout or lease
+    errors the request falls through and renders on its own.
+    """
+    lease = getattr(tile_cache, "render_lease", None)
+    if lease is None or not _render_lease_enabled():
+        yield
+        return
+
+    timeout = max(0.0, float(getattr(settings, "TILE_RENDER_LEASE_TIMEOUT_SECONDS", 10.0) or 0.0))
+    ttl = max(1.0, float(getattr(settings, "TILE_RENDER_LEASE_TTL_SECONDS", 30.0) or 1.0))
+    with ExitStack() as stack:
+        try:
+            acquired = stack.enter_context(lease(lock_key, timeout=timeout, ttl=ttl))
+        except Exception:
+            logger.exception("Tile render lease failed; rendering without coalescing")
+            acquired = None
+        if acquired is False:
+            logger.warning("Tile render lease wait timed out after %.1fs; rendering anyway", timeout)
+        yield
+
+
 @dataclass
 class _TileRenderResult:
     content: bytes
@@ -90,6 +122,53 @@ def _png_save_options() -> dict:
     return {"format": "PNG", "compress_level": _png_compress_level()}
 
 
+TILE_MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+}
+
+
+def _webp_enabled() -> bool:
+    return bool(getattr(settings, "TILE_WEBP_ENABLED", True))
+
+
+def _webp_save_options() -> dict:
+    lossless = bool(getattr(settings, "TILE_WEBP_LOSSLESS", True))
+    quality = int(getattr(settings, "TILE_WEBP_QUALITY", 80) or 80)
+    method = int(getattr(settings, "TILE_WEBP_METHOD", 2) or 0)
+    return {
+        "format": "WEBP",
+        "lossless": lossless,
+        "quality": min(100, max(0, quality)),
+        "method": min(6, max(0, method)),
+        "exact": lossless,
+    }
+
+
+def _palette_max_colors() -> int:
+    colors = int(getattr(settings, "TILE_PALETTE_MAX_COLORS", 256) or 0)
+    return min(256, max(0, colors))
+
+
+def _negotiate_tile_format(accept: str | None) -> str:
+    """Pick WebP when the client lists it with a non-zero q-value."""
+    if not accept or not _webp_enabled():
+        return "png"
+    for media_range in accept.split(","):
+        media_type, _, params = media_range.strip().partition(";")
+        if media_type.strip().lower() != "image/webp":
+            continue
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return "webp" if float(value) > 0 else "png"
+                except ValueError:
+                    return "png"
+        return "webp"
+    return "png"
+
+
 @lru_cache(maxsize=1)
 def _empty_png_bytes() -> bytes:
     img = Image.new("RGBA", (settings.TILE_SIZE, settings.TILE_SIZE), (0, 0, 0, 0))
@@ -98,29 +177,102 @@ def _empty_png_bytes() -> bytes:
     return buf.getvalue()
 
 
+@lru_cache(maxsize=1)
+def _empty_webp_bytes() -> bytes:
+    img = Image.new("RGBA", (settings.TILE_SIZE, settings.TILE_SIZE), (0, 0, 0, 0))
+    buf = io.BytesIO()
+    img.save(buf, **_webp_save_options())
+    return buf.getvalue()
+
+
+def _empty_tile_bytes(tile_format: str = "png") -> bytes:
+    if tile_format == "webp":
+        return _empty_webp_bytes()
+    return _empty_png_bytes()
+
+
 def _png_response(
     content: bytes,
     status_code: int = 200,
     headers: dict[str, str] | None = None,
+) -> Response:
+    return _tile_response(content, "png", status_code=status_code, headers=headers)
+
+
+def _tile_response(
+    content: bytes,
+    tile_format: str,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
 ) -> Response:
     return Response(
         content=content,
-        media_type="image/png",
+        media_type=TILE_MEDIA_TYPES.get(tile_format, "image/png"),
         status_code=status_code,
         headers=headers,
     )
 
 
+def _encode_tile(tile_data, tile_format: str = "png") -> bytes:
+    if tile_format == "webp":
+        return _encode_webp(tile_data)
+    return _encode_png(tile_data)
+
+
+def _encode_webp(tile_data) -> bytes:
+    if tile_data is None:
+        return _empty_webp_bytes()
+
+    img = Image.fromarray(tile_data)
+    buf = io.BytesIO()
+    img.save(buf, **_webp_save_options())
+    return buf.getvalue()
+
+
 def _encode_png(tile_data) -> bytes:
     if tile_data is None:
         return _empty_png_bytes()
 
-    img = Image.fromarray(tile_data)
+    img, extra_options = _png_image(tile_data)
     buf = io.BytesIO()
-    img.save(buf, **_png_save_options())
+    img.save(buf, **_png_save_options(), **extra_options)
     return buf.getvalue()
 
 
+def _png_image(tile_data) -> tuple[Image.Image, dict]:
+    """
+    Smallest lossless PNG representation of an RGBA tile.
+
+    Classification and mask tiles usually hold a handful of colors and become
+    8-bit paletted PNGs with a tRNS chunk; grey single-band tiles drop to
+    two-channel LA; everything else keeps the RGBA path.
+    """
+    rgba = np.ascontiguousarray(tile_data, dtype=np.uint8)
+    img = Image.fromarray(rgba)
+    max_colors = _palette_max_colors()
+    if max_colors and img.getcolors(max_colors) is not None:
+        packed = rgba.view(np.uint32)[..., 0]
+        colors, indices = np.unique(packed, return_inverse=True)
+        palette_rgba = colors.view(np.uint8).reshape(-1, 4)
+        height, width = packed.shape
+        palette_img = Image.frombytes(
+            "P",
+            (width, height),
+            indices.astype(np.uint8).tobytes(),
+        )
+        palette_img.putpalette(palette_rgba[:, :3].tobytes(), rawmode="RGB")
+        options = {}
+        if np.any(palette_rgba[:, 3] != 255):
+            options["transparency"] = palette_rgba[:, 3].tobytes()
+        return palette_img, options
+
+    if np.array_equal(rgba[..., 0], rgba[..., 1]) and np.array_equal(rgba[..., 1], rgba[..., 2]):
+        height, width = rgba.shape[:2]
+        return Image.frombytes("LA", (width, height), rgba[..., [0, 3]].tobytes()), {}
+
+    return img, {}
+
+
 def _parse_bands(bands: str):
     parsed = []
     seen = set()
@@ -170,6 +322,8 @@ def _render_options() -> dict:
     return {
         "resampling": _resampling_mode(),
         "png_compress": _png_compress_level(),
+        "palette_colors": _palette_max_colors(),
+        "webp": _webp_save_options(),
     }
 
 
@@ -194,6 +348,22 @@ def _validate_tile_coordinates(z: int, x: int, y: int) -> None:
         )
 
 
+def _metatile_span(z: int) -> int:
+    """
+    Metatile edge length for zoom ``z``; 1 disables metatile rendering.
+
+    Sub-tiles are sliced linearly out of one source window, which only tracks
+    the Web Mercator grid closely once a block spans a small latitude range,
+    so low zooms keep rendering tile by tile.
+    """
+    span = int(getattr(settings, "TILE_METATILE_SIZE", 1) or 1)
+    min_zoom = int(getattr(settings, "TILE_METATILE_MIN_ZOOM", 0) or 0)
+    if span <= 1 or z < min_zoom:
+        return 1
+    span = 1 << (min(span, 16).bit_length() - 1)
+    return max(1, min(span, 1 << z))
+
+
 def _render_lock_key(
     file_path: str | None,
     index_id: str,
@@ -217,6 +387,7 @@ def _render_tile_sync(
     band_key: str,
     alpha_strategy: str,
     render_options: dict,
+    tile_format: str = "png",
 ) -> _TileRenderResult:
     timings = {
         "singleflight_wait": 0.0,
@@ -226,26 +397,31 @@ def _render_tile_sync(
         "png_encode": 0.0,
         "cache_set": 0.0,
     }
-    wait_start = time.perf_counter()
-    lock_key = _render_lock_key(file_path, index_id, z, x, y, band_key)
+    meta_x, meta_y, span = metatile_origin(x, y, z, _metatile_span(z))
+    if span > 1:
+        # Neighbouring requests in one block share a lock so the block is
+        # read once and the waiters are answered from the cache.
+        lock_key = _render_lock_key(
+            file_path, index_id, z, meta_x, meta_y, f"{band_key}@meta{span}.{tile_format}"
+        )
+    else:
+        lock_key = _render_lock_key(file_path, index_id, z, x, y, f"{band_key}.{tile_format}")
 
-    with _TILE_RENDER_LOCKS.hold(lock_key):
-        timings["singleflight_wait"] = (time.perf_counter() - wait_start) * 1000.0
+    start = time.perf_counter()
+    file_exists = bool(file_path and os.path.exists(file_path))
+    file_version = _file_version(file_path) if file_exists else None
+    timings["file_stat"] = (time.perf_counter() - start) * 1000.0
 
-        start = time.perf_counter()
-        file_exists = bool(file_path and os.path.exists(file_path))
-        file_version = _file_version(file_path) if file_exists else None
-        timings["file_stat"] = (time.perf_counter() - start) * 1000.0
-
-        if not file_exists:
-            return _TileRenderResult(
-                content=_empty_png_bytes(),
-                file_version=None,
-                cache_hit=False,
-                missing_source=True,
-                timings=timings,
-            )
+    if not file_exists:
+        return _TileRenderResult(
+            content=_empty_tile_bytes(tile_format),
+            file_version=None,
+            cache_hit=False,
+            missing_source=True,
+            timings=timings,
+        )
 
+    def cached_result() -> _TileRenderResult | None:
         start = time.perf_counter()
         try:
             cached_tile = tile_cache.get_tile(
@@ -259,21 +435,64 @@ def _render_tile_sync(
                 renderer_version=RENDER_CACHE_VERSION,
                 alpha_strategy=alpha_strategy,
                 render_options=render_options,
+                tile_format=tile_format,
             )
         except Exception:
             cached_tile = None
             logger.exception("Tile cache read failed; rendering without cache")
-        timings["cache_get"] = (time.perf_counter() - start) * 1000.0
-        if cached_tile is not None:
-            return _TileRenderResult(
-                content=cached_tile,
-                file_version=file_version,
-                cache_hit=True,
-                missing_source=False,
-                timings=timings,
-            )
+        timings["cache_get"] += (time.perf_counter() - start) * 1000.0
+        if cached_tile is None:
+            return None
+        return _TileRenderResult(
+            content=cached_tile,
+            file_version=file_version,
+            cache_hit=True,
+            missing_source=False,
+            timings=timings,
+        )
+
+    # Hits never touch the locks or the L2 lease; only misses coalesce.
+    cached = cached_result()
+    if cached is not None:
+        return cached
+
+    wait_start = time.perf_counter()
+    with _TILE_RENDER_LOCKS.hold(lock_key), _render_lease(lock_key):
+        timings["singleflight_wait"] = (time.perf_counter() - wait_start) * 1000.0
+
+        # Another thread or worker may have rendered it while we waited.
+        cached = cached_result()
+        if cached is not None:
+            return cached
 
         engine = get_tile_engine(file_path)
+        if span > 1:
+            content = _render_metatile(
+                engine,
+                index_id,
+                z,
+                x,
+                y,
+                meta_x,
+                meta_y,
+                span,
+                requested_bands,
+                band_key,
+                file_version,
+                alpha_strategy,
+                render_options,
+                tile_format,
+                timings,
+            )
+            if content is not None:
+                return _TileRenderResult(
+                    content=content,
+                    file_version=file_version,
+                    cache_hit=False,
+                    missing_source=False,
+                    timings=timings,
+                )
+
         start = time.perf_counter()
         tile_data = engine.read_tile(
             x,
@@ -284,7 +503,7 @@ def _render_tile_sync(
         timings["engine_read"] = (time.perf_counter() - start) * 1000.0
 
         start = time.perf_counter()
-        content = _encode_png(tile_data)
+        content = _encode_tile(tile_data, tile_format)
         timings["png_encode"] = (time.perf_counter() - start) * 1000.0
 
         start = time.perf_counter()
@@ -301,6 +520,7 @@ def _render_tile_sync(
                 renderer_version=RENDER_CACHE_VERSION,
                 alpha_strategy=alpha_strategy,
                 render_options=render_options,
+                tile_format=tile_format,
             )
         except Exception:
             logger.exception("Tile cache write failed; returning rendered tile")
@@ -314,6 +534,71 @@ def _render_tile_sync(
         )
 
 
+def _render_metatile(
+    engine,
+    index_id: str,
+    z: int,
+    x: int,
+    y: int,
+    meta_x: int,
+    meta_y: int,
+    span: int,
+    requested_bands: list[int],
+    band_key: str,
+    file_version: str,
+    alpha_strategy: str,
+    render_options: dict,
+    tile_format: str,
+    timings: dict,
+) -> bytes | None:
+    """
+    Render the metatile containing x/y, cache every sub-tile and return the
+    encoded requested tile. Returns ``None`` when the block read failed so the
+    caller can fall back to a single-tile render.
+    """
+    start = time.perf_counter()
+    tiles = engine.read_metatile(
+        meta_x,
+        meta_y,
+        z,
+        span,
+        bands=requested_bands,
+    )
+    timings["engine_read"] = (time.perf_counter() - start) * 1000.0
+    if (x, y) not in tiles:
+        return None
+
+    start = time.perf_counter()
+    encoded = {
+        coords: _encode_tile(tile_data, tile_format)
+        for coords, tile_data in tiles.items()
+    }
+    timings["png_encode"] = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    for (tile_x, tile_y), content in encoded.items():
+        try:
+            tile_cache.set_tile(
+                index_id,
+                z,
+                tile_x,
+                tile_y,
+                band_key,
+                content,
+                file_version=file_version,
+                tile_size=settings.TILE_SIZE,
+                renderer_version=RENDER_CACHE_VERSION,
+                alpha_strategy=alpha_strategy,
+                render_options=render_options,
+                tile_format=tile_format,
+            )
+        except Exception:
+            logger.exception("Tile cache write failed; returning rendered tile")
+            break
+    timings["cache_set"] = (time.perf_counter() - start) * 1000.0
+    return encoded[(x, y)]
+
+
 def _tile_http_headers(
     content: bytes,
     file_version: str | None,
@@ -343,11 +628,14 @@ def _tile_http_headers(
     cache_control = f"public, max-age={max_age}"
     if stale:
         cache_control += f", stale-while-revalidate={stale}"
-    return {
+    headers = {
         "Cache-Control": cache_control,
         "ETag": f'"{etag}"',
         "X-Content-Type-Options": "nosniff",
     }
+    if _webp_enabled():
+        headers["Vary"] = "Accept"
+    return headers
 
 
 def _etag_matches(if_none_match: str | None, etag: str | None) -> bool:
@@ -368,6 +656,7 @@ async def get_tile(
     y: int,
     bands: str = settings.DEFAULT_BANDS,
     if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    accept: str | None = Header(default=None, alias="Accept"),
     db: AsyncSession = Depends(get_db),
 ):
     profile = _profile_enabled()
@@ -387,6 +676,7 @@ async def get_tile(
     file_path = None
     alpha_strategy = _alpha_strategy()
     render_options = _render_options()
+    tile_format = _negotiate_tile_format(accept if isinstance(accept, str) else None)
 
     try:
         _validate_tile_coordinates(z, x, y)
@@ -407,6 +697,7 @@ async def get_tile(
             band_key,
             alpha_strategy,
             render_options,
+            tile_format,
         )
         timings.update(result.timings)
         cache_hit = result.cache_hit
@@ -417,7 +708,7 @@ async def get_tile(
         if _etag_matches(request_etag, headers.get("ETag")):
             response_len = 0
             return Response(status_code=304, headers=headers)
-        return _png_response(result.content, headers=headers)
+        return _tile_response(result.content, tile_format, headers=headers)
 
     except HTTPException:
         raise
@@ -431,7 +722,7 @@ async def get_tile(
                 "tile_route_profile index=%s z=%s x=%s y=%s bands=%s "
                 "db_path=%.2fms wait=%.2fms file_stat=%.2fms cache_get=%.2fms "
                 "engine=%.2fms encode=%.2fms cache_set=%.2fms total=%.2fms "
-                "cache_hit=%s bytes=%s alpha=%s renderer=%s file_version=%s path=%s",
+                "cache_hit=%s bytes=%s format=%s alpha=%s renderer=%s file_version=%s path=%s",
                 index_id,
                 z,
                 x,
@@ -447,6 +738,7 @@ async def get_tile(
                 total_ms,
                 cache_hit,
                 response_len,
+                tile_format,
                 alpha_strategy,
                 RENDER_CACHE_VERSION,
                 file_version,
@@ -454,6 +746,22 @@ async def get_tile(
             )
 
 
+@router.delete("/tile/cache/{index_id}")
+async def invalidate_tile_cache(index_id: str, file_version: str | None = None):
+    """
+    Evict cached tiles for one raster, optionally only one file version.
+
+    Called by the data service when a raster is deleted or its file replaced.
+    """
+    try:
+        result = await run_in_threadpool(tile_cache.invalidate_raster, index_id, file_version)
+    except Exception as e:
+        logger.exception("Tile cache invalidation failed for %s", index_id)
+        raise HTTPException(status_code=500, detail=str(e))
+    logic.forget_raster_path(index_id)
+    return result
+
+
 @router.get("/debug/render-first.png")
 async def debug_render_first(db: AsyncSession = Depends(get_db)):
     query = text("SELECT index_id, file_path FROM raster_metadata ORDER BY id DESC LIMIT 1")
@@ -0,0 +1,198 @@
+"""
+Offline tile pre-seeding for freshly written rasters.
+
+Seeding renders a zoom range over a raster's WGS84 footprint through the same
+render path as ``GET /tile/...`` so the cache keys match live requests, and
+stores the results in the shared diskcache L2. Low zooms are rendered first so
+the overview is warm before the detailed levels.
+"""
+
+import logging
+import os
+import time
+from collections.abc import Callable, Iterator, Sequence
+
+import mercantile
+import rasterio
+
+from functions.implement.spatial_ops import get_wgs84_bounds
+from services.tile_service.core.config import settings
+from services.tile_service.engine.stats import write_band_stats
+
+logger = logging.getLogger("tile_service.seeding")
+
+ProgressCallback = Callable[[int, str], None]
+
+_MERCATOR_MAX_LAT = 85.0511287798066
+
+
+def _seed_zoom_range(min_zoom: int | None, max_zoom: int | None) -> tuple[int, int]:
+    max_allowed = max(0, int(getattr(settings, "TILE_MAX_ZOOM", 24) or 24))
+    if min_zoom is None:
+        min_zoom = int(getattr(settings, "TILE_SEED_MIN_ZOOM", 0) or 0)
+    if max_zoom is None:
+        max_zoom = int(getattr(settings, "TILE_SEED_MAX_ZOOM", 12) or 0)
+    min_zoom = min(max(0, int(min_zoom)), max_allowed)
+    max_zoom = min(max(min_zoom, int(max_zoom)), max_allowed)
+    return min_zoom, max_zoom
+
+
+def _seed_max_tiles() -> int:
+    return max(1, int(getattr(settings, "TILE_SEED_MAX_TILES", 5000) or 5000))
+
+
+def raster_bounds_wgs84(file_path: str) -> list[float]:
+    with rasterio.open(file_path) as src:
+        return list(get_wgs84_bounds(src.crs, src.bounds))
+
+
+def _clamp_bounds(bounds_wgs84: Sequence[float]) -> tuple[float, float, float, float]:
+    west, south, east, north = (float(value) for value in bounds_wgs84[:4])
+    west = min(max(west, -180.0), 180.0)
+    east = min(max(east, -180.0), 180.0)
+    south = min(max(south, -_MERCATOR_MAX_LAT), _MERCATOR_MAX_LAT)
+    north = min(max(north, -_MERCATOR_MAX_LAT), _MERCATOR_MAX_LAT)
+    if east <= west or north <= south:
+        raise ValueError(f"Degenerate WGS84 bounds for tile seeding: {bounds_wgs84}")
+    return west, south, east, north
+
+
+def _zoom_tile_count(bounds: tuple[float, float, float, float], zoom: int) -> int:
+    west, south, east, north = bounds
+    upper_left = mercantile.tile(west, north, zoom)
+    lower_right = mercantile.tile(east, south, zoom)
+    return (lower_right.x - upper_left.x + 1) * (lower_right.y - upper_left.y + 1)
+
+
+def plan_seed_zooms(
+    bounds_wgs84: Sequence[float],
+    min_zoom: int | None = None,
+    max_zoom: int | None = None,
+    max_tiles: int | None = None,
+) -> list[tuple[int, int]]:
+    """
+    Return ``[(zoom, tile_count), ...]`` from low to high zoom.
+
+    Zooms are added until the next level would push the total over
+    ``max_tiles``; the minimum zoom is always kept so tiny budgets still warm
+    the overview.
+    """
+    bounds = _clamp_bounds(bounds_wgs84)
+    min_zoom, max_zoom = _seed_zoom_range(min_zoom, max_zoom)
+    budget = _seed_max_tiles() if max_tiles is None else max(1, int(max_tiles))
+
+    plan = []
+    total = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        count = _zoom_tile_count(bounds, zoom)
+        if plan and total + count > budget:
+            break
+        plan.append((zoom, count))
+        total += count
+    return plan
+
+
+def iter_seed_tiles(
+    bounds_wgs84: Sequence[float],
+    zooms: Sequence[int],
+) -> Iterator[mercantile.Tile]:
+    """Yield tiles zoom by zoom, in row-major order within each zoom."""
+    west, south, east, north = _clamp_bounds(bounds_wgs84)
+    for zoom in sorted(zooms):
+        yield from mercantile.tiles(west, south, east, north, zooms=[zoom])
+
+
+def seed_raster_tiles(
+    index_id: str | int,
+    file_path: str,
+    bounds_wgs84: Sequence[float] | None = None,
+    *,
+    min_zoom: int | None = None,
+    max_zoom: int | None = None,
+    bands: str | None = None,
+    tile_format: str | None = None,
+    max_tiles: int | None = None,
+    progress: ProgressCallback | None = None,
+) -> dict:
+    """
+    Render and cache every tile of ``file_path`` in the configured zoom range.
+
+    ``file_path`` must be the path the tile service resolves for ``index_id``
+    (normally the COG) because the cache key includes its validity signature.
+    Tiles that are already cached are skipped. ``tile_format`` defaults to
+    WebP when the tile service serves it, since map clients advertise it.
+    """
+    from services.tile_service import router as tile_router
+
+    if not file_path or not os.path.exists(file_path):
+        raise FileNotFoundError(f"Raster not found for tile seeding: {file_path}")
+
+    if bounds_wgs84 is None:
+        bounds_wgs84 = raster_bounds_wgs84(file_path)
+
+    plan = plan_seed_zooms(bounds_wgs84, min_zoom, max_zoom, max_tiles)
+    total = sum(count for _, count in plan)
+    requested_bands = tile_router._parse_bands(bands or settings.DEFAULT_BANDS)
+    band_key = ",".join(str(b) for b in requested_bands)
+    alpha_strategy = tile_router._alpha_strategy()
+    render_options = tile_router._render_options()
+    if tile_format is None:
+        tile_format = "webp" if tile_router._webp_enabled() else "png"
+
+    # Persist stretch stats first so every worker can render without the
+    # overview read, even for tiles outside the seeded zoom range.
+    try:
+        write_band_stats(file_path, requested_bands)
+    except Exception:
+        logger.exception("Band stats precompute failed for %s", file_path)
+
+    start = time.perf_counter()
+    rendered = 0
+    cached = 0
+    done = 0
+    current_zoom = None
+    for tile in iter_seed_tiles(bounds_wgs84, [zoom for zoom, _ in plan]):
+        if progress is not None and tile.z != current_zoom:
+            current_zoom = tile.z
+            progress(
+                int(100 * done / total) if total else 0,
+                f"Seeding zoom {tile.z} ({done}/{total} tiles)",
+            )
+
+        result = tile_router._render_tile_sync(
+            file_path,
+            str(index_id),
+            tile.z,
+            tile.x,
+            tile.y,
+            requested_bands,
+            band_key,
+            alpha_strategy,
+            render_options,
+            tile_format,
+        )
+        if result.cache_hit:
+            cached += 1
+        else:
+            rendered += 1
+        done += 1
+
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    logger.info(
+        "tile_seed index=%s zooms=%s tiles=%s rendered=%s cached=%s total=%.2fms",
+        index_id,
+        [zoom for zoom, _ in plan],
+        done,
+        rendered,
+        cached,
+        elapsed_ms,
+    )
+    return {
+        "index_id": str(index_id),
+        "format": tile_format,
+        "zooms": [zoom for zoom, _ in plan],
+        "tiles": done,
+        "rendered": rendered,
+        "cached": cached,
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
@@ -0,0 +1,130 @@
+"""
+Two-level MVT cache for the vector tile service.
+
+Keys embed the layer's ``edit_version`` (bumped by annotation_service on every
+feature write), so an edit never needs an explicit purge: the next request
+looks up the new version and misses, while tiles of older versions age out of
+the byte-bounded LRU levels.
+"""
+
+import logging
+import os
+from threading import RLock
+from typing import Optional
+
+from cachetools import LRUCache
+
+logger = logging.getLogger("vtile_service.cache")
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        logger.warning("Ignoring invalid %s", name)
+        return default
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name, "1" if default else "0").strip().lower()
+    return value not in {"0", "false", "no", "off"}
+
+
+class VectorTileCache:
+    def __init__(
+        self,
+        l1_bytes: int = 64 * 1024 ** 2,
+        l2_dir: Optional[str] = None,
+        l2_limit: int = 2 * 1024 ** 3,
+    ):
+        self.l1_cache = LRUCache(maxsize=max(1, l1_bytes), getsizeof=lambda data: max(1, len(data)))
+        self.l2_dir = l2_dir
+        self.l2_limit = l2_limit
+        self._l2_cache = None
+        self._l1_lock = RLock()
+        self._l2_init_lock = RLock()
+
+    @staticmethod
+    def make_key(layer_id: str, edit_version: int, z: int, x: int, y: int, variant: str = "") -> str:
+        key = f"{layer_id}/{edit_version}/{z}/{x}/{y}"
+        return f"{key}/{variant}" if variant else key
+
+    def _get_l2_cache(self):
+        if self.l2_dir is None:
+            return None
+        if self._l2_cache is None:
+            with self._l2_init_lock:
+                if self._l2_cache is None:
+                    from diskcache import Cache
+
+                    self._l2_cache = Cache(self.l2_dir, size_limit=self.l2_limit)
+        return self._l2_cache
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._l1_lock:
+            data = self.l1_cache.get(key)
+        if data is not None:
+            return data
+
+        l2 = self._get_l2_cache()
+        if l2 is None:
+            return None
+        try:
+            data = l2.get(key)
+        except Exception as exc:
+            logger.warning("MVT L2 read failed for %s: %s", key, exc)
+            return None
+        if data is not None:
+            self._l1_store(key, data)
+        return data
+
+    def set(self, key: str, data: bytes):
+        self._l1_store(key, data)
+        l2 = self._get_l2_cache()
+        if l2 is None:
+            return
+        try:
+            l2.set(key, data)
+        except Exception as exc:
+            logger.warning("MVT L2 write failed for %s: %s", key, exc)
+
+    def _l1_store(self, key: str, data: bytes):
+        try:
+            with self._l1_lock:
+                self.l1_cache[key] = data
+        except ValueError:
+            # Larger than the whole L1 budget; the L2 still keeps it.
+            pass
+
+    def clear(self):
+        with self._l1_lock:
+            self.l1_cache.clear()
+        l2 = self._get_l2_cache()
+        if l2 is not None:
+            l2.clear()
+
+    def stats(self) -> dict:
+        with self._l1_lock:
+            l1_entries = len(self.l1_cache)
+            l1_bytes = self.l1_cache.currsize
+        l2 = self._get_l2_cache()
+        return {
+            "l1_entries": l1_entries,
+            "l1_bytes": l1_bytes,
+            "l1_limit": self.l1_cache.maxsize,
+            "l2_bytes": l2.volume() if l2 is not None else 0,
+            "l2_limit": self.l2_limit if l2 is not None else 0,
+        }
+
+
+def build_vector_tile_cache() -> Optional[VectorTileCache]:
+    if not _env_flag("VTILE_CACHE_ENABLED", True):
+        return None
+    l2_dir = os.getenv("VTILE_CACHE_DIR", os.path.join(BASE_DIR, ".vtile_cache"))
+    return VectorTileCache(
+        l1_bytes=_env_int("VTILE_CACHE_L1_BYTES", 64 * 1024 ** 2),
+        l2_dir=l2_dir or None,
+        l2_limit=_env_int("VTILE_CACHE_L2_BYTES", 2 * 1024 ** 3),
+    )
@@ -1,11 +1,16 @@
 import os
 import time
+from collections import deque
 
 import numpy as np
 import pytest
 
+from functions.implement.classification import _assign_nearest
 from functions.implement.extraction import extract_building, extract_cloud, extract_vegetation, extract_water
+from functions.implement.flow_routing import d8_flow, filled_d8_flow, flow_accumulation
 from functions.implement.spectral_indices import calculate_ndvi_array
+from functions.implement.texture_features import _glcm_texture
+from functions.implement.time_series_analysis import _interpolate_missing
 
 
 pytestmark = pytest.mark.benchmark
@@ -64,3 +69,110 @@ def test_extraction_modes_512_latency_budget():
         assert mask.dtype == np.uint8
         assert latency_ms < 250.0
         print(f"{name} 512x512 latency: {latency_ms:.2f} ms")
+
+
+def test_glcm_texture_1024_latency_budget():
+    _require_benchmarks_enabled()
+    _, _, _, nir, _ = _synthetic_reflectance(size=1024)
+    rng = np.random.default_rng(0)
+    band = nir + rng.normal(0.0, 0.02, nir.shape).astype("float32")
+    valid_mask = np.ones(band.shape, dtype=bool)
+
+    for property_name, budget_ms in (("contrast", 500.0), ("correlation", 1000.0), ("entropy", 3000.0)):
+        latency_ms, (result, _) = _time_call(
+            _glcm_texture, band, valid_mask, 32, 7, 1, 45.0, property_name, runs=3,
+        )
+        assert result.shape == band.shape
+        assert np.isfinite(result).all()
+        assert latency_ms < budget_ms
+        print(f"GLCM {property_name} 1024x1024 (32 levels, 7x7) latency: {latency_ms:.2f} ms")
+
+
+def _interpolate_missing_per_pixel(stack, valid_mask):
+    time_count = stack.shape[0]
+    series = stack.reshape(time_count, -1)
+    valid = valid_mask.reshape(time_count, -1)
+    filled = np.full_like(series, np.nan, dtype="float32")
+    x = np.arange(time_count, dtype="float64")
+    for pixel in np.flatnonzero(valid.any(axis=0)):
+        pixel_valid = valid[:, pixel]
+        filled[:, pixel] = np.interp(x, x[pixel_valid], series[pixel_valid, pixel]).astype("float32")
+    return filled.reshape(stack.shape)
+
+
+def test_time_series_gap_filling_30x512_vectorized_vs_per_pixel():
+    _require_benchmarks_enabled()
+    rng = np.random.default_rng(0)
+    stack = rng.normal(0.4, 0.2, (30, 512, 512)).astype("float32")
+    valid_mask = rng.random(stack.shape) > 0.3
+    stack[~valid_mask] = np.nan
+
+    loop_ms, expected = _time_call(_interpolate_missing_per_pixel, stack, valid_mask, runs=1)
+    vectorized_ms, (filled, _) = _time_call(_interpolate_missing, stack, valid_mask, runs=3)
+
+    np.testing.assert_array_equal(filled, expected)
+    assert vectorized_ms * 5 < loop_ms
+    print(f"Gap filling 30x512x512: per-pixel {loop_ms:.0f} ms, vectorized {vectorized_ms:.0f} ms")
+
+
+def _synthetic_terrain(size=1024, seed=0):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices((size, size), dtype="float32")
+    terrain = 200.0 + 0.05 * rows + 10.0 * np.sin(cols / 40.0) + 8.0 * np.cos(rows / 55.0)
+    return (terrain + rng.normal(0.0, 0.5, terrain.shape)).astype("float32")
+
+
+def _flow_accumulation_per_cell(receiver, valid_mask):
+    flat_receiver = receiver.ravel()
+    indegree = np.bincount(flat_receiver[flat_receiver >= 0], minlength=flat_receiver.size)
+    accumulation = valid_mask.ravel().astype("float64")
+    queue = deque(np.flatnonzero(valid_mask.ravel() & (indegree == 0)).tolist())
+    while queue:
+        cell = queue.popleft()
+        target = flat_receiver[cell]
+        if target < 0:
+            continue
+        accumulation[target] += accumulation[cell]
+        indegree[target] -= 1
+        if indegree[target] == 0:
+            queue.append(int(target))
+    return accumulation.reshape(receiver.shape).astype("float32")
+
+
+def test_flow_routing_1024_vectorized_vs_per_cell():
+    _require_benchmarks_enabled()
+    dem = _synthetic_terrain()
+    valid_mask = np.ones(dem.shape, dtype=bool)
+    _, receiver = d8_flow(dem, valid_mask, 10.0, 10.0)
+
+    loop_ms, expected = _time_call(_flow_accumulation_per_cell, receiver, valid_mask, runs=1)
+    vectorized_ms, accumulation = _time_call(flow_accumulation, receiver, valid_mask, runs=3)
+    fill_ms, (_, _, filled_receiver) = _time_call(filled_d8_flow, dem, valid_mask, 10.0, 10.0, runs=1)
+
+    np.testing.assert_array_equal(accumulation, expected)
+    assert vectorized_ms * 5 < loop_ms
+    # Noisy terrain: roughly a third of the cells sit in filled depressions.
+    assert fill_ms < 5000
+    assert int(np.count_nonzero(filled_receiver < 0)) < int(np.count_nonzero(receiver < 0))
+    print(
+        f"Flow routing 1024x1024: per-cell accumulation {loop_ms:.0f} ms, "
+        f"vectorized {vectorized_ms:.0f} ms, priority-flood fill + D8 {fill_ms:.0f} ms"
+    )
+
+
+def test_kmeans_assignment_1m_pixels_gemm_vs_broadcast():
+    _require_benchmarks_enabled()
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(1_000_000, 6)).astype("float32")
+    centers = rng.normal(size=(8, 6)).astype("float32")
+
+    def broadcast(features, centers):
+        return np.argmin(np.sum((features[:, None, :] - centers[None, :, :]) ** 2, axis=2), axis=1)
+
+    broadcast_ms, expected = _time_call(broadcast, features, centers, runs=1)
+    gemm_ms, nearest = _time_call(_assign_nearest, features, centers, runs=3)
+
+    # Rounding can flip exact ties between equidistant centers.
+    assert np.count_nonzero(nearest != expected) <= 10
+    assert gemm_ms * 3 < broadcast_ms
+    print(f"K-means assignment 1M x 6 bands, 8 centers: broadcast {broadcast_ms:.0f} ms, GEMM {gemm_ms:.0f} ms")
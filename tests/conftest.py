@@ -1,8 +1,20 @@
 import os
 import sys
 
+import pytest
+
 
 def pytest_configure(config):
     root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     if root not in sys.path:
         sys.path.insert(0, root)
+
+
+@pytest.fixture(autouse=True)
+def _aligned_cache_outside_repo(tmp_path_factory, monkeypatch):
+    """Keep warped-input cache entries out of the repo's storage tree."""
+    try:
+        from functions.implement import aligned_cache
+    except ImportError:
+        return
+    monkeypatch.setattr(aligned_cache, "ALIGNED_CACHE_DIR", str(tmp_path_factory.getbasetemp() / "aligned_cache"))
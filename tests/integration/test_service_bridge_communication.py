@@ -7,7 +7,7 @@ import httpx
 import pytest
 
 pytest.importorskip("fastapi")
-from services.data_service.bridges import vector_bridge
+from services.data_service.bridges import tile_bridge, vector_bridge
 
 
 pytestmark = pytest.mark.integration
@@ -25,6 +25,8 @@ def _record_httpx_requests(monkeypatch, module, responses):
     def handler(request):
         requests.append(request)
         status_code, payload = next(pending_responses)
+        if isinstance(payload, str):
+            return httpx.Response(status_code, text=payload, request=request)
         return httpx.Response(status_code, json=payload, request=request)
 
     transport = httpx.MockTransport(handler)
@@ -71,12 +73,13 @@ def test_export_bridge_reads_features_and_fields_from_annotation_port(monkeypatc
         "geometry": {"type": "Point", "coordinates": [120.0, 30.0]},
         "properties": {"category": "sample"},
     }
+    other = {**feature, "properties": {"category": "other"}}
     field = {"field_name": "category", "field_type": "string"}
     requests = _record_httpx_requests(
         monkeypatch,
         vector_bridge,
         [
-            (200, {"type": "FeatureCollection", "features": [feature]}),
+            (200, "".join(json.dumps(item) + "\n" for item in (feature, other))),
             (200, [field]),
         ],
     )
@@ -84,8 +87,9 @@ def test_export_bridge_reads_features_and_fields_from_annotation_port(monkeypatc
     features = _run(vector_bridge.internal_fetch_features(layer_id))
     fields = _run(vector_bridge.internal_fetch_fields(layer_id))
 
-    assert features == [feature]
+    assert features == [feature, other]
     assert fields == [field]
+    assert requests[0].url.params["format"] == "ndjson"
     assert [(request.method, request.url.port, request.url.path) for request in requests] == [
         ("GET", 8001, f"/layers/{layer_id}/features/export"),
         ("GET", 8001, f"/{layer_id}/fields"),
@@ -174,3 +178,24 @@ def test_script_bridge_posts_to_executor_service_port(monkeypatch, tmp_path):
         {"path": str(input_path), "name": "source.tif", "raster_id": 42, "alias": "raster_42"}
     ]
     assert payload["output_name"].endswith("_script_raw.tif")
+
+
+def test_tile_bridge_invalidates_each_raster_key_and_tolerates_failures(monkeypatch):
+    requests = _record_httpx_requests(
+        monkeypatch,
+        tile_bridge,
+        [(200, {"l1_removed": 2, "l2_removed": 5}), (500, {"detail": "boom"})],
+    )
+
+    removed = _run(
+        tile_bridge.invalidate_raster_tiles(
+            tile_bridge.raster_tile_keys(7, 1729),
+            file_version="raster:1:2",
+        )
+    )
+
+    assert removed == 7
+    assert [request.method for request in requests] == ["DELETE", "DELETE"]
+    assert requests[0].url.port == 8005
+    assert [request.url.path for request in requests] == ["/tile/cache/1729", "/tile/cache/7"]
+    assert requests[0].url.params["file_version"] == "raster:1:2"
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+
+from functions.implement import aligned_cache as cache_module
+from functions.implement.aligned_cache import (
+    aligned_raster_path,
+    evict_aligned_cache,
+    open_aligned,
+    read_masked_aligned,
+)
+from functions.implement.raster_validity import aligned_vrt, read_masked_from_vrt
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "aligned_cache"
+    monkeypatch.setattr(cache_module, "ALIGNED_CACHE_DIR", str(directory))
+    monkeypatch.setattr(cache_module, "ALIGNED_CACHE_ENABLED", True)
+    return directory
+
+
+def _write_raster(path, data, *, origin=(0, 40), size=10, dtype="float32", nodata=None):
+    if data.ndim == 2:
+        data = data[np.newaxis, ...]
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[1],
+        width=data.shape[2],
+        count=data.shape[0],
+        dtype=dtype,
+        nodata=nodata,
+        crs="EPSG:3857",
+        transform=from_origin(origin[0], origin[1], size, size),
+    ) as dst:
+        dst.write(data.astype(dtype))
+
+
+def _pair(tmp_path, nodata=None):
+    reference_path = tmp_path / "reference.tif"
+    source_path = tmp_path / "source.tif"
+    _write_raster(reference_path, np.ones((4, 4), dtype="float32"))
+    source = np.arange(2 * 8 * 8, dtype="float32").reshape(2, 8, 8) + 1
+    source[0, 2, 3] = -1
+    _write_raster(source_path, source, origin=(3, 43), size=5, nodata=nodata)
+    return str(source_path), str(reference_path)
+
+
+def test_cached_read_matches_warped_vrt(tmp_path, _cache_dir):
+    source_path, reference_path = _pair(tmp_path, nodata=-1)
+
+    with rasterio.open(source_path) as src, rasterio.open(reference_path) as ref:
+        with aligned_vrt(src, ref, resampling=Resampling.bilinear) as vrt:
+            expected = read_masked_from_vrt(src, vrt, [2, 1], zero_is_invalid=None)
+        with open_aligned(src, ref, resampling=Resampling.bilinear) as aligned:
+            actual = read_masked_aligned(src, aligned, [2, 1], zero_is_invalid=None)
+
+    np.testing.assert_array_equal(np.ma.getmaskarray(actual), np.ma.getmaskarray(expected))
+    np.testing.assert_allclose(actual.filled(0), expected.filled(0).astype("float32"))
+    assert len(list(_cache_dir.glob("*.tif"))) == 1
+
+
+def test_cache_hit_reuses_entry_and_source_change_invalidates(tmp_path):
+    source_path, reference_path = _pair(tmp_path)
+
+    with rasterio.open(source_path) as src, rasterio.open(reference_path) as ref:
+        first = aligned_raster_path(src, ref)
+        built_at = os.stat(first).st_ino
+        assert aligned_raster_path(src, ref) == first
+        assert os.stat(first).st_ino == built_at
+        assert aligned_raster_path(src, ref, resampling=Resampling.bilinear) != first
+
+    stat = os.stat(source_path)
+    os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    with rasterio.open(source_path) as src, rasterio.open(reference_path) as ref:
+        assert aligned_raster_path(src, ref) != first
+
+
+def test_entry_holds_only_requested_bands(tmp_path, _cache_dir):
+    source_path, reference_path = _pair(tmp_path, nodata=-1)
+
+    with rasterio.open(source_path) as src, rasterio.open(reference_path) as ref:
+        with aligned_vrt(src, ref) as vrt:
+            expected = read_masked_from_vrt(src, vrt, 2, zero_is_invalid=None)
+        with open_aligned(src, ref, band_indexes=[2]) as aligned:
+            assert aligned.count == 1
+            actual = read_masked_aligned(src, aligned, 2, zero_is_invalid=None)
+            with pytest.raises(ValueError, match="does not hold source band"):
+                read_masked_aligned(src, aligned, 1)
+        assert aligned_raster_path(src, ref, band_indexes=[2]) != aligned_raster_path(src, ref)
+
+    np.testing.assert_array_equal(np.ma.getmaskarray(actual), np.ma.getmaskarray(expected))
+    np.testing.assert_allclose(actual.filled(0), expected.filled(0).astype("float32"))
+
+
+def test_concurrent_misses_build_the_entry_once(tmp_path, monkeypatch):
+    source_path, reference_path = _pair(tmp_path)
+    builds = []
+    write_aligned = cache_module._write_aligned
+
+    def slow_write(*args):
+        builds.append(args[-1])
+        time.sleep(0.1)
+        write_aligned(*args)
+
+    monkeypatch.setattr(cache_module, "_write_aligned", slow_write)
+    paths = []
+
+    def build():
+        with rasterio.open(source_path) as src, rasterio.open(reference_path) as ref:
+            paths.append(aligned_raster_path(src, ref, band_indexes=[1]))
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == [(1,)]
+    assert len(set(paths)) == 1 and len(paths) == 4
+
+
+def test_eviction_removes_least_recently_used_entries(tmp_path):
+    directory = tmp_path / "entries"
+    directory.mkdir()
+    for age, name in enumerate(["c", "b", "a"]):
+        entry = directory / f"{name}.tif"
+        entry.write_bytes(b"x" * 100)
+        os.utime(entry, ns=(age * 10 ** 9, age * 10 ** 9))
+
+    assert evict_aligned_cache(str(directory), 250) == 1
+    assert sorted(path.name for path in directory.glob("*.tif")) == ["a.tif", "b.tif"]
+
+    assert evict_aligned_cache(str(directory), 50, keep=str(directory / "b.tif")) == 1
+    assert [path.name for path in directory.glob("*.tif")] == ["b.tif"]
+
+
+def test_eviction_skips_entries_that_cannot_be_removed(tmp_path, monkeypatch):
+    directory = tmp_path / "entries"
+    directory.mkdir()
+    for age, name in enumerate(["open", "old", "new"]):
+        entry = directory / f"{name}.tif"
+        entry.write_bytes(b"x" * 100)
+        os.utime(entry, ns=(age * 10 ** 9, age * 10 ** 9))
+    real_remove = os.remove
+
+    def remove(path):
+        if path.endswith("open.tif"):
+            raise PermissionError("in use by another process")
+        real_remove(path)
+
+    monkeypatch.setattr(cache_module.os, "remove", remove)
+
+    assert evict_aligned_cache(str(directory), 200) == 1
+    assert sorted(path.name for path in directory.glob("*.tif")) == ["new.tif", "open.tif"]
+
+
+def test_disabled_cache_falls_back_to_warped_vrt(tmp_path, monkeypatch, _cache_dir):
+    monkeypatch.setattr(cache_module, "ALIGNED_CACHE_ENABLED", False)
+    source_path, reference_path = _pair(tmp_path)
+
+    with rasterio.open(source_path) as src, rasterio.open(reference_path) as ref:
+        with open_aligned(src, ref) as aligned:
+            data = read_masked_aligned(src, aligned, 1)
+
+    assert data.shape == (4, 4)
+    assert not _cache_dir.exists()
@@ -0,0 +1,233 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import from_origin
+
+from functions.implement import dem_analysis as dem_module
+from functions.implement import texture_features as texture_module
+from functions.implement.block_processing import BlockOutput, band_statistics, iter_halo_windows, run_halo_blocks
+from functions.implement.dem_analysis import dem_analysis
+from functions.implement.raster_transforms import raster_transform_analysis
+from functions.implement.texture_features import texture_feature_analysis
+
+
+NODATA = -9999.0
+
+
+def _write_raster(path, data, dtype="float32", nodata=None):
+    if data.ndim == 2:
+        data = data[np.newaxis, ...]
+
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[1],
+        width=data.shape[2],
+        count=data.shape[0],
+        dtype=dtype,
+        nodata=nodata,
+        crs="EPSG:3857",
+        transform=from_origin(0, data.shape[1], 10, 10),
+    ) as dst:
+        dst.write(data.astype(dtype))
+
+
+def _surface(height=53, width=47, seed=11):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices((height, width), dtype="float32")
+    surface = 100.0 + 0.8 * rows + 0.3 * cols + 4.0 * np.sin(cols / 5.0) + rng.normal(0, 0.5, (height, width))
+    surface = surface.astype("float32")
+    surface[20:23, 30:34] = NODATA
+    surface[0, 5] = NODATA
+    return surface
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setenv("RS_BLOCK_SIZE", "16")
+    monkeypatch.setenv("RS_BLOCK_WORKERS", "3")
+
+
+def test_halo_windows_cover_the_raster_once_and_clip_halo_at_edges():
+    coverage = np.zeros((37, 50), dtype=int)
+    for halo_window in iter_halo_windows(50, 37, 16, halo=3):
+        window, read = halo_window.window, halo_window.read_window
+        coverage[window.row_off:window.row_off + window.height, window.col_off:window.col_off + window.width] += 1
+        assert read.row_off == max(0, window.row_off - 3)
+        assert read.col_off + read.width == min(50, window.col_off + window.width + 3)
+        rows, cols = halo_window.crop
+        assert rows.stop - rows.start == window.height and cols.stop - cols.start == window.width
+
+    assert (coverage == 1).all()
+
+
+@pytest.mark.parametrize(
+    ("operation", "kwargs"),
+    [
+        ("slope", {"slope_unit": "percent"}),
+        ("aspect", {}),
+        ("hillshade", {"hillshade_azimuth": 200.0}),
+        ("curvature", {}),
+        ("relief", {"relief_window_size": 5}),
+    ],
+)
+def test_tiled_dem_products_match_whole_array_kernels(tmp_path, small_blocks, operation, kwargs):
+    source = tmp_path / "dem.tif"
+    output = tmp_path / f"{operation}.tif"
+    surface = _surface()
+    _write_raster(source, surface, nodata=NODATA)
+
+    result = dem_analysis(str(source), str(output), operation, z_factor=1.5, **kwargs)
+
+    dem = np.where(surface == NODATA, np.nan, surface).astype("float32")
+    valid_mask = surface != NODATA
+    expected = dem_module._local_dem_block(
+        dem,
+        valid_mask,
+        operation=operation,
+        z_factor=1.5,
+        x_size=10.0,
+        y_size=10.0,
+        slope_unit=kwargs.get("slope_unit", "degrees"),
+        hillshade_azimuth=kwargs.get("hillshade_azimuth", 315.0),
+        hillshade_altitude=45.0,
+        relief_window_size=kwargs.get("relief_window_size", 3),
+    )
+    with rasterio.open(output) as ds:
+        assert ds.profile["tiled"]
+        np.testing.assert_allclose(ds.read(1), expected, rtol=1e-5, atol=1e-4)
+    assert result["block_processing"]["blocks"] == 4 * 3
+    assert result["block_processing"]["block_size"] == 16
+
+
+@pytest.mark.parametrize(
+    ("texture_type", "kwargs"),
+    [
+        ("glcm", {"glcm_property": "entropy", "window_size": 5, "glcm_angle": 135}),
+        ("glcm", {"glcm_property": "correlation", "window_size": 7, "glcm_distance": 2}),
+        ("local_statistics", {"local_stat": "std", "window_size": 5}),
+        ("local_statistics", {"local_stat": "entropy", "window_size": 3}),
+        ("gabor", {"gabor_sigma": 1.5}),
+        ("lbp", {"lbp_radius": 1.5, "lbp_points": 8}),
+    ],
+)
+def test_tiled_texture_products_match_whole_array_kernels(tmp_path, small_blocks, texture_type, kwargs):
+    source = tmp_path / "band.tif"
+    output = tmp_path / f"{texture_type}.tif"
+    surface = _surface(seed=5)
+    _write_raster(source, surface, nodata=NODATA)
+
+    texture_feature_analysis(str(source), str(output), texture_type, gray_levels=16, **kwargs)
+
+    band = np.where(surface == NODATA, np.nan, surface).astype("float32")
+    valid_mask = surface != NODATA
+    statistics = band_statistics(str(source), 1)
+    parameters = {
+        "gray_levels": 16,
+        "window_size": 7,
+        "glcm_distance": 1,
+        "glcm_angle": 0.0,
+        "glcm_property": "contrast",
+        "local_stat": "mean",
+        "gabor_frequency": 0.2,
+        "gabor_theta": 0.0,
+        "gabor_sigma": 2.0,
+        "lbp_radius": 1.0,
+        "lbp_points": 8,
+        **kwargs,
+    }
+    expected, _ = texture_module._texture_block(
+        band,
+        valid_mask,
+        feature_type=texture_type,
+        parameters=parameters,
+        value_range=(statistics.minimum, statistics.maximum),
+        fill_value=statistics.mean,
+    )
+    with rasterio.open(output) as ds:
+        np.testing.assert_allclose(ds.read(1), expected, rtol=1e-4, atol=1e-4)
+
+
+def test_process_executor_writes_the_same_blocks(tmp_path, small_blocks, monkeypatch):
+    source = tmp_path / "dem.tif"
+    _write_raster(source, _surface(), nodata=NODATA)
+
+    dem_analysis(str(source), str(tmp_path / "threads.tif"), "relief")
+    monkeypatch.setenv("RS_BLOCK_EXECUTOR", "process")
+    result = dem_analysis(str(source), str(tmp_path / "processes.tif"), "relief")
+
+    with rasterio.open(tmp_path / "threads.tif") as threads, rasterio.open(tmp_path / "processes.tif") as processes:
+        np.testing.assert_array_equal(threads.read(1), processes.read(1))
+    assert result["block_processing"]["executor"] == "process"
+
+
+def test_failed_block_removes_partial_output(tmp_path, small_blocks):
+    source = tmp_path / "dem.tif"
+    output = tmp_path / "slope.tif"
+    _write_raster(source, _surface(), nodata=NODATA)
+
+    with pytest.raises(ValueError, match="gabor_frequency"):
+        texture_feature_analysis(str(source), str(output), "gabor", gabor_frequency=-1.0)
+
+    assert not output.exists()
+
+
+def _sum_and_bands(data, valid_mask):
+    total = np.where(valid_mask, data.sum(axis=0), NODATA).astype("float32")
+    return [total, data.astype("float32")]
+
+
+def test_extra_outputs_are_written_from_the_same_pass(tmp_path, small_blocks):
+    source = tmp_path / "stack.tif"
+    stack = np.stack([_surface(seed=1), _surface(seed=2)])
+    stack[:, stack[0] == NODATA] = NODATA
+    _write_raster(source, stack, nodata=NODATA)
+    bands_output = tmp_path / "bands.tif"
+
+    run_halo_blocks(
+        str(source),
+        str(tmp_path / "sum.tif"),
+        _sum_and_bands,
+        indexes=[1, 2],
+        nodata=NODATA,
+        extra_outputs=[BlockOutput(str(bands_output), count=2, nodata=NODATA, descriptions=["a", "b"])],
+    )
+
+    with rasterio.open(tmp_path / "sum.tif") as total, rasterio.open(bands_output) as bands:
+        valid = stack[0] != NODATA
+        np.testing.assert_allclose(total.read(1)[valid], stack.sum(axis=0)[valid], rtol=1e-6)
+        np.testing.assert_array_equal(bands.read()[:, valid], stack[:, valid])
+        assert bands.descriptions == ("a", "b")
+        assert bands.nodata == NODATA
+
+
+def test_streamed_pca_matches_in_memory_projection(tmp_path, small_blocks):
+    source = tmp_path / "stack.tif"
+    output = tmp_path / "pca.tif"
+    rng = np.random.default_rng(2)
+    base = rng.normal(500.0, 40.0, (3, 41, 37)).astype("float32")
+    base[1] += 0.7 * base[0]
+    base[2, 10:12, 5:9] = NODATA
+    _write_raster(source, base, nodata=NODATA)
+
+    result = raster_transform_analysis(str(source), str(output), "pca", pca_components=2, pca_standardize=True)
+
+    valid_mask = ~np.any(base == NODATA, axis=0)
+    samples = base[:, valid_mask].T.astype("float64")
+    scales = samples.std(axis=0)
+    standardized = (samples - samples.mean(axis=0)) / scales
+    eigenvalues, eigenvectors = np.linalg.eigh(np.cov(standardized, rowvar=False))
+    order = np.argsort(eigenvalues)[::-1]
+    expected = standardized @ eigenvectors[:, order][:, :2]
+
+    with rasterio.open(output) as ds:
+        written = ds.read()
+    assert result["band_means"] == pytest.approx(samples.mean(axis=0).tolist())
+    assert result["band_scales"] == pytest.approx(scales.tolist())
+    for component in range(2):
+        projected = written[component][valid_mask]
+        sign = np.sign(projected @ expected[:, component])
+        np.testing.assert_allclose(projected * sign, expected[:, component], rtol=1e-4, atol=1e-4)
+        assert (written[component][~valid_mask] == NODATA).all()
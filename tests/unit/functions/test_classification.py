@@ -4,13 +4,22 @@ import pytest
 rasterio = pytest.importorskip("rasterio")
 from rasterio.transform import from_origin
 
+from functions.implement import classifier_store as store_module
 from functions.implement.classification import (
     supervised_classification,
     unsupervised_classification,
 )
+from functions.implement.classifier_store import list_classifiers
 from functions.implement.segmentation import deep_learning_segmentation
 
 
+@pytest.fixture(autouse=True)
+def _classifier_store(tmp_path, monkeypatch):
+    directory = tmp_path / "classifiers"
+    monkeypatch.setattr(store_module, "CLASSIFIER_STORE_DIR", str(directory))
+    return directory
+
+
 def _write_raster(path, data, valid_mask=None):
     if data.ndim == 2:
         data = data[np.newaxis, ...]
@@ -57,6 +66,146 @@ def test_supervised_classification_uses_labeled_pixels(tmp_path):
     assert result["training_sample_count"] == 2
 
 
+@pytest.mark.parametrize("classifier", ["nearest_centroid", "random_forest"])
+def test_supervised_classification_predicts_blocks_with_probabilities(tmp_path, monkeypatch, classifier):
+    monkeypatch.setenv("RS_BLOCK_SIZE", "16")
+    monkeypatch.setenv("RS_BLOCK_WORKERS", "2")
+    source = tmp_path / "source.tif"
+    output = tmp_path / "labels.tif"
+    probability = tmp_path / "probability.tif"
+    rng = np.random.default_rng(3)
+    data = np.empty((2, 40, 36), dtype=np.float32)
+    data[:, :20] = np.array([1.0, 4.0], dtype=np.float32)[:, None, None]
+    data[:, 20:] = np.array([7.0, 2.0], dtype=np.float32)[:, None, None]
+    data += rng.normal(0.0, 0.2, data.shape).astype("float32")
+    valid = np.ones((40, 36), dtype=bool)
+    valid[:3, :3] = False
+    _write_raster(source, data, valid_mask=valid)
+
+    samples = [{"row": row, "col": col, "class_id": 3} for row, col in [(5, 5), (10, 20), (15, 30)]]
+    samples += [{"row": row, "col": col, "class_id": 8} for row, col in [(25, 5), (30, 20), (35, 30)]]
+    result = supervised_classification(
+        str(source),
+        str(output),
+        samples=samples,
+        classifier=classifier,
+        n_estimators=10,
+        probability_output_path=str(probability),
+    )
+
+    with rasterio.open(output) as classified, rasterio.open(probability) as proba:
+        labels = classified.read(1)
+        probabilities = proba.read()
+        assert proba.count == 2
+        assert proba.descriptions == ("probability_3", "probability_8")
+    assert np.all(labels[:20][valid[:20]] == 3)
+    assert np.all(labels[20:] == 8)
+    assert np.all(labels[~valid] == 0)
+    assert np.all(probabilities[:, ~valid] == -9999.0)
+    np.testing.assert_allclose(probabilities[:, valid].sum(axis=0), 1.0, atol=1e-5)
+    np.testing.assert_array_equal(np.array([3, 8])[probabilities[:, valid].argmax(axis=0)], labels[valid])
+    assert result["probability_classes"] == [3, 8]
+    assert result["block_processing"]["blocks"] == 9
+    assert result["training_sample_count"] == 6
+
+
+def test_stored_classifier_is_reused_and_applied_by_model_id(tmp_path, _classifier_store):
+    data = np.zeros((2, 6, 6), dtype=np.float32)
+    data[:, :3, :] = np.array([1, 2], dtype=np.float32)[:, None, None]
+    data[:, 3:, :] = np.array([8, 9], dtype=np.float32)[:, None, None]
+    _write_raster(tmp_path / "first.tif", data)
+    _write_raster(tmp_path / "second.tif", data[:, ::-1])
+    _write_raster(tmp_path / "single_band.tif", data[:1])
+    samples = [
+        {"row": 1, "col": 1, "label": "water"},
+        {"row": 4, "col": 1, "label": "forest"},
+    ]
+
+    trained = supervised_classification(str(tmp_path / "first.tif"), str(tmp_path / "a.tif"), samples=samples)
+    retrained = supervised_classification(str(tmp_path / "first.tif"), str(tmp_path / "b.tif"), samples=samples)
+    applied = supervised_classification(
+        str(tmp_path / "second.tif"),
+        str(tmp_path / "c.tif"),
+        model_id=trained["model_id"],
+    )
+
+    assert not trained["model_reused"]
+    assert retrained["model_reused"] and retrained["model_id"] == trained["model_id"]
+    assert applied["model_reused"] and applied["class_labels"] == {1: "water", 2: "forest"}
+    with rasterio.open(tmp_path / "a.tif") as first, rasterio.open(tmp_path / "c.tif") as second:
+        np.testing.assert_array_equal(second.read(1), first.read(1)[::-1])
+        assert second.tags()["MODEL_ID"] == trained["model_id"]
+    assert [entry["model_id"] for entry in list_classifiers()] == [trained["model_id"]]
+    assert list_classifiers()[0]["class_labels"] == {"1": "water", "2": "forest"}
+    assert len(list(_classifier_store.glob("*.pkl"))) == 1
+    assert len(list(_classifier_store.glob("*.json"))) == 1
+
+    with pytest.raises(ValueError, match="2-band raster"):
+        supervised_classification(
+            str(tmp_path / "single_band.tif"), str(tmp_path / "d.tif"), model_id=trained["model_id"]
+        )
+    with pytest.raises(ValueError, match="was not found"):
+        supervised_classification(str(tmp_path / "second.tif"), str(tmp_path / "d.tif"), model_id="0" * 40)
+    with pytest.raises(ValueError, match="Invalid classifier model_id"):
+        supervised_classification(str(tmp_path / "second.tif"), str(tmp_path / "d.tif"), model_id="../x")
+
+
+def test_classifier_store_evicts_least_recently_used_models(tmp_path, _classifier_store):
+    import os
+
+    data = np.zeros((2, 6, 6), dtype=np.float32)
+    data[:, :3, :] = np.array([1, 2], dtype=np.float32)[:, None, None]
+    data[:, 3:, :] = np.array([8, 9], dtype=np.float32)[:, None, None]
+    _write_raster(tmp_path / "source.tif", data)
+    model_ids = []
+    for seed in range(3):
+        result = supervised_classification(
+            str(tmp_path / "source.tif"),
+            str(tmp_path / f"{seed}.tif"),
+            samples=[{"row": 1, "col": 1, "class_id": 1}, {"row": 4, "col": 1, "class_id": 2}],
+            random_seed=seed,
+        )
+        model_ids.append(result["model_id"])
+        path = _classifier_store / f"{result['model_id']}.pkl"
+        os.utime(path, ns=(seed * 10 ** 9, seed * 10 ** 9))
+
+    entry_bytes = sum(path.stat().st_size for path in _classifier_store.iterdir()) // 3
+    removed = store_module.evict_classifier_store(str(_classifier_store), entry_bytes * 2 + 1)
+
+    assert removed == 1
+    assert {entry["model_id"] for entry in list_classifiers()} == set(model_ids[1:])
+    assert not (_classifier_store / f"{model_ids[0]}.json").exists()
+
+
+class _Planted:
+    def __reduce__(self):
+        return (exec, ("raise AssertionError('unsigned pickle was loaded')",))
+
+
+def test_classifier_store_only_loads_pickles_it_signed(tmp_path, _classifier_store):
+    import os
+    import pickle
+
+    data = np.zeros((2, 6, 6), dtype=np.float32)
+    data[:, :3, :] = np.array([1, 2], dtype=np.float32)[:, None, None]
+    data[:, 3:, :] = np.array([8, 9], dtype=np.float32)[:, None, None]
+    _write_raster(tmp_path / "source.tif", data)
+    trained = supervised_classification(
+        str(tmp_path / "source.tif"),
+        str(tmp_path / "a.tif"),
+        samples=[{"row": 1, "col": 1, "class_id": 1}, {"row": 4, "col": 1, "class_id": 2}],
+    )
+    assert store_module.load_classifier(trained["model_id"]).model_id == trained["model_id"]
+
+    planted = _classifier_store / f"{'1' * 40}.pkl"
+    planted.write_bytes(b"\0" * 32 + pickle.dumps(_Planted()))
+    assert store_module.load_classifier("1" * 40) is None
+
+    os.chmod(_classifier_store, 0o777)
+    with pytest.raises(PermissionError, match="writable by group or others"):
+        store_module.load_classifier(trained["model_id"])
+
+
 def test_unsupervised_classification_creates_requested_classes(tmp_path):
     source = tmp_path / "source.tif"
     output = tmp_path / "unsupervised.tif"
@@ -146,3 +295,89 @@ def test_deep_learning_segmentation_builtin_backend(tmp_path):
         assert segmented.dtypes[0] == "uint16"
         assert set(np.unique(labels)) == {1, 2}
     assert result["operation"] == "deep_learning_segmentation"
+
+
+def test_assign_nearest_gemm_matches_broadcast_distances():
+    from functions.implement.classification import _assign_nearest
+
+    rng = np.random.default_rng(3)
+    features = rng.normal(size=(5000, 4)).astype("float32")
+    centers = rng.normal(size=(6, 4)).astype("float32")
+
+    distances = np.sum((features[:, None, :] - centers[None, :, :]) ** 2, axis=2)
+    np.testing.assert_array_equal(_assign_nearest(features, centers), np.argmin(distances, axis=1))
+
+
+def test_feature_scan_streams_exact_statistics_and_bounded_sample(tmp_path):
+    from functions.implement.classification import _read_stack, _scan_features
+
+    source = tmp_path / "scan.tif"
+    rng = np.random.default_rng(5)
+    data = rng.normal(50.0, 10.0, size=(3, 40, 37)).astype("float32")
+    valid = rng.random((40, 37)) > 0.2
+    _write_raster(source, data, valid_mask=valid)
+
+    with rasterio.open(source) as src:
+        scan = _scan_features(src, [1, 2, 3], 100, np.random.default_rng(0), block_size=16)
+        stack, valid_mask, _ = _read_stack(src, None)
+
+    features = stack[:, valid_mask].T.astype("float64")
+    assert scan.count == int(valid.sum())
+    np.testing.assert_allclose(scan.mean[0], features.mean(axis=0), rtol=1e-6)
+    np.testing.assert_allclose(scan.scale[0], features.std(axis=0), rtol=1e-5)
+    assert scan.sample.shape == (100, 3)
+    assert sum(count for _, count in scan.windows) == scan.count
+
+
+@pytest.mark.parametrize("method", ["kmeans", "mini_batch_kmeans"])
+def test_unsupervised_classification_labels_blocks_consistently(tmp_path, monkeypatch, method):
+    monkeypatch.setenv("RS_BLOCK_SIZE", "16")
+    source = tmp_path / "clusters.tif"
+    output = tmp_path / f"{method}.tif"
+    rng = np.random.default_rng(9)
+    data = np.empty((2, 48, 40), dtype=np.float32)
+    data[:, :16] = np.array([1.0, 5.0], dtype=np.float32)[:, None, None]
+    data[:, 16:32] = np.array([6.0, 1.0], dtype=np.float32)[:, None, None]
+    data[:, 32:] = np.array([9.0, 9.0], dtype=np.float32)[:, None, None]
+    data += rng.normal(0.0, 0.1, data.shape).astype("float32")
+    _write_raster(source, data)
+
+    result = unsupervised_classification(
+        str(source),
+        str(output),
+        n_classes=3,
+        method=method,
+        max_samples=200,
+        random_seed=1,
+        smoothing=1,
+    )
+
+    with rasterio.open(output) as classified:
+        labels = classified.read(1)
+    groups = [labels[:16], labels[16:32], labels[32:]]
+    assert all(np.unique(group).size == 1 for group in groups)
+    assert len({int(group[0, 0]) for group in groups}) == 3
+    assert result["valid_pixel_count"] == 48 * 40
+    assert result["block_processing"]["blocks"] == 9
+    assert sum(result["class_histogram"].values()) == 48 * 40
+
+
+def test_windowed_label_smoothing_matches_whole_array(tmp_path, monkeypatch):
+    from functions.implement.classification import _smooth_labels
+
+    monkeypatch.setenv("RS_BLOCK_SIZE", "16")
+    source = tmp_path / "noisy.tif"
+    raw_output = tmp_path / "raw.tif"
+    smoothed_output = tmp_path / "smoothed.tif"
+    rng = np.random.default_rng(2)
+    data = rng.normal(0.0, 1.0, size=(2, 37, 45)).astype("float32")
+    valid = rng.random((37, 45)) > 0.1
+    _write_raster(source, data, valid_mask=valid)
+
+    options = dict(n_classes=4, method="kmeans", random_seed=4)
+    unsupervised_classification(str(source), str(raw_output), smoothing=0, **options)
+    unsupervised_classification(str(source), str(smoothed_output), smoothing=2, **options)
+
+    with rasterio.open(raw_output) as raw, rasterio.open(smoothed_output) as smoothed:
+        expected = _smooth_labels(raw.read(1), 2, valid)
+        np.testing.assert_array_equal(smoothed.read(1), expected)
@@ -99,9 +99,9 @@ def test_d8_flow_accumulation_and_watershed_drain_to_sink(tmp_path):
     )
     _write_raster(source, data)
 
-    dem_analysis(str(source), str(flow_output), operation="flow_direction")
-    dem_analysis(str(source), str(accumulation_output), operation="flow_accumulation")
-    dem_analysis(str(source), str(watershed_output), operation="watershed")
+    dem_analysis(str(source), str(flow_output), operation="flow_direction", fill_depressions=False)
+    dem_analysis(str(source), str(accumulation_output), operation="flow_accumulation", fill_depressions=False)
+    dem_analysis(str(source), str(watershed_output), operation="watershed", fill_depressions=False)
 
     with rasterio.open(flow_output) as flow_ds:
         flow = flow_ds.read(1)
@@ -118,3 +118,34 @@ def test_d8_flow_accumulation_and_watershed_drain_to_sink(tmp_path):
     with rasterio.open(watershed_output) as ws_ds:
         labels = ws_ds.read(1)
         assert set(np.unique(labels)) == {1}
+
+
+def test_filled_flow_routing_drains_sink_to_the_raster_edge(tmp_path):
+    source = tmp_path / "sink.tif"
+    accumulation_output = tmp_path / "accumulation.tif"
+    watershed_output = tmp_path / "watershed.tif"
+    data = np.array(
+        [
+            [5, 4, 5, 5],
+            [5, 0, 6, 5],
+            [5, 6, 6, 5],
+            [5, 5, 5, 5],
+        ],
+        dtype=np.float32,
+    )
+    _write_raster(source, data)
+
+    result = dem_analysis(str(source), str(accumulation_output), operation="flow_accumulation")
+    dem_analysis(str(source), str(watershed_output), operation="watershed")
+
+    assert result["fill_depressions"] is True
+    with rasterio.open(accumulation_output) as acc_ds:
+        accumulation = acc_ds.read(1)
+        # The pit fills to the rim at 4 and the whole 3x3 depression
+        # spills through the top edge cell instead of ending in the pit.
+        assert accumulation[1, 1] == pytest.approx(6.0)
+        assert accumulation[0, 1] == pytest.approx(9.0)
+
+    with rasterio.open(watershed_output) as ws_ds:
+        labels = ws_ds.read(1)
+        assert labels[1, 1] == labels[0, 1]
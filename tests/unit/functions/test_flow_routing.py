@@ -0,0 +1,137 @@
+import heapq
+from collections import deque
+
+import numpy as np
+import pytest
+
+from functions.implement.flow_routing import (
+    basin_labels,
+    d8_flow,
+    filled_d8_flow,
+    flow_accumulation,
+    topological_levels,
+)
+
+
+def _terrain(rows=61, cols=47, seed=5):
+    rng = np.random.default_rng(seed)
+    r, c = np.indices((rows, cols), dtype="float32")
+    surface = 50.0 + 0.3 * r + 4.0 * np.sin(c / 6.0) + 3.0 * np.cos(r / 7.0)
+    surface += rng.normal(0.0, 1.5, (rows, cols)).astype("float32")
+    valid = np.ones((rows, cols), dtype=bool)
+    valid[20:24, 10:14] = False
+    surface[~valid] = np.nan
+    return surface.astype("float32"), valid
+
+
+def _reference_accumulation(receiver, valid_mask):
+    flat_receiver = receiver.ravel()
+    valid_flat = valid_mask.ravel()
+    indegree = np.zeros(flat_receiver.size, dtype=np.int64)
+    np.add.at(indegree, flat_receiver[valid_flat & (flat_receiver >= 0)], 1)
+    accumulation = valid_flat.astype("float64")
+    queue = deque(np.flatnonzero(valid_flat & (indegree == 0)).tolist())
+    while queue:
+        cell = queue.popleft()
+        target = flat_receiver[cell]
+        if target < 0:
+            continue
+        accumulation[target] += accumulation[cell]
+        indegree[target] -= 1
+        if indegree[target] == 0:
+            queue.append(int(target))
+    return accumulation.reshape(receiver.shape)
+
+
+def _reference_labels(receiver, valid_mask):
+    flat_receiver = receiver.ravel()
+    labels = np.zeros(flat_receiver.size, dtype=np.int32)
+    next_label = 1
+    for start in np.flatnonzero(valid_mask.ravel()):
+        path = []
+        current = int(start)
+        while labels[current] == 0:
+            path.append(current)
+            target = int(flat_receiver[current])
+            if target < 0:
+                labels[path] = next_label
+                next_label += 1
+                path = []
+                break
+            current = target
+        if path:
+            labels[path] = labels[current]
+    return labels.reshape(receiver.shape)
+
+
+def _reference_priority_flood(dem, valid_mask):
+    rows, cols = dem.shape
+    filled = dem.astype("float64").copy()
+    closed = ~valid_mask.copy()
+    heap = []
+    for row in range(rows):
+        for col in range(cols):
+            if not valid_mask[row, col]:
+                continue
+            window = valid_mask[max(row - 1, 0):row + 2, max(col - 1, 0):col + 2]
+            if row in (0, rows - 1) or col in (0, cols - 1) or not window.all():
+                heapq.heappush(heap, (filled[row, col], row, col))
+                closed[row, col] = True
+    while heap:
+        level, row, col = heapq.heappop(heap)
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                nr, nc = row + dr, col + dc
+                if 0 <= nr < rows and 0 <= nc < cols and not closed[nr, nc]:
+                    closed[nr, nc] = True
+                    filled[nr, nc] = max(filled[nr, nc], level)
+                    heapq.heappush(heap, (filled[nr, nc], nr, nc))
+    return filled.astype("float32")
+
+
+def test_level_sweeps_match_per_cell_traversal():
+    dem, valid = _terrain()
+    _, receiver = d8_flow(dem, valid, 10.0, 10.0)
+    levels = topological_levels(receiver, valid)
+
+    assert receiver.dtype == np.int32
+    assert sum(level.size for level in levels) == int(valid.sum())
+    np.testing.assert_array_equal(
+        flow_accumulation(receiver, valid, levels),
+        _reference_accumulation(receiver, valid).astype("float32"),
+    )
+    np.testing.assert_array_equal(basin_labels(receiver, valid, levels), _reference_labels(receiver, valid))
+
+
+def test_priority_flood_matches_heap_fill_and_leaves_no_interior_pits():
+    dem, valid = _terrain()
+    filled, direction, receiver = filled_d8_flow(dem, valid, 10.0, 10.0)
+
+    np.testing.assert_array_equal(filled[valid], _reference_priority_flood(dem, valid)[valid])
+    assert np.all(filled[valid] >= dem[valid])
+
+    # Every cell reaches an outlet on the raster edge or next to nodata.
+    labels = basin_labels(receiver, valid)
+    outlets = np.flatnonzero(valid.ravel() & (receiver.ravel() < 0))
+    rows, cols = np.divmod(outlets, dem.shape[1])
+    on_edge = (rows == 0) | (rows == dem.shape[0] - 1) | (cols == 0) | (cols == dem.shape[1] - 1)
+    near_nodata = (rows >= 19) & (rows <= 24) & (cols >= 9) & (cols <= 14)
+    assert np.all(on_edge | near_nodata)
+    assert np.all(labels[valid] > 0)
+    assert np.all((direction[valid] == 0) == (receiver[valid] < 0))
+
+    accumulation = flow_accumulation(receiver, valid)
+    assert accumulation.ravel()[outlets].sum() == pytest.approx(valid.sum())
+
+
+def test_filled_flow_keeps_d8_routing_without_pits():
+    rows, cols = np.indices((12, 9), dtype="float32")
+    dem = 100.0 - rows - 0.1 * cols
+    valid = np.ones(dem.shape, dtype=bool)
+
+    filled, direction, receiver = filled_d8_flow(dem, valid, 1.0, 1.0)
+    expected_direction, expected_receiver = d8_flow(dem, valid, 1.0, 1.0)
+
+    np.testing.assert_array_equal(filled, dem)
+    np.testing.assert_array_equal(direction, expected_direction)
+    np.testing.assert_array_equal(receiver, expected_receiver)
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from functions.implement.glcm_engine import glcm_property_image
+
+
+def _reference_glcm(quantized, valid_mask, levels, size, row_offset, col_offset, prop):
+    """Per-window definition: pairs (p, p + offset) with both ends inside the window."""
+    pad = size // 2
+    q = np.pad(quantized, pad, mode="edge")
+    v = np.pad(valid_mask, pad, mode="constant", constant_values=False)
+    height, width = quantized.shape
+    output = np.full((height, width), np.nan)
+    for r in range(height):
+        for c in range(width):
+            pairs = []
+            for i in range(size):
+                for j in range(size):
+                    ti, tj = i + row_offset, j + col_offset
+                    if 0 <= ti < size and 0 <= tj < size and v[r + i, c + j] and v[r + ti, c + tj]:
+                        pairs.append((int(q[r + i, c + j]), int(q[r + ti, c + tj])))
+            if not pairs:
+                continue
+            a = np.array(pairs, dtype="float64")
+            s, t = a[:, 0], a[:, 1]
+            if prop == "contrast":
+                output[r, c] = np.mean((s - t) ** 2)
+            elif prop == "dissimilarity":
+                output[r, c] = np.mean(np.abs(s - t))
+            elif prop == "homogeneity":
+                output[r, c] = np.mean(1.0 / (1.0 + (s - t) ** 2))
+            elif prop == "correlation":
+                denominator = math.sqrt(s.var() * t.var())
+                output[r, c] = ((s * t).mean() - s.mean() * t.mean()) / denominator if denominator > 1e-12 else 0.0
+            else:
+                _, counts = np.unique(s * levels + t, return_counts=True)
+                p = counts / counts.sum()
+                if prop == "entropy":
+                    output[r, c] = -np.sum(p * np.log(p))
+                else:
+                    asm = np.sum(p * p)
+                    output[r, c] = math.sqrt(asm) if prop == "energy" else asm
+    return output
+
+
+@pytest.mark.parametrize("prop", ["contrast", "dissimilarity", "homogeneity", "correlation", "asm", "energy", "entropy"])
+@pytest.mark.parametrize("offset", [(0, 1), (-1, 1), (2, 0), (-1, -2)])
+def test_strip_engine_matches_per_window_definition(prop, offset):
+    rng = np.random.default_rng(7)
+    quantized = rng.integers(0, 6, size=(17, 13)).astype(np.uint16)
+    valid_mask = rng.random((17, 13)) > 0.15
+
+    result, count = glcm_property_image(
+        quantized, valid_mask, 6, 5, offset[0], offset[1], prop, strip_rows=4, max_workers=3,
+    )
+    expected = _reference_glcm(quantized, valid_mask, 6, 5, offset[0], offset[1], prop)
+
+    np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-6, equal_nan=True)
+    assert np.array_equal(count > 0, np.isfinite(expected))
+
+
+def test_running_histogram_blocks_match_single_block(monkeypatch):
+    from functions.implement import glcm_engine
+
+    rng = np.random.default_rng(3)
+    quantized = rng.integers(0, 16, size=(20, 40)).astype(np.uint16)
+    valid_mask = np.ones_like(quantized, dtype=bool)
+    whole, _ = glcm_property_image(quantized, valid_mask, 16, 7, 0, 1, "entropy", max_workers=1)
+
+    monkeypatch.setattr(glcm_engine, "HISTOGRAM_BLOCK_BYTES", 16 * 16 * 4 * 6)
+    blocked, _ = glcm_property_image(quantized, valid_mask, 16, 7, 0, 1, "entropy", strip_rows=3, max_workers=2)
+
+    np.testing.assert_allclose(blocked, whole, rtol=1e-6)
+
+
+def test_offset_must_fit_inside_window():
+    with pytest.raises(ValueError, match="smaller than window_size"):
+        glcm_property_image(np.zeros((5, 5), np.uint16), np.ones((5, 5), bool), 4, 3, 0, 3, "contrast")
@@ -0,0 +1,185 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("numexpr")
+from rasterio.transform import from_origin
+
+from functions.implement import raster_calculator
+from functions.implement.raster_calculator import (
+    compile_expression,
+    iter_block_windows,
+    resolve_output_band_count,
+    run_block_calculator,
+)
+
+
+def _write_raster(path, data, *, transform=None, valid_mask=None, crs="EPSG:3857"):
+    if data.ndim == 2:
+        data = data[np.newaxis, ...]
+
+    meta = {
+        "driver": "GTiff",
+        "height": data.shape[1],
+        "width": data.shape[2],
+        "count": data.shape[0],
+        "dtype": str(data.dtype),
+        "crs": crs,
+        "transform": transform or from_origin(0, data.shape[1], 1, 1),
+    }
+    with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True):
+        with rasterio.open(path, "w", **meta) as dst:
+            dst.write(data)
+            if valid_mask is not None:
+                dst.write_mask(np.asarray(valid_mask, dtype=np.uint8) * 255)
+    return str(path)
+
+
+def test_iter_block_windows_covers_grid_without_overlap():
+    windows = list(iter_block_windows(70, 33, 32))
+
+    covered = np.zeros((33, 70), dtype=int)
+    for window in windows:
+        covered[
+            window.row_off:window.row_off + window.height,
+            window.col_off:window.col_off + window.width,
+        ] += 1
+    assert len(windows) == 6
+    assert np.all(covered == 1)
+
+
+def test_resolve_output_band_count_rejects_mixed_multiband_inputs():
+    assert resolve_output_band_count([1, 3, 3]) == 3
+    with pytest.raises(ValueError):
+        resolve_output_band_count([2, 3])
+
+
+def test_compiled_expression_reports_tokens_and_is_cached_by_text():
+    compiled = compile_expression("where(A_2 > 0, sqrt(A_2), B + GREEN_1_3 + A)")
+
+    assert compiled is compile_expression("where(A_2 > 0, sqrt(A_2), B + GREEN_1_3 + A)")
+    assert compiled.tokens == {
+        "A_2": ("A", [2]),
+        "B": ("B", []),
+        "GREEN_1_3": ("GREEN", [1, 3]),
+        "A": ("A", []),
+    }
+    assert compiled.variables == ("A", "B", "GREEN")
+
+    ones = np.ones((2, 3), dtype=np.float32)
+    operands = {"A_2": ones * 4, "B": ones, "GREEN_1_3": ones * 2, "A": ones * 3}
+    np.testing.assert_allclose(compiled.evaluate(operands), 2.0)
+    operands["A_2"] = -ones
+    np.testing.assert_allclose(compiled.evaluate(operands), 6.0)
+
+
+@pytest.mark.parametrize("expression", ["A +", "sqrt(2)", "A_1 ** __import__"])
+def test_compile_expression_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        compile_expression(expression)
+
+
+def test_block_calculator_compiles_expression_once_per_text(tmp_path, monkeypatch):
+    a_path = _write_raster(tmp_path / "a.tif", np.ones((2, 40, 40), dtype=np.float32))
+    compiled_programs = []
+    real_numexpr = raster_calculator.ne.NumExpr
+
+    def counting_numexpr(*args, **kwargs):
+        compiled_programs.append(args[0])
+        return real_numexpr(*args, **kwargs)
+
+    compile_expression.cache_clear()
+    monkeypatch.setattr(raster_calculator.ne, "NumExpr", counting_numexpr)
+    for name in ("first.tif", "second.tif"):
+        run_block_calculator(
+            {"A": a_path, "UNUSED": str(tmp_path / "missing.tif")},
+            "A * 3 - 1",
+            str(tmp_path / name),
+            block_size=16,
+            max_workers=2,
+        )
+
+    assert len(compiled_programs) == 1
+    with rasterio.open(tmp_path / "second.tif") as result:
+        np.testing.assert_allclose(result.read(), 2.0)
+
+
+def test_block_calculator_matches_whole_array_result_across_blocks(tmp_path):
+    rng = np.random.default_rng(5)
+    a = rng.uniform(1, 100, size=(2, 100, 75)).astype(np.float32)
+    b = rng.uniform(1, 100, size=(100, 75)).astype(np.float32)
+    valid_b = np.ones((100, 75), dtype=bool)
+    valid_b[:10, :10] = False
+    a_path = _write_raster(tmp_path / "a.tif", a)
+    b_path = _write_raster(tmp_path / "b.tif", b, valid_mask=valid_b)
+    output = str(tmp_path / "out.tif")
+
+    bands = run_block_calculator(
+        {"A": a_path, "B": b_path},
+        "(A - B_1) / (A + B_1)",
+        output,
+        reference_path=a_path,
+        block_size=32,
+        max_workers=3,
+    )
+
+    expected = (a - b) / (a + b)
+    with rasterio.open(output) as result:
+        assert bands == result.count == 2
+        assert result.block_shapes[0] == (32, 32)
+        mask = result.dataset_mask() > 0
+        np.testing.assert_array_equal(mask, valid_b)
+        np.testing.assert_allclose(result.read()[:, mask], expected[:, mask], rtol=1e-6)
+        assert np.all(result.read()[:, ~mask] == -9999)
+
+
+def test_block_calculator_warps_misaligned_inputs_onto_reference_grid(tmp_path):
+    reference = _write_raster(tmp_path / "ref.tif", np.ones((40, 40), dtype=np.float32))
+    shifted = _write_raster(
+        tmp_path / "shifted.tif",
+        np.full((20, 20), 3, dtype=np.float32),
+        transform=from_origin(20, 40, 1, 1),
+        valid_mask=np.ones((20, 20), dtype=bool),
+    )
+    output = str(tmp_path / "out.tif")
+
+    run_block_calculator(
+        {"A": reference, "B": shifted},
+        "A + B",
+        output,
+        reference_path=reference,
+        block_size=16,
+        max_workers=2,
+    )
+
+    with rasterio.open(output) as result:
+        valid = result.dataset_mask() > 0
+        expected_valid = np.zeros((40, 40), dtype=bool)
+        expected_valid[:20, 20:] = True
+        np.testing.assert_array_equal(valid, expected_valid)
+        np.testing.assert_allclose(result.read(1)[valid], 4.0)
+
+
+def test_block_calculator_peak_memory_is_bounded_by_blocks(tmp_path):
+    size = 1024
+    data = np.ones((2, size, size), dtype=np.float32)
+    a_path = _write_raster(tmp_path / "big.tif", data)
+    full_scene_bytes = data.nbytes
+
+    tracemalloc.start()
+    try:
+        run_block_calculator(
+            {"A": a_path},
+            "A * 2 + 1",
+            str(tmp_path / "out.tif"),
+            reference_path=a_path,
+            block_size=128,
+            max_workers=2,
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < full_scene_bytes / 4
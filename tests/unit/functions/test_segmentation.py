@@ -0,0 +1,166 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import from_origin
+
+from functions.implement import segmentation as segmentation_module
+from functions.implement.segmentation import deep_learning_segmentation
+
+
+class _PixelModel:
+    """Per-pixel stand-in for an ONNX session, so any patch layout gives the same answer."""
+
+    def __init__(self, output="scores", patch=8):
+        self.output = output
+        self.patch = patch
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="image", shape=["batch", 2, self.patch, self.patch])]
+
+    def run(self, output_names, feeds):
+        tensor = feeds["image"]
+        self.batches.append(tensor.shape)
+        bright = tensor[:, 0]
+        if self.output == "labels":
+            return [(bright > 0.5).astype("int64")]
+        if self.output == "probability":
+            return [bright[:, np.newaxis]]
+        return [np.stack([bright, 1.0 - bright], axis=1)]
+
+
+@pytest.fixture
+def onnx_model(tmp_path, monkeypatch):
+    monkeypatch.setenv("RS_BLOCK_SIZE", "16")
+    monkeypatch.setattr(segmentation_module, "_onnx_sessions", segmentation_module.OrderedDict())
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"onnx")
+    created = []
+
+    def create(path):
+        created.append(path)
+        return _PixelModel()
+
+    monkeypatch.setattr(segmentation_module, "_create_onnx_session", create)
+    return SimpleNamespace(path=str(model_path), created=created)
+
+
+def _write_scene(path, height=37, width=29):
+    rows, cols = np.indices((height, width))
+    bright = ((rows // 7 + cols // 5) % 2).astype("float32")
+    data = np.stack([0.1 + 0.8 * bright, np.full((height, width), 0.5, dtype="float32")])
+    valid = np.ones((height, width), dtype=bool)
+    valid[30:, :4] = False
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=2,
+        dtype="float32",
+        crs="EPSG:3857",
+        transform=from_origin(0, height, 1, 1),
+    ) as dst:
+        dst.write(data)
+        dst.write_mask(valid.astype(np.uint8) * 255)
+    return bright.astype(bool), valid
+
+
+@pytest.mark.parametrize(
+    "output, expected_bright",
+    [("scores", 1), ("probability", 2), ("labels", 2)],
+)
+def test_onnx_sliding_window_matches_per_pixel_model(tmp_path, onnx_model, monkeypatch, output, expected_bright):
+    monkeypatch.setattr(
+        segmentation_module,
+        "_create_onnx_session",
+        lambda path: onnx_model.created.append(path) or _PixelModel(output),
+    )
+    bright, valid = _write_scene(tmp_path / "scene.tif")
+
+    result = deep_learning_segmentation(str(tmp_path / "scene.tif"), str(tmp_path / "out.tif"), model_path=onnx_model.path)
+
+    with rasterio.open(tmp_path / "out.tif") as segmented:
+        labels = segmented.read(1)
+        assert segmented.tags()["CLASS_COUNT"] == "2"
+    expected = np.where(bright, expected_bright, 3 - expected_bright)
+    np.testing.assert_array_equal(labels[valid], expected[valid])
+    assert np.all(labels[~valid] == 0)
+    assert result["patch_size"] == [8, 8]
+    # 8px patches with a 2px overlap: blocks span 4 strides (24px, rounded up to 32).
+    assert result["block_processing"]["block_size"] == 32
+    assert result["block_processing"]["blocks"] == 2
+
+
+class _ThreeClassLabels(_PixelModel):
+    def run(self, output_names, feeds):
+        tensor = feeds["image"]
+        self.batches.append(tensor.shape)
+        return [np.digitize(tensor[:, 0], [0.3, 0.7]).astype("int64")]
+
+
+def test_label_map_ids_are_the_same_in_every_block(tmp_path, onnx_model, monkeypatch):
+    monkeypatch.setattr(segmentation_module, "_create_onnx_session", lambda path: _ThreeClassLabels())
+    height, width = 40, 64
+    cols = np.indices((height, width))[1]
+    # Left half only holds classes 0/1, the right half classes 0/1/2.
+    band = np.where(cols < 32, np.where(cols % 4 < 2, 0.0, 0.5), (cols % 3) / 2.0).astype("float32")
+    with rasterio.open(
+        tmp_path / "scene.tif",
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=2,
+        dtype="float32",
+        crs="EPSG:3857",
+        transform=from_origin(0, height, 1, 1),
+    ) as dst:
+        dst.write(np.stack([band + 0.01, np.full_like(band, 0.5)]))
+
+    deep_learning_segmentation(str(tmp_path / "scene.tif"), str(tmp_path / "out.tif"), model_path=onnx_model.path)
+
+    with rasterio.open(tmp_path / "out.tif") as segmented:
+        labels = segmented.read(1)
+    normalized_class = np.digitize(band, [0.3, 0.7]) + 1
+    np.testing.assert_array_equal(labels, normalized_class)
+
+
+def test_blocks_reuse_the_global_patch_grid(tmp_path, onnx_model, monkeypatch):
+    session = _PixelModel(patch=16)
+    monkeypatch.setattr(segmentation_module, "_create_onnx_session", lambda path: session)
+    bright, valid = _write_scene(tmp_path / "scene.tif", height=200, width=180)
+
+    deep_learning_segmentation(str(tmp_path / "scene.tif"), str(tmp_path / "out.tif"), model_path=onnx_model.path)
+
+    with rasterio.open(tmp_path / "out.tif") as segmented:
+        labels = segmented.read(1)
+    np.testing.assert_array_equal(labels[valid], np.where(bright, 1, 2)[valid])
+    inferred = sum(shape[0] for shape in session.batches) * 16 * 16
+    global_patches = len(segmentation_module._patch_starts(200, 16, 4)) * len(
+        segmentation_module._patch_starts(180, 16, 4)
+    )
+    # One repeated patch row/column per block boundary, nothing more.
+    assert inferred <= 1.6 * global_patches * 16 * 16
+
+
+def test_onnx_sessions_are_cached_until_the_model_changes(tmp_path, onnx_model):
+    _write_scene(tmp_path / "scene.tif")
+    session = segmentation_module.onnx_session(onnx_model.path)
+
+    deep_learning_segmentation(str(tmp_path / "scene.tif"), str(tmp_path / "a.tif"), model_path=onnx_model.path)
+    deep_learning_segmentation(str(tmp_path / "scene.tif"), str(tmp_path / "b.tif"), model_path=onnx_model.path)
+
+    assert len(onnx_model.created) == 1
+    assert all(shape[0] <= 4 and shape[2:] == (8, 8) for shape in session.batches)
+
+    stat = os.stat(onnx_model.path)
+    os.utime(onnx_model.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert segmentation_module.onnx_session(onnx_model.path) is not session
+    assert len(onnx_model.created) == 2
+    assert len(segmentation_module._onnx_sessions) == 1
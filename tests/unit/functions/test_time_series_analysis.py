@@ -4,7 +4,7 @@ import pytest
 rasterio = pytest.importorskip("rasterio")
 from rasterio.transform import from_origin  # noqa: E402
 
-from functions.implement.time_series_analysis import time_series_analysis  # noqa: E402
+from functions.implement.time_series_analysis import _interpolate_missing, time_series_analysis  # noqa: E402
 
 
 def _write_raster(path, data, dtype="float32"):
@@ -246,3 +246,109 @@ def test_calendar_composite_without_any_dates_suggests_alternative(tmp_path):
             operation="annual_composite",
             dates=[None, None],
         )
+
+
+def _write_random_series(tmp_path, count=6, shape=(37, 29)):
+    rng = np.random.default_rng(8)
+    paths = []
+    frames = []
+    for index in range(count):
+        frame = rng.normal(0.5, 0.2, shape).astype("float32")
+        frame[rng.random(shape) < 0.2] = -9999.0
+        path = tmp_path / f"frame_{index}.tif"
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=shape[0],
+            width=shape[1],
+            count=1,
+            dtype="float32",
+            nodata=-9999.0,
+            crs="EPSG:3857",
+            transform=from_origin(0, shape[0], 1, 1),
+        ) as dst:
+            dst.write(frame[np.newaxis])
+        paths.append(str(path))
+        frames.append(frame)
+    return paths, np.stack(frames)
+
+
+@pytest.mark.parametrize("operation", ["trend", "seasonality", "savitzky_golay", "monthly_composite"])
+def test_chunked_stack_matches_single_window(tmp_path, monkeypatch, operation):
+    paths, _ = _write_random_series(tmp_path)
+    dates = ["2024-01-05", "2024-01-20", "2024-02-04", "2024-02-19", "2024-03-05", "2024-03-20"]
+
+    monkeypatch.setenv("RS_BLOCK_SIZE", "1024")
+    whole = time_series_analysis(paths, str(tmp_path / "whole.tif"), operation, dates=dates)
+    monkeypatch.setenv("RS_BLOCK_SIZE", "16")
+    monkeypatch.setenv("RS_TIME_SERIES_WORKERS", "3")
+    chunked = time_series_analysis(paths, str(tmp_path / "chunked.tif"), operation, dates=dates)
+
+    with rasterio.open(tmp_path / "whole.tif") as expected, rasterio.open(tmp_path / "chunked.tif") as actual:
+        assert actual.profile["tiled"]
+        assert actual.descriptions == expected.descriptions
+        np.testing.assert_allclose(actual.read(), expected.read(), rtol=1e-6, atol=1e-6)
+    assert chunked == whole
+
+
+def test_lazy_stack_reads_only_the_requested_window_in_date_order(tmp_path):
+    from rasterio.windows import Window
+
+    from functions.implement.time_stack import LazyTimeStack
+
+    paths, frames = _write_random_series(tmp_path, count=3)
+    with LazyTimeStack.open(paths, 1) as time_stack:
+        reordered = time_stack.take([2, 0])
+        stack, valid_mask = reordered.read(Window(4, 3, 5, 2))
+
+    expected = frames[[2, 0], 3:5, 4:9]
+    assert stack.shape == (2, 2, 5)
+    np.testing.assert_array_equal(valid_mask, expected != -9999.0)
+    np.testing.assert_array_equal(stack[valid_mask], expected[valid_mask])
+
+
+def test_time_series_without_valid_pixels_leaves_no_output(tmp_path):
+    paths = []
+    for index in range(2):
+        path = tmp_path / f"empty_{index}.tif"
+        with rasterio.open(
+            path, "w", driver="GTiff", height=2, width=2, count=1, dtype="float32",
+            nodata=0.0, crs="EPSG:3857", transform=from_origin(0, 2, 1, 1),
+        ) as dst:
+            dst.write(np.zeros((1, 2, 2), dtype=np.float32))
+        paths.append(str(path))
+    output = tmp_path / "empty.tif"
+
+    with pytest.raises(ValueError, match="no valid pixels"):
+        time_series_analysis(paths, str(output), operation="maximum_composite")
+    assert not output.exists()
+
+
+def _interpolate_per_pixel(stack, valid_mask):
+    time_count = stack.shape[0]
+    series = stack.reshape(time_count, -1)
+    valid = valid_mask.reshape(time_count, -1)
+    filled = np.full_like(series, np.nan, dtype="float32")
+    x = np.arange(time_count, dtype="float64")
+    for pixel in np.flatnonzero(valid.any(axis=0)):
+        pixel_valid = valid[:, pixel]
+        filled[:, pixel] = np.interp(x, x[pixel_valid], series[pixel_valid, pixel]).astype("float32")
+    return filled.reshape(stack.shape)
+
+
+def test_vectorized_gap_filling_matches_per_pixel_interpolation():
+    rng = np.random.default_rng(4)
+    stack = rng.normal(0.4, 0.2, (9, 13, 11)).astype("float32")
+    valid_mask = rng.random(stack.shape) > 0.45
+    valid_mask[:, 0, 0] = False
+    valid_mask[:, 0, 1] = False
+    valid_mask[4, 0, 1] = True
+    stack[~valid_mask] = np.nan
+
+    filled, valid_any = _interpolate_missing(stack, valid_mask, chunk_elements=40)
+
+    np.testing.assert_array_equal(filled, _interpolate_per_pixel(stack, valid_mask))
+    assert valid_any.sum() == (valid_mask.any(axis=0)).sum()
+    assert np.isnan(filled[:, 0, 0]).all()
+    assert (filled[:, 0, 1] == stack[4, 0, 1]).all()
@@ -328,3 +328,38 @@ def test_processing_job_status_is_read_from_job_store(monkeypatch):
     assert result["result"]["job"]["status"] == "running"
     assert result["result"]["job"]["created_at"] == "2026-06-23T00:00:00+00:00"
     assert result["result"]["job"]["task_status"]["task_id"] == "task-1"
+
+
+def test_raster_calculator_tool_only_resolves_referenced_variables(monkeypatch):
+    captured = {}
+
+    class FakeOps:
+        @staticmethod
+        async def process_calculator_task(db, var_mapping, expression, new_name, prefix):
+            captured["call"] = (var_mapping, expression, new_name, prefix)
+            return {"index_id": 999}
+
+    monkeypatch.setattr(function_registry, "_get_data_service_ops", lambda: FakeOps)
+
+    result = _run(
+        invoke_registered_function(
+            AIFunctionInvokeRequest(
+                name="run_raster_calculator",
+                arguments={
+                    "expression": "(NIR_4 - RED_3) / (NIR_4 + RED_3)",
+                    "new_name": "ndvi",
+                    "var_mapping": {"NIR": 1, "RED": 2, "SWIR": 3},
+                },
+            ),
+            db=object(),
+            vector_db=object(),
+        )
+    )
+
+    assert captured["call"] == (
+        {"NIR": 1, "RED": 2},
+        "(NIR_4 - RED_3) / (NIR_4 + RED_3)",
+        "ndvi",
+        "calc",
+    )
+    assert result["result"]["index_id"] == 999
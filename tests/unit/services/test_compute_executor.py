@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from services.data_service.compute_executor import (
+    ComputeCancelled,
+    ComputeExecutor,
+    current_request,
+    parse_operation_limits,
+)
+
+
+class DisconnectingRequest:
+    def __init__(self, after_polls):
+        self.after_polls = after_polls
+        self.polls = 0
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.polls > self.after_polls
+
+
+def test_parse_operation_limits_skips_invalid_items():
+    assert parse_operation_limits("calc=1, time_series=2,bad,x=oops,=3") == {
+        "calc": 1,
+        "time_series": 2,
+    }
+
+
+def test_process_pool_runs_jobs_without_blocking_the_event_loop():
+    executor = ComputeExecutor(max_workers=1, start_method="spawn")
+
+    async def scenario():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.ensure_future(heartbeat())
+        await executor.run("warmup", pow, 2, 3)
+        ticks = 0
+        await executor.run("sleep", time.sleep, 0.3)
+        result = await executor.run("pow", pow, 2, 10)
+        beat.cancel()
+        return ticks, result
+
+    try:
+        ticks, result = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    metrics = executor.metrics()
+    assert result == 1024
+    assert ticks >= 10
+    assert metrics["backend"] == "process"
+    assert metrics["operations"]["sleep"]["completed"] == 1
+    assert metrics["operations"]["sleep"]["busy_seconds"] >= 0.3
+    assert metrics["queued"] == metrics["running"] == 0
+
+
+def test_operation_limits_bound_concurrency_per_operation():
+    executor = ComputeExecutor(max_workers=0, operation_limits={"heavy": 1}, default_operation_limit=4)
+    active = {"heavy": 0, "light": 0}
+    peak = {"heavy": 0, "light": 0}
+    lock = threading.Lock()
+
+    def job(name):
+        with lock:
+            active[name] += 1
+            peak[name] = max(peak[name], active[name])
+        time.sleep(0.05)
+        with lock:
+            active[name] -= 1
+
+    async def scenario():
+        jobs = [asyncio.ensure_future(executor.run("heavy", job, "heavy")) for _ in range(3)]
+        jobs += [asyncio.ensure_future(executor.run("light", job, "light")) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        snapshot = executor.metrics()
+        await asyncio.gather(*jobs)
+        return snapshot
+
+    snapshot = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert peak == {"heavy": 1, "light": 3}
+    assert snapshot["operations"]["heavy"]["queued"] == 2
+    assert snapshot["operations"]["heavy"]["limit"] == 1
+    assert executor.metrics()["operations"]["heavy"]["completed"] == 3
+
+
+def test_client_disconnect_cancels_queued_job_and_cleans_abandoned_outputs(tmp_path):
+    executor = ComputeExecutor(
+        max_workers=0,
+        operation_limits={"calc": 1},
+        disconnect_poll_seconds=0.05,
+    )
+    output = tmp_path / "abandoned.tif"
+    started = []
+
+    def write_output():
+        started.append("running")
+        time.sleep(0.2)
+        output.write_bytes(b"tif")
+
+    def never_started():
+        started.append("queued")
+
+    async def cancelled_run(func, cleanup_paths=()):
+        current_request.set(DisconnectingRequest(after_polls=1))
+        await executor.run("calc", func, cleanup_paths=cleanup_paths)
+
+    async def scenario():
+        running = asyncio.ensure_future(cancelled_run(write_output, cleanup_paths=(str(output),)))
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(cancelled_run(never_started))
+        results = await asyncio.gather(running, queued, return_exceptions=True)
+        await asyncio.sleep(0.3)
+        return results
+
+    results = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert all(isinstance(result, ComputeCancelled) for result in results)
+    assert started == ["running"]
+    assert not output.exists()
+    stats = executor.metrics()["operations"]["calc"]
+    assert stats["cancelled"] == 2
+    assert stats["running"] == stats["queued"] == 0
@@ -0,0 +1,137 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("geoalchemy2")
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.annotation_service.database import get_db
+from services.annotation_service.router import layers_router
+from services.annotation_service.utils.feature_export import FeatureStreamEncoder
+from services.data_service.bridges import vector_bridge
+
+
+def _rows(layer_id, count):
+    return [
+        SimpleNamespace(
+            id=str(uuid4()),
+            layer_id=str(layer_id),
+            geometry=f'{{"type":"Point","coordinates":[{index},30.5]}}',
+            properties=f'{{"score": {index}, "category": "tree"}}',
+        )
+        for index in range(count)
+    ]
+
+
+class StreamResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self.rows:
+            yield row
+
+
+class StreamingDb:
+    def __init__(self, rows):
+        self.rows = rows
+        self.streamed = []
+        self.closed = False
+
+    async def stream(self, statement, params=None):
+        self.streamed.append((statement, params))
+        return StreamResult(self.rows)
+
+
+@pytest.fixture
+def export_client():
+    layer_id = uuid4()
+    db = StreamingDb(_rows(layer_id, 3))
+
+    async def fake_get_db():
+        try:
+            yield db
+        finally:
+            db.closed = True
+
+    app = FastAPI()
+    app.include_router(layers_router.router)
+    app.dependency_overrides[get_db] = fake_get_db
+    return TestClient(app), db, layer_id
+
+
+def test_export_streams_feature_collection_from_server_side_cursor(export_client):
+    client, db, layer_id = export_client
+
+    response = client.get(f"/layers/{layer_id}/features/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/geo+json")
+    payload = response.json()
+    assert payload["type"] == "FeatureCollection"
+    assert [feature["geometry"]["coordinates"][0] for feature in payload["features"]] == [0, 1, 2]
+    assert payload["features"][0]["properties"] == {"score": 0, "category": "tree"}
+    assert payload["features"][0]["layer_id"] == str(layer_id)
+    statement, params = db.streamed[0]
+    assert statement.get_execution_options()["yield_per"] > 0
+    assert params == {"layer_id": layer_id}
+    assert db.closed
+
+
+def test_export_supports_newline_delimited_geojson(export_client):
+    client, _, layer_id = export_client
+
+    response = client.get(f"/layers/{layer_id}/features/export", params={"format": "ndjson"})
+
+    lines = response.text.splitlines()
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert len(lines) == 3
+    assert all(json.loads(line)["type"] == "Feature" for line in lines)
+
+
+def test_bridge_reads_the_ndjson_export_line_by_line(export_client, monkeypatch):
+    client, _, layer_id = export_client
+    requests = []
+    real_client = vector_bridge.httpx.AsyncClient
+
+    def asgi_client(**kwargs):
+        async def record(request):
+            requests.append(request)
+
+        return real_client(
+            transport=vector_bridge.httpx.ASGITransport(app=client.app),
+            event_hooks={"request": [record]},
+            **kwargs,
+        )
+
+    monkeypatch.setattr(vector_bridge, "ANNOTATION_SERVICE_URL", "http://annotation")
+    monkeypatch.setattr(vector_bridge.httpx, "AsyncClient", asgi_client)
+
+    features = asyncio.run(vector_bridge.internal_fetch_features(layer_id))
+
+    assert requests[0].url.params["format"] == "ndjson"
+    assert [feature["properties"]["score"] for feature in features] == [0, 1, 2]
+
+
+def test_encoder_passes_geometry_through_and_appends_metadata():
+    rows = _rows(uuid4(), 2)
+    encoder = FeatureStreamEncoder("geojson", metadata={"layer_id": "x"})
+
+    text = encoder.start() + "".join(encoder.feature(row) for row in rows) + encoder.end(feature_count=encoder.count)
+
+    assert rows[1].geometry in text
+    assert json.loads(text)["metadata"] == {"layer_id": "x", "feature_count": 2}
+    assert json.loads(FeatureStreamEncoder().start() + FeatureStreamEncoder().end()) == {
+        "type": "FeatureCollection",
+        "features": [],
+    }
+    with pytest.raises(ValueError):
+        FeatureStreamEncoder("csv")
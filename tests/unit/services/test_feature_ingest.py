@@ -0,0 +1,160 @@
+import asyncio
+import io
+import json
+from uuid import UUID, uuid4
+
+import pytest
+
+pytest.importorskip("fiona")
+pytest.importorskip("geoalchemy2")
+import fiona
+import shapely
+from shapely.geometry import Polygon, mapping
+
+from services.annotation_service.crud.feature_crud import FeatureCRUD
+from services.annotation_service.schemas.geojson import FeatureCreate
+from services.annotation_service.utils.feature_ingest import (
+    FeatureBatch,
+    encode_feature_batch,
+    make_transformer,
+    start_ingest_progress,
+)
+from services.annotation_service.utils.shapefile_importer import (
+    iter_shapefile_batches,
+    shapefile_crs,
+    shapefile_fields,
+    stage_shapefile_upload,
+)
+
+
+class CopyDriver:
+    def __init__(self):
+        self.copied = []
+        self.codecs = []
+
+    async def set_type_codec(self, typename, **kwargs):
+        self.codecs.append((typename, kwargs["format"]))
+
+    async def reset_type_codec(self, typename, **kwargs):
+        self.codecs.append((typename, "reset"))
+
+    async def copy_records_to_table(self, table_name, *, records, columns=None):
+        assert table_name == "features"
+        async for record in records:
+            self.copied.append(dict(zip(columns, record)))
+
+
+class CopySession:
+    def __init__(self):
+        self.driver = CopyDriver()
+        self.statements = []
+        self.commits = 0
+
+    async def connection(self):
+        session = self
+
+        class Connection:
+            driver_connection = session.driver
+
+            async def get_raw_connection(self):
+                return self
+
+        return Connection()
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    async def commit(self):
+        self.commits += 1
+
+
+def _write_utm_shapefile(directory, count):
+    schema = {"geometry": "Polygon", "properties": {"category": "str", "area": "float"}}
+    path = directory / "parcels.shp"
+    with fiona.open(path, "w", driver="ESRI Shapefile", crs="EPSG:32650", schema=schema) as dst:
+        for index in range(count):
+            x = 500000 + index * 100
+            square = Polygon([(x, 4400000), (x + 50, 4400000), (x + 50, 4400050), (x, 4400050)])
+            dst.write({"geometry": mapping(square), "properties": {"category": "parcel", "area": 2500.0}})
+        bowtie = Polygon([(0, 0), (10, 10), (10, 0), (0, 10)])
+        dst.write({"geometry": mapping(bowtie), "properties": {"category": "broken", "area": 0.0}})
+    return path
+
+
+def test_encode_feature_batch_skips_missing_empty_and_invalid_geometries():
+    layer_id = uuid4()
+    batch = FeatureBatch(
+        geometries=[
+            shapely.Point(116.4, 39.9, 50.0),
+            None,
+            shapely.Polygon(),
+            shapely.Polygon([(0, 0), (1, 1), (1, 0), (0, 1)]),
+        ],
+        properties=[{"name": "a"}, {}, {}, {}],
+        categories=["tree", None, None, None],
+        meta={"source_srid": 4326},
+    )
+
+    records, skipped = encode_feature_batch(layer_id, batch)
+
+    assert skipped == 3
+    feature_id, record_layer, wkb, category, properties, meta = records[0]
+    assert isinstance(feature_id, UUID) and record_layer == layer_id
+    geometry = shapely.from_wkb(wkb)
+    assert shapely.get_srid(geometry) == 4326
+    assert not geometry.has_z
+    assert category == "tree"
+    assert json.loads(properties) == {"name": "a"}
+    assert json.loads(meta) == {"source_srid": 4326}
+
+
+def test_shapefile_ingest_streams_reprojected_batches_through_copy(tmp_path):
+    (tmp_path / "src").mkdir()
+    source = _write_utm_shapefile(tmp_path / "src", 7)
+    uploads = {
+        f"parcels{ext}": io.BytesIO((source.with_suffix(ext)).read_bytes())
+        for ext in (".shp", ".shx", ".dbf", ".prj")
+    }
+    staged = tmp_path / "staged"
+    staged.mkdir()
+    shp_path = stage_shapefile_upload(uploads, str(staged))
+
+    session = CopySession()
+    layer_id = uuid4()
+    with fiona.open(shp_path) as src:
+        progress = start_ingest_progress(layer_id, len(src))
+        assert [field["field_name"] for field in shapefile_fields(src)] == ["category", "area"]
+        imported = asyncio.run(
+            FeatureCRUD(session).ingest(
+                layer_id,
+                iter_shapefile_batches(src, batch_size=3),
+                transformer=make_transformer(shapefile_crs(src)),
+                progress=progress,
+            )
+        )
+
+    assert imported == 7
+    assert (progress.processed, progress.imported, progress.skipped) == (8, 7, 1)
+    assert session.driver.codecs == [("geometry", "binary"), ("geometry", "reset")]
+    assert session.commits == 1
+    assert any("UPDATE layers" in sql for sql in session.statements)
+    first = shapely.from_wkb(session.driver.copied[0]["geom"])
+    assert first.bounds[0] == pytest.approx(117.0, abs=0.01)
+    assert first.bounds[1] == pytest.approx(39.74, abs=0.01)
+    assert {row["category"] for row in session.driver.copied} == {"parcel"}
+
+
+def test_stage_shapefile_upload_requires_companion_files(tmp_path):
+    with pytest.raises(ValueError, match=".dbf, .shx"):
+        stage_shapefile_upload({"only.shp": io.BytesIO(b"")}, str(tmp_path))
+
+
+def test_bulk_create_reports_the_number_of_valid_features():
+    session = CopySession()
+    point = FeatureCreate(geometry={"type": "Point", "coordinates": [116.4, 39.9]}, properties={"category": "tree"})
+    bowtie = FeatureCreate(
+        geometry={"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]},
+    )
+
+    assert asyncio.run(FeatureCRUD(session).bulk_create(uuid4(), [point, bowtie, point])) == 2
+    assert [row["category"] for row in session.driver.copied] == ["tree", "tree"]
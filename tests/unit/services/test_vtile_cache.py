@@ -0,0 +1,214 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("cachetools")
+pytest.importorskip("diskcache")
+pytest.importorskip("geoalchemy2")
+from fastapi.testclient import TestClient
+
+from services.annotation_service.crud.feature_crud import FeatureCRUD
+from services.annotation_service.schemas.geojson import FeatureCreate
+from services.vtile_service import main as vtile_main
+from services.vtile_service.cache import VectorTileCache
+
+
+class ScalarResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeVectorDb:
+    def __init__(self, version=3, tile=b"\x1a\x02mvt"):
+        self.version = version
+        self.tile = tile
+        self.mvt_queries = 0
+        self.mvt_params = []
+
+    async def execute(self, statement, params=None):
+        if "edit_version" in str(statement):
+            return ScalarResult(self.version)
+        self.mvt_queries += 1
+        self.mvt_params.append(params)
+        return ScalarResult(self.tile)
+
+
+@pytest.fixture
+def vtile_client(tmp_path, monkeypatch):
+    db = FakeVectorDb()
+
+    async def fake_get_db():
+        yield db
+
+    monkeypatch.setattr(vtile_main, "tile_cache", VectorTileCache(l2_dir=str(tmp_path / "mvt")))
+    vtile_main.app.dependency_overrides[vtile_main.get_db] = fake_get_db
+    try:
+        yield TestClient(vtile_main.app), db
+    finally:
+        vtile_main.app.dependency_overrides.clear()
+
+
+def test_vector_tile_cache_reads_back_from_disk(tmp_path):
+    key = VectorTileCache.make_key("layer", 2, 5, 1, 1)
+    VectorTileCache(l2_dir=str(tmp_path)).set(key, b"tile")
+
+    fresh = VectorTileCache(l2_dir=str(tmp_path))
+
+    assert fresh.get(key) == b"tile"
+    assert fresh.stats()["l1_entries"] == 1
+    assert fresh.get(VectorTileCache.make_key("layer", 3, 5, 1, 1)) is None
+
+
+def test_vtile_serves_cached_tiles_and_revalidates_by_layer_version(vtile_client):
+    client, db = vtile_client
+    url = f"/tiles/{uuid4()}/12/100/200.pbf"
+
+    first = client.get(url)
+    second = client.get(url)
+    not_modified = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content == db.tile
+    assert first.headers["X-Tile-Cache"] == "miss"
+    assert second.headers["X-Tile-Cache"] == "hit"
+    assert not_modified.status_code == 304
+    assert db.mvt_queries == 1
+
+    db.version += 1
+    edited = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert edited.status_code == 200
+    assert edited.headers["ETag"] != first.headers["ETag"]
+    assert db.mvt_queries == 2
+
+
+def test_vtile_caches_empty_tiles_and_skips_unknown_layers(vtile_client):
+    client, db = vtile_client
+    db.tile = None
+    url = f"/tiles/{uuid4()}/3/1/1.pbf"
+
+    assert client.get(url).status_code == 204
+    assert client.get(url).headers["X-Tile-Cache"] == "hit"
+    assert db.mvt_queries == 1
+
+    db.version = None
+    missing = client.get(url)
+    assert missing.status_code == 204
+    assert missing.headers["Cache-Control"] == "no-store"
+
+
+def test_mvt_query_uses_stored_web_mercator_geometry_by_zoom_band(vtile_client):
+    client, db = vtile_client
+    layer_id = uuid4()
+
+    client.get(f"/tiles/{layer_id}/4/8/5.pbf")
+    client.get(f"/tiles/{layer_id}/12/100/200.pbf")
+    client.get(f"/tiles/{layer_id}/18/1000/2000.pbf")
+    low, mid, high = db.mvt_params
+
+    sql = str(vtile_main.MVT_QUERY)
+    assert "ST_Intersects(f.geom_3857, bounds.geom_3857)" in sql
+    assert "ST_Transform(geom, 3857)" not in sql
+    assert low["use_lowres"] is True and mid["use_lowres"] is False
+    assert low["tolerance"] == pytest.approx(vtile_main.tile_unit_meters(4))
+    assert mid["tolerance"] == pytest.approx(vtile_main.tile_unit_meters(12))
+    assert high["tolerance"] == 0.0
+    assert vtile_main.tile_unit_meters(vtile_main.LOWRES_MAX_ZOOM) == pytest.approx(9.5546285356)
+
+
+def test_mvt_query_thins_low_zoom_tiles_and_limits_properties(monkeypatch):
+    monkeypatch.setattr(vtile_main, "PROPERTIES_BY_ZOOM", vtile_main.parse_zoom_properties("0:id,8:category,12:full"))
+    layer_id = uuid4()
+
+    overview = vtile_main.mvt_query_params(layer_id, 5, 10, 12)
+    detail = vtile_main.mvt_query_params(layer_id, 15, 100, 200)
+
+    assert overview["cluster_cell"] == pytest.approx(vtile_main.CLUSTER_GRID_UNITS * vtile_main.tile_unit_meters(5))
+    assert overview["min_size"] == pytest.approx(vtile_main.MIN_FEATURE_UNITS * vtile_main.tile_unit_meters(5))
+    assert overview["max_features"] == vtile_main.MAX_FEATURES_PER_TILE
+    assert overview["properties_mode"] == "id"
+    assert detail["cluster_cell"] == detail["min_size"] == 0.0
+    assert detail["properties_mode"] == "full"
+    assert vtile_main.mvt_query_params(layer_id, 9, 1, 1)["properties_mode"] == "category"
+
+    sql = str(vtile_main.MVT_QUERY)
+    assert "count(*) AS point_count" in sql
+    assert "LIMIT CAST(:max_features AS integer)" in sql
+
+
+def test_parse_zoom_properties_sorts_bands_and_skips_invalid_items():
+    assert vtile_main.parse_zoom_properties("12:FULL, 0:none,bad,x:id,3:everything,") == [
+        (0, "none"),
+        (12, "full"),
+    ]
+    assert vtile_main.parse_zoom_properties("") == []
+
+
+class RecordingDriver:
+    def __init__(self):
+        self.copied = []
+
+    async def set_type_codec(self, typename, **kwargs):
+        return None
+
+    async def reset_type_codec(self, typename, **kwargs):
+        return None
+
+    async def copy_records_to_table(self, table_name, *, records, columns=None):
+        async for record in records:
+            self.copied.append(dict(zip(columns, record)))
+
+
+class RecordingConnection:
+    def __init__(self, driver):
+        self.driver_connection = driver
+
+    async def get_raw_connection(self):
+        return self
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+        self.added = []
+        self.commits = 0
+        self.driver = RecordingDriver()
+
+    async def connection(self):
+        return RecordingConnection(self.driver)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, obj):
+        return None
+
+
+def test_feature_writes_bump_layer_edit_version_before_commit():
+    session = RecordingSession()
+    crud = FeatureCRUD(session)
+    layer_id = uuid4()
+    feature = FeatureCreate(
+        geometry={"type": "Point", "coordinates": [116.4, 39.9]},
+        properties={"category": "tree"},
+    )
+
+    asyncio.run(crud.create(layer_id, feature))
+    asyncio.run(crud.bulk_create(layer_id, [feature, feature]))
+
+    bumps = [str(statement) for statement in session.statements if "UPDATE layers" in str(statement)]
+    assert len(bumps) == 2
+    assert all("edit_version=(layers.edit_version +" in sql for sql in bumps)
+    assert session.commits == 2
+    assert len(session.driver.copied) == 2
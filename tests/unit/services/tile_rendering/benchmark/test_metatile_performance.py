@@ -0,0 +1,122 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("diskcache")
+pytest.importorskip("fastapi")
+rasterio = pytest.importorskip("rasterio")
+mercantile = pytest.importorskip("mercantile")
+from rasterio.transform import from_bounds
+
+from services.tile_service import router as tile_router
+from services.tile_service.core.cache import TileCache
+from services.tile_service.engine.tiler import clear_tile_engine_cache
+
+pytestmark = pytest.mark.benchmark
+
+PAN_ZOOM = 14
+PAN_ORIGIN = (8192, 5440)
+PAN_TILES = 8
+
+
+@pytest.fixture(autouse=True)
+def _benchmarks_enabled():
+    if os.getenv("RS_RUN_BENCHMARKS") != "1":
+        pytest.skip("Set RS_RUN_BENCHMARKS=1 to run tile rendering benchmarks.")
+
+
+@pytest.fixture
+def pan_raster(tmp_path):
+    """3-band Web Mercator GeoTIFF covering an 8x8 tile block at PAN_ZOOM."""
+    x0, y0 = PAN_ORIGIN
+    top_left = mercantile.xy_bounds(x0, y0, PAN_ZOOM)
+    bottom_right = mercantile.xy_bounds(x0 + PAN_TILES - 1, y0 + PAN_TILES - 1, PAN_ZOOM)
+    size = 256 * PAN_TILES * 2
+    rng = np.random.default_rng(7)
+    data = rng.integers(1, 4000, size=(3, size, size), dtype=np.uint16)
+
+    path = tmp_path / "pan.tif"
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=size,
+        height=size,
+        count=3,
+        dtype="uint16",
+        crs="EPSG:3857",
+        transform=from_bounds(
+            top_left.left,
+            bottom_right.bottom,
+            bottom_right.right,
+            top_left.top,
+            size,
+            size,
+        ),
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        nodata=0,
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+def _pan_sequence():
+    """Row-by-row sweep over the block, like a user dragging the map."""
+    x0, y0 = PAN_ORIGIN
+    for row in range(PAN_TILES):
+        cols = range(PAN_TILES) if row % 2 == 0 else reversed(range(PAN_TILES))
+        for col in cols:
+            yield x0 + col, y0 + row
+
+
+def _simulate_pan(monkeypatch, tmp_path, raster_path, metatile_size):
+    clear_tile_engine_cache()
+    cache = TileCache(
+        l1_size=1024,
+        l2_dir=str(tmp_path / f"cache_{metatile_size}"),
+        l2_limit=256 * 1024 ** 2,
+    )
+    monkeypatch.setattr(tile_router, "tile_cache", cache)
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_SIZE", metatile_size)
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_MIN_ZOOM", 0)
+
+    latencies = []
+    hits = 0
+    for x, y in _pan_sequence():
+        start = time.perf_counter()
+        result = tile_router._render_tile_sync(
+            raster_path,
+            "pan",
+            PAN_ZOOM,
+            x,
+            y,
+            [1, 2, 3],
+            "1,2,3",
+            tile_router._alpha_strategy(),
+            tile_router._render_options(),
+        )
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        hits += int(result.cache_hit)
+        assert result.content
+    return np.asarray(latencies), hits
+
+
+def test_metatile_pan_reduces_per_tile_cost(monkeypatch, tmp_path, pan_raster):
+    single_ms, single_hits = _simulate_pan(monkeypatch, tmp_path, pan_raster, 1)
+    meta_ms, meta_hits = _simulate_pan(monkeypatch, tmp_path, pan_raster, 4)
+
+    tiles = PAN_TILES * PAN_TILES
+    print(
+        f"\nPan over {tiles} tiles at z{PAN_ZOOM}: "
+        f"single {single_ms.mean():.2f} ms/tile ({single_hits} hits), "
+        f"metatile 4x4 {meta_ms.mean():.2f} ms/tile ({meta_hits} hits), "
+        f"p95 {np.percentile(single_ms, 95):.2f} -> {np.percentile(meta_ms, 95):.2f} ms"
+    )
+
+    assert single_hits == 0
+    assert meta_hits == tiles - (PAN_TILES // 4) ** 2
+    assert meta_ms.sum() < single_ms.sum()
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cachetools")
+pytest.importorskip("diskcache")
+
+from services.tile_service.core import shared_l1
+from services.tile_service.core.cache import TileCache
+
+pytestmark = pytest.mark.benchmark
+
+WORKERS = 4
+REQUESTS_PER_WORKER = 1500
+HOT_TILES = 600
+TILE_BYTES = 24 * 1024
+L1_BYTES = 32 * 1024 * 1024
+RENDER_SECONDS = 0.004
+
+
+@pytest.fixture(autouse=True)
+def _benchmarks_enabled():
+    if os.getenv("RS_RUN_BENCHMARKS") != "1":
+        pytest.skip("Set RS_RUN_BENCHMARKS=1 to run tile rendering benchmarks.")
+    if not shared_l1.HAS_SHARED_L1:
+        pytest.skip("Shared L1 needs fcntl.")
+
+
+class CountingL2:
+    """Counts L2 lookups, i.e. L1 misses, without changing behaviour."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.gets = 0
+
+    def get(self, key, *args, **kwargs):
+        self.gets += 1
+        return self.inner.get(key, *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self.inner.set(*args, **kwargs)
+
+
+def _worker(worker_id, l2_dir, shared_path, results):
+    cache = TileCache(
+        l2_dir=l2_dir,
+        l2_limit=1024 ** 3,
+        l1_bytes=L1_BYTES,
+        shared_l1_path=shared_path,
+    )
+    l2 = CountingL2(cache._get_l2_cache())
+    cache._l2_cache = l2
+
+    rng = np.random.default_rng(worker_id)
+    tiles = np.minimum(rng.zipf(1.2, size=REQUESTS_PER_WORKER), HOT_TILES)
+    payload = bytes(rng.integers(0, 256, size=TILE_BYTES, dtype=np.uint8))
+    latencies = []
+    cached_latencies = []
+    renders = 0
+    for tile in tiles:
+        start = time.perf_counter()
+        content = cache.get_tile("bench", 14, int(tile), 0, "1,2,3", file_version="v1")
+        if content is None:
+            time.sleep(RENDER_SECONDS)
+            cache.set_tile("bench", 14, int(tile), 0, "1,2,3", payload, file_version="v1")
+            renders += 1
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        latencies.append(elapsed_ms)
+        if content is not None:
+            cached_latencies.append(elapsed_ms)
+    results.put((REQUESTS_PER_WORKER - l2.gets, renders, latencies, cached_latencies))
+
+
+def _run_workers(tmp_path, shared):
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    l2_dir = str(tmp_path / ("shared" if shared else "local"))
+    shared_path = str(tmp_path / "l1.slab") if shared else None
+    procs = [
+        ctx.Process(target=_worker, args=(worker_id, l2_dir, shared_path, results))
+        for worker_id in range(WORKERS)
+    ]
+    for proc in procs:
+        proc.start()
+    collected = [results.get(timeout=120) for _ in procs]
+    for proc in procs:
+        proc.join(timeout=30)
+        assert proc.exitcode == 0
+
+    total = WORKERS * REQUESTS_PER_WORKER
+    l1_hits = sum(item[0] for item in collected)
+    renders = sum(item[1] for item in collected)
+    latencies = np.concatenate([item[2] for item in collected])
+    cached = np.concatenate([item[3] for item in collected])
+    return l1_hits / total, renders, latencies, cached
+
+
+def test_shared_l1_improves_cross_worker_hit_rate(tmp_path):
+    local_rate, local_renders, local_ms, local_cached = _run_workers(tmp_path, shared=False)
+    shared_rate, shared_renders, shared_ms, shared_cached = _run_workers(tmp_path, shared=True)
+
+    print(
+        f"\n{WORKERS} workers x {REQUESTS_PER_WORKER} requests: "
+        f"per-process L1 hit {local_rate:.1%} renders {local_renders} "
+        f"p99 {np.percentile(local_ms, 99):.3f} ms "
+        f"(cached p99 {np.percentile(local_cached, 99):.3f} ms) | "
+        f"shared L1 hit {shared_rate:.1%} renders {shared_renders} "
+        f"p99 {np.percentile(shared_ms, 99):.3f} ms "
+        f"(cached p99 {np.percentile(shared_cached, 99):.3f} ms)"
+    )
+
+    assert shared_rate > local_rate
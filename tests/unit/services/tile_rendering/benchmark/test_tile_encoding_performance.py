@@ -0,0 +1,100 @@
+import io
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("diskcache")
+pytest.importorskip("fastapi")
+pytest.importorskip("rasterio")
+from PIL import Image
+
+from services.tile_service import router as tile_router
+
+pytestmark = pytest.mark.benchmark
+
+REPEATS = 20
+
+
+@pytest.fixture(autouse=True)
+def _benchmarks_enabled():
+    if os.getenv("RS_RUN_BENCHMARKS") != "1":
+        pytest.skip("Set RS_RUN_BENCHMARKS=1 to run tile rendering benchmarks.")
+
+
+def _sample_tiles():
+    rng = np.random.default_rng(11)
+    yy, xx = np.mgrid[0:256, 0:256]
+
+    rgb = np.empty((256, 256, 4), dtype=np.uint8)
+    rgb[..., 0] = (xx + rng.integers(0, 24, size=xx.shape)) % 256
+    rgb[..., 1] = (yy + rng.integers(0, 24, size=yy.shape)) % 256
+    rgb[..., 2] = ((xx + yy) // 2) % 256
+    rgb[..., 3] = 255
+
+    colors = np.array(
+        [(0, 0, 0, 0), (34, 139, 34, 255), (65, 105, 225, 255), (210, 180, 140, 255), (128, 128, 128, 255)],
+        dtype=np.uint8,
+    )
+    classes = colors[((xx // 37) + (yy // 53)) % len(colors)]
+
+    mask = np.zeros((256, 256, 4), dtype=np.uint8)
+    mask[(xx - 128) ** 2 + (yy - 128) ** 2 < 90 ** 2] = (255, 255, 0, 255)
+
+    grey = np.empty((256, 256, 4), dtype=np.uint8)
+    grey[..., :3] = ((xx * 3 + yy) % 256)[..., None]
+    grey[..., 3] = 255
+    grey[:16] = 0
+
+    return {"rgb": rgb, "classes": classes, "mask": mask, "grey": grey}
+
+
+def _legacy_png(tile_data) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(tile_data).save(buf, **tile_router._png_save_options())
+    return buf.getvalue()
+
+
+def _encoders(monkeypatch):
+    def webp(lossless):
+        def encode(tile_data):
+            monkeypatch.setattr(tile_router.settings, "TILE_WEBP_LOSSLESS", lossless)
+            return tile_router._encode_webp(tile_data)
+
+        return encode
+
+    return {
+        "png_rgba": _legacy_png,
+        "png_auto": tile_router._encode_png,
+        "webp_lossless": webp(True),
+        "webp_lossy": webp(False),
+    }
+
+
+def test_tile_encoding_size_and_latency(monkeypatch):
+    monkeypatch.setattr(tile_router.settings, "TILE_PALETTE_MAX_COLORS", 256)
+    tiles = _sample_tiles()
+    results = {}
+    for tile_name, tile_data in tiles.items():
+        for encoder_name, encode in _encoders(monkeypatch).items():
+            content = encode(tile_data)
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                encode(tile_data)
+            elapsed_ms = (time.perf_counter() - start) * 1000.0 / REPEATS
+            results[(tile_name, encoder_name)] = (len(content), elapsed_ms)
+
+    print("\nTile encoding (bytes / ms per tile):")
+    for tile_name in tiles:
+        row = ", ".join(
+            f"{encoder_name} {results[(tile_name, encoder_name)][0]}B "
+            f"{results[(tile_name, encoder_name)][1]:.2f}ms"
+            for encoder_name in _encoders(monkeypatch)
+        )
+        print(f"  {tile_name}: {row}")
+
+    for tile_name in ("classes", "mask", "grey"):
+        assert results[(tile_name, "png_auto")][0] < results[(tile_name, "png_rgba")][0]
+    for tile_name in tiles:
+        assert results[(tile_name, "webp_lossless")][0] < results[(tile_name, "png_rgba")][0]
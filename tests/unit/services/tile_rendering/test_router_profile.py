@@ -1,14 +1,19 @@
 import asyncio
+import io
 import logging
+import multiprocessing
 from threading import RLock, get_ident
 import time
 
+import numpy as np
 import pytest
 
 pytest.importorskip("diskcache")
 pytest.importorskip("fastapi")
 pytest.importorskip("rasterio")
 
+from PIL import Image
+
 from services.tile_service import router as tile_router
 
 
@@ -123,6 +128,80 @@ def test_concurrent_identical_requests_render_once_off_event_loop(
     assert engine.thread_ids[0] != caller_thread_id
 
 
+class ProcessCountingEngine:
+    def __init__(self, counter):
+        self.counter = counter
+
+    def read_tile(self, *args, **kwargs):
+        with self.counter.get_lock():
+            self.counter.value += 1
+        time.sleep(0.2)
+        return object()
+
+
+def _render_in_process(raster_path, start_event):
+    start_event.wait(10)
+    result = tile_router._render_tile_sync(
+        raster_path, "idx", 3, 2, 3, [1], "1", "auto", {}
+    )
+    assert result.content == b"rendered-png"
+
+
+def test_identical_misses_in_separate_processes_render_once(tmp_path, monkeypatch):
+    from services.tile_service.core.cache import TileCache
+
+    raster_path = tmp_path / "lease.tif"
+    raster_path.write_bytes(b"raster")
+    ctx = multiprocessing.get_context("fork")
+    counter = ctx.Value("i", 0)
+    start_event = ctx.Event()
+    cache = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+
+    monkeypatch.setattr(tile_router, "tile_cache", cache)
+    monkeypatch.setattr(tile_router, "get_tile_engine", lambda path: ProcessCountingEngine(counter))
+    monkeypatch.setattr(tile_router, "_file_version", lambda path: "version-1")
+    monkeypatch.setattr(tile_router, "_encode_png", lambda tile: b"rendered-png")
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_SIZE", 1)
+    monkeypatch.setattr(tile_router.settings, "TILE_RENDER_LEASE_ENABLED", True)
+
+    procs = [
+        ctx.Process(target=_render_in_process, args=(str(raster_path), start_event))
+        for _ in range(4)
+    ]
+    for proc in procs:
+        proc.start()
+    start_event.set()
+    for proc in procs:
+        proc.join(timeout=30)
+
+    assert [proc.exitcode for proc in procs] == [0, 0, 0, 0]
+    assert counter.value == 1
+
+
+def test_cache_hit_skips_render_locks_and_lease(tmp_path, monkeypatch):
+    raster_path = tmp_path / "hit.tif"
+    raster_path.write_bytes(b"raster")
+
+    class LeaseRecordingCache(FakeCache):
+        def render_lease(self, *args, **kwargs):
+            raise AssertionError("cache hit should not take a render lease")
+
+    monkeypatch.setattr(tile_router, "tile_cache", LeaseRecordingCache())
+    monkeypatch.setattr(tile_router, "_file_version", lambda path: "version-1")
+    monkeypatch.setattr(tile_router.settings, "TILE_RENDER_LEASE_ENABLED", True)
+    monkeypatch.setattr(
+        tile_router._TILE_RENDER_LOCKS,
+        "hold",
+        lambda key: (_ for _ in ()).throw(AssertionError("cache hit should not lock")),
+    )
+
+    result = tile_router._render_tile_sync(str(raster_path), "idx", 3, 2, 3, [1], "1", "auto", {})
+
+    assert result.cache_hit
+    assert result.content == b"png"
+    assert result.timings["singleflight_wait"] == 0.0
+
+
 def test_tile_response_supports_browser_cache_revalidation(tmp_path, monkeypatch):
     raster_path = tmp_path / "etag.tif"
     raster_path.write_bytes(b"raster")
@@ -159,6 +238,88 @@ def test_tile_response_supports_browser_cache_revalidation(tmp_path, monkeypatch
     assert second.body == b""
 
 
+class FormatCache(FakeCache):
+    def __init__(self):
+        self.formats = []
+
+    def get_tile(self, *args, **kwargs):
+        self.formats.append(kwargs.get("tile_format"))
+        return b"tile"
+
+
+def test_accept_header_negotiates_webp_and_varies_response(tmp_path, monkeypatch):
+    raster_path = tmp_path / "webp.tif"
+    raster_path.write_bytes(b"raster")
+    cache = FormatCache()
+    monkeypatch.setattr(tile_router.logic, "get_raster_path", _fake_get_raster_path)
+    monkeypatch.setattr(tile_router, "tile_cache", cache)
+    monkeypatch.setattr(tile_router, "_file_version", lambda path: "version-1")
+    monkeypatch.setattr(tile_router.settings, "TILE_WEBP_ENABLED", True)
+
+    response = asyncio.run(
+        tile_router.get_tile(
+            "idx",
+            3,
+            2,
+            3,
+            bands="1",
+            accept="image/avif,image/webp,*/*;q=0.8",
+            db={"path": str(raster_path)},
+        )
+    )
+
+    assert response.status_code == 200
+    assert response.media_type == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    assert cache.formats == ["webp"]
+    assert tile_router._negotiate_tile_format("image/webp;q=0, image/png") == "png"
+    assert tile_router._negotiate_tile_format("image/png,*/*") == "png"
+
+    monkeypatch.setattr(tile_router.settings, "TILE_WEBP_ENABLED", False)
+    assert tile_router._negotiate_tile_format("image/webp") == "png"
+
+
+def test_png_encoder_picks_smallest_lossless_mode(monkeypatch):
+    monkeypatch.setattr(tile_router.settings, "TILE_PALETTE_MAX_COLORS", 256)
+    classes = np.zeros((256, 256, 4), dtype=np.uint8)
+    classes[:128] = (255, 0, 0, 255)
+    classes[128:, :128] = (0, 128, 0, 255)
+    grey = np.zeros((256, 256, 4), dtype=np.uint8)
+    grey[..., :3] = np.arange(256, dtype=np.uint8)[None, :, None]
+    grey[..., 3] = 255
+    rgb = np.random.default_rng(3).integers(0, 256, size=(256, 256, 4), dtype=np.uint8)
+    rgb[..., 3] = 255
+
+    palette = Image.open(io.BytesIO(tile_router._encode_png(classes)))
+    assert palette.mode == "P"
+    assert "transparency" in palette.info
+    assert np.array_equal(np.asarray(palette.convert("RGBA")), classes)
+
+    assert Image.open(io.BytesIO(tile_router._encode_png(rgb))).mode == "RGBA"
+
+    monkeypatch.setattr(tile_router.settings, "TILE_PALETTE_MAX_COLORS", 0)
+    assert Image.open(io.BytesIO(tile_router._encode_png(classes))).mode == "RGBA"
+    assert Image.open(io.BytesIO(tile_router._encode_png(grey))).mode == "LA"
+
+
+def test_cache_admin_endpoint_evicts_raster_and_forgets_path(monkeypatch):
+    calls = []
+
+    class InvalidatingCache:
+        def invalidate_raster(self, index_id, file_version=None):
+            calls.append((index_id, file_version))
+            return {"index_id": index_id, "l1_removed": 0, "l2_removed": 3}
+
+    monkeypatch.setattr(tile_router, "tile_cache", InvalidatingCache())
+    tile_router.logic._set_cached_raster_path("idx", "/old/path.tif")
+
+    result = asyncio.run(tile_router.invalidate_tile_cache("idx", file_version="v1"))
+
+    assert result["l2_removed"] == 3
+    assert calls == [("idx", "v1")]
+    assert tile_router.logic._get_cached_raster_path("idx") is tile_router.logic._CACHE_MISS
+
+
 def test_tile_request_bounds_band_and_xyz_work(monkeypatch):
     monkeypatch.setattr(tile_router.settings, "TILE_MAX_BANDS", 4)
     monkeypatch.setattr(tile_router.settings, "TILE_MAX_ZOOM", 24)
@@ -193,3 +354,74 @@ def test_route_preserves_client_error_for_invalid_xyz(monkeypatch):
         )
 
     assert exc_info.value.status_code == 400
+
+
+class RecordingCache(CoordinatedCache):
+    def __init__(self):
+        super().__init__()
+        self.tiles = {}
+
+    def get_tile(self, index_id, z, x, y, bands, *args, **kwargs):
+        with self.lock:
+            self.get_calls += 1
+            return self.tiles.get((z, x, y))
+
+    def set_tile(self, index_id, z, x, y, bands, data, *args, **kwargs):
+        with self.lock:
+            self.set_calls += 1
+            self.tiles[(z, x, y)] = data
+
+
+class MetatileEngine(SlowEngine):
+    def read_metatile(self, x, y, z, span, bands=None, stats=None):
+        with self.lock:
+            self.calls += 1
+        return {
+            (x + col, y + row): f"{x + col}/{y + row}"
+            for row in range(span)
+            for col in range(span)
+        }
+
+
+def test_metatile_mode_renders_block_once_and_caches_neighbours(tmp_path, monkeypatch):
+    raster_path = tmp_path / "metatile.tif"
+    raster_path.write_bytes(b"raster")
+    cache = RecordingCache()
+    engine = MetatileEngine()
+
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_SIZE", 4)
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_MIN_ZOOM", 0)
+    monkeypatch.setattr(tile_router.logic, "get_raster_path", _fake_get_raster_path)
+    monkeypatch.setattr(tile_router, "tile_cache", cache)
+    monkeypatch.setattr(tile_router, "get_tile_engine", lambda path: engine)
+    monkeypatch.setattr(tile_router, "_file_version", lambda path: "version-1")
+    monkeypatch.setattr(tile_router, "_encode_png", lambda tile: tile.encode())
+
+    responses = [
+        asyncio.run(
+            tile_router.get_tile("idx", 5, x, y, bands="1", db={"path": str(raster_path)})
+        )
+        for x, y in ((9, 13), (10, 13), (11, 14), (8, 15))
+    ]
+
+    assert [response.body for response in responses] == [
+        b"9/13",
+        b"10/13",
+        b"11/14",
+        b"8/15",
+    ]
+    assert engine.calls == 1
+    assert cache.set_calls == 16
+    assert (5, 8, 12) in cache.tiles and (5, 11, 15) in cache.tiles
+
+
+def test_metatile_span_respects_min_zoom_and_axis_size(monkeypatch):
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_SIZE", 6)
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_MIN_ZOOM", 1)
+
+    assert tile_router._metatile_span(0) == 1
+    assert tile_router._metatile_span(1) == 2
+    assert tile_router._metatile_span(10) == 4
+
+    monkeypatch.setattr(tile_router.settings, "TILE_METATILE_SIZE", 1)
+    assert tile_router._metatile_span(10) == 1
@@ -0,0 +1,103 @@
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("cachetools")
+pytest.importorskip("diskcache")
+
+from services.tile_service.core import shared_l1
+from services.tile_service.core.cache import TileCache
+from services.tile_service.core.shared_l1 import SharedTileSlab
+
+pytestmark = pytest.mark.skipif(not shared_l1.HAS_SHARED_L1, reason="shared L1 needs fcntl")
+
+
+def _write_from_child(path, capacity):
+    slab = SharedTileSlab(path, capacity)
+    slab["from-child"] = b"child-bytes"
+
+
+def test_shared_slab_roundtrip_pop_and_clear(tmp_path):
+    slab = SharedTileSlab(str(tmp_path / "l1.slab"), 256 * 1024)
+    slab["a"] = b"alpha"
+    slab["b"] = b"beta"
+    slab["a"] = b"alpha-2"
+
+    assert slab.get("a") == b"alpha-2"
+    assert slab.get("missing") is None
+    assert "b" in slab
+    assert sorted(slab) == ["a", "b"]
+    assert slab.pop("b") == b"beta"
+    assert "b" not in slab
+    with pytest.raises(KeyError):
+        slab["b"]
+
+    stats = slab.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    slab.clear()
+    assert len(slab) == 0
+
+
+def test_shared_slab_respects_byte_budget_and_keeps_hot_entries(tmp_path):
+    capacity = 256 * 1024
+    slab = SharedTileSlab(str(tmp_path / "l1.slab"), capacity)
+    payload = b"x" * 8 * 1024
+    slab["hot"] = payload
+
+    for i in range(200):
+        slab[f"cold-{i}"] = payload
+        assert slab.get("hot") == payload
+
+    assert slab.get("cold-0") is None
+    assert slab.stats()["used_bytes"] <= capacity
+    with pytest.raises(ValueError):
+        slab["huge"] = b"x" * capacity
+
+
+def test_shared_slab_is_visible_across_processes(tmp_path):
+    path = str(tmp_path / "l1.slab")
+    parent = SharedTileSlab(path, 256 * 1024)
+    parent["from-parent"] = b"parent-bytes"
+
+    ctx = multiprocessing.get_context("fork")
+    child = ctx.Process(target=_write_from_child, args=(path, 256 * 1024))
+    child.start()
+    child.join(timeout=30)
+
+    assert child.exitcode == 0
+    assert parent.get("from-child") == b"child-bytes"
+    assert parent.get("from-parent") == b"parent-bytes"
+
+
+def test_tile_cache_uses_shared_l1_and_invalidates_it(tmp_path):
+    l1_path = str(tmp_path / "l1.slab")
+    writer = TileCache(
+        l2_dir=str(tmp_path / "cache"),
+        l2_limit=1024 * 1024,
+        l1_bytes=256 * 1024,
+        shared_l1_path=l1_path,
+    )
+    reader = TileCache(
+        l2_dir=str(tmp_path / "other"),
+        l2_limit=1024 * 1024,
+        l1_bytes=256 * 1024,
+        shared_l1_path=l1_path,
+    )
+    writer.set_tile("idx", 1, 0, 0, "1", b"tile", file_version="v1")
+
+    assert reader.get_tile("idx", 1, 0, 0, "1", file_version="v1") == b"tile"
+
+    writer.invalidate_raster("idx")
+
+    assert reader.get_tile("idx", 1, 0, 0, "1", file_version="v1") is None
+
+
+def test_tile_cache_l1_byte_budget_skips_oversized_tiles(tmp_path):
+    cache = TileCache(l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024, l1_bytes=16)
+    cache.set_tile("idx", 1, 0, 0, "1", b"small", file_version=1)
+    cache.set_tile("idx", 1, 0, 1, "1", b"x" * 64, file_version=1)
+
+    assert cache.l1_cache.currsize == len(b"small")
+    assert cache.get_tile("idx", 1, 0, 1, "1", file_version=1) == b"x" * 64
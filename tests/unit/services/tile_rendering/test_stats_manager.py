@@ -11,6 +11,10 @@ from services.tile_service.engine.stats import (
     _GLOBAL_FILE_STATS,
     _GLOBAL_FILE_STATS_LOCK,
     StatsManager,
+    load_band_stats,
+    save_band_stats,
+    stats_sidecar_path,
+    write_band_stats,
 )
 
 
@@ -139,3 +143,95 @@ def test_stats_manager_skips_metadata_stats_that_equal_nodata(tmp_path, monkeypa
 
     assert float(mins[0]) == 10.0
     assert float(maxs[0]) == 90.0
+
+
+def test_stats_manager_loads_persisted_stats_without_reading_raster(tmp_path, monkeypatch):
+    raster = tmp_path / "persisted.tif"
+    raster.write_bytes(b"raster")
+    src = FakeStatsDataset(str(raster))
+    StatsManager.invalidate_file(src.name)
+    save_band_stats(src.name, {1: (12.0, 345.0)})
+
+    def unexpected_compute(self, compute_src, b_idx):
+        raise AssertionError("persisted stats must not trigger a raster read")
+
+    monkeypatch.setattr(StatsManager, "_compute_global_stats", unexpected_compute)
+    mins, maxs = StatsManager().get_stretch_params(np.ones((1, 4, 4)), [1], src)
+
+    assert (float(mins[0]), float(maxs[0])) == (12.0, 345.0)
+
+
+def test_stats_manager_persists_computed_stats_and_recomputes_when_file_changes(
+    tmp_path,
+    monkeypatch,
+):
+    raster = tmp_path / "changing.tif"
+    raster.write_bytes(b"raster")
+    src = FakeStatsDataset(str(raster))
+    StatsManager.invalidate_file(src.name)
+    monkeypatch.setattr(StatsManager, "_compute_global_stats", lambda self, compute_src, b_idx: (5.0, 50.0))
+
+    StatsManager().get_stretch_params(np.ones((1, 4, 4)), [1], src)
+
+    assert load_band_stats(src.name) == {1: (5.0, 50.0)}
+
+    raster.write_bytes(b"rewritten raster")
+    StatsManager.invalidate_file(src.name)
+    assert load_band_stats(src.name) == {}
+
+    monkeypatch.setattr(StatsManager, "_compute_global_stats", lambda self, compute_src, b_idx: (7.0, 70.0))
+    mins, maxs = StatsManager().get_stretch_params(np.ones((1, 4, 4)), [1], src)
+
+    assert (float(mins[0]), float(maxs[0])) == (7.0, 70.0)
+    assert load_band_stats(src.name) == {1: (7.0, 70.0)}
+
+
+def test_save_band_stats_uses_a_distinct_temp_file_per_write(tmp_path, monkeypatch):
+    import os
+
+    from services.tile_service.engine import stats as stats_module
+
+    raster = tmp_path / "shared.tif"
+    raster.write_bytes(b"raster")
+    replaced = []
+    real_replace = os.replace
+
+    def recording_replace(src, dst):
+        replaced.append(src)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(stats_module.os, "replace", recording_replace)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda band: save_band_stats(str(raster), {band: (1.0, 2.0)}), [1, 1, 1, 1]))
+
+    assert all(results)
+    assert len(set(replaced)) == 4
+    assert load_band_stats(str(raster)) == {1: (1.0, 2.0)}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_write_band_stats_precomputes_every_band(tmp_path):
+    rasterio = pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+
+    path = str(tmp_path / "cog.tif")
+    data = np.arange(1, 2 * 32 * 32 + 1, dtype=np.uint16).reshape(2, 32, 32)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=32,
+        height=32,
+        count=2,
+        dtype="uint16",
+        crs="EPSG:3857",
+        transform=from_origin(0, 0, 10, 10),
+    ) as dst:
+        dst.write(data)
+
+    stats = write_band_stats(path)
+
+    assert sorted(stats) == [1, 2]
+    assert all(high > low for low, high in stats.values())
+    assert load_band_stats(path) == stats
+    assert stats_sidecar_path(path).endswith(".rsstats.json")
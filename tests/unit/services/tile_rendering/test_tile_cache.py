@@ -88,3 +88,61 @@ def test_tile_cache_preserves_legacy_key_shape(tmp_path):
 
     assert cache._make_key("idx", 1, 2, 3, "1,2,3") == "idx/1/2/3/1,2,3"
     assert cache._make_key("idx", 1, 2, 3, "1", {"low": 1, "high": 9}).count("/") == 5
+
+
+def test_tile_cache_different_format_does_not_hit(tmp_path):
+    cache = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+    cache.set_tile("idx", 1, 2, 3, "1", b"webp", file_version=1, tile_format="webp")
+
+    assert cache.get_tile("idx", 1, 2, 3, "1", file_version=1, tile_format="webp") == b"webp"
+    assert cache.get_tile("idx", 1, 2, 3, "1", file_version=1, tile_format="png") is None
+    assert cache.get_tile("idx", 1, 2, 3, "1", file_version=1) is None
+
+
+def test_tile_cache_invalidates_one_raster_or_one_file_version(tmp_path):
+    cache = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+    cache.set_tile("idx", 1, 0, 0, "1", b"old", file_version="v1")
+    cache.set_tile("idx", 1, 0, 1, "1", b"new", file_version="v2")
+    cache.set_tile("other", 1, 0, 0, "1", b"keep", file_version="v1")
+
+    result = cache.invalidate_raster("idx", "v1")
+
+    assert result["l1_removed"] == 1
+    assert result["l2_removed"] == 1
+    assert cache.raster_versions("idx") == ("v2",)
+    assert cache.get_tile("idx", 1, 0, 0, "1", file_version="v1") is None
+    assert cache.get_tile("idx", 1, 0, 1, "1", file_version="v2") == b"new"
+
+    cache.clear_l1()
+    result = cache.invalidate_raster("idx")
+
+    assert result["l2_removed"] == 1
+    assert cache.raster_versions("idx") == ()
+    assert cache.get_tile("idx", 1, 0, 1, "1", file_version="v2") is None
+    assert cache.get_tile("other", 1, 0, 0, "1", file_version="v1") == b"keep"
+
+
+def test_tile_cache_invalidation_is_visible_to_another_process_handle(tmp_path):
+    writer = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+    admin = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+    writer.set_tile("idx", 1, 0, 0, "1", b"a", file_version="v1")
+
+    assert admin.invalidate_raster("idx")["l2_removed"] == 1
+
+    writer.clear_l1()
+    assert writer.get_tile("idx", 1, 0, 0, "1", file_version="v1") is None
+
+
+def test_render_lease_is_exclusive_and_times_out(tmp_path):
+    owner = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+    other = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=1024 * 1024)
+
+    with owner.render_lease("tile-key") as acquired:
+        assert acquired is True
+        with other.render_lease("tile-key", timeout=0.05) as waited:
+            assert waited is False
+        with other.render_lease("other-key", timeout=0.05) as independent:
+            assert independent is True
+
+    with other.render_lease("tile-key", timeout=0.05) as acquired_after_release:
+        assert acquired_after_release is True
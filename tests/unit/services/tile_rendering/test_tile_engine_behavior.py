@@ -186,3 +186,26 @@ def test_tile_engine_thread_local_does_not_share_handles_across_threads(mocker,
     assert all(result is not None for result in results)
     assert len(opened_thread_ids) == 2
     assert len(set(opened_thread_ids)) == 2
+
+
+def test_tile_engine_metatile_slices_block_into_sub_tiles(mocker):
+    data = np.zeros((1, 512, 512), dtype=np.float32)
+    data[:, :256, :256] = 7.0
+    data[:, :256, 256:] = 9.0
+    data[:, 256:, 256:] = 11.0
+    _patch_engine_io(mocker, data)
+    mocker.patch("services.tile_service.engine.tiler.get_metatile_window", return_value=None)
+
+    tiles = TileEngine("fake.tif").read_metatile(4, 6, 3, 2, bands=[1])
+
+    assert set(tiles) == {(4, 6), (5, 6), (4, 7), (5, 7)}
+    assert tiles[(4, 7)] is None
+    for coords in ((4, 6), (5, 6), (5, 7)):
+        assert tiles[coords].shape == (256, 256, 4)
+        assert np.all(tiles[coords][:, :, 3] == 255)
+
+
+def test_tile_engine_metatile_missing_file_returns_empty(tmp_path):
+    engine = TileEngine(str(tmp_path / "missing.tif"))
+
+    assert engine.read_metatile(0, 0, 2, 2, bands=[1]) == {}
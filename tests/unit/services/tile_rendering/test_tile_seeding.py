@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("diskcache")
+pytest.importorskip("fastapi")
+rasterio = pytest.importorskip("rasterio")
+from rasterio.transform import from_bounds
+
+from services.tile_service import router as tile_router
+from services.tile_service import seeding
+from services.tile_service.core.cache import TileCache
+from services.tile_service.engine.tiler import clear_tile_engine_cache
+
+BOUNDS = [116.30, 39.85, 116.50, 40.00]
+
+
+def _write_wgs84_raster(path):
+    data = np.arange(1, 3 * 64 * 64 + 1, dtype=np.uint16).reshape(3, 64, 64)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=64,
+        height=64,
+        count=3,
+        dtype="uint16",
+        crs="EPSG:4326",
+        transform=from_bounds(*BOUNDS, 64, 64),
+        nodata=0,
+    ) as dst:
+        dst.write(data)
+    return str(path)
+
+
+def test_plan_seed_zooms_orders_low_zoom_first_and_respects_budget():
+    plan = seeding.plan_seed_zooms(BOUNDS, min_zoom=0, max_zoom=14, max_tiles=40)
+
+    zooms = [zoom for zoom, _ in plan]
+    assert zooms == sorted(zooms)
+    assert zooms[0] == 0
+    assert sum(count for _, count in plan) <= 40
+    assert zooms[-1] < 14
+
+
+def test_plan_seed_zooms_keeps_min_zoom_even_when_over_budget():
+    plan = seeding.plan_seed_zooms(BOUNDS, min_zoom=15, max_zoom=16, max_tiles=1)
+
+    assert [zoom for zoom, _ in plan] == [15]
+
+
+def test_iter_seed_tiles_matches_plan_counts():
+    plan = seeding.plan_seed_zooms(BOUNDS, min_zoom=8, max_zoom=11)
+    tiles = list(seeding.iter_seed_tiles(BOUNDS, [zoom for zoom, _ in plan]))
+
+    assert [tile.z for tile in tiles] == sorted(tile.z for tile in tiles)
+    for zoom, count in plan:
+        assert sum(1 for tile in tiles if tile.z == zoom) == count
+
+
+def test_seed_raster_tiles_fills_cache_used_by_tile_route(tmp_path, monkeypatch):
+    raster_path = _write_wgs84_raster(tmp_path / "seed.tif")
+    cache = TileCache(l1_size=8, l2_dir=str(tmp_path / "cache"), l2_limit=64 * 1024 ** 2)
+    monkeypatch.setattr(tile_router, "tile_cache", cache)
+    clear_tile_engine_cache()
+    progress = []
+
+    first = seeding.seed_raster_tiles(
+        42,
+        raster_path,
+        min_zoom=9,
+        max_zoom=10,
+        progress=lambda value, message: progress.append((value, message)),
+    )
+    second = seeding.seed_raster_tiles(42, raster_path, BOUNDS, min_zoom=9, max_zoom=10)
+
+    assert first["zooms"] == [9, 10]
+    assert first["rendered"] == first["tiles"] > 0
+    assert second["cached"] == second["tiles"] == first["tiles"]
+    assert [message.split(" (")[0] for _, message in progress] == [
+        "Seeding zoom 9",
+        "Seeding zoom 10",
+    ]
+
+    tile = next(seeding.iter_seed_tiles(BOUNDS, [10]))
+    result = tile_router._render_tile_sync(
+        raster_path,
+        "42",
+        tile.z,
+        tile.x,
+        tile.y,
+        [1, 2, 3],
+        "1,2,3",
+        tile_router._alpha_strategy(),
+        tile_router._render_options(),
+        first["format"],
+    )
+    assert result.cache_hit is True
+
+
+def test_seed_raster_tiles_rejects_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        seeding.seed_raster_tiles(1, str(tmp_path / "missing.tif"), BOUNDS)
@@ -65,19 +65,21 @@ def test_geojson_export_serializes_geom_column_and_uuid_ids(monkeypatch, tmp_pat
     executed = {}
 
     class ResultStub:
-        def fetchall(self):
-            return [
+        def __iter__(self):
+            return iter([
                 SimpleNamespace(
-                    id=feature_id,
-                    properties={"category": "sample"},
+                    id=str(feature_id),
+                    layer_id=str(layer_id),
+                    properties='{"category": "sample"}',
                     geometry='{"type":"Point","coordinates":[120.0,30.0]}',
                 )
-            ]
+            ])
 
     class DbStub:
         def execute(self, sql, params):
             executed["sql"] = str(sql)
             executed["params"] = params
+            executed["options"] = sql.get_execution_options()
             return ResultStub()
 
     class DbContext:
@@ -98,10 +100,72 @@ def test_geojson_export_serializes_geom_column_and_uuid_ids(monkeypatch, tmp_pat
     result = geojson.export_geojson_task.run(layer_id, str(output_path))
 
     assert result == {"output_path": str(output_path), "feature_count": 1}
-    assert "ST_AsGeoJSON(f.geom)::json AS geometry" in executed["sql"]
+    assert "ST_AsGeoJSON(f.geom) AS geometry" in executed["sql"]
+    assert executed["options"]["yield_per"] > 0
     assert executed["params"] == {"layer_id": layer_id}
 
     payload = json.loads(output_path.read_text(encoding="utf-8"))
     assert payload["features"][0]["id"] == str(feature_id)
     assert payload["features"][0]["geometry"]["type"] == "Point"
     assert payload["metadata"]["layer_id"] == str(layer_id)
+    assert payload["metadata"]["feature_count"] == 1
+
+
+def test_seed_tiles_task_is_registered_on_preprocess_queue():
+    _require_worker_deps()
+    from worker_cluster.app import celery_app
+
+    celery_app.loader.import_default_modules()
+
+    assert "worker_cluster.tasks.preprocess.seed_tiles" in celery_app.tasks
+    route = celery_app.amqp.router.route({}, "worker_cluster.tasks.preprocess.seed_tiles")
+    assert route["queue"].name == "preprocess"
+
+
+def test_geom_3857_backfill_runs_batches_until_nothing_is_pending(monkeypatch):
+    pytest.importorskip("celery")
+    pytest.importorskip("redis")
+    from worker_cluster.tasks.maintenance import geometry
+
+    layer_id = uuid4()
+    batches = [
+        SimpleNamespace(features=3, layers=1),
+        SimpleNamespace(features=2, layers=1),
+        SimpleNamespace(features=0, layers=0),
+    ]
+    executed = []
+
+    class ResultStub:
+        def __init__(self, row):
+            self.row = row
+
+        def scalar(self):
+            return 5
+
+        def one(self):
+            return self.row
+
+    class DbStub:
+        def execute(self, sql, params):
+            executed.append((str(sql), params))
+            if "count(*)" in str(sql) and "WITH" not in str(sql):
+                return ResultStub(None)
+            return ResultStub(batches.pop(0))
+
+    class DbContext:
+        def __enter__(self):
+            return DbStub()
+
+        def __exit__(self, exc_type, exc, traceback):
+            return False
+
+    monkeypatch.setattr(geometry, "get_sync_db", lambda: DbContext())
+    monkeypatch.setattr(geometry.backfill_geom_3857_task, "report", lambda progress, message="": None)
+
+    result = geometry.backfill_geom_3857_task.run(layer_id, batch_size=3)
+
+    assert result == {"updated": 5, "batches": 2, "layer_id": str(layer_id)}
+    assert len(executed) == 4
+    assert "SET geom = f.geom" in executed[1][0]
+    assert "SET edit_version = l.edit_version + 1" in executed[1][0]
+    assert executed[1][1] == {"layer_id": str(layer_id), "batch_size": 3}
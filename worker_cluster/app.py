@@ -22,6 +22,7 @@ TASK_MODULES = (
     "worker_cluster.tasks.index.spectral",
     "worker_cluster.tasks.algorithm.raster_product",
     "worker_cluster.tasks.export.geojson",
+    "worker_cluster.tasks.maintenance.geometry",
 )
 
 celery_app = Celery("rsmarking", include=list(TASK_MODULES))
@@ -48,6 +48,8 @@ task_routes = {
     "worker_cluster.tasks.index.*": {"queue": "index"},
     "worker_cluster.tasks.algorithm.*": {"queue": "index"},
     "worker_cluster.tasks.export.*": {"queue": "export"},
+    # Database maintenance shares the export workers (annotation DB access).
+    "worker_cluster.tasks.maintenance.*": {"queue": "export"},
     "worker_cluster.tasks.extraction.*": {"queue": "extraction"},
 }
 task_default_queue = "preprocess"
@@ -21,6 +21,7 @@ from services.data_service.processor import RasterProcessor
 from worker_cluster.app import celery_app
 from worker_cluster.bridge.db_sync import get_sync_db
 from worker_cluster.tasks.base import BaseRasterTask
+from worker_cluster.tasks.preprocess.pipeline import schedule_tile_seed
 
 
 logger = logging.getLogger("worker.algorithm.raster_product")
@@ -299,6 +300,7 @@ def raster_product_task(
             bands_count=bands_count,
         )
         product = _register_raster_product(metadata)
+        schedule_tile_seed(product["index_id"], cog_path, metadata.get("bounds_wgs84"))
         product.update(
             {
                 "operation": operation,
@@ -0,0 +1 @@
+"""Cluster tasks that maintain derived data in the service databases."""
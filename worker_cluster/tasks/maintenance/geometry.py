@@ -0,0 +1,107 @@
+"""
+features.geom_3857 backfill task
+─────────────────────────────────────────────────────────────────────────────
+Migration c4d7e2a9b613 adds trigger-maintained Web Mercator columns to
+annotation_service's ``features`` table. New writes fill them immediately;
+this task fills rows that predate the migration, in short batches so it can
+run while the services are live.
+"""
+import logging
+import os
+
+from sqlalchemy import text
+
+from worker_cluster.app import celery_app
+from worker_cluster.tasks.base import BaseRasterTask
+from worker_cluster.bridge.db_sync import get_sync_db
+
+logger = logging.getLogger("worker.maintenance.geometry")
+
+DEFAULT_BATCH_SIZE = int(os.getenv("GEOM_3857_BACKFILL_BATCH_SIZE", "5000"))
+
+COUNT_PENDING_SQL = text("""
+    SELECT count(*)
+    FROM features
+    WHERE geom_3857 IS NULL
+    AND (CAST(:layer_id AS uuid) IS NULL OR layer_id = CAST(:layer_id AS uuid))
+""")
+
+# Re-assigning geom fires features_sync_geom_3857, so the projection and
+# simplification rules live only in the trigger. Touched layers get a new
+# edit_version so vtile_service stops serving tiles rendered from the fallback.
+BACKFILL_BATCH_SQL = text("""
+    WITH
+    batch AS (
+      SELECT id
+      FROM features
+      WHERE geom_3857 IS NULL
+      AND (CAST(:layer_id AS uuid) IS NULL OR layer_id = CAST(:layer_id AS uuid))
+      LIMIT :batch_size
+      FOR UPDATE SKIP LOCKED
+    ),
+    updated AS (
+      UPDATE features f
+      SET geom = f.geom
+      FROM batch
+      WHERE f.id = batch.id
+      RETURNING f.layer_id
+    ),
+    bumped AS (
+      UPDATE layers l
+      SET edit_version = l.edit_version + 1
+      WHERE l.id IN (SELECT layer_id FROM updated)
+      RETURNING l.id
+    )
+    SELECT
+      (SELECT count(*) FROM updated) AS features,
+      (SELECT count(*) FROM bumped) AS layers
+""")
+
+
+@celery_app.task(
+    bind=True,
+    base=BaseRasterTask,
+    name="worker_cluster.tasks.maintenance.backfill_geom_3857",
+    queue="export",
+)
+def backfill_geom_3857_task(
+    self,
+    layer_id: str | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """
+    Fill features.geom_3857 / geom_3857_lowres for rows created before the
+    column existed. Each batch commits on its own; re-running is a no-op.
+
+    Args:
+        layer_id   : optional, limit the backfill to one layer
+        batch_size : rows per transaction
+    Returns:
+        {"updated": ..., "batches": ..., "layer_id": ...}
+    """
+    try:
+        batch_size = max(1, int(batch_size))
+        params = {"layer_id": str(layer_id) if layer_id else None}
+
+        with get_sync_db() as db:
+            pending = int(db.execute(COUNT_PENDING_SQL, params).scalar() or 0)
+        self.report(5, f"{pending} features to backfill")
+
+        updated = 0
+        batches = 0
+        while True:
+            with get_sync_db() as db:
+                row = db.execute(BACKFILL_BATCH_SQL, {**params, "batch_size": batch_size}).one()
+            if not row.features:
+                break
+            updated += int(row.features)
+            batches += 1
+            progress = 5 + int(90 * min(updated, pending) / pending) if pending else 95
+            self.report(progress, f"Backfilled {updated}/{pending} features")
+
+        logger.info(f"[backfill_geom_3857] done layer_id={layer_id} updated={updated} batches={batches}")
+        return {"updated": updated, "batches": batches, "layer_id": params["layer_id"]}
+
+    except Exception as exc:
+        logger.exception(f"[backfill_geom_3857] failed layer_id={layer_id}")
+        raise self.retry(exc=exc, countdown=30)
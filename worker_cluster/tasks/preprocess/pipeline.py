@@ -6,6 +6,7 @@ text:
   - build_overviews_task  : textBuilding overviews(text COG whenuses)
   - reproject_task        : reproject to CRS
   - compute_statistics_task: text(min/max/mean/std),write RasterField
+  - seed_tiles_task       : pre-render XYZ tiles into the tile-service diskcache
 """
 import logging
 import os
@@ -15,6 +16,7 @@ from worker_cluster.tasks.base import BaseRasterTask
 from worker_cluster.bridge.status_reporter import update_cog_path
 from worker_cluster.bridge.db_sync import get_sync_db
 
+from services.data_service.bridges.worker_bridge import tile_seed_enabled
 from services.data_service.models import RasterMetadata, RasterField
 from services.data_service.processor import RasterProcessor
 from functions.implement.io_ops import build_raster_overviews, convert_raster_to_cog
@@ -35,6 +37,27 @@ def _ensure_parent_dir(path: str) -> None:
     if parent:
         os.makedirs(parent, exist_ok=True)
 
+
+def schedule_tile_seed(
+    index_id: int,
+    cog_path: str,
+    bounds_wgs84: list[float] | None = None,
+) -> None:
+    """Queue tile pre-seeding for a new COG; never fails the calling task."""
+    if not tile_seed_enabled():
+        return
+    try:
+        seed_tiles_task.apply_async(
+            kwargs={
+                "index_id": index_id,
+                "file_path": cog_path,
+                "bounds_wgs84": bounds_wgs84,
+            },
+            queue="preprocess",
+        )
+    except Exception as exc:
+        logger.warning(f"[seed_tiles] scheduling failed index_id={index_id}: {exc}")
+
 # ─── 1. COG conversion + text ─────────────────────────────────────────────────────
 
 @celery_app.task(
@@ -68,6 +91,8 @@ def build_cog_task(self, index_id: int, raw_path: str, cog_path: str) -> dict:
         self.report(90, "Writing back to database")
         update_cog_path(index_id, cog_path)
 
+        schedule_tile_seed(index_id, cog_path)
+
         logger.info(f"[build_cog] done index_id={index_id}")
         return {"index_id": index_id, "cog_path": cog_path}
 
@@ -266,3 +291,55 @@ def compute_statistics_task(self, index_id: int, file_path: str) -> dict:
     except Exception as exc:
         logger.exception(f"[compute_statistics] failed index_id={index_id}")
         raise self.retry(exc=exc, countdown=10)
+
+
+# ─── 5. Tile pre-seeding ──────────────────────────────────────────────────────
+
+@celery_app.task(
+    bind=True,
+    base=BaseRasterTask,
+    name="worker_cluster.tasks.preprocess.seed_tiles",
+    queue="preprocess",
+    max_retries=1,
+)
+def seed_tiles_task(
+    self,
+    index_id: int,
+    file_path: str,
+    bounds_wgs84: list[float] | None = None,
+    min_zoom: int | None = None,
+    max_zoom: int | None = None,
+    bands: str | None = None,
+) -> dict:
+    """
+    Render a zoom range over the raster footprint into the tile diskcache.
+
+    Args:
+        index_id     : RasterMetadata.index_id used in tile URLs
+        file_path    : COG path the tile service resolves for index_id
+        bounds_wgs84 : [west, south, east, north]; read from the file when omitted
+        min_zoom     : first zoom to seed, TILE_SEED_MIN_ZOOM by default
+        max_zoom     : last zoom to seed, TILE_SEED_MAX_ZOOM by default
+        bands        : band selection, tile-service DEFAULT_BANDS by default
+    Returns:
+        {"index_id": ..., "zooms": [...], "tiles": ..., "rendered": ..., "cached": ...}
+    """
+    from services.tile_service.seeding import seed_raster_tiles
+
+    try:
+        self.report(1, "Planning tile seeding")
+        result = seed_raster_tiles(
+            index_id,
+            file_path,
+            bounds_wgs84,
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            bands=bands,
+            progress=lambda progress, message: self.report(max(1, progress), message),
+        )
+        logger.info(f"[seed_tiles] done index_id={index_id} tiles={result['tiles']}")
+        return result
+
+    except Exception as exc:
+        logger.exception(f"[seed_tiles] failed index_id={index_id}")
+        raise self.retry(exc=exc, countdown=30)